@@ -36,53 +36,37 @@ const Dashboard = () => {
 
   const fetchDashboardData = async () => {
     try {
-      // Mock data for demonstration
+      const [summaryResponse, seriesResponse, callsResponse] = await Promise.all([
+        fetch('/api/analytics/summary?days=7'),
+        fetch('/api/analytics/timeseries?granularity=day&periods=7'),
+        fetch('/api/phone/calls?limit=3&fields=id,caller_name,caller_phone,primary_intent,call_status,duration_seconds,start_time')
+      ]);
+
+      const summary = await summaryResponse.json();
       setStats({
-        totalCalls: 127,
-        appointmentsBooked: 34,
-        leadsGenerated: 89,
-        averageCallDuration: 185
+        totalCalls: summary.total_calls,
+        appointmentsBooked: summary.appointments_booked,
+        leadsGenerated: summary.leads_qualified,
+        averageCallDuration: summary.average_duration_seconds
       });
 
-      setRecentCalls([
-        {
-          id: 1,
-          caller: 'John Smith',
-          phone: '(555) 123-4567',
-          intent: 'appointment_booking',
-          status: 'completed',
-          duration: 180,
-          timestamp: '2025-01-30 14:30:00'
-        },
-        {
-          id: 2,
-          caller: 'Sarah Johnson',
-          phone: '(555) 987-6543',
-          intent: 'business_hours',
-          status: 'completed',
-          duration: 45,
-          timestamp: '2025-01-30 14:15:00'
-        },
-        {
-          id: 3,
-          caller: 'Mike Wilson',
-          phone: '(555) 456-7890',
-          intent: 'services',
-          status: 'completed',
-          duration: 120,
-          timestamp: '2025-01-30 13:45:00'
-        }
-      ]);
-
-      setCallData([
-        { date: '2025-01-24', calls: 12, appointments: 3 },
-        { date: '2025-01-25', calls: 19, appointments: 5 },
-        { date: '2025-01-26', calls: 15, appointments: 4 },
-        { date: '2025-01-27', calls: 22, appointments: 7 },
-        { date: '2025-01-28', calls: 18, appointments: 6 },
-        { date: '2025-01-29', calls: 25, appointments: 8 },
-        { date: '2025-01-30', calls: 16, appointments: 1 }
-      ]);
+      const { series } = await seriesResponse.json();
+      setCallData(series.map((bucket) => ({
+        date: bucket.bucket_start.slice(0, 10),
+        calls: bucket.calls,
+        appointments: bucket.appointments_booked
+      })));
+
+      const { calls } = await callsResponse.json();
+      setRecentCalls(calls.map((call) => ({
+        id: call.id,
+        caller: call.caller_name || 'Unknown caller',
+        phone: call.caller_phone,
+        intent: call.primary_intent || 'unknown',
+        status: call.call_status,
+        duration: call.duration_seconds || 0,
+        timestamp: call.start_time
+      })));
     } catch (error) {
       console.error('Error fetching dashboard data:', error);
     }
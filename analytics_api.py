@@ -0,0 +1,100 @@
+"""
+Analytics API Routes
+Dashboard statistics served from call rollups
+"""
+
+import logging
+from flask import Blueprint, request, jsonify
+from flask_cors import cross_origin
+from src.services.analytics_service import AnalyticsService
+from src.services.tracing import tracer
+from src.models.rollup import rebuild_rollups
+
+logger = logging.getLogger(__name__)
+
+analytics_bp = Blueprint('analytics', __name__)
+
+# Longest window a single request may ask for
+MAX_DAYS = 366
+MAX_PERIODS = 24 * 31
+MAX_TRACE_WINDOW_SECONDS = 24 * 3600
+MAX_TRACES = 500
+
+analytics_service = AnalyticsService()
+
+@analytics_bp.route('/summary', methods=['GET'])
+@cross_origin()
+def get_summary():
+    """Get call, appointment and lead totals for the last N days"""
+    try:
+        days = max(1, min(request.args.get('days', 7, type=int), MAX_DAYS))
+        return jsonify(analytics_service.get_summary(days))
+        
+    except Exception as e:
+        logger.error(f"Error fetching analytics summary: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@analytics_bp.route('/timeseries', methods=['GET'])
+@cross_origin()
+def get_timeseries():
+    """Get per-hour or per-day rollups for charting"""
+    try:
+        granularity = request.args.get('granularity', 'day')
+        periods = max(1, min(request.args.get('periods', 7, type=int), MAX_PERIODS))
+        
+        series = analytics_service.get_timeseries(granularity, periods)
+        return jsonify({'granularity': granularity, 'series': series})
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error fetching analytics timeseries: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@analytics_bp.route('/latency', methods=['GET'])
+@cross_origin()
+def get_turn_latency():
+    """
+    Get per-stage turn latency percentiles from this server process's recent turns
+    
+    Query Parameters:
+        window: Seconds of history to include (default 300)
+    """
+    try:
+        window = max(1, min(request.args.get('window', 300, type=int), MAX_TRACE_WINDOW_SECONDS))
+        return jsonify({'window_seconds': window, 'stages': tracer.stage_percentiles(window)})
+        
+    except Exception as e:
+        logger.error(f"Error computing turn latency: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@analytics_bp.route('/traces', methods=['GET'])
+@cross_origin()
+def get_turn_traces():
+    """
+    Get the most recent turn traces, newest first
+    
+    Query Parameters:
+        session_id: Only turns of this chat session or CallSid
+        limit: Number of traces (max 500)
+    """
+    try:
+        limit = max(1, min(request.args.get('limit', 50, type=int), MAX_TRACES))
+        traces = tracer.recent(request.args.get('session_id'), limit)
+        return jsonify({'traces': [trace.to_dict() for trace in traces]})
+        
+    except Exception as e:
+        logger.error(f"Error fetching turn traces: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@analytics_bp.route('/rebuild', methods=['POST'])
+@cross_origin()
+def rebuild():
+    """Recompute rollups from raw call and appointment history"""
+    try:
+        rebuild_rollups()
+        return jsonify({'success': True})
+        
+    except Exception as e:
+        logger.error(f"Error rebuilding analytics rollups: {e}")
+        return jsonify({'error': str(e)}), 500
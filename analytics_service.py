@@ -0,0 +1,88 @@
+"""
+Analytics Service
+Answers dashboard queries from pre-aggregated rollups, so response time
+depends on the reporting window rather than the size of call history
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Any
+from src.models.user import db
+from src.models.rollup import CallRollup, IntentRollup, GRANULARITIES, bucket_start, bucket_range
+
+class AnalyticsService:
+    def get_summary(self, days: int = 7, now: datetime = None) -> Dict[str, Any]:
+        """
+        Get totals over the last N days
+        
+        Args:
+            days: Number of days to include, counting today
+            now: Reference time (defaults to the current UTC time)
+        
+        Returns:
+            Dictionary with call, appointment and lead totals, average call
+            duration and a histogram of primary intents
+        """
+        now = now or datetime.utcnow()
+        start = bucket_start(now, 'day') - timedelta(days=days - 1)
+        
+        totals = db.session.query(
+            *[db.func.coalesce(db.func.sum(getattr(CallRollup, counter)), 0) for counter in CallRollup.COUNTERS]
+        ).filter(
+            CallRollup.granularity == 'day',
+            CallRollup.bucket_start >= start
+        ).one()
+        totals = dict(zip(CallRollup.COUNTERS, totals))
+        
+        intents = db.session.query(
+            IntentRollup.intent, db.func.sum(IntentRollup.count)
+        ).filter(
+            IntentRollup.granularity == 'day',
+            IntentRollup.bucket_start >= start
+        ).group_by(IntentRollup.intent).all()
+        
+        return {
+            'days': days,
+            'total_calls': totals['calls'],
+            'completed_calls': totals['completed_calls'],
+            'appointments_booked': totals['appointments_booked'],
+            'leads_qualified': totals['leads_qualified'],
+            'average_duration_seconds': round(totals['duration_sum'] / totals['duration_count']) if totals['duration_count'] else 0,
+            'intents': {intent: count for intent, count in intents}
+        }
+    
+    def get_timeseries(self, granularity: str = 'day', periods: int = 7, now: datetime = None) -> List[Dict[str, Any]]:
+        """
+        Get one rollup entry per bucket, including empty buckets
+        
+        Args:
+            granularity: 'hour' or 'day'
+            periods: Number of buckets ending with the current one
+            now: Reference time (defaults to the current UTC time)
+        
+        Returns:
+            List of bucket dictionaries in chronological order
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+        
+        now = now or datetime.utcnow()
+        step = timedelta(hours=1) if granularity == 'hour' else timedelta(days=1)
+        start = bucket_start(now, granularity) - step * (periods - 1)
+        
+        rows = CallRollup.query.filter(
+            CallRollup.granularity == granularity,
+            CallRollup.bucket_start >= start
+        ).all()
+        by_bucket = {row.bucket_start: row for row in rows}
+        
+        series = []
+        for bucket in bucket_range(start, now, granularity):
+            row = by_bucket.get(bucket)
+            if row:
+                series.append(row.to_dict())
+            else:
+                series.append(CallRollup(
+                    bucket_start=bucket, calls=0, completed_calls=0, appointments_booked=0,
+                    leads_qualified=0, duration_sum=0, duration_count=0
+                ).to_dict())
+        return series
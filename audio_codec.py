@@ -0,0 +1,327 @@
+"""
+Audio Codec Module
+In-process G.711 transcoding, resampling and framing for the voice pipeline
+"""
+
+from functools import lru_cache
+from math import gcd
+from typing import Iterator, List, Union
+
+import numpy as np
+
+BytesLike = Union[bytes, bytearray, memoryview]
+
+# Sample rates used across the pipeline
+TWILIO_SAMPLE_RATE = 8000    # Twilio media streams (G.711)
+WHISPER_SAMPLE_RATE = 16000  # Speech-to-text input
+TTS_SAMPLE_RATE = 24000      # OpenAI 'pcm' TTS output
+
+FRAME_MS = 20  # Twilio sends 20 ms media frames
+
+def _build_ulaw_decode_table() -> np.ndarray:
+    """Build the 256-entry mu-law to 16-bit PCM table"""
+    u = ~np.arange(256, dtype=np.int32) & 0xFF
+    exponent = (u >> 4) & 0x07
+    mantissa = u & 0x0F
+    magnitude = (((mantissa << 3) + 0x84) << exponent) - 0x84
+    return np.where(u & 0x80, -magnitude, magnitude).astype(np.int16)
+
+def _build_alaw_decode_table() -> np.ndarray:
+    """Build the 256-entry A-law to 16-bit PCM table"""
+    a = np.arange(256, dtype=np.int32) ^ 0x55
+    exponent = (a >> 4) & 0x07
+    mantissa = a & 0x0F
+    magnitude = np.where(
+        exponent == 0,
+        (mantissa << 4) + 8,
+        ((mantissa << 4) + 0x108) << np.maximum(exponent - 1, 0)
+    )
+    return np.where(a & 0x80, magnitude, -magnitude).astype(np.int16)
+
+def _segment(values: np.ndarray, segment_ends: List[int]) -> np.ndarray:
+    """Return the G.711 segment number for each value"""
+    return np.searchsorted(np.array(segment_ends), values, side='left')
+
+def _build_ulaw_encode_table() -> np.ndarray:
+    """Build the 65536-entry 16-bit PCM to mu-law table, indexed by uint16 view"""
+    pcm = np.arange(65536, dtype=np.int32)
+    pcm = np.where(pcm >= 32768, pcm - 65536, pcm) >> 2
+    mask = np.where(pcm < 0, 0x7F, 0xFF)
+    pcm = np.minimum(np.abs(pcm), 8159) + 0x21
+    seg = _segment(pcm, [0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF, 0x1FFF])
+    uval = (seg << 4) | ((pcm >> (seg + 1)) & 0x0F)
+    uval = np.where(seg >= 8, 0x7F, uval)
+    return (uval ^ mask).astype(np.uint8)
+
+def _build_alaw_encode_table() -> np.ndarray:
+    """Build the 65536-entry 16-bit PCM to A-law table, indexed by uint16 view"""
+    pcm = np.arange(65536, dtype=np.int32)
+    pcm = np.where(pcm >= 32768, pcm - 65536, pcm) >> 3
+    mask = np.where(pcm >= 0, 0xD5, 0x55)
+    pcm = np.where(pcm >= 0, pcm, -pcm - 1)
+    seg = _segment(pcm, [0x1F, 0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF])
+    shift = np.where(seg < 2, 1, seg)
+    aval = (seg << 4) | ((pcm >> shift) & 0x0F)
+    aval = np.where(seg >= 8, 0x7F, aval)
+    return (aval ^ mask).astype(np.uint8)
+
+ULAW_DECODE_TABLE = _build_ulaw_decode_table()
+ALAW_DECODE_TABLE = _build_alaw_decode_table()
+ULAW_ENCODE_TABLE = _build_ulaw_encode_table()
+ALAW_ENCODE_TABLE = _build_alaw_encode_table()
+
+def _as_pcm16(data: Union[BytesLike, np.ndarray]) -> np.ndarray:
+    """View bytes-like PCM as int16 samples without copying"""
+    if isinstance(data, np.ndarray):
+        return data
+    return np.frombuffer(data, dtype='<i2')
+
+def ulaw_decode(data: BytesLike) -> np.ndarray:
+    """
+    Decode G.711 mu-law bytes to 16-bit PCM samples
+    
+    Args:
+        data: mu-law encoded bytes, bytearray or memoryview
+    
+    Returns:
+        int16 array of samples
+    """
+    return ULAW_DECODE_TABLE[np.frombuffer(data, dtype=np.uint8)]
+
+def ulaw_encode(samples: Union[BytesLike, np.ndarray]) -> bytes:
+    """
+    Encode 16-bit PCM samples to G.711 mu-law
+    
+    Args:
+        samples: int16 array or little-endian 16-bit PCM bytes
+    
+    Returns:
+        mu-law encoded bytes
+    """
+    pcm = _as_pcm16(samples).astype(np.int16, copy=False)
+    return ULAW_ENCODE_TABLE[pcm.view(np.uint16)].tobytes()
+
+def alaw_decode(data: BytesLike) -> np.ndarray:
+    """
+    Decode G.711 A-law bytes to 16-bit PCM samples
+    
+    Args:
+        data: A-law encoded bytes, bytearray or memoryview
+    
+    Returns:
+        int16 array of samples
+    """
+    return ALAW_DECODE_TABLE[np.frombuffer(data, dtype=np.uint8)]
+
+def alaw_encode(samples: Union[BytesLike, np.ndarray]) -> bytes:
+    """
+    Encode 16-bit PCM samples to G.711 A-law
+    
+    Args:
+        samples: int16 array or little-endian 16-bit PCM bytes
+    
+    Returns:
+        A-law encoded bytes
+    """
+    pcm = _as_pcm16(samples).astype(np.int16, copy=False)
+    return ALAW_ENCODE_TABLE[pcm.view(np.uint16)].tobytes()
+
+@lru_cache(maxsize=None)
+def _polyphase_filter(up: int, down: int, taps_per_phase: int) -> np.ndarray:
+    """
+    Design a windowed-sinc low-pass filter split into polyphase branches
+    
+    Returns:
+        Array of shape (up, taps_per_phase); row p holds the taps for phase p,
+        ordered from the newest input sample to the oldest
+    """
+    num_taps = up * taps_per_phase
+    cutoff = 1.0 / max(up, down)
+    n = np.arange(num_taps) - (num_taps - 1) / 2.0
+    h = cutoff * np.sinc(cutoff * n) * np.kaiser(num_taps, 5.0)
+    h *= up / h.sum()
+    phases = h.reshape(taps_per_phase, up).T
+    phases.setflags(write=False)
+    return phases
+
+@lru_cache(maxsize=64)
+def _resample_matrix(up: int, down: int, taps_per_phase: int, position: int, length: int):
+    """
+    Build the dense filter matrix mapping one chunk (plus history) to its outputs
+    
+    Streams fed with fixed-size frames only ever see a handful of distinct
+    (position, length) pairs, so the matrices are shared by every call.
+    
+    Returns:
+        Tuple of (matrix, next_position); matrix has shape
+        (outputs, taps_per_phase - 1 + length)
+    """
+    filters = _polyphase_filter(up, down, taps_per_phase)
+    available = length * up
+    
+    # Upsampled positions of every output that can be produced from this chunk
+    positions = np.arange(position, available, down)
+    next_position = (positions[-1] + down if len(positions) else position) - available
+    
+    # Row i applies phase filter (positions[i] % up) to the window of inputs
+    # ending at positions[i] // up, newest sample first
+    newest = positions[:, None] // up + taps_per_phase - 1
+    columns = newest - np.arange(taps_per_phase)[None, :]
+    matrix = np.zeros((len(positions), length + taps_per_phase - 1), dtype=np.float32)
+    np.put_along_axis(matrix, columns, filters[positions % up].astype(np.float32), axis=1)
+    matrix.setflags(write=False)
+    
+    return matrix, int(next_position)
+
+class Resampler:
+    """
+    Streaming rational resampler (polyphase FIR) for 16-bit mono PCM
+    
+    Keeps filter history between calls, so audio can be fed in arbitrary
+    chunk sizes (e.g. one 20 ms frame at a time) without edge artifacts.
+    """
+    
+    def __init__(self, input_rate: int, output_rate: int, taps_per_phase: int = 16):
+        divisor = gcd(input_rate, output_rate)
+        self.input_rate = input_rate
+        self.output_rate = output_rate
+        self.up = output_rate // divisor
+        self.down = input_rate // divisor
+        self.taps_per_phase = taps_per_phase
+        self.filters = _polyphase_filter(self.up, self.down, taps_per_phase)
+        self.block_size = input_rate * FRAME_MS // 1000
+        
+        # Input history needed by the first output of the next chunk
+        self._history = np.zeros(taps_per_phase - 1, dtype=np.float32)
+        # Position of the next output sample, in upsampled units
+        self._position = 0
+    
+    def process(self, samples: Union[BytesLike, np.ndarray]) -> np.ndarray:
+        """
+        Resample a chunk of audio
+        
+        Args:
+            samples: int16 array or little-endian 16-bit PCM bytes
+        
+        Returns:
+            int16 array at the output rate
+        """
+        pcm = _as_pcm16(samples)
+        if self.up == self.down or not len(pcm):
+            return pcm.astype(np.int16, copy=False)
+        
+        # Work in frame-sized blocks so the cached filter matrices stay small
+        outputs = [self._process_block(pcm[start:start + self.block_size])
+                   for start in range(0, len(pcm), self.block_size)]
+        y = np.concatenate(outputs) if len(outputs) != 1 else outputs[0]
+        return np.clip(np.rint(y), -32768, 32767).astype(np.int16)
+    
+    def _process_block(self, pcm: np.ndarray) -> np.ndarray:
+        """Filter one block of at most block_size samples"""
+        x = np.concatenate((self._history, pcm.astype(np.float32)))
+        matrix, self._position = _resample_matrix(
+            self.up, self.down, self.taps_per_phase, self._position, len(pcm)
+        )
+        self._history = x[len(x) - (self.taps_per_phase - 1):]
+        return matrix @ x
+    
+    def reset(self):
+        """Clear filter history between streams"""
+        self._history[:] = 0
+        self._position = 0
+
+def resample(samples: Union[BytesLike, np.ndarray], input_rate: int, output_rate: int) -> np.ndarray:
+    """
+    Resample a complete buffer of 16-bit mono PCM
+    
+    Args:
+        samples: int16 array or little-endian 16-bit PCM bytes
+        input_rate: Sample rate of the input
+        output_rate: Desired sample rate
+    
+    Returns:
+        int16 array at the output rate
+    """
+    return Resampler(input_rate, output_rate).process(samples)
+
+class Framer:
+    """
+    Split a byte stream into fixed-size frames (20 ms by default)
+    
+    Complete frames inside each pushed buffer are returned as memoryview
+    slices of that buffer; only a partial frame at the end is copied and
+    carried over to the next push.
+    """
+    
+    def __init__(self, sample_rate: int = TWILIO_SAMPLE_RATE, sample_width: int = 1, frame_ms: int = FRAME_MS):
+        self.frame_bytes = sample_rate * frame_ms // 1000 * sample_width
+        self._pending = bytearray()
+    
+    def push(self, data: BytesLike) -> Iterator[memoryview]:
+        """
+        Add data and yield every complete frame
+        
+        Args:
+            data: Audio bytes in the stream's encoding
+        
+        Yields:
+            memoryview of exactly frame_bytes bytes per frame
+        """
+        view = memoryview(data).cast('B')
+        offset = 0
+        
+        if self._pending:
+            needed = self.frame_bytes - len(self._pending)
+            self._pending += view[:needed]
+            offset = min(needed, len(view))
+            if len(self._pending) < self.frame_bytes:
+                return
+            frame = bytes(self._pending)
+            self._pending.clear()
+            yield memoryview(frame)
+        
+        end = offset + (len(view) - offset) // self.frame_bytes * self.frame_bytes
+        for start in range(offset, end, self.frame_bytes):
+            yield view[start:start + self.frame_bytes]
+        
+        self._pending += view[end:]
+    
+    def flush(self, pad: bytes = b'\x00') -> Iterator[memoryview]:
+        """Yield the remaining partial frame, padded to full length"""
+        if self._pending:
+            missing = self.frame_bytes - len(self._pending)
+            frame = bytes(self._pending) + pad * missing
+            self._pending.clear()
+            yield memoryview(frame)
+
+class UlawEncoder:
+    """
+    Streaming 16-bit PCM to 8 kHz mu-law encoder
+    
+    Carries an odd trailing byte between chunks so network chunk boundaries
+    do not have to be sample aligned.
+    """
+    
+    def __init__(self, input_rate: int = TTS_SAMPLE_RATE):
+        self.resampler = Resampler(input_rate, TWILIO_SAMPLE_RATE)
+        self._remainder = b''
+    
+    def encode(self, chunk: BytesLike) -> bytes:
+        """Encode one PCM chunk, returning whatever mu-law output is ready"""
+        if self._remainder:
+            chunk = self._remainder + bytes(chunk)
+        usable = len(chunk) - (len(chunk) % 2)
+        self._remainder = bytes(chunk[usable:])
+        if not usable:
+            return b''
+        return ulaw_encode(self.resampler.process(memoryview(chunk)[:usable]))
+
+class UlawDecoder:
+    """Streaming 8 kHz mu-law to 16-bit PCM decoder at a target rate"""
+    
+    def __init__(self, output_rate: int = WHISPER_SAMPLE_RATE):
+        self.resampler = Resampler(TWILIO_SAMPLE_RATE, output_rate)
+    
+    def decode(self, chunk: BytesLike) -> bytes:
+        """Decode one mu-law chunk to little-endian 16-bit PCM bytes"""
+        return self.resampler.process(ulaw_decode(chunk)).astype('<i2', copy=False).tobytes()
@@ -0,0 +1,736 @@
+"""
+Performance Benchmarks for AI Voice Receptionist
+Measures throughput of the hot paths that run once per call, turn or audio frame
+
+Usage:
+    python benchmark.py            # run every suite
+    python benchmark.py audio      # run a single suite
+    python benchmark.py nlu --save baseline.json
+    python benchmark.py nlu --compare baseline.json --threshold 15   # exit 1 on regression
+"""
+
+import os
+import sys
+import json
+import time
+from datetime import datetime
+
+# Add the src directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+def _time_per_iteration(func, iterations):
+    """Return CPU seconds per call of func"""
+    func()  # warm up
+    start = time.process_time()
+    for _ in range(iterations):
+        func()
+    return (time.process_time() - start) / iterations
+
+def _benchmark_app():
+    """Minimal app serving the phone webhooks from a throwaway SQLite file"""
+    import tempfile
+    from flask import Flask
+    from src.models.user import db
+    from src.routes.phone_api import phone_bp
+    
+    app = Flask('benchmark')
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tempfile.mkdtemp()}/benchmark.db"
+    db.init_app(app)
+    app.register_blueprint(phone_bp, url_prefix='/api/phone')
+    return app
+
+def benchmark_audio(seconds=60):
+    """
+    Transcode one simulated call leg per 20 ms frame in both directions:
+    inbound 8 kHz mu-law -> 16 kHz PCM and outbound 24 kHz PCM -> 8 kHz mu-law.
+    
+    The real-time factor (audio seconds processed per CPU second) is the
+    number of concurrent call streams one core can sustain.
+    """
+    import numpy as np
+    from src.services.audio_codec import UlawDecoder, UlawEncoder, ulaw_encode
+    
+    rng = np.random.default_rng(0)
+    inbound_frame = ulaw_encode(rng.integers(-8000, 8000, 160).astype(np.int16))
+    outbound_frame = rng.integers(-8000, 8000, 480).astype('<i2').tobytes()
+    
+    decoder = UlawDecoder()
+    encoder = UlawEncoder()
+    frames = seconds * 50
+    
+    def transcode_frame():
+        decoder.decode(inbound_frame)
+        encoder.encode(outbound_frame)
+    
+    per_frame = _time_per_iteration(transcode_frame, frames)
+    realtime_factor = 0.020 / per_frame
+    
+    return {
+        'frame_us': round(per_frame * 1e6, 2),
+        'concurrent_streams_per_core': int(realtime_factor)
+    }
+
+def benchmark_status_webhooks(calls=1000, duplicate_ratio=0.25):
+    """
+    Replay a burst of Twilio status callbacks (ringing, in-progress,
+    completed per call, plus retried duplicates) against the status webhook,
+    then apply the queue in batches.
+    
+    Reports acknowledgement and application throughput separately, since
+    Twilio only waits for the former.
+    """
+    import random
+    from src.models.user import db
+    from src.models.call import Call
+    from src.services.status_ingest import status_ingestor
+    
+    app = _benchmark_app()
+    client = app.test_client()
+    
+    callbacks = []
+    for i in range(calls):
+        call_sid = f'CA{i:032d}'
+        for sequence, status in enumerate(('ringing', 'in-progress', 'completed')):
+            callbacks.append({'CallSid': call_sid, 'CallStatus': status,
+                              'SequenceNumber': str(sequence), 'CallDuration': '60'})
+    rng = random.Random(0)
+    callbacks += rng.sample(callbacks, int(len(callbacks) * duplicate_ratio))
+    rng.shuffle(callbacks)
+    
+    with app.app_context():
+        db.create_all()
+        db.session.execute(db.insert(Call), [
+            {'session_id': f'CA{i:032d}', 'call_status': 'initiated', 'start_time': datetime.utcnow()}
+            for i in range(calls)
+        ])
+        db.session.commit()
+    
+    latencies = []
+    start = time.perf_counter()
+    for callback in callbacks:
+        sent = time.perf_counter()
+        client.post('/api/phone/webhook/status', data=callback)
+        latencies.append(time.perf_counter() - sent)
+    ack_seconds = time.perf_counter() - start
+    
+    with app.app_context():
+        start = time.perf_counter()
+        applied = status_ingestor.drain()
+        apply_seconds = time.perf_counter() - start
+        completed = Call.query.filter_by(call_status='completed').count()
+    
+    latencies.sort()
+    return {
+        'callbacks': len(callbacks),
+        'acks_per_second': int(len(callbacks) / ack_seconds),
+        'ack_p50_ms': round(latencies[len(latencies) // 2] * 1000, 2),
+        'ack_p99_ms': round(latencies[int(len(latencies) * 0.99)] * 1000, 2),
+        'applied_events': applied,
+        'applied_per_second': int(applied / apply_seconds),
+        'completed_calls': completed
+    }
+
+def benchmark_twiml(responses=5000):
+    """
+    Build TwiML responses the way every webhook used to (VoiceResponse
+    objects serialized per request) and from the precompiled template cache,
+    then time the incoming call webhook end to end.
+    """
+    from twilio.twiml.voice_response import VoiceResponse, Connect, Stream
+    from src.models.user import db
+    from src.services.twiml_templates import twiml_cache, DEFAULT_GREETING
+    
+    stream_url = 'wss://example.ngrok.io/api/phone/media-stream'
+    
+    def build_legacy():
+        response = VoiceResponse()
+        response.say(DEFAULT_GREETING, voice='Polly.Amy')
+        connect = Connect()
+        connect.append(Stream(url=stream_url))
+        response.append(connect)
+        return str(response).encode()
+    
+    def render_cached():
+        return twiml_cache.render('incoming_stream', tenant='+15551234567', stream_url=stream_url)
+    
+    legacy = _time_per_iteration(build_legacy, responses)
+    cached = _time_per_iteration(render_cached, responses)
+    
+    app = _benchmark_app()
+    client = app.test_client()
+    with app.app_context():
+        db.create_all()
+    
+    latencies = []
+    for i in range(responses // 10):
+        sent = time.perf_counter()
+        client.post('/api/phone/webhook/voice', data={
+            'CallSid': f'CA{i:032d}', 'From': '+15559876543', 'To': '+15551234567'
+        })
+        latencies.append(time.perf_counter() - sent)
+    
+    latencies.sort()
+    return {
+        'legacy_build_us': round(legacy * 1e6, 2),
+        'cached_render_us': round(cached * 1e6, 2),
+        'speedup': round(legacy / cached, 1),
+        'webhook_p50_ms': round(latencies[len(latencies) // 2] * 1000, 2),
+        'webhook_p99_ms': round(latencies[int(len(latencies) * 0.99)] * 1000, 2)
+    }
+
+# Run in a fresh interpreter so that nothing is imported before the timer starts.
+# argv: mode ('fork' or 'preload'), database URI, worker count
+_STARTUP_SCRIPT = """
+import os, sys, json, time
+started = time.perf_counter()
+os.environ.setdefault('OPENAI_API_KEY', 'sk-benchmark')
+from main import create_app
+imported = time.perf_counter()
+app = create_app({'SQLALCHEMY_DATABASE_URI': sys.argv[2]})
+ready = time.perf_counter()
+
+def first_request(index):
+    app.test_client().post('/api/phone/webhook/voice', data={
+        'CallSid': f'CA{os.getpid()}{index}', 'From': '+15559876543', 'To': '+15551234567'
+    })
+    return time.perf_counter()
+
+result = {'import_ms': (imported - started) * 1000, 'create_app_ms': (ready - imported) * 1000}
+if sys.argv[1] == 'fork':
+    result['first_request_ms'] = [(first_request(0) - ready) * 1000]
+    from src.services.registry import speech_service, dialogue_service
+    before = time.perf_counter()
+    speech_service.get()
+    dialogue_service.get()
+    result['deferred_service_init_ms'] = (time.perf_counter() - before) * 1000
+else:
+    # One worker at a time, so the timings don't depend on the number of cores
+    result['first_request_ms'] = []
+    for index in range(int(sys.argv[3])):
+        read_end, write_end = os.pipe()
+        forked = time.perf_counter()
+        if os.fork() == 0:
+            os.write(write_end, str((first_request(index) - forked) * 1000).encode())
+            os._exit(0)
+        os.close(write_end)
+        os.wait()
+        result['first_request_ms'].append(float(os.read(read_end, 64)))
+print(json.dumps(result))
+"""
+
+def _run_startup(mode, database_uri, workers):
+    """Run the startup script in a new interpreter and return its timings"""
+    import subprocess
+    
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    output = subprocess.run([sys.executable, '-W', 'ignore', '-c', _STARTUP_SCRIPT, mode, database_uri, str(workers)],
+                            env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def benchmark_startup(workers=4):
+    """
+    Time from interpreter start to each worker's first response, the way
+    gunicorn starts workers:
+    
+    - fork (default): every worker imports main and calls create_app itself
+    - preload (--preload): the master does so once and forks the workers,
+      which then only pay for their first request
+    
+    Services are built lazily, so the OpenAI clients' construction cost is
+    reported separately as paid by the first request that needs them.
+    """
+    import tempfile
+    import statistics
+    
+    database_uri = f"sqlite:///{tempfile.mkdtemp()}/benchmark.db"
+    _run_startup('fork', database_uri, 1)  # Create the schema outside the timings
+    
+    fork_runs = [_run_startup('fork', database_uri, 1) for _ in range(workers)]
+    preload = _run_startup('preload', database_uri, workers)
+    
+    def median(values):
+        return round(statistics.median(values), 1)
+    
+    return {
+        'fork_import_ms': median(run['import_ms'] for run in fork_runs),
+        'fork_create_app_ms': median(run['create_app_ms'] for run in fork_runs),
+        'fork_worker_ready_ms': median(run['import_ms'] + run['create_app_ms'] + run['first_request_ms'][0]
+                                       for run in fork_runs),
+        'preload_master_ms': round(preload['import_ms'] + preload['create_app_ms'], 1),
+        'preload_worker_ready_ms': median(preload['first_request_ms']),
+        'deferred_service_init_ms': median(run['deferred_service_init_ms'] for run in fork_runs)
+    }
+
+def benchmark_call_setup(calls=200):
+    """
+    Set up media stream sessions the old way (a RealtimeVoiceService,
+    SpeechService, DialogueService and NLUService per call, each with its own
+    OpenAI client, plus regenerated booking slots) and through the shared
+    service registry, where only the Realtime session is per call.
+    
+    Sessions are kept open, so memory and allocated blocks are what each
+    concurrent call retains.
+    """
+    import gc
+    import tracemalloc
+    from openai import OpenAI
+    from src.routes.phone_api import open_call_session, active_calls
+    from src.services.realtime_voice_service import RealtimeVoiceService
+    from src.services.speech_service import SpeechService
+    from src.services.dialogue_service import DialogueService
+    from src.services.nlu_service import NLUService
+    from src.services.registry import speech_service, dialogue_service
+    
+    def legacy_session(call_sid):
+        dialogue = DialogueService()
+        dialogue.booking_slots
+        return {
+            'realtime_service': RealtimeVoiceService(),
+            'speech_service': SpeechService(),
+            'dialogue_service': dialogue,
+            'clients': [OpenAI() for _ in ('speech', 'dialogue', 'nlu')],
+            'nlu_service': NLUService()
+        }
+    
+    def shared_session(call_sid):
+        return open_call_session(call_sid, ws=None)
+    
+    # Build the process-wide services before measuring, as the first call would
+    speech_service.get()
+    dialogue_service.booking_slots
+    
+    results = {}
+    for name, setup in (('legacy', legacy_session), ('shared', shared_session)):
+        setup('CAwarmup')
+        active_calls.clear()
+        gc.collect()
+        
+        start = time.perf_counter()
+        sessions = [setup(f'CA{i:032d}') for i in range(calls)]
+        elapsed = time.perf_counter() - start
+        del sessions
+        active_calls.clear()
+        gc.collect()
+        
+        # Memory is measured in a second pass, since tracing slows allocation down
+        tracemalloc.start()
+        blocks = sys.getallocatedblocks()
+        sessions = [setup(f'CA{i:032d}') for i in range(calls)]
+        retained_blocks = sys.getallocatedblocks() - blocks
+        retained_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del sessions
+        active_calls.clear()
+        
+        results[f'{name}_setup_us'] = round(elapsed / calls * 1e6, 1)
+        results[f'{name}_blocks_per_call'] = int(retained_blocks / calls)
+        results[f'{name}_kb_per_call'] = round(retained_bytes / calls / 1024, 1)
+    
+    return results
+
+def benchmark_static(requests=2000):
+    """
+    Serve a dashboard page load (index.html plus a 300 KB bundle) the old way,
+    with os.path.exists and send_from_directory per request, and from the
+    in-memory manifest with gzip and ETag revalidation.
+    """
+    import random
+    import tempfile
+    from flask import Flask, send_from_directory
+    from main import create_app
+    
+    folder = tempfile.mkdtemp()
+    os.makedirs(os.path.join(folder, 'assets'))
+    rng = random.Random(0)
+    words = ['const', 'return', 'function', 'props', 'state', 'useEffect', 'React', 'div', 'className']
+    bundle = ' '.join(rng.choice(words) + str(rng.randrange(100)) for _ in range(50000)).encode()[:300000]
+    with open(os.path.join(folder, 'assets', 'index-4f9a2b1c.js'), 'wb') as f:
+        f.write(bundle)
+    with open(os.path.join(folder, 'index.html'), 'wb') as f:
+        f.write(b'<!doctype html><div id="root"></div><script src="/assets/index-4f9a2b1c.js"></script>')
+    
+    legacy_app = Flask('legacy', static_folder=folder)
+    
+    @legacy_app.route('/<path:path>')
+    def legacy_serve(path):
+        if os.path.exists(os.path.join(folder, path)):
+            return send_from_directory(folder, path)
+        return send_from_directory(folder, 'index.html')
+    
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:', 'TESTING': True, 'STATIC_FOLDER': folder})
+    headers = {'Accept-Encoding': 'gzip, br'}
+    
+    def page_loads(client, paths, extra_headers=None):
+        sent = 0
+        start = time.perf_counter()
+        for i in range(requests):
+            response = client.get(paths[i % len(paths)], headers={**headers, **(extra_headers or {})})
+            sent += len(response.get_data())
+            response.close()
+        return requests / (time.perf_counter() - start), sent / requests
+    
+    paths = ['/dashboard', '/assets/index-4f9a2b1c.js']
+    legacy_rps, legacy_bytes = page_loads(legacy_app.test_client(), paths)
+    cached_rps, cached_bytes = page_loads(app.test_client(), paths)
+    
+    etag = app.test_client().get('/dashboard').headers['ETag']
+    revalidate_rps, _ = page_loads(app.test_client(), ['/dashboard'], {'If-None-Match': etag})
+    
+    return {
+        'legacy_requests_per_second': int(legacy_rps),
+        'legacy_bytes_per_request': int(legacy_bytes),
+        'manifest_requests_per_second': int(cached_rps),
+        'manifest_bytes_per_request': int(cached_bytes),
+        'revalidations_per_second': int(revalidate_rps)
+    }
+
+def benchmark_metrics(updates=200000, threads=4):
+    """
+    Cost of recording a metric: a counter behind one shared lock against the
+    per-thread shards, with several threads updating at once, plus histogram
+    observations and rendering /metrics.
+    """
+    import threading
+    from src.services import metrics
+    from src.services.metrics import metrics_store
+    
+    lock = threading.Lock()
+    locked_values = {}
+    
+    def locked_inc():
+        with lock:
+            locked_values['frames'] = locked_values.get('frames', 0) + 1
+    
+    frames = metrics.media_frames.labels(direction='inbound')
+    
+    def contended(inc):
+        def run():
+            for _ in range(updates // threads):
+                inc()
+        workers = [threading.Thread(target=run) for _ in range(threads)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return (time.perf_counter() - start) / updates
+    
+    locked = contended(locked_inc)
+    sharded = contended(frames.inc)
+    observe = _time_per_iteration(lambda: metrics.turn_stage_seconds.observe(0.12, stage='nlu'), updates)
+    render = _time_per_iteration(metrics_store.render, 200)
+    
+    return {
+        'locked_counter_ns': round(locked * 1e9),
+        'sharded_counter_ns': round(sharded * 1e9),
+        'histogram_observe_ns': round(observe * 1e9),
+        'render_ms': round(render * 1000, 3)
+    }
+
+# Caller utterances of the NLU and dialogue suites
+NLU_CORPUS = [
+    "Hi, good morning",
+    "Hello, how are you today?",
+    "I'd like to book an appointment for a consultation",
+    "Can I schedule a cleaning for next Tuesday at 3:30 pm?",
+    "Do you have any available slots tomorrow morning?",
+    "I need to cancel my appointment on Friday",
+    "Could I reschedule my meeting to March 14 at 10 am?",
+    "What are your business hours on Saturday?",
+    "When do you open on Monday?",
+    "Where are you located?",
+    "How do I get to your office from the highway?",
+    "What services do you offer?",
+    "Tell me about your services for new patients",
+    "How much does a massage cost?",
+    "What is the price of a follow-up treatment?",
+    "What's your phone number and email?",
+    "My name is Jordan Smith and my number is 555-123-4567",
+    "This is Alex Chen, you can reach me at alex.chen@example.com",
+    "I'm calling about the therapy appointment on 11/03/2026",
+    "Is there anything available this afternoon around 2pm?",
+    "My insurance company asked me to get a referral before my visit",
+    "Can you tell me whether the doctor handles sports injuries?",
+    "Yes, that time works for me",
+    "Actually, make it the evening instead",
+    "Thanks so much, goodbye",
+    "Bye, have a good day",
+]
+
+# Custom intents of a large tenant: 10 topics x 5 aspects, 3 phrases each
+CUSTOM_TOPICS = ['parking', 'insurance', 'referral', 'gift card', 'wheelchair', 'pets', 'wifi',
+                 'late fee', 'newsletter', 'membership']
+CUSTOM_ASPECTS = ['policy', 'cost', 'options', 'hours', 'rules']
+
+def _custom_tenant():
+    """Tenant with 50 custom intents plus intent and service synonyms"""
+    from src.services.tenants import DEFAULT_CONFIG, Tenant
+    
+    custom_intents = {
+        f"{topic.replace(' ', '_')}_{aspect}": {
+            'phrases': [f'{topic} {aspect}', f'your {topic} {aspect}', f'{aspect} for {topic}'],
+            'response': f'Let me tell you about our {topic} {aspect}.'
+        }
+        for topic in CUSTOM_TOPICS for aspect in CUSTOM_ASPECTS
+    }
+    config = dict(
+        DEFAULT_CONFIG,
+        custom_intents=json.dumps(custom_intents),
+        intent_synonyms=json.dumps({'appointment_booking': ['pencil me in', 'get me in'], 'goodbye': ['cheers']}),
+        service_synonyms=json.dumps({'Treatment': ['massage', 'therapy'], 'Consultation': ['checkup', 'first visit']})
+    )
+    return Tenant('+15550100000', config, ())
+
+class _StubCompletions:
+    """Chat completions answering instantly, so only local work is measured"""
+    
+    def create(self, **kwargs):
+        from types import SimpleNamespace
+        message = SimpleNamespace(content="We'd be happy to help with that.")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+def _stub_services():
+    """NLU and dialogue services with the OpenAI fallbacks stubbed out"""
+    from types import SimpleNamespace
+    from src.services.nlu_service import NLUService
+    from src.services.dialogue_service import DialogueService
+    
+    nlu = NLUService()
+    nlu._ai_based_intent = lambda text, intents=None: {'intent': 'unknown', 'confidence': 0.0}
+    dialogue = DialogueService()
+    dialogue.nlu_service = nlu
+    dialogue.client = SimpleNamespace(chat=SimpleNamespace(completions=_StubCompletions()))
+    return nlu, dialogue
+
+def _clear_text_caches():
+    """Forget memoized per-utterance work, so every round scans its utterances again"""
+    from src.services import nlu_service
+    from src.services.entity_extractor import entity_extractor
+    
+    entity_extractor._extract.cache_clear()
+    nlu_service._words.cache_clear()
+
+def _median_per_call(func, corpus, rounds, reset=None):
+    """
+    Median over rounds of the mean seconds per call across the corpus
+    
+    Args:
+        reset: Called, untimed, before each round, e.g. to empty caches the
+            corpus would otherwise only ever hit
+    """
+    for text in corpus:
+        func(text)  # warm up
+    samples = []
+    for _ in range(rounds):
+        if reset:
+            reset()
+        start = time.perf_counter()
+        for text in corpus:
+            func(text)
+        samples.append((time.perf_counter() - start) / len(corpus))
+    samples.sort()
+    return samples[len(samples) // 2]
+
+def _peak_bytes_per_call(func, corpus, reset=None):
+    """Mean peak of memory allocated while handling one utterance"""
+    import tracemalloc
+    
+    if reset:
+        reset()
+    tracemalloc.start()
+    total = 0
+    for text in corpus:
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        func(text)
+        total += tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+    return total / len(corpus)
+
+def benchmark_nlu(rounds=50):
+    """
+    Per-call time and allocations of the NLU and dialogue hot path over a
+    fixed corpus of caller utterances, with the OpenAI fallbacks stubbed.
+    
+    Each dialogue round replays the corpus as one conversation in a fresh
+    session. Per-utterance caches are emptied before every round, so the
+    timings include the scans a new caller's utterances need. The
+    *_50_custom results repeat analyze_intent and process_message for a
+    tenant with 50 custom intents, which should cost no more per turn than
+    the built-in ones. Compare runs with --save and --compare (see __main__).
+    """
+    nlu, dialogue = _stub_services()
+    
+    def process_message(text):
+        # Each pass over the corpus is one conversation in a fresh session
+        if text == NLU_CORPUS[0]:
+            dialogue.active_sessions.clear()
+        dialogue.process_message(text, 'benchmark-session')
+    
+    functions = {
+        'analyze_intent': nlu.analyze_intent,
+        'extract_entities': nlu._extract_entities,
+        'extract_appointment_details': nlu.extract_appointment_details,
+        'process_message': process_message,
+    }
+    
+    # The same paths for a tenant with 50 custom intents, whose language is compiled once
+    from src.services.tenants import tenant_registry
+    tenant = _custom_tenant()
+    tenant_registry._tenants.put(tenant.number, tenant)
+    
+    def process_message_custom(text):
+        if text == NLU_CORPUS[0]:
+            dialogue.active_sessions.clear()
+        dialogue.process_message(text, 'benchmark-session', tenant.number)
+    
+    functions['analyze_intent_50_custom'] = lambda text: nlu.analyze_intent(text, tenant)
+    functions['process_message_50_custom'] = process_message_custom
+    
+    results = {}
+    for name, func in functions.items():
+        results[f'{name}_median_us'] = round(
+            _median_per_call(func, NLU_CORPUS, rounds, reset=_clear_text_caches) * 1e6, 2)
+        results[f'{name}_peak_bytes'] = int(_peak_bytes_per_call(func, NLU_CORPUS, reset=_clear_text_caches))
+    results['compile_language_50_custom_us'] = round(
+        _time_per_iteration(lambda: nlu.compile_language(tenant), 200) * 1e6, 2)
+    
+    # Reply prompt after a long call: cached system message plus the history that fits the budget
+    from src.services.prompt_builder import PromptHistory, prompt_builder
+    history = PromptHistory()
+    for text in NLU_CORPUS * 4:
+        history.add_turn(text, "We'd be happy to help with that.")
+    results['build_prompt_104_turns_us'] = round(
+        _time_per_iteration(lambda: prompt_builder.build(tenant, history, NLU_CORPUS[-1]), 20000) * 1e6, 2)
+    tenant_registry.invalidate(tenant.number)
+    return results
+
+def _serve_openai_stand_in(latency, urls):
+    """Run the load test's OpenAI stand-in, answering after latency seconds, until terminated"""
+    from loadtest import FakeOpenAIServer, LATENCIES
+    
+    server = FakeOpenAIServer(dict(LATENCIES, chat=latency, transcription=latency, speech=latency))
+    urls.put(server.url)
+    while True:
+        time.sleep(3600)
+
+def benchmark_async_turns(concurrency=10, latency=0.05):
+    """
+    Dialogue turns per second of one worker against a local OpenAI stand-in
+    answering each request after `latency` seconds: back to back on one
+    thread, as a WSGI thread serves them, and as concurrent sessions awaiting
+    process_message_async on one event loop.
+    
+    Each session replays the NLU corpus, so some turns are answered locally
+    and some wait for the intent fallback and an AI reply.
+    Throughput beyond a few concurrent sessions is bound by the worker's CPU,
+    most of it spent by the OpenAI SDK preparing each request.
+    """
+    import asyncio
+    import multiprocessing
+    
+    # The stand-in runs in its own process, so its CPU time and GIL are not the worker's
+    urls = multiprocessing.Queue()
+    server = multiprocessing.Process(target=_serve_openai_stand_in, args=(latency, urls), daemon=True)
+    server.start()
+    os.environ.setdefault('OPENAI_API_KEY', 'sk-benchmark')
+    os.environ['OPENAI_BASE_URL'] = urls.get(timeout=30)
+    
+    from src.services.dialogue_service import DialogueService
+    from src.services.registry import async_openai_client
+    dialogue = DialogueService()
+    turns = NLU_CORPUS
+    
+    try:
+        # One thread, one turn at a time
+        start = time.perf_counter()
+        for text in turns:
+            dialogue.process_message(text, 'sync-session')
+        sync_seconds = time.perf_counter() - start
+        
+        # One event loop, concurrent sessions sharing the loop's connection pool
+        latencies = []
+        
+        async def session(index):
+            for text in turns:
+                started = time.perf_counter()
+                await dialogue.process_message_async(text, f'async-session-{index}', timeout=5)
+                latencies.append(time.perf_counter() - started)
+        
+        async def run_sessions():
+            async with async_openai_client.scope():
+                await session(-1)  # warm up the pool
+                latencies.clear()
+                cpu_start, start = time.process_time(), time.perf_counter()
+                await asyncio.gather(*(session(index) for index in range(concurrency)))
+                return time.perf_counter() - start, time.process_time() - cpu_start
+        
+        async_seconds, async_cpu = asyncio.run(run_sessions())
+    finally:
+        server.terminate()
+    
+    latencies.sort()
+    async_turns = concurrency * len(turns)
+    return {
+        'sync_turns_per_second': round(len(turns) / sync_seconds, 1),
+        'async_turns_per_second': round(async_turns / async_seconds, 1),
+        'async_turn_p50_ms': round(latencies[len(latencies) // 2] * 1000, 1),
+        'async_turn_p99_ms': round(latencies[int(len(latencies) * 0.99)] * 1000, 1),
+        'async_cpu_ms_per_turn': round(async_cpu / async_turns * 1000, 3)
+    }
+
+SUITES = {
+    'audio': benchmark_audio,
+    'status_webhooks': benchmark_status_webhooks,
+    'twiml': benchmark_twiml,
+    'startup': benchmark_startup,
+    'call_setup': benchmark_call_setup,
+    'static': benchmark_static,
+    'metrics': benchmark_metrics,
+    'nlu': benchmark_nlu,
+    'async_turns': benchmark_async_turns
+}
+
+def compare(results, baseline, threshold):
+    """
+    Find median timings that got slower than the baseline by more than threshold percent
+    
+    Returns:
+        One message per regressed '<suite>.<name>_median_us' result
+    """
+    regressions = []
+    for suite, values in results.items():
+        for name, value in values.items():
+            before = baseline.get(suite, {}).get(name)
+            if not name.endswith('_median_us') or not before:
+                continue
+            change = (value - before) / before * 100
+            if change > threshold:
+                regressions.append(f'{suite}.{name}: {before} -> {value} us (+{change:.1f}%)')
+    return regressions
+
+if __name__ == '__main__':
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Run performance benchmarks')
+    parser.add_argument('suites', nargs='*', help=f'Suites to run: {", ".join(SUITES)} (default: all)')
+    parser.add_argument('--save', help='Write the results to this JSON file, e.g. as a baseline')
+    parser.add_argument('--compare', help='Fail if a median timing regressed against this baseline file')
+    parser.add_argument('--threshold', type=float, default=15.0,
+                        help='Allowed median slowdown in percent for --compare (default: 15)')
+    args = parser.parse_args()
+    
+    results = {name: SUITES[name]() for name in args.suites or list(SUITES)}
+    print(json.dumps(results, indent=2))
+    
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+    
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f'REGRESSION {regression}', file=sys.stderr)
+        sys.exit(1 if regressions else 0)
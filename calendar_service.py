@@ -4,10 +4,11 @@ Handles calendar integration for appointment scheduling
 """
 
 import json
-import requests
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from typing import Dict, List, Optional, Any
 from src.models.call import BusinessConfig
+from src.services.metrics import TimedSession
+from src.services.date_resolver import AvailabilityIndex
 
 class CalendarService:
     def __init__(self):
@@ -16,6 +17,8 @@ class CalendarService:
         self.google_calendar_id = None
         self.outlook_access_token = None
         
+        self.http = TimedSession('calendar')  # Pooled connections, timed per request
+        
         # Load configuration from database
         self._load_config()
     
@@ -48,25 +51,14 @@ class CalendarService:
             start_date = datetime.strptime(date_start, '%Y-%m-%d')
             end_date = datetime.strptime(date_end, '%Y-%m-%d')
             
-            current_date = start_date
-            while current_date <= end_date:
-                # Skip weekends (simplified - should be configurable)
-                if current_date.weekday() < 6:  # Monday = 0, Sunday = 6
-                    # Generate hourly slots from 9 AM to 5 PM
-                    for hour in range(9, 17):
-                        slot_time = current_date.replace(hour=hour, minute=0, second=0, microsecond=0)
-                        
-                        # Check if slot is available (not booked)
-                        if self._is_slot_available(slot_time, duration_minutes):
-                            available_slots.append({
-                                'datetime': slot_time.isoformat(),
-                                'date': slot_time.strftime('%Y-%m-%d'),
-                                'time': slot_time.strftime('%H:%M'),
-                                'duration_minutes': duration_minutes,
-                                'available': True
-                            })
-                
-                current_date += timedelta(days=1)
+            for slot_time in self._open_slot_times(start_date, end_date, duration_minutes):
+                available_slots.append({
+                    'datetime': slot_time.isoformat(),
+                    'date': slot_time.strftime('%Y-%m-%d'),
+                    'time': slot_time.strftime('%H:%M'),
+                    'duration_minutes': duration_minutes,
+                    'available': True
+                })
             
             return available_slots
         
@@ -74,6 +66,63 @@ class CalendarService:
             print(f"Error getting available slots: {str(e)}")
             return []
     
+    def get_availability_index(self, date_start: date, date_end: date, duration_minutes: int = 60,
+                               tenant: Optional[str] = None) -> AvailabilityIndex:
+        """
+        Open slots for a date range, indexed for the date resolver
+        
+        Args:
+            date_start: First day
+            date_end: Last day (inclusive)
+            duration_minutes: Duration of appointment in minutes
+            tenant: Business number, only whose appointments take slots; None
+                for the deployment's own business
+        
+        Returns:
+            AvailabilityIndex of slot start times
+        """
+        start_date = datetime.combine(date_start, datetime.min.time())
+        end_date = datetime.combine(date_end, datetime.min.time())
+        return AvailabilityIndex(self._open_slot_times(start_date, end_date, duration_minutes, tenant))
+    
+    def _open_slot_times(self, start_date: datetime, end_date: datetime, duration_minutes: int,
+                         tenant: Optional[str] = None) -> List[datetime]:
+        """Hourly slots in the range not overlapping a booked appointment, from one query"""
+        from src.models.call import Appointment
+        
+        booked = []
+        appointments = Appointment.query.filter(
+            Appointment.appointment_date >= start_date.date(),
+            Appointment.appointment_date <= end_date.date(),
+            Appointment.status.in_(['scheduled', 'confirmed']),
+            Appointment.business_phone.is_(None) if tenant is None else Appointment.business_phone == tenant
+        ).all()
+        for appointment in appointments:
+            appointment_datetime = datetime.combine(appointment.appointment_date, appointment.appointment_time)
+            booked.append((appointment_datetime, appointment_datetime + timedelta(minutes=appointment.duration_minutes)))
+        
+        slot_times = []
+        current_date = start_date
+        while current_date <= end_date:
+            # Skip weekends (simplified - should be configurable)
+            if current_date.weekday() < 6:  # Monday = 0, Sunday = 6
+                # Generate hourly slots from 9 AM to 5 PM
+                for hour in range(9, 17):
+                    slot_time = current_date.replace(hour=hour, minute=0, second=0, microsecond=0)
+                    slot_end = slot_time + timedelta(minutes=duration_minutes)
+                    
+                    # Check for overlap with booked appointments, then the external calendar
+                    if any(slot_time < end and slot_end > start for start, end in booked):
+                        continue
+                    if self.google_calendar_api_key and self.google_calendar_id:
+                        if not self._check_google_calendar_availability(slot_time, duration_minutes):
+                            continue
+                    slot_times.append(slot_time)
+            
+            current_date += timedelta(days=1)
+        
+        return slot_times
+    
     def _is_slot_available(self, slot_time: datetime, duration_minutes: int) -> bool:
         """
         Check if a time slot is available (not conflicting with existing appointments)
@@ -149,7 +198,7 @@ class CalendarService:
                 'orderBy': 'startTime'
             }
             
-            response = requests.get(url, params=params)
+            response = self.http.get(url, params=params)
             
             if response.status_code == 200:
                 events = response.json().get('items', [])
@@ -240,7 +289,7 @@ class CalendarService:
                 'Content-Type': 'application/json'
             }
             
-            response = requests.post(url, headers=headers, json=event_data)
+            response = self.http.post(url, headers=headers, json=event_data)
             
             if response.status_code == 200:
                 event = response.json()
@@ -309,7 +358,7 @@ class CalendarService:
                 'Authorization': f'Bearer {self.google_calendar_api_key}'
             }
             
-            response = requests.delete(url, headers=headers)
+            response = self.http.delete(url, headers=headers)
             return response.status_code == 204
         
         except Exception as e:
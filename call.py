@@ -3,6 +3,7 @@ Call Model
 Database model for storing call information and logs
 """
 
+from sqlalchemy import event
 from src.models.user import db
 from datetime import datetime
 import json
@@ -10,6 +11,13 @@ import json
 class Call(db.Model):
     """Model for storing call information"""
     __tablename__ = 'calls'
+    __table_args__ = (
+        db.Index('ix_calls_start_time', 'start_time'),
+        db.Index('ix_calls_status_start_time', 'call_status', 'start_time'),
+        db.Index('ix_calls_caller_phone', 'caller_phone'),
+        db.Index('ix_calls_primary_intent', 'primary_intent'),
+        db.Index('ix_calls_business_phone', 'business_phone'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     session_id = db.Column(db.String(100), unique=True, nullable=False)
@@ -22,6 +30,11 @@ class Call(db.Model):
     end_time = db.Column(db.DateTime, nullable=True)
     duration_seconds = db.Column(db.Integer, nullable=True)
     call_status = db.Column(db.String(20), default='active')  # active, completed, failed
+    business_phone = db.Column(db.String(20), nullable=True)  # Number that was dialed
+    direction = db.Column(db.String(10), default='inbound')  # inbound, outbound
+    stream_sid = db.Column(db.String(100), nullable=True)  # Twilio media stream
+    price = db.Column(db.String(20), nullable=True)  # Twilio price, e.g. '-0.0085'
+    twilio_synced_at = db.Column(db.DateTime, nullable=True)  # Last call-log sync
     
     # Conversation details
     primary_intent = db.Column(db.String(50), nullable=True)
@@ -37,12 +50,31 @@ class Call(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Columns that list endpoints may request through sparse fieldsets
+    LIST_FIELDS = (
+        'id', 'session_id', 'caller_phone', 'caller_name', 'caller_email',
+        'start_time', 'end_time', 'duration_seconds', 'call_status',
+        'business_phone', 'direction',
+        'primary_intent', 'conversation_summary', 'appointment_booked',
+        'lead_qualified', 'follow_up_required', 'created_at', 'updated_at'
+    )
+    
+    # Relationship
+    turns = db.relationship('CallTurn', backref='call', lazy='dynamic',
+                            order_by='CallTurn.seq', cascade='all, delete-orphan')
+    
     def __repr__(self):
         return f'<Call {self.id}: {self.session_id}>'
     
-    def to_dict(self):
-        """Convert call object to dictionary"""
-        return {
+    def to_dict(self, include_history=True):
+        """
+        Convert call object to dictionary
+        
+        Args:
+            include_history: Include the conversation transcript; list views
+                pass False and load turns separately when needed
+        """
+        data = {
             'id': self.id,
             'session_id': self.session_id,
             'caller_phone': self.caller_phone,
@@ -52,26 +84,111 @@ class Call(db.Model):
             'end_time': self.end_time.isoformat() if self.end_time else None,
             'duration_seconds': self.duration_seconds,
             'call_status': self.call_status,
+            'business_phone': self.business_phone,
+            'direction': self.direction,
+            'price': self.price,
             'primary_intent': self.primary_intent,
             'conversation_summary': self.conversation_summary,
-            'conversation_history': json.loads(self.conversation_history) if self.conversation_history else [],
             'appointment_booked': self.appointment_booked,
             'lead_qualified': self.lead_qualified,
             'follow_up_required': self.follow_up_required,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
+        if include_history:
+            data['conversation_history'] = self.get_conversation_history()
+        return data
+    
+    @staticmethod
+    def columns_to_dict(row, fields):
+        """Convert a column-level query row to a dictionary with only the given fields"""
+        data = {}
+        for field in fields:
+            value = getattr(row, field)
+            data[field] = value.isoformat() if isinstance(value, datetime) else value
+        return data
     
     def set_conversation_history(self, history_list):
-        """Set conversation history from list"""
+        """Set legacy conversation history from list (new turns go to call_turns)"""
         self.conversation_history = json.dumps(history_list)
     
     def get_conversation_history(self):
-        """Get conversation history as list"""
+        """
+        Get conversation history as list
+        
+        Reads the call_turns table, falling back to the legacy JSON column
+        for calls recorded before turns were stored separately.
+        """
+        turns = self.turns.all() if self.id is not None else []
+        if turns:
+            return [turn.to_dict() for turn in turns]
         if self.conversation_history:
             return json.loads(self.conversation_history)
         return []
     
+    def append_turns(self, turns):
+        """
+        Append conversation turns with a single batched insert
+        
+        Each row's seq is allocated by its own INSERT (the call's highest seq
+        plus one), so writers appending to the same call at once (the
+        realtime transcript and process-call) never claim the same seq.
+        
+        Args:
+            turns: List of dicts with role, text and optional intent and
+                latency fields (stt_ms, dialogue_ms, tts_ms, total_ms)
+        """
+        if not turns:
+            return
+        if self.id is None:
+            db.session.flush()
+        
+        now = datetime.utcnow()
+        rows = []
+        for turn in turns:
+            row = {field: turn.get(field) for field in CallTurn.TURN_FIELDS}
+            row.update(call_id=self.id, created_at=now)
+            rows.append(row)
+        
+        turns_table = CallTurn.__table__
+        next_seq = db.select(db.func.coalesce(db.func.max(turns_table.c.seq), 0) + 1).where(
+            turns_table.c.call_id == self.id
+        ).scalar_subquery()
+        db.session.execute(db.insert(turns_table).values(seq=next_seq), rows)
+    
+    def record_turn(self, user_text, bot_text, intent=None, latency=None):
+        """
+        Append one user/assistant exchange as a batch of two turns
+        
+        Args:
+            user_text: What the caller said
+            bot_text: The receptionist's reply
+            intent: Intent detected for the caller's message
+            latency: Optional dict of stage timings in milliseconds, plus
+                'spans' with the turn's serialized trace
+        """
+        latency = latency or {}
+        if intent and not self.primary_intent:
+            self.primary_intent = intent
+        
+        self.append_turns([
+            {'role': 'user', 'text': user_text, 'intent': intent,
+             'stt_ms': latency.get('stt_ms')},
+            {'role': 'assistant', 'text': bot_text, 'intent': intent,
+             'dialogue_ms': latency.get('dialogue_ms'), 'tts_ms': latency.get('tts_ms'),
+             'total_ms': latency.get('total_ms'), 'spans': latency.get('spans')}
+        ])
+    
+    @staticmethod
+    def get_or_create(session_id, **kwargs):
+        """Get call by session ID, creating it if it does not exist"""
+        call = Call.query.filter_by(session_id=session_id).first()
+        if not call:
+            call = Call(session_id=session_id, **kwargs)
+            db.session.add(call)
+            db.session.flush()
+        return call
+    
     def calculate_duration(self):
         """Calculate and set call duration"""
         if self.start_time and self.end_time:
@@ -84,12 +201,119 @@ class Call(db.Model):
         self.call_status = 'completed'
         self.calculate_duration()
 
+class CallTurn(db.Model):
+    """Model for storing individual conversation turns of a call"""
+    __tablename__ = 'call_turns'
+    __table_args__ = (
+        db.UniqueConstraint('call_id', 'seq', name='uq_call_turns_call_seq'),
+    )
+    
+    # Columns callers may set through Call.append_turns
+    TURN_FIELDS = ('role', 'text', 'intent', 'stt_ms', 'dialogue_ms', 'tts_ms', 'total_ms', 'spans')
+    
+    id = db.Column(db.Integer, primary_key=True)
+    call_id = db.Column(db.Integer, db.ForeignKey('calls.id'), nullable=False)
+    seq = db.Column(db.Integer, nullable=False)
+    
+    # Turn content
+    role = db.Column(db.String(20), nullable=False)  # user, assistant
+    text = db.Column(db.Text, nullable=False)
+    intent = db.Column(db.String(50), nullable=True)
+    
+    # Stage latencies in milliseconds
+    stt_ms = db.Column(db.Integer, nullable=True)
+    dialogue_ms = db.Column(db.Integer, nullable=True)
+    tts_ms = db.Column(db.Integer, nullable=True)
+    total_ms = db.Column(db.Integer, nullable=True)
+    spans = db.Column(db.Text, nullable=True)  # JSON turn trace, when persisting traces is enabled
+    
+    # Metadata
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<CallTurn {self.call_id}#{self.seq}: {self.role}>'
+    
+    def to_dict(self):
+        """Convert turn object to dictionary"""
+        return {
+            'seq': self.seq,
+            'role': self.role,
+            'text': self.text,
+            'intent': self.intent,
+            'stt_ms': self.stt_ms,
+            'dialogue_ms': self.dialogue_ms,
+            'tts_ms': self.tts_ms,
+            'total_ms': self.total_ms,
+            'spans': json.loads(self.spans) if self.spans else None,
+            'timestamp': self.created_at.isoformat() if self.created_at else None
+        }
+
+class CallRecording(db.Model):
+    """Model for recording metadata synchronized from Twilio"""
+    __tablename__ = 'call_recordings'
+    __table_args__ = (
+        db.Index('ix_call_recordings_call_sid', 'call_sid'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    sid = db.Column(db.String(100), unique=True, nullable=False)
+    call_sid = db.Column(db.String(100), nullable=False)
+    
+    # Recording details
+    status = db.Column(db.String(20), nullable=True)
+    duration_seconds = db.Column(db.Integer, nullable=True)
+    uri = db.Column(db.String(255), nullable=True)
+    date_created = db.Column(db.DateTime, nullable=True)
+    
+    # Metadata
+    synced_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<CallRecording {self.sid}: {self.call_sid}>'
+    
+    def to_dict(self):
+        """Convert recording object to dictionary"""
+        return {
+            'sid': self.sid,
+            'call_sid': self.call_sid,
+            'status': self.status,
+            'duration_seconds': self.duration_seconds,
+            'uri': self.uri,
+            'date_created': self.date_created.isoformat() if self.date_created else None
+        }
+
+class CallStatusEvent(db.Model):
+    """Model for the queue of received Twilio status callbacks awaiting application"""
+    __tablename__ = 'call_status_events'
+    __table_args__ = (
+        db.UniqueConstraint('call_sid', 'call_status', 'sequence_number', name='uq_call_status_events_dedup'),
+        db.Index('ix_call_status_events_pending', 'processed_at', 'id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    call_sid = db.Column(db.String(100), nullable=False)
+    call_status = db.Column(db.String(20), nullable=False)
+    sequence_number = db.Column(db.Integer, default=0, nullable=False)
+    duration_seconds = db.Column(db.Integer, nullable=True)
+    
+    # Queue bookkeeping
+    received_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    processed_at = db.Column(db.DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f'<CallStatusEvent {self.call_sid}: {self.call_status}#{self.sequence_number}>'
+
 class Appointment(db.Model):
     """Model for storing appointment information"""
     __tablename__ = 'appointments'
+    __table_args__ = (
+        db.Index('ix_appointments_date_status', 'appointment_date', 'status'),
+        db.Index('ix_appointments_customer_phone', 'customer_phone'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     call_id = db.Column(db.Integer, db.ForeignKey('calls.id'), nullable=True)
+    business_phone = db.Column(db.String(20), nullable=True)  # Business booked with; None for the deployment's own
     
     # Customer information
     customer_name = db.Column(db.String(100), nullable=False)
@@ -122,6 +346,7 @@ class Appointment(db.Model):
         return {
             'id': self.id,
             'call_id': self.call_id,
+            'business_phone': self.business_phone,
             'customer_name': self.customer_name,
             'customer_phone': self.customer_phone,
             'customer_email': self.customer_email,
@@ -136,6 +361,14 @@ class Appointment(db.Model):
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
+@event.listens_for(Appointment, 'before_insert')
+def _appointment_business(mapper, connection, appointment):
+    """Book an appointment made on a call with the business that was called, unless given"""
+    if appointment.business_phone is None and appointment.call_id is not None:
+        appointment.business_phone = connection.scalar(
+            db.select(Call.business_phone).where(Call.id == appointment.call_id)
+        )
+
 class BusinessConfig(db.Model):
     """Model for storing business configuration"""
     __tablename__ = 'business_config'
@@ -183,3 +416,79 @@ class BusinessConfig(db.Model):
         db.session.commit()
         return config
 
+class SyncState(db.Model):
+    """Model for progress markers of background jobs, kept apart from configuration"""
+    __tablename__ = 'sync_state'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(100), unique=True, nullable=False)
+    value = db.Column(db.Text, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<SyncState {self.key}: {self.value}>'
+    
+    @staticmethod
+    def get_value(key, default=None):
+        """Get a stored marker by key"""
+        state = SyncState.query.filter_by(key=key).first()
+        return state.value if state else default
+    
+    @staticmethod
+    def set_value(key, value):
+        """Set a marker"""
+        state = SyncState.query.filter_by(key=key).first()
+        if state:
+            state.value = value
+        else:
+            state = SyncState(key=key, value=value)
+            db.session.add(state)
+        db.session.commit()
+        return state
+
+class TenantConfig(db.Model):
+    """Configuration overrides of one business, keyed on the number callers dial"""
+    __tablename__ = 'tenant_config'
+    __table_args__ = (
+        db.UniqueConstraint('tenant', 'key', name='uq_tenant_config_tenant_key'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    tenant = db.Column(db.String(20), nullable=False)  # Business number in E.164
+    key = db.Column(db.String(100), nullable=False)
+    value = db.Column(db.Text, nullable=False)
+    
+    # Metadata
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<TenantConfig {self.tenant} {self.key}: {self.value[:50]}...>'
+    
+    def to_dict(self):
+        """Convert config object to dictionary"""
+        return {
+            'id': self.id,
+            'tenant': self.tenant,
+            'key': self.key,
+            'value': self.value,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+    
+    @staticmethod
+    def get_configs(tenant):
+        """Get a tenant's configuration overrides as a dictionary"""
+        return {config.key: config.value for config in TenantConfig.query.filter_by(tenant=tenant)}
+    
+    @staticmethod
+    def set_config(tenant, key, value):
+        """Set a tenant's configuration value"""
+        config = TenantConfig.query.filter_by(tenant=tenant, key=key).first()
+        if config:
+            config.value = value
+        else:
+            config = TenantConfig(tenant=tenant, key=key, value=value)
+            db.session.add(config)
+        db.session.commit()
+        return config
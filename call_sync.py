@@ -0,0 +1,235 @@
+"""
+Call Log Sync Service
+Incrementally mirrors Twilio call logs and recording metadata into the local
+calls and call_recordings tables so list and detail views never wait on Twilio
+"""
+
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from src.models.user import db
+from src.models.call import Call, CallRecording, SyncState
+from src.models.rollup import TERMINAL_CALL_STATUSES
+
+logger = logging.getLogger(__name__)
+
+CALLS_WATERMARK_KEY = 'twilio_calls_watermark'
+RECORDINGS_WATERMARK_KEY = 'twilio_recordings_watermark'
+
+PAGE_SIZE = 1000
+SYNC_INTERVAL_SECONDS = 300
+WATERMARK_OVERLAP = timedelta(hours=1)  # Re-read this much history to absorb clock skew
+MAX_OPEN_CALL_AGE = timedelta(days=1)  # Unfinished calls older than this stop holding the watermark back
+
+def _naive_utc(value):
+    """Convert an aware datetime from the Twilio SDK to the naive UTC used in the database"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+def _to_int(value):
+    """Parse an optional integer field from Twilio"""
+    return int(value) if value not in (None, '') else None
+
+class CallLogSync:
+    def __init__(self, twilio_service, page_size: int = PAGE_SIZE,
+                 interval_seconds: float = SYNC_INTERVAL_SECONDS):
+        """
+        Initialize the sync job
+        
+        Args:
+            twilio_service: TwilioService used to page through the REST API
+            page_size: Records fetched per REST request
+            interval_seconds: Pause between background sync runs
+        """
+        self.twilio = twilio_service
+        self.page_size = page_size
+        self.interval_seconds = interval_seconds
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def sync(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Pull calls and recordings changed since the last watermarks
+        
+        Each page is upserted and committed on its own, so an interrupted
+        run simply repeats from the previous watermark next time.
+        
+        Returns:
+            Counts of calls and recordings upserted
+        """
+        now = now or datetime.utcnow()
+        return {
+            'calls': self.sync_calls(now),
+            'recordings': self.sync_recordings()
+        }
+    
+    def sync_calls(self, now: Optional[datetime] = None) -> int:
+        """Upsert calls started since the calls watermark and advance it"""
+        now = now or datetime.utcnow()
+        since = self._get_watermark(CALLS_WATERMARK_KEY)
+        
+        synced = 0
+        newest = None
+        oldest_open = None
+        for page in self.twilio.iter_call_pages(start_time_after=since, page_size=self.page_size):
+            for record in self.upsert_calls(page):
+                started = record['start_time']
+                if started is None:
+                    continue
+                newest = max(newest, started) if newest else started
+                # Calls still in progress will change again; keep them inside the window
+                if record['status'] not in TERMINAL_CALL_STATUSES and now - started < MAX_OPEN_CALL_AGE:
+                    oldest_open = min(oldest_open, started) if oldest_open else started
+            synced += len(page)
+        
+        if newest:
+            self._set_watermark(CALLS_WATERMARK_KEY, min(filter(None, (newest, oldest_open))))
+        return synced
+    
+    def sync_recordings(self) -> int:
+        """Upsert recordings created since the recordings watermark and advance it"""
+        since = self._get_watermark(RECORDINGS_WATERMARK_KEY)
+        
+        synced = 0
+        newest = None
+        for page in self.twilio.iter_recording_pages(date_created_after=since, page_size=self.page_size):
+            self.upsert_recordings(page)
+            for recording in page:
+                created = _naive_utc(recording['date_created'])
+                if created:
+                    newest = max(newest, created) if newest else created
+            synced += len(page)
+        
+        if newest:
+            self._set_watermark(RECORDINGS_WATERMARK_KEY, newest)
+        return synced
+    
+    def upsert_calls(self, page: List[Dict]) -> List[Dict]:
+        """
+        Insert or update one page of Twilio calls with a single lookup query
+        
+        Calls go through the ORM so rollups count newly finished calls.
+        
+        Returns:
+            The page normalized to database values
+        """
+        records = [self._call_record(call) for call in page]
+        existing = {
+            call.session_id: call
+            for call in Call.query.filter(Call.session_id.in_([record['sid'] for record in records]))
+        }
+        
+        now = datetime.utcnow()
+        for record in records:
+            call = existing.get(record['sid'])
+            if call is None:
+                call = Call(session_id=record['sid'], caller_phone=record['from'],
+                            business_phone=record['to'], direction=record['direction'])
+                db.session.add(call)
+            
+            call.call_status = record['status']
+            call.start_time = record['start_time'] or call.start_time or now
+            call.end_time = record['end_time']
+            call.duration_seconds = record['duration']
+            call.price = record['price']
+            call.twilio_synced_at = now
+        
+        db.session.commit()
+        return records
+    
+    def upsert_recordings(self, page: List[Dict]):
+        """Insert or update one page of Twilio recording metadata"""
+        existing = {
+            recording.sid: recording
+            for recording in CallRecording.query.filter(CallRecording.sid.in_([r['sid'] for r in page]))
+        }
+        
+        now = datetime.utcnow()
+        for data in page:
+            recording = existing.get(data['sid'])
+            if recording is None:
+                recording = CallRecording(sid=data['sid'])
+                db.session.add(recording)
+            
+            recording.call_sid = data['call_sid']
+            recording.status = data['status']
+            recording.duration_seconds = _to_int(data['duration'])
+            recording.uri = data['uri']
+            recording.date_created = _naive_utc(data['date_created'])
+            recording.synced_at = now
+        
+        db.session.commit()
+    
+    def refresh_call(self, call_sid: str) -> bool:
+        """
+        Re-fetch a single call and its recordings from Twilio
+        
+        Returns:
+            True if Twilio returned the call
+        """
+        details = self.twilio.get_call_details(call_sid)
+        if not details:
+            return False
+        
+        self.upsert_calls([details])
+        self.upsert_recordings(self.twilio.get_call_recordings(call_sid))
+        return True
+    
+    def start(self, app):
+        """Start periodic background syncs for the given Flask app"""
+        if self.twilio.client is None:
+            logger.info("Twilio not configured; call log sync disabled")
+            return
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, args=(app,), name='call-log-sync', daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        """Stop the background worker after its current run"""
+        self._stop.set()
+    
+    def _run(self, app):
+        """Worker loop: sync, then sleep for the interval"""
+        with app.app_context():
+            while not self._stop.is_set():
+                try:
+                    counts = self.sync()
+                    logger.info(f"Call log sync: {counts['calls']} calls, {counts['recordings']} recordings")
+                except Exception as e:
+                    logger.error(f"Error syncing call logs: {e}")
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+                self._stop.wait(self.interval_seconds)
+    
+    @staticmethod
+    def _call_record(call: Dict) -> Dict:
+        """Normalize a Twilio call dictionary to database values"""
+        direction = call.get('direction') or 'inbound'
+        return {
+            'sid': call['sid'],
+            'from': call.get('from'),
+            'to': call.get('to'),
+            'status': (call.get('status') or '').lower() or None,
+            'start_time': _naive_utc(call.get('start_time')) or _naive_utc(call.get('date_created')),
+            'end_time': _naive_utc(call.get('end_time')),
+            'duration': _to_int(call.get('duration')),
+            'price': call.get('price'),
+            'direction': 'inbound' if direction == 'inbound' else 'outbound'
+        }
+    
+    @staticmethod
+    def _get_watermark(key: str) -> Optional[datetime]:
+        """Read a stored watermark, widened by the overlap window"""
+        value = SyncState.get_value(key)
+        if not value:
+            return None
+        return datetime.fromisoformat(value) - WATERMARK_OVERLAP
+    
+    @staticmethod
+    def _set_watermark(key: str, value: datetime):
+        """Persist a watermark (UTC); sync progress is not configuration, so tenants are not reloaded"""
+        SyncState.set_value(key, value.isoformat())
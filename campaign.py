@@ -0,0 +1,126 @@
+"""
+Campaign Models
+Outbound call campaigns and the per-number dialing state of their contacts
+"""
+
+from src.models.user import db
+from datetime import datetime
+import json
+
+class Campaign(db.Model):
+    """Model for an outbound call campaign"""
+    __tablename__ = 'campaigns'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    message_template = db.Column(db.Text, nullable=False)  # Spoken text with {placeholders}
+    
+    # Scheduling
+    status = db.Column(db.String(20), default='draft')  # draft, scheduled, running, paused, completed, cancelled
+    scheduled_at = db.Column(db.DateTime, nullable=True)
+    started_at = db.Column(db.DateTime, nullable=True)
+    completed_at = db.Column(db.DateTime, nullable=True)
+    
+    # Dialing limits
+    max_concurrency = db.Column(db.Integer, default=5)  # Calls in flight at once
+    calls_per_second = db.Column(db.Float, default=1.0)
+    max_attempts = db.Column(db.Integer, default=3)
+    retry_delay_seconds = db.Column(db.Integer, default=300)  # Doubles after every attempt
+    status_callback_url = db.Column(db.String(255), nullable=True)
+    
+    # Rate budget shared by the dialers of every worker process
+    dial_tokens = db.Column(db.Float, nullable=True)  # Calls that may start now; None when never dialed
+    dial_tokens_at = db.Column(db.DateTime, nullable=True)
+    
+    # Metadata
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Relationship
+    contacts = db.relationship('CampaignContact', backref='campaign', lazy='dynamic',
+                               cascade='all, delete-orphan')
+    
+    def __repr__(self):
+        return f'<Campaign {self.id}: {self.name}>'
+    
+    def status_counts(self):
+        """Count contacts per dialing status with one grouped query"""
+        rows = db.session.query(CampaignContact.status, db.func.count()).filter(
+            CampaignContact.campaign_id == self.id
+        ).group_by(CampaignContact.status)
+        return {status: count for status, count in rows}
+    
+    def to_dict(self, include_counts=True):
+        """Convert campaign object to dictionary"""
+        data = {
+            'id': self.id,
+            'name': self.name,
+            'message_template': self.message_template,
+            'status': self.status,
+            'scheduled_at': self.scheduled_at.isoformat() if self.scheduled_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
+            'max_concurrency': self.max_concurrency,
+            'calls_per_second': self.calls_per_second,
+            'max_attempts': self.max_attempts,
+            'retry_delay_seconds': self.retry_delay_seconds,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+        if include_counts:
+            data['contact_counts'] = self.status_counts()
+        return data
+
+class CampaignContact(db.Model):
+    """Model for one number to dial in a campaign"""
+    __tablename__ = 'campaign_contacts'
+    __table_args__ = (
+        db.Index('ix_campaign_contacts_due', 'campaign_id', 'status', 'next_attempt_at'),
+        db.Index('ix_campaign_contacts_call_sid', 'call_sid'),
+    )
+    
+    # Contacts the dialer has handed to Twilio and not yet resolved
+    ACTIVE_STATUSES = ('dialing', 'in_progress')
+    
+    id = db.Column(db.Integer, primary_key=True)
+    campaign_id = db.Column(db.Integer, db.ForeignKey('campaigns.id'), nullable=False)
+    phone = db.Column(db.String(20), nullable=False)
+    name = db.Column(db.String(100), nullable=True)
+    variables = db.Column(db.Text, nullable=True)  # JSON template variables
+    
+    # Dialing state
+    status = db.Column(db.String(20), default='pending')  # pending, dialing, in_progress, completed, busy, no-answer, failed, cancelled
+    attempts = db.Column(db.Integer, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=True)
+    call_sid = db.Column(db.String(100), nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    
+    # Metadata
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<CampaignContact {self.id}: {self.phone} ({self.status})>'
+    
+    def get_variables(self):
+        """Template variables for this contact, including name and phone"""
+        variables = json.loads(self.variables) if self.variables else {}
+        variables.setdefault('name', self.name or '')
+        variables.setdefault('phone', self.phone)
+        return variables
+    
+    def to_dict(self):
+        """Convert contact object to dictionary"""
+        return {
+            'id': self.id,
+            'campaign_id': self.campaign_id,
+            'phone': self.phone,
+            'name': self.name,
+            'variables': json.loads(self.variables) if self.variables else {},
+            'status': self.status,
+            'attempts': self.attempts,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'call_sid': self.call_sid,
+            'last_error': self.last_error,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
@@ -0,0 +1,249 @@
+"""
+Campaign API Routes
+Upload, schedule and monitor outbound call campaigns
+"""
+
+import os
+import io
+import csv
+import json
+import logging
+from datetime import datetime, timezone
+from flask import Blueprint, request, jsonify
+from flask_cors import cross_origin
+from src.models.user import db
+from src.models.campaign import Campaign, CampaignContact
+from src.services.registry import twilio_service
+from src.services.campaign_dialer import CampaignDialer
+
+logger = logging.getLogger(__name__)
+
+campaign_bp = Blueprint('campaigns', __name__)
+
+# Limits accepted from clients
+MAX_CONCURRENCY = 100
+MAX_CALLS_PER_SECOND = 50.0
+MAX_CONTACTS_PAGE = 1000
+
+# Global services
+campaign_dialer = CampaignDialer(twilio_service)
+
+def _parse_contacts(data):
+    """
+    Read contacts from an uploaded CSV file or a JSON 'contacts' list
+    
+    Every column besides phone and name becomes a template variable.
+    Duplicate phone numbers are dropped.
+    
+    Returns:
+        List of contact rows ready for insertion
+    """
+    if 'file' in request.files:
+        text = request.files['file'].read().decode('utf-8-sig')
+        entries = list(csv.DictReader(io.StringIO(text)))
+    else:
+        entries = data.get('contacts') or []
+    
+    rows = []
+    seen = set()
+    for entry in entries:
+        phone = (entry.get('phone') or '').strip()
+        if not phone or phone in seen:
+            continue
+        seen.add(phone)
+        variables = {key: value for key, value in entry.items() if key not in ('phone', 'name') and value}
+        rows.append({
+            'phone': phone,
+            'name': (entry.get('name') or '').strip() or None,
+            'variables': json.dumps(variables) if variables else None
+        })
+    return rows
+
+def _status_callback_url():
+    """Public URL of the status webhook, so campaign call outcomes are reported back"""
+    base_url = os.getenv('PUBLIC_BASE_URL') or request.url_root
+    return base_url.rstrip('/') + '/api/phone/webhook/status'
+
+@campaign_bp.route('', methods=['POST'])
+@cross_origin()
+def create_campaign():
+    """
+    Create a campaign from a contact list
+    
+    Accepts JSON, or multipart form data with a CSV 'file' whose header
+    includes 'phone' (and optionally 'name' plus template variables).
+    """
+    try:
+        data = request.get_json(silent=True) or request.form.to_dict()
+        name = data.get('name')
+        message = data.get('message')
+        
+        if not name or not message:
+            return jsonify({'error': 'name and message are required'}), 400
+        
+        contacts = _parse_contacts(data)
+        if not contacts:
+            return jsonify({'error': 'At least one contact with a phone number is required'}), 400
+        
+        campaign = Campaign(
+            name=name,
+            message_template=message,
+            max_concurrency=max(1, min(int(data.get('max_concurrency', 5)), MAX_CONCURRENCY)),
+            calls_per_second=max(0.1, min(float(data.get('calls_per_second', 1.0)), MAX_CALLS_PER_SECOND)),
+            max_attempts=max(1, int(data.get('max_attempts', 3))),
+            retry_delay_seconds=max(0, int(data.get('retry_delay_seconds', 300))),
+            status_callback_url=_status_callback_url()
+        )
+        db.session.add(campaign)
+        db.session.flush()
+        
+        for row in contacts:
+            row['campaign_id'] = campaign.id
+        db.session.execute(db.insert(CampaignContact), contacts)
+        db.session.commit()
+        
+        return jsonify(campaign.to_dict()), 201
+    
+    except (TypeError, ValueError) as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error creating campaign: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@campaign_bp.route('', methods=['GET'])
+@cross_origin()
+def get_campaigns():
+    """List campaigns, newest first"""
+    try:
+        campaigns = Campaign.query.order_by(Campaign.created_at.desc()).all()
+        return jsonify({'campaigns': [campaign.to_dict(include_counts=False) for campaign in campaigns]})
+    
+    except Exception as e:
+        logger.error(f"Error fetching campaigns: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@campaign_bp.route('/<int:campaign_id>', methods=['GET'])
+@cross_origin()
+def get_campaign(campaign_id):
+    """Get a campaign with per-status contact counts"""
+    try:
+        campaign = Campaign.query.get(campaign_id)
+        if not campaign:
+            return jsonify({'error': 'Campaign not found'}), 404
+        
+        return jsonify(campaign.to_dict())
+    
+    except Exception as e:
+        logger.error(f"Error fetching campaign: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@campaign_bp.route('/<int:campaign_id>/contacts', methods=['GET'])
+@cross_origin()
+def get_campaign_contacts(campaign_id):
+    """
+    Get a page of campaign contacts
+    
+    Query Parameters:
+        status: Filter by dialing status
+        after: Return contacts with an id greater than this one
+        limit: Page size (max 1000)
+    """
+    try:
+        limit = max(1, min(request.args.get('limit', 100, type=int), MAX_CONTACTS_PAGE))
+        query = CampaignContact.query.filter(
+            CampaignContact.campaign_id == campaign_id,
+            CampaignContact.id > request.args.get('after', 0, type=int)
+        )
+        status = request.args.get('status')
+        if status:
+            query = query.filter(CampaignContact.status == status)
+        
+        contacts = query.order_by(CampaignContact.id).limit(limit).all()
+        return jsonify({
+            'contacts': [contact.to_dict() for contact in contacts],
+            'next_after': contacts[-1].id if len(contacts) == limit else None
+        })
+    
+    except Exception as e:
+        logger.error(f"Error fetching campaign contacts: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@campaign_bp.route('/<int:campaign_id>/schedule', methods=['POST'])
+@cross_origin()
+def schedule_campaign(campaign_id):
+    """
+    Schedule (or resume) a campaign at the given time, default now
+    
+    scheduled_at is ISO 8601; a time with an offset is converted to UTC, one
+    without is taken as UTC, as the dialer compares against utcnow.
+    """
+    try:
+        campaign = Campaign.query.get(campaign_id)
+        if not campaign:
+            return jsonify({'error': 'Campaign not found'}), 404
+        if campaign.status in ('running', 'completed', 'cancelled'):
+            return jsonify({'error': f'Campaign is {campaign.status}'}), 400
+        
+        data = request.get_json(silent=True) or {}
+        scheduled_at = data.get('scheduled_at')
+        if scheduled_at:
+            scheduled_at = datetime.fromisoformat(scheduled_at)
+            if scheduled_at.tzinfo is not None:
+                # The column stores naive UTC; an offset would otherwise be dropped
+                scheduled_at = scheduled_at.astimezone(timezone.utc).replace(tzinfo=None)
+        campaign.scheduled_at = scheduled_at or datetime.utcnow()
+        campaign.status = 'scheduled'
+        db.session.commit()
+        
+        return jsonify(campaign.to_dict())
+    
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error scheduling campaign: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@campaign_bp.route('/<int:campaign_id>/pause', methods=['POST'])
+@cross_origin()
+def pause_campaign(campaign_id):
+    """Stop dialing new numbers; calls already in flight finish normally"""
+    try:
+        campaign = Campaign.query.get(campaign_id)
+        if not campaign:
+            return jsonify({'error': 'Campaign not found'}), 404
+        if campaign.status not in ('scheduled', 'running'):
+            return jsonify({'error': f'Campaign is {campaign.status}'}), 400
+        
+        campaign.status = 'paused'
+        db.session.commit()
+        
+        return jsonify(campaign.to_dict())
+    
+    except Exception as e:
+        logger.error(f"Error pausing campaign: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@campaign_bp.route('/<int:campaign_id>/cancel', methods=['POST'])
+@cross_origin()
+def cancel_campaign(campaign_id):
+    """Cancel a campaign and every contact not yet dialed"""
+    try:
+        campaign = Campaign.query.get(campaign_id)
+        if not campaign:
+            return jsonify({'error': 'Campaign not found'}), 404
+        
+        campaign.status = 'cancelled'
+        db.session.execute(
+            db.update(CampaignContact)
+            .where(CampaignContact.campaign_id == campaign_id, CampaignContact.status == 'pending')
+            .values(status='cancelled', updated_at=datetime.utcnow())
+        )
+        db.session.commit()
+        
+        return jsonify(campaign.to_dict())
+    
+    except Exception as e:
+        logger.error(f"Error cancelling campaign: {e}")
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,289 @@
+"""
+Campaign Dialer Service
+Places outbound campaign calls within each campaign's concurrency and
+calls-per-second limits, and retries busy or unanswered numbers with backoff
+"""
+
+import string
+import logging
+import threading
+from datetime import datetime, timedelta
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+from src.models.user import db
+from src.models.call import Call
+from src.models.campaign import Campaign, CampaignContact
+from src.models.rollup import TERMINAL_CALL_STATUSES
+from src.services.twiml_templates import twiml_cache
+
+logger = logging.getLogger(__name__)
+
+TICK_SECONDS = 0.2
+DIAL_WORKERS = 8  # Concurrent Twilio REST requests
+DIAL_TIMEOUT = timedelta(minutes=5)  # Contacts stuck in 'dialing' this long were interrupted
+
+# Call outcomes worth another attempt
+RETRY_OUTCOMES = ('busy', 'no-answer')
+
+@lru_cache(maxsize=256)
+def _parse_template(template):
+    """Split a message template into (literal, field name) pairs once per template"""
+    return tuple((literal, field) for literal, field, _, _ in string.Formatter().parse(template))
+
+def render_campaign_twiml(template: str, variables: Dict[str, str]) -> str:
+    """
+    Render the TwiML for one campaign call
+    
+    Args:
+        template: Message with {placeholders}, e.g. 'Hi {name}, ...'
+        variables: Values for the placeholders; missing ones render empty
+    
+    Returns:
+        TwiML document that speaks the message, from the cached 'say' template
+    """
+    parts = []
+    for literal, field in _parse_template(template):
+        parts.append(literal)
+        if field:
+            parts.append(str(variables.get(field, '')))
+    
+    return twiml_cache.render('say', message=''.join(parts)).decode()
+
+def refill_tokens(tokens: Optional[float], updated_at: Optional[datetime], now: datetime, rate: float) -> float:
+    """
+    Tokens of a calls-per-second budget, refilled since its last update
+    
+    Bursts are allowed up to max(1, rate) calls; a budget never used is full.
+    """
+    capacity = max(1.0, rate)
+    if tokens is None or updated_at is None:
+        return capacity
+    return min(capacity, tokens + max(0.0, (now - updated_at).total_seconds()) * rate)
+
+class CampaignDialer:
+    def __init__(self, twilio_service, dial_workers: int = DIAL_WORKERS, tick_seconds: float = TICK_SECONDS):
+        """
+        Initialize the dialer
+        
+        Every worker process runs one; their rounds share each campaign's
+        concurrency and rate budget through the database.
+        
+        Args:
+            twilio_service: TwilioService used to place calls
+            dial_workers: Twilio REST requests made in parallel
+            tick_seconds: Pause between background dialing rounds
+        """
+        self.twilio = twilio_service
+        self.tick_seconds = tick_seconds
+        self._executor = ThreadPoolExecutor(max_workers=dial_workers, thread_name_prefix='campaign-dial')
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def tick(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Run one dialing round: resolve finished calls, start due campaigns,
+        then dial every running campaign up to its limits
+        
+        Returns:
+            Numbers of contacts resolved and dialed
+        """
+        now = now or datetime.utcnow()
+        resolved = self.reconcile(now)
+        
+        for campaign in Campaign.query.filter(Campaign.status == 'scheduled', Campaign.scheduled_at <= now):
+            campaign.status = 'running'
+            campaign.started_at = now
+        db.session.commit()
+        
+        dialed = 0
+        for campaign in Campaign.query.filter_by(status='running').all():
+            dialed += self._dial_campaign(campaign, now)
+            self._complete_if_done(campaign, now)
+        
+        return {'resolved': resolved, 'dialed': dialed}
+    
+    def reconcile(self, now: Optional[datetime] = None) -> int:
+        """
+        Resolve contacts whose calls have ended or whose dial was interrupted
+        
+        Call outcomes come from the calls table, which the status webhook
+        and the call log sync keep current.
+        
+        Returns:
+            Number of contacts resolved
+        """
+        now = now or datetime.utcnow()
+        finished = db.session.query(CampaignContact, Campaign, Call.call_status).join(
+            Campaign, Campaign.id == CampaignContact.campaign_id
+        ).join(
+            Call, Call.session_id == CampaignContact.call_sid
+        ).filter(
+            CampaignContact.status == 'in_progress',
+            db.func.lower(Call.call_status).in_(TERMINAL_CALL_STATUSES)
+        ).all()
+        
+        for contact, campaign, call_status in finished:
+            self._resolve(contact, campaign, call_status.lower(), now)
+        
+        interrupted = db.session.query(CampaignContact, Campaign).join(
+            Campaign, Campaign.id == CampaignContact.campaign_id
+        ).filter(
+            CampaignContact.status == 'dialing',
+            CampaignContact.updated_at < now - DIAL_TIMEOUT
+        ).all()
+        
+        for contact, campaign in interrupted:
+            contact.last_error = 'Dial interrupted'
+            self._resolve(contact, campaign, 'failed', now, retry=True)
+        
+        db.session.commit()
+        return len(finished) + len(interrupted)
+    
+    def _dial_campaign(self, campaign: Campaign, now: datetime) -> int:
+        """
+        Dial due contacts of one campaign within its concurrency and rate limits
+        
+        The round takes its calls from the rate budget stored on the campaign
+        with a compare-and-set, in the transaction that claims the contacts.
+        A concurrent round of another process therefore either sees those
+        claims or loses the compare-and-set, so the limits hold across
+        processes and no contact is dialed twice.
+        """
+        tokens, tokens_at = self._budget(campaign)
+        in_flight = CampaignContact.query.filter(
+            CampaignContact.campaign_id == campaign.id,
+            CampaignContact.status.in_(CampaignContact.ACTIVE_STATUSES)
+        ).count()
+        available = refill_tokens(tokens, tokens_at, now, campaign.calls_per_second or 1.0)
+        calls = min((campaign.max_concurrency or 1) - in_flight, int(available))
+        if calls <= 0:
+            return 0
+        
+        due = db.session.query(CampaignContact.id).filter(
+            CampaignContact.campaign_id == campaign.id,
+            CampaignContact.status == 'pending',
+            db.or_(CampaignContact.next_attempt_at.is_(None), CampaignContact.next_attempt_at <= now)
+        ).order_by(CampaignContact.id).limit(calls).all()
+        if not due:
+            return 0
+        
+        taken = db.session.execute(
+            db.update(Campaign)
+            .where(Campaign.id == campaign.id,
+                   Campaign.dial_tokens_at.is_(None) if tokens_at is None else Campaign.dial_tokens_at == tokens_at)
+            .values(dial_tokens=available - len(due), dial_tokens_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        if not taken.rowcount:
+            db.session.rollback()  # Another process dialed this campaign meanwhile
+            return 0
+        
+        # Guarded claim: only contacts still pending are ours
+        claimed_ids = []
+        for (contact_id,) in due:
+            result = db.session.execute(
+                db.update(CampaignContact)
+                .where(CampaignContact.id == contact_id, CampaignContact.status == 'pending')
+                .values(status='dialing', attempts=db.func.coalesce(CampaignContact.attempts, 0) + 1, updated_at=now)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount:
+                claimed_ids.append(contact_id)
+        
+        # Claim before dialing so a restart never places the same attempt twice
+        db.session.commit()
+        if not claimed_ids:
+            return 0
+        claimed = CampaignContact.query.filter(CampaignContact.id.in_(claimed_ids)).order_by(CampaignContact.id).all()
+        
+        # Read everything the worker threads need while still on this thread's session
+        callback_url = campaign.status_callback_url
+        jobs = [
+            (contact.phone, render_campaign_twiml(campaign.message_template, contact.get_variables()))
+            for contact in claimed
+        ]
+        results = self._executor.map(
+            lambda job: self.twilio.make_outbound_call(
+                to_number=job[0], twiml=job[1], status_callback=callback_url
+            ),
+            jobs
+        )
+        
+        for contact, result in zip(claimed, results):
+            if result['success']:
+                contact.status = 'in_progress'
+                contact.call_sid = result['call_sid']
+                db.session.add(Call(
+                    session_id=result['call_sid'],
+                    caller_phone=self.twilio.phone_number,
+                    business_phone=contact.phone,
+                    call_status='initiated',
+                    start_time=now,
+                    direction='outbound'
+                ))
+            else:
+                contact.last_error = result.get('error')
+                self._resolve(contact, campaign, 'failed', now, retry=True)
+        
+        db.session.commit()
+        return len(claimed)
+    
+    @staticmethod
+    def _resolve(contact: CampaignContact, campaign: Campaign, outcome: str, now: datetime,
+                 retry: Optional[bool] = None):
+        """Record the outcome of an attempt, scheduling a retry with exponential backoff"""
+        if retry is None:
+            retry = outcome in RETRY_OUTCOMES
+        
+        if retry and contact.attempts < campaign.max_attempts:
+            delay = campaign.retry_delay_seconds * 2 ** (contact.attempts - 1)
+            contact.status = 'pending'
+            contact.next_attempt_at = now + timedelta(seconds=delay)
+        else:
+            contact.status = outcome
+        contact.updated_at = now
+    
+    @staticmethod
+    def _complete_if_done(campaign: Campaign, now: datetime):
+        """Mark a campaign completed once no contact is pending or in flight"""
+        remaining = db.session.query(CampaignContact.id).filter(
+            CampaignContact.campaign_id == campaign.id,
+            CampaignContact.status.in_(('pending',) + CampaignContact.ACTIVE_STATUSES)
+        ).first()
+        if remaining is None:
+            campaign.status = 'completed'
+            campaign.completed_at = now
+            db.session.commit()
+    
+    @staticmethod
+    def _budget(campaign: Campaign):
+        """Rate budget of a campaign as last stored: (tokens, updated at)"""
+        return db.session.query(Campaign.dial_tokens, Campaign.dial_tokens_at).filter(
+            Campaign.id == campaign.id
+        ).one()
+    
+    def start(self, app):
+        """Start background dialing for the given Flask app"""
+        if self.twilio.client is None:
+            logger.info("Twilio not configured; campaign dialer disabled")
+            return
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, args=(app,), name='campaign-dialer', daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        """Stop the background worker after its current round"""
+        self._stop.set()
+    
+    def _run(self, app):
+        """Worker loop: one dialing round per tick"""
+        with app.app_context():
+            while not self._stop.is_set():
+                try:
+                    self.tick()
+                except Exception as e:
+                    logger.error(f"Error dialing campaigns: {e}")
+                    db.session.rollback()
+                self._stop.wait(self.tick_seconds)
@@ -4,10 +4,10 @@ Handles CRM integration for lead management and customer data
 """
 
 import json
-import requests
 from typing import Dict, List, Optional, Any
 from datetime import datetime
 from src.models.call import BusinessConfig
+from src.services.metrics import TimedSession
 
 class CRMService:
     def __init__(self):
@@ -17,6 +17,8 @@ class CRMService:
         self.hubspot_api_key = None
         self.zoho_access_token = None
         
+        self.http = TimedSession('crm')  # Pooled connections, timed per request
+        
         # Load configuration from database
         self._load_config()
     
@@ -100,7 +102,7 @@ class CRMService:
                 'properties': properties
             }
             
-            response = requests.post(url, headers=headers, json=payload)
+            response = self.http.post(url, headers=headers, json=payload)
             
             if response.status_code == 201:
                 contact = response.json()
@@ -158,7 +160,7 @@ class CRMService:
                 'Content-Type': 'application/json'
             }
             
-            response = requests.post(url, headers=headers, json=lead_record)
+            response = self.http.post(url, headers=headers, json=lead_record)
             
             if response.status_code == 201:
                 result = response.json()
@@ -220,7 +222,7 @@ class CRMService:
                 'data': [lead_record]
             }
             
-            response = requests.post(url, headers=headers, json=payload)
+            response = self.http.post(url, headers=headers, json=payload)
             
             if response.status_code == 201:
                 result = response.json()
@@ -296,7 +298,7 @@ class CRMService:
                 'properties': properties
             }
             
-            response = requests.patch(url, headers=headers, json=payload)
+            response = self.http.patch(url, headers=headers, json=payload)
             
             return {
                 'success': response.status_code == 200,
@@ -325,7 +327,7 @@ class CRMService:
                 'Content-Type': 'application/json'
             }
             
-            response = requests.patch(url, headers=headers, json=update_record)
+            response = self.http.patch(url, headers=headers, json=update_record)
             
             return {
                 'success': response.status_code == 204,
@@ -358,7 +360,7 @@ class CRMService:
                 'data': [update_record]
             }
             
-            response = requests.put(url, headers=headers, json=payload)
+            response = self.http.put(url, headers=headers, json=payload)
             
             return {
                 'success': response.status_code == 200,
@@ -420,7 +422,7 @@ class CRMService:
                 'Content-Type': 'application/json'
             }
             
-            response = requests.get(url, headers=headers)
+            response = self.http.get(url, headers=headers)
             
             if response.status_code == 200:
                 contact = response.json()
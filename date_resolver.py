@@ -0,0 +1,179 @@
+"""
+Date Resolver
+Turns the dates, times and parts of day a caller asked for into concrete
+candidate intervals within business hours, and intersects them with open
+calendar slots to propose the nearest bookable appointments
+"""
+
+import re
+from bisect import bisect_left
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from src.services.entity_extractor import WEEKDAYS, business_now
+
+HORIZON_DAYS = 14  # Days searched when the caller gave no date
+PROPOSAL_LIMIT = 3  # Slots offered at a time
+
+# Part of day -> window of the day it covers, before clipping to business hours
+PART_OF_DAY_WINDOWS = {
+    'morning': (time(0, 0), time(12, 0)),
+    'afternoon': (time(12, 0), time(17, 0)),
+    'evening': (time(17, 0), time(23, 59)),
+}
+
+_DAY_NAME = r'(?:{})[a-z]*'.format('|'.join(day[:3] for day in WEEKDAYS))
+_CLOCK = r'\d{1,2}(?::\d{2})?\s*[ap]\.?m\.?'
+_HOURS_PATTERN = re.compile(
+    rf'(?P<first>{_DAY_NAME})(?:\s*(?:-|to|through)\s*(?P<last>{_DAY_NAME}))?'
+    rf'\s+(?P<open>{_CLOCK})\s*(?:-|to)\s*(?P<close>{_CLOCK})',
+    re.IGNORECASE
+)
+
+def _parse_clock(text: str) -> time:
+    match = re.match(r'(\d{1,2})(?::(\d{2}))?\s*([ap])', text.strip(), re.IGNORECASE)
+    hour = int(match.group(1)) % 12 + (12 if match.group(3).lower() == 'p' else 0)
+    return time(hour, int(match.group(2) or 0))
+
+def parse_business_hours(text: str) -> Dict[int, Tuple[time, time]]:
+    """
+    Parse business hours such as "Monday-Friday 9AM-6PM, Saturday 9AM-3PM"
+    
+    Args:
+        text: Business hours as configured
+    
+    Returns:
+        Weekday (Monday = 0) -> opening and closing time; closed days are absent
+    """
+    hours = {}
+    for match in _HOURS_PATTERN.finditer(text):
+        first = WEEKDAYS.index(next(day for day in WEEKDAYS if match.group('first').lower().startswith(day[:3])))
+        last = first
+        if match.group('last'):
+            last = WEEKDAYS.index(next(day for day in WEEKDAYS if match.group('last').lower().startswith(day[:3])))
+        for offset in range((last - first) % 7 + 1):
+            hours[(first + offset) % 7] = (_parse_clock(match.group('open')), _parse_clock(match.group('close')))
+    return hours
+
+class AvailabilityIndex:
+    """Sorted start times of open slots, searchable by interval"""
+    
+    def __init__(self, slots: Iterable[datetime]):
+        self._slots = sorted(slots)
+    
+    def __len__(self):
+        return len(self._slots)
+    
+    def __contains__(self, slot: datetime) -> bool:
+        index = bisect_left(self._slots, slot)
+        return index < len(self._slots) and self._slots[index] == slot
+    
+    def between(self, start: datetime, end: datetime) -> List[datetime]:
+        """Open slots starting at or after start and before end"""
+        return self._slots[bisect_left(self._slots, start):bisect_left(self._slots, end)]
+
+class DateResolver:
+    def __init__(self, business_hours: str, slot_minutes: int = 60, horizon_days: int = HORIZON_DAYS):
+        """
+        Initialize the resolver; business hours are parsed once here
+        
+        Args:
+            business_hours: Business hours, e.g. "Monday-Friday 9AM-6PM, Saturday 9AM-3PM"
+            slot_minutes: Appointment length
+            horizon_days: Days searched when no date was given, or none was open
+        """
+        self.hours = parse_business_hours(business_hours)
+        self.slot = timedelta(minutes=slot_minutes)
+        self.horizon = timedelta(days=horizon_days)
+        
+        # (weekday, part of day or None) -> window clipped to that day's hours, None if closed then
+        self._windows = {}
+        for weekday, (opens, closes) in self.hours.items():
+            self._windows[weekday, None] = (opens, closes)
+            for part, (start, end) in PART_OF_DAY_WINDOWS.items():
+                start, end = max(start, opens), min(end, closes)
+                self._windows[weekday, part] = (start, end) if start < end else None
+    
+    def candidates(self, preferred_date=None, preferred_time=None,
+                   now: Optional[datetime] = None) -> List[Tuple[datetime, datetime]]:
+        """
+        Intervals within business hours matching what the caller asked for
+        
+        Args:
+            preferred_date: date, or None for any day within the horizon
+            preferred_time: time, a part of day ('morning', 'afternoon',
+                'evening'), or None for any time
+            now: Current business time (default: business_now()); nothing earlier is a candidate
+        
+        Returns:
+            (start, end) intervals that slots may start in, in chronological
+            order. An exact time yields the business hours of its day, as
+            slots are then ranked by how close they are to it.
+        """
+        return list(self._intervals(preferred_date, preferred_time, now or business_now()))
+    
+    def _intervals(self, preferred_date, preferred_time, now: datetime) -> Iterator[Tuple[datetime, datetime]]:
+        part = preferred_time if preferred_time in PART_OF_DAY_WINDOWS else None
+        if isinstance(preferred_date, date):
+            days = [preferred_date]
+        else:
+            days = (now.date() + timedelta(days=offset) for offset in range(self.horizon.days))
+        
+        for day in days:
+            window = self._windows.get((day.weekday(), part))
+            if window is None:
+                continue
+            start = max(datetime.combine(day, window[0]), now)
+            end = datetime.combine(day, window[1])
+            if start < end:
+                yield start, end
+    
+    def propose(self, availability: AvailabilityIndex, preferred_date=None, preferred_time=None,
+                now: Optional[datetime] = None, limit: int = PROPOSAL_LIMIT) -> List[datetime]:
+        """
+        Nearest open slots for what the caller asked for
+        
+        Slots inside the candidate intervals come first, earliest day first
+        and, if an exact time was given, closest to it within the day. If
+        none are open, the earliest slots from the requested day on are
+        offered instead.
+        
+        Args:
+            availability: Open slots to choose from
+            preferred_date: See candidates()
+            preferred_time: See candidates()
+            now: Current time
+            limit: Most slots to return
+        
+        Returns:
+            Slot start times, best first; empty if nothing is open within the horizon
+        """
+        now = now or business_now()
+        
+        # Intervals are generated lazily, so a vague request stops at the first days with openings
+        slots = []
+        for start, end in self._intervals(preferred_date, preferred_time, now):
+            day_slots = [slot for slot in availability.between(start, end) if self._fits(slot)]
+            if isinstance(preferred_time, time):
+                requested = datetime.combine(start.date(), preferred_time)
+                day_slots.sort(key=lambda slot: abs(slot - requested))
+            slots.extend(day_slots)
+            if len(slots) >= limit:
+                break
+        if slots:
+            return slots[:limit]
+        
+        # Nothing open as asked: offer the next openings from the requested day on
+        if isinstance(preferred_date, date):
+            start = max(datetime.combine(preferred_date, time(0, 0)), now)
+        else:
+            start = now
+        return [slot for slot in availability.between(start, start + self.horizon) if self._fits(slot)][:limit]
+    
+    def is_open(self, availability: AvailabilityIndex, requested: datetime) -> bool:
+        """Whether the exact slot is open and within business hours"""
+        return self._fits(requested) and requested in availability
+    
+    def _fits(self, slot: datetime) -> bool:
+        """Whether an appointment starting at slot ends by closing time"""
+        hours = self.hours.get(slot.weekday())
+        return hours is not None and hours[0] <= slot.time() and slot + self.slot <= datetime.combine(slot.date(), hours[1])
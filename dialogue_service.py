@@ -5,19 +5,39 @@ Manages conversation flow, context, and determines appropriate responses
 
 import json
 import uuid
-from typing import Dict, List, Optional, Any
-from datetime import datetime, timedelta
-from openai import OpenAI
-from src.services.nlu_service import NLUService
+import logging
+from typing import Dict, List, Optional, Any, Tuple
+from datetime import date, datetime, time, timedelta
+from flask import has_app_context
+from src.services.registry import openai_client, async_openai_client, nlu_service, OPENAI_TIMEOUT_SECONDS
+from src.services.tracing import tracer
+from src.services.entity_extractor import business_now, entities_to_json, json_value, spoken_value
+from src.services.date_resolver import AvailabilityIndex, DateResolver
+from src.services.calendar_service import CalendarService
+from src.services.tenants import Tenant, tenant_registry
+from src.services.prompt_builder import PromptHistory, prompt_builder
+
+logger = logging.getLogger(__name__)
+
+AVAILABILITY_SECONDS = 30  # How long a tenant's open calendar slots are reused
+
+# Reply when the AI could not be reached
+COMPLEX_QUERY_FALLBACK = "I apologize, but I'm having trouble understanding your request. Could you please rephrase it or let me know how I can help you?"
+
+def _build_date_resolver(tenant: Tenant) -> DateResolver:
+    """Business hours are parsed once per tenant configuration, so resolving a request takes microseconds"""
+    return DateResolver(tenant.config['business_hours'], int(tenant.config['appointment_duration']))
 
 class DialogueState:
     """Represents the current state of a conversation"""
     
-    def __init__(self, session_id: str):
+    def __init__(self, session_id: str, tenant: Optional[str] = None):
         self.session_id = session_id
+        self.tenant = tenant  # Dialed number of the business the conversation is with
         self.current_intent = None
         self.context = {}
         self.conversation_history = []
+        self.prompt_history = PromptHistory()  # The same turns as chat messages for reply requests
         self.user_info = {}
         self.appointment_details = {}
         self.last_activity = datetime.now()
@@ -32,6 +52,7 @@ class DialogueState:
             'intent': intent
         }
         self.conversation_history.append(turn)
+        self.prompt_history.add_turn(user_input, bot_response)
         self.last_activity = datetime.now()
     
     def update_context(self, key: str, value: Any):
@@ -45,43 +66,40 @@ class DialogueState:
 class DialogueService:
     def __init__(self):
         """Initialize the Dialogue Service"""
-        self.client = OpenAI()
-        self.nlu_service = NLUService()
+        # Shared with the other services; only sessions are per conversation
+        self.client = openai_client
+        self.async_client = async_openai_client  # The running event loop's
+        self.nlu_service = nlu_service
         self.active_sessions = {}  # Store active conversation sessions
-        
-        # Business configuration (should be configurable per client)
-        self.business_config = {
-            'name': 'Your Business Name',
-            'hours': 'Monday-Friday 9AM-6PM, Saturday 9AM-3PM',
-            'address': '123 Main Street, City, State 12345',
-            'phone': '(555) 123-4567',
-            'email': 'info@yourbusiness.com',
-            'services': ['Consultation', 'Treatment', 'Follow-up'],
-            'booking_slots': self._generate_available_slots()
-        }
+        self._slots = []
+        self._slots_date = None
     
-    def process_message(self, user_input: str, session_id: str = None) -> Dict[str, Any]:
+    @property
+    def booking_slots(self) -> List[str]:
+        """Available appointment slots for the coming week, regenerated once a day"""
+        today = business_now().date()
+        if self._slots_date != today:
+            self._slots = self._generate_available_slots()
+            self._slots_date = today
+        return self._slots
+    
+    def process_message(self, user_input: str, session_id: str = None, tenant: Optional[str] = None) -> Dict[str, Any]:
         """
         Process a user message and generate appropriate response
         
         Args:
             user_input: User's message
             session_id: Optional session ID for conversation continuity
+            tenant: Dialed number of the business; only needed on the first
+                message of a session, which keeps it
         
         Returns:
             Dictionary containing response and session information
         """
-        # Create or get session
-        if not session_id:
-            session_id = str(uuid.uuid4())
-        
-        if session_id not in self.active_sessions:
-            self.active_sessions[session_id] = DialogueState(session_id)
-        
-        session = self.active_sessions[session_id]
+        session, business = self._get_session(session_id, tenant)
         
         # Analyze user input
-        nlu_result = self.nlu_service.analyze_intent(user_input)
+        nlu_result = self.nlu_service.analyze_intent(user_input, business)
         intent = nlu_result['intent']
         entities = nlu_result['entities']
         
@@ -89,34 +107,91 @@ class DialogueService:
         session.current_intent = intent
         
         # Generate response based on intent and current state
-        response = self._generate_response(session, intent, entities, user_input)
+        with tracer.span('dialogue.response', intent=intent):
+            response = self._generate_response(session, business, intent, entities, user_input)
+            if response is None:
+                response = self._handle_complex_query(session, business, user_input)
+        
+        return self._finish_turn(session, user_input, intent, entities, response)
+    
+    async def process_message_async(self, user_input: str, session_id: str = None, tenant: Optional[str] = None,
+                                    timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Process a user message without blocking the event loop
+        
+        Like process_message, for the async media path and async servers:
+        the OpenAI requests (intent fallback, AI reply) are awaited, everything
+        else runs inline. Cancelling the awaiting task aborts the request in
+        flight and leaves the session without the turn.
         
+        Args:
+            user_input: User's message
+            session_id: Optional session ID for conversation continuity
+            tenant: Dialed number of the business, for a new session
+            timeout: Seconds to wait for each OpenAI request (default OPENAI_TIMEOUT_SECONDS)
+        
+        Returns:
+            Dictionary containing response and session information
+        """
+        session, business = self._get_session(session_id, tenant)
+        
+        nlu_result = await self.nlu_service.analyze_intent_async(user_input, business, timeout)
+        intent = nlu_result['intent']
+        entities = nlu_result['entities']
+        session.current_intent = intent
+        
+        with tracer.span('dialogue.response', intent=intent):
+            response = self._generate_response(session, business, intent, entities, user_input)
+            if response is None:
+                response = await self._handle_complex_query_async(session, business, user_input, timeout)
+        
+        return self._finish_turn(session, user_input, intent, entities, response)
+    
+    def _get_session(self, session_id: Optional[str], tenant: Optional[str]) -> Tuple[DialogueState, Tenant]:
+        """Session of a message, created on its first, and the tenant it is with"""
+        # Create or get session
+        if not session_id:
+            session_id = str(uuid.uuid4())
+        
+        if session_id not in self.active_sessions:
+            self.active_sessions[session_id] = DialogueState(session_id, tenant)
+        
+        session = self.active_sessions[session_id]
+        return session, tenant_registry.get(session.tenant)
+    
+    def _finish_turn(self, session: DialogueState, user_input: str, intent: str, entities: Dict,
+                     response: Dict[str, Any]) -> Dict[str, Any]:
+        """Record the turn in the session and describe it to the caller"""
         # Add turn to conversation history
         session.add_turn(user_input, response['message'], intent)
         
         return {
-            'session_id': session_id,
+            'session_id': session.session_id,
+            'tenant': session.tenant,
             'response': response['message'],
             'intent': intent,
-            'entities': entities,
+            'entities': entities_to_json(entities),
             'state': session.state,
             'requires_action': response.get('requires_action', False),
             'action_type': response.get('action_type', None),
             'action_data': response.get('action_data', {})
         }
     
-    def _generate_response(self, session: DialogueState, intent: str, entities: Dict, user_input: str) -> Dict[str, Any]:
+    def _generate_response(self, session: DialogueState, business: Tenant, intent: str, entities: Dict,
+                           user_input: str) -> Optional[Dict[str, Any]]:
         """
         Generate appropriate response based on intent and session state
         
         Args:
             session: Current dialogue session
+            business: Tenant the session is with
             intent: Detected intent
             entities: Extracted entities
             user_input: Original user input
         
         Returns:
-            Dictionary containing response message and any required actions
+            Dictionary containing response message and any required actions,
+            or None if the query needs an AI reply (see _handle_complex_query)
         """
         response = {
             'message': '',
@@ -124,44 +199,29 @@ class DialogueService:
             'action_type': None,
             'action_data': {}
         }
+        templates = self.nlu_service.tenant_language(business).templates
         
-        if intent == 'greeting':
-            response['message'] = f"Hello! Thank you for calling {self.business_config['name']}. How can I help you today?"
-            session.state = 'initial'
-        
-        elif intent == 'appointment_booking':
-            response = self._handle_appointment_booking(session, entities, user_input)
+        if intent == 'appointment_booking':
+            response = self._handle_appointment_booking(session, business, entities, user_input)
         
         elif intent == 'appointment_cancel':
             response = self._handle_appointment_cancellation(session, entities, user_input)
         
-        elif intent == 'business_hours':
-            response['message'] = f"Our business hours are {self.business_config['hours']}. Is there anything else I can help you with?"
-        
-        elif intent == 'location':
-            response['message'] = f"We're located at {self.business_config['address']}. Would you like me to provide directions or any other information?"
-        
-        elif intent == 'services':
-            services_list = ', '.join(self.business_config['services'])
-            response['message'] = f"We offer the following services: {services_list}. Would you like more information about any specific service or would you like to schedule an appointment?"
-        
-        elif intent == 'pricing':
-            response['message'] = "Our pricing varies depending on the specific service you're interested in. Could you tell me which service you'd like to know about, and I'll provide you with detailed pricing information?"
-        
-        elif intent == 'contact':
-            response['message'] = f"You can reach us at {self.business_config['phone']} or email us at {self.business_config['email']}. Is there anything specific you'd like to know or discuss?"
-        
-        elif intent == 'goodbye':
-            response['message'] = f"Thank you for calling {self.business_config['name']}! Have a wonderful day, and we look forward to serving you soon."
-            session.state = 'completed'
+        elif intent != 'unknown' and intent in templates:
+            # Built-in and custom intents answered from the business's reply templates
+            response['message'] = templates[intent]
+            if intent == 'greeting':
+                session.state = 'initial'
+            elif intent == 'goodbye':
+                session.state = 'completed'
         
         else:
-            # Handle unknown intent or use AI for complex responses
-            response = self._handle_complex_query(session, user_input)
+            # Unknown intent or custom intent without a reply: the AI answers
+            return None
         
         return response
     
-    def _handle_appointment_booking(self, session: DialogueState, entities: Dict, user_input: str) -> Dict[str, Any]:
+    def _handle_appointment_booking(self, session: DialogueState, business: Tenant, entities: Dict, user_input: str) -> Dict[str, Any]:
         """Handle appointment booking conversation flow"""
         response = {
             'message': '',
@@ -171,7 +231,7 @@ class DialogueService:
         }
         
         # Extract appointment details from entities
-        appointment_details = self.nlu_service.extract_appointment_details(user_input)
+        appointment_details = self.nlu_service.extract_appointment_details(user_input, business)
         
         # Update session with any new information
         for key, value in appointment_details.items():
@@ -206,7 +266,7 @@ class DialogueService:
             elif 'phone number' in missing_info:
                 response['message'] = f"Thank you, {session.user_info.get('name', '')}. Could you please provide your phone number?"
             elif 'service type' in missing_info:
-                services_list = ', '.join(self.business_config['services'])
+                services_list = ', '.join(business.business_config['services'])
                 response['message'] = f"What type of service would you like to schedule? We offer: {services_list}."
             elif 'preferred date' in missing_info:
                 response['message'] = "What date would you prefer for your appointment? I can check our availability."
@@ -215,11 +275,77 @@ class DialogueService:
             
             session.state = 'collecting_info'
         else:
-            # All information collected, confirm appointment
-            response = self._confirm_appointment(session)
+            # All information collected: confirm if the slot is open, else offer the nearest open ones
+            response = self._resolve_slot(session, business) or self._confirm_appointment(session)
         
         return response
     
+    def _resolve_slot(self, session: DialogueState, business: Tenant) -> Optional[Dict[str, Any]]:
+        """
+        Check the requested date and time against open calendar slots
+        
+        Returns:
+            None if the exact slot requested is open, otherwise a response
+            offering the nearest open slots
+        """
+        preferred_date = session.appointment_details.get('preferred_date')
+        preferred_time = session.appointment_details.get('preferred_time')
+        date_resolver = business.derived('date_resolver', _build_date_resolver)
+        availability = self._availability(business, date_resolver)
+        
+        if isinstance(preferred_date, date) and isinstance(preferred_time, time):
+            requested = datetime.combine(preferred_date, preferred_time)
+            if date_resolver.is_open(availability, requested):
+                return None
+            opening = f"I'm sorry, {spoken_value(preferred_date)} at {spoken_value(preferred_time)} isn't available."
+        else:
+            opening = "Let me check our availability."
+        
+        proposals = date_resolver.propose(availability, preferred_date, preferred_time)
+        
+        # Ask again for the time; a date shared by every proposal is kept
+        session.appointment_details['preferred_time'] = None
+        if len({slot.date() for slot in proposals}) == 1:
+            session.appointment_details['preferred_date'] = proposals[0].date()
+        session.context['proposed_slots'] = [slot.isoformat() for slot in proposals]
+        session.state = 'offering_slots'
+        
+        if not proposals:
+            return {
+                'message': f"{opening} We don't have any openings around then. Is there another day that would work for you?",
+                'requires_action': False,
+                'action_type': 'appointment_booking',
+                'action_data': {}
+            }
+        
+        options = ', '.join(f"{spoken_value(slot.date())} at {spoken_value(slot.time())}" for slot in proposals)
+        return {
+            'message': f"{opening} The nearest openings are {options}. Which would you prefer?",
+            'requires_action': False,
+            'action_type': 'appointment_booking',
+            'action_data': {'proposed_slots': session.context['proposed_slots']}
+        }
+    
+    def _availability(self, business: Tenant, date_resolver: DateResolver) -> AvailabilityIndex:
+        """
+        Open slots over the resolver's horizon: the tenant's calendar when the
+        database is at hand, else the generated slots
+        
+        The calendar's index is cached per tenant for AVAILABILITY_SECONDS.
+        """
+        if has_app_context():
+            def load(tenant):
+                today = business_now().date()
+                return CalendarService().get_availability_index(
+                    today, today + date_resolver.horizon, int(tenant.config['appointment_duration']), tenant=tenant.number
+                )
+            
+            try:
+                return business.derived('availability', load, max_age=AVAILABILITY_SECONDS)
+            except Exception as e:
+                logger.error(f"Error loading calendar availability: {e}")
+        return AvailabilityIndex(datetime.strptime(slot, "%Y-%m-%d %H:%M") for slot in self.booking_slots)
+    
     def _handle_appointment_cancellation(self, session: DialogueState, entities: Dict, user_input: str) -> Dict[str, Any]:
         """Handle appointment cancellation"""
         response = {
@@ -247,8 +373,8 @@ class DialogueService:
         name = session.user_info.get('name', '')
         phone = session.user_info.get('phone', '')
         service = session.appointment_details.get('service_type', '')
-        date = session.appointment_details.get('preferred_date', '')
-        time = session.appointment_details.get('preferred_time', '')
+        appointment_date = session.appointment_details.get('preferred_date', '')
+        appointment_time = session.appointment_details.get('preferred_time', '')
         
         confirmation_message = f"""
         Perfect! Let me confirm your appointment details:
@@ -256,8 +382,8 @@ class DialogueService:
         Name: {name}
         Phone: {phone}
         Service: {service}
-        Date: {date}
-        Time: {time}
+        Date: {spoken_value(appointment_date)}
+        Time: {spoken_value(appointment_time)}
         
         Is this information correct? If yes, I'll book this appointment for you.
         """
@@ -272,37 +398,50 @@ class DialogueService:
                 'name': name,
                 'phone': phone,
                 'service': service,
-                'date': date,
-                'time': time
+                'date': json_value(appointment_date),
+                'time': json_value(appointment_time)
             }
         }
     
-    def _handle_complex_query(self, session: DialogueState, user_input: str) -> Dict[str, Any]:
-        """Handle complex queries using AI"""
+    def _handle_complex_query(self, session: DialogueState, business: Tenant, user_input: str) -> Dict[str, Any]:
+        """Handle complex queries using AI, with the business's cached system message and the recent conversation"""
         try:
-            # Create context from business config and conversation history
-            context = f"""
-            You are an AI receptionist for {self.business_config['name']}.
-            Business hours: {self.business_config['hours']}
-            Location: {self.business_config['address']}
-            Phone: {self.business_config['phone']}
-            Email: {self.business_config['email']}
-            Services: {', '.join(self.business_config['services'])}
-            
-            Recent conversation:
-            {self._get_recent_conversation(session)}
+            messages = prompt_builder.build(business, session.prompt_history, user_input)
             
-            Customer query: {user_input}
+            with tracer.span('openai.chat', service='openai', purpose='reply'):
+                response = self.client.chat.completions.create(
+                    model="gpt-3.5-turbo",
+                    messages=messages,
+                    max_tokens=200,
+                    temperature=0.7
+                )
             
-            Provide a helpful, professional response as a receptionist would.
-            """
+            return {
+                'message': response.choices[0].message.content.strip(),
+                'requires_action': False
+            }
+        
+        except Exception as e:
+            logger.error(f"Error in complex query handling: {e}")
+            return {
+                'message': COMPLEX_QUERY_FALLBACK,
+                'requires_action': False
+            }
+    
+    async def _handle_complex_query_async(self, session: DialogueState, business: Tenant, user_input: str,
+                                          timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Async _handle_complex_query; timeout is in seconds (default OPENAI_TIMEOUT_SECONDS)"""
+        try:
+            messages = prompt_builder.build(business, session.prompt_history, user_input)
             
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": context}],
-                max_tokens=200,
-                temperature=0.7
-            )
+            with tracer.span('openai.chat', service='openai', purpose='reply'):
+                response = await self.async_client.chat.completions.create(
+                    model="gpt-3.5-turbo",
+                    messages=messages,
+                    max_tokens=200,
+                    temperature=0.7,
+                    timeout=timeout or OPENAI_TIMEOUT_SECONDS
+                )
             
             return {
                 'message': response.choices[0].message.content.strip(),
@@ -310,24 +449,16 @@ class DialogueService:
             }
         
         except Exception as e:
-            print(f"Error in complex query handling: {str(e)}")
+            logger.error(f"Error in complex query handling: {e}")
             return {
-                'message': "I apologize, but I'm having trouble understanding your request. Could you please rephrase it or let me know how I can help you?",
+                'message': COMPLEX_QUERY_FALLBACK,
                 'requires_action': False
             }
     
-    def _get_recent_conversation(self, session: DialogueState, num_turns: int = 3) -> str:
-        """Get recent conversation history as string"""
-        recent_turns = session.conversation_history[-num_turns:]
-        conversation_text = ""
-        for turn in recent_turns:
-            conversation_text += f"User: {turn['user_input']}\nBot: {turn['bot_response']}\n"
-        return conversation_text
-    
     def _generate_available_slots(self) -> List[str]:
         """Generate available appointment slots (mock implementation)"""
         slots = []
-        base_date = datetime.now() + timedelta(days=1)
+        base_date = business_now() + timedelta(days=1)
         
         for day in range(7):  # Next 7 days
             current_date = base_date + timedelta(days=day)
@@ -344,6 +475,7 @@ class DialogueService:
             session = self.active_sessions[session_id]
             return {
                 'session_id': session_id,
+                'tenant': session.tenant,
                 'state': session.state,
                 'current_intent': session.current_intent,
                 'user_info': session.user_info,
@@ -353,6 +485,10 @@ class DialogueService:
             }
         return None
     
+    def end_session(self, session_id: str):
+        """Forget a finished conversation"""
+        self.active_sessions.pop(session_id, None)
+    
     def cleanup_old_sessions(self, max_age_hours: int = 24):
         """Remove old inactive sessions"""
         cutoff_time = datetime.now() - timedelta(hours=max_age_hours)
@@ -0,0 +1,262 @@
+"""
+Entity Extractor
+Single-pass extraction of dates, times, names, phone numbers and email
+addresses from caller utterances, normalized to typed values
+"""
+
+import os
+import re
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+BUSINESS_TIMEZONE = os.getenv('BUSINESS_TIMEZONE', 'UTC')  # Appointments are booked in its wall-clock time
+CACHE_SIZE = 1024  # Utterances whose entities are kept
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+MONTHS = ['january', 'february', 'march', 'april', 'may', 'june', 'july', 'august',
+          'september', 'october', 'november', 'december']
+RELATIVE_DAYS = {'yesterday': -1, 'today': 0, 'tomorrow': 1}
+NAMED_TIMES = {'noon': time(12, 0), 'midday': time(12, 0)}
+PARTS_OF_DAY = ['morning', 'afternoon', 'evening']
+
+# Words that end a name ("my name is Jo and ...") or show "I'm ..." is not one
+NAME_STOPWORDS = [
+    'a', 'an', 'and', 'the', 'my', 'me', 'at', 'on', 'in', 'from', 'with', 'for', 'to', 'of', 'but',
+    'or', 'so', 'just', 'not', 'here', 'phone', 'number', 'email', 'calling', 'looking', 'trying',
+    'wondering', 'interested', 'sorry', 'fine', 'good', 'great', 'ok', 'okay', 'available', 'free',
+    'going', 'having', 'wanting', 'hoping', 'also', 'still', 'very', 'really', 'please', 'thanks',
+]
+
+_BUSINESS_ZONE = ZoneInfo(BUSINESS_TIMEZONE)
+
+# Afternoon is assumed for clock times without am/pm before this hour, e.g. "at 3:30"
+ASSUME_PM_BEFORE_HOUR = 8
+
+def _name_pattern(first_word: str) -> str:
+    not_stopword = r"(?!(?:{})\b)".format('|'.join(NAME_STOPWORDS))
+    return rf"{not_stopword}{first_word}(?:\s+{not_stopword}[A-Za-z][A-Za-z'\-]*){{0,3}}"
+
+# One alternative per entity form; the first alternative matching at a position wins
+_ENTITY_PATTERN = re.compile('|'.join([
+    r"(?P<email>\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b)",
+    r"(?P<slash_date>\b(?P<sd_month>\d{1,2})/(?P<sd_day>\d{1,2})/(?P<sd_year>\d{4})\b)",
+    r"(?P<phone>(?<![\w+])(?:\+?1[-.\s]?)?(?:\(\d{3}\)\s*|\d{3}[-.\s]?)\d{3}[-.\s]?\d{4}\b)",
+    r"(?P<clock>\b(?P<c_hour>\d{1,2}):(?P<c_minute>[0-5]\d)\s*(?P<c_meridiem>[ap]\.?m\.?)?(?!\w))",
+    r"(?P<hour>\b(?P<h_hour>\d{1,2})\s*(?P<h_meridiem>[ap]\.?m\.?)(?!\w))",
+    r"(?P<named_time>\b(?:{})\b)".format('|'.join(NAMED_TIMES)),
+    r"(?P<part_of_day>\b(?:{})\b)".format('|'.join(PARTS_OF_DAY)),
+    r"(?P<relative_day>\b(?:{})\b)".format('|'.join(RELATIVE_DAYS)),
+    r"(?P<weekday>\b(?P<w_next>next\s+)?(?P<w_day>{})\b)".format('|'.join(WEEKDAYS)),
+    r"(?P<month_day>\b(?P<md_month>{})\s+(?P<md_day>\d{{1,2}})(?:st|nd|rd|th)?\b)".format('|'.join(MONTHS)),
+    r"(?P<ordinal_day>\bthe\s+(?P<od_day>\d{1,2})(?:st|nd|rd|th)\b)",
+    r"(?P<name>\bmy\s+name\s+is\s+(?P<n_name>{}))".format(_name_pattern(r"[A-Za-z][A-Za-z'\-]*")),
+    r"(?P<intro>\b(?:i'm|i\s+am|this\s+is)\s+(?P<i_name>{}))".format(_name_pattern(r"(?-i:[A-Z])[A-Za-z'\-]*")),
+]), re.IGNORECASE)
+
+class Entity:
+    """An extracted entity with its normalized value and where it was found"""
+    __slots__ = ('type', 'value', 'text', 'start', 'end')
+    
+    def __init__(self, type: str, value: Any, text: str, start: int, end: int):
+        self.type = type
+        self.value = value
+        self.text = text
+        self.start = start
+        self.end = end
+    
+    def to_dict(self):
+        """Convert entity to dictionary"""
+        return {
+            'type': self.type,
+            'value': json_value(self.value),
+            'text': self.text,
+            'start': self.start,
+            'end': self.end
+        }
+    
+    def __repr__(self):
+        return f'<Entity {self.type}={self.value!r} [{self.start}:{self.end}]>'
+
+def business_now() -> datetime:
+    """
+    Current time in the business timezone, naive like the appointment dates
+    and times it is compared with
+    
+    The one clock for "today", open slots and reminder times, so they agree
+    whatever timezone the server runs in.
+    """
+    return datetime.now(_BUSINESS_ZONE).replace(tzinfo=None)
+
+def json_value(value):
+    """ISO 8601 string for dates and times, the value itself otherwise"""
+    return value.isoformat() if isinstance(value, (date, time)) else value
+
+def spoken_value(value) -> str:
+    """Dates and times as a receptionist would read them back, e.g. Tuesday, October 20 at 3:30 PM"""
+    if isinstance(value, date):
+        return f"{value:%A, %B} {value.day}"
+    if isinstance(value, time):
+        return f"{value.hour % 12 or 12}:{value:%M %p}"
+    return str(value)
+
+class EntityExtractor:
+    def __init__(self, timezone: str = BUSINESS_TIMEZONE):
+        """
+        Initialize the extractor
+        
+        Args:
+            timezone: Business timezone that relative dates ("tomorrow") are resolved in
+        """
+        self.timezone = ZoneInfo(timezone)
+        self._extract = lru_cache(maxsize=CACHE_SIZE)(self._scan)
+    
+    def today(self) -> date:
+        """Current date in the business timezone"""
+        return datetime.now(self.timezone).date()
+    
+    def extract(self, text: str, today: Optional[date] = None) -> Tuple[Entity, ...]:
+        """
+        Extract entities in order of appearance
+        
+        Results are memoized per utterance and day, so the NLU and dialogue
+        steps of a turn share one scan.
+        
+        Args:
+            text: Caller utterance
+            today: Date relative expressions are resolved against (default:
+                today in the business timezone)
+        """
+        return self._extract(text, today or self.today())
+    
+    def _scan(self, text: str, today: date) -> Tuple[Entity, ...]:
+        entities = []
+        for match in _ENTITY_PATTERN.finditer(text):
+            # Inner groups close before their alternative's group, so lastgroup names the alternative
+            normalized = _NORMALIZERS[match.lastgroup](match, today)
+            if normalized is None:
+                continue
+            entity_type, value, start, end = normalized
+            entities.append(Entity(entity_type, value, text[start:end], start, end))
+        return tuple(entities)
+
+def _hour_24(hour: int, meridiem: Optional[str]) -> Optional[int]:
+    if meridiem:
+        if not 1 <= hour <= 12:
+            return None
+        return hour % 12 + (12 if meridiem[0].lower() == 'p' else 0)
+    if hour > 23:
+        return None
+    return hour + 12 if 1 <= hour < ASSUME_PM_BEFORE_HOUR else hour
+
+def _clock(match, today):
+    hour = _hour_24(int(match.group('c_hour')), match.group('c_meridiem'))
+    if hour is None:
+        return None
+    return 'time', time(hour, int(match.group('c_minute'))), match.start('clock'), match.end('clock')
+
+def _hour(match, today):
+    hour = _hour_24(int(match.group('h_hour')), match.group('h_meridiem'))
+    if hour is None:
+        return None
+    return 'time', time(hour, 0), match.start('hour'), match.end('hour')
+
+def _named_time(match, today):
+    return 'time', NAMED_TIMES[match.group('named_time').lower()], match.start(), match.end()
+
+def _part_of_day(match, today):
+    return 'part_of_day', match.group('part_of_day').lower(), match.start(), match.end()
+
+def _relative_day(match, today):
+    offset = RELATIVE_DAYS[match.group('relative_day').lower()]
+    return 'date', today + timedelta(days=offset), match.start(), match.end()
+
+def _weekday(match, today):
+    weekday = WEEKDAYS.index(match.group('w_day').lower())
+    days_ahead = (weekday - today.weekday()) % 7
+    if match.group('w_next') and days_ahead == 0:
+        days_ahead = 7
+    return 'date', today + timedelta(days=days_ahead), match.start(), match.end()
+
+def _calendar_date(year: int, month: int, day: int) -> Optional[date]:
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+def _slash_date(match, today):
+    value = _calendar_date(int(match.group('sd_year')), int(match.group('sd_month')), int(match.group('sd_day')))
+    return value and ('date', value, match.start(), match.end())
+
+def _month_day(match, today):
+    """Month and day without a year: the next such date, today included"""
+    month = MONTHS.index(match.group('md_month').lower()) + 1
+    day = int(match.group('md_day'))
+    value = _calendar_date(today.year, month, day)
+    if value and value < today:
+        value = _calendar_date(today.year + 1, month, day)
+    return value and ('date', value, match.start(), match.end())
+
+def _ordinal_day(match, today):
+    """Day of the month alone ("the 3rd"): its next occurrence, today included"""
+    day = int(match.group('od_day'))
+    year, month = today.year, today.month
+    for _ in range(12):
+        value = _calendar_date(year, month, day)
+        if value and value >= today:
+            return 'date', value, match.start(), match.end()
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return None
+
+def _phone(match, today):
+    """E.164, assuming the North American numbering plan for national numbers"""
+    digits = re.sub(r'\D', '', match.group('phone'))
+    if len(digits) == 10:
+        digits = '1' + digits
+    if len(digits) != 11 or not digits.startswith('1'):
+        return None
+    return 'phone', '+' + digits, match.start(), match.end()
+
+def _email(match, today):
+    return 'email', match.group('email').lower(), match.start(), match.end()
+
+def _clean_name(name: str) -> str:
+    return ' '.join(word[:1].upper() + word[1:].lower() for word in name.split())
+
+def _name(match, today):
+    return 'name', _clean_name(match.group('n_name')), match.start('n_name'), match.end('n_name')
+
+def _intro(match, today):
+    return 'name', _clean_name(match.group('i_name')), match.start('i_name'), match.end('i_name')
+
+# Alternative group -> function returning (type, value, start, end), or None to drop the match
+_NORMALIZERS = {
+    'email': _email,
+    'slash_date': _slash_date,
+    'phone': _phone,
+    'clock': _clock,
+    'hour': _hour,
+    'named_time': _named_time,
+    'part_of_day': _part_of_day,
+    'relative_day': _relative_day,
+    'weekday': _weekday,
+    'month_day': _month_day,
+    'ordinal_day': _ordinal_day,
+    'name': _name,
+    'intro': _intro,
+}
+
+def entities_by_type(entities) -> Dict[str, List[Any]]:
+    """Group entity values by type, in order of appearance"""
+    grouped = {}
+    for entity in entities:
+        grouped.setdefault(entity.type, []).append(entity.value)
+    return grouped
+
+def entities_to_json(entities: Dict[str, List[Any]]) -> Dict[str, List[Any]]:
+    """Grouped entities with dates and times as ISO 8601 strings, for API responses"""
+    return {entity_type: [json_value(value) for value in values] for entity_type, values in entities.items()}
+
+# Process-wide extractor shared by the NLU service
+entity_extractor = EntityExtractor()
@@ -0,0 +1,130 @@
+"""
+Event Bus Service
+In-process publish/subscribe fan-out for live call lifecycle events
+"""
+
+import json
+import threading
+import itertools
+from collections import deque
+from datetime import datetime
+from typing import Dict, Optional, Any
+
+class Subscription:
+    """A subscriber's bounded event buffer; the oldest events are dropped when full"""
+    
+    def __init__(self, bus: 'EventBus', tenant: Optional[str] = None, max_buffer: int = 100):
+        self.bus = bus
+        self.tenant = tenant
+        self.buffer = deque(maxlen=max_buffer)
+        self.dropped = 0
+        self.closed = False
+        self._condition = threading.Condition()
+    
+    def deliver(self, event: Dict[str, Any]):
+        """Queue an event for this subscriber without ever blocking the publisher"""
+        with self._condition:
+            if len(self.buffer) == self.buffer.maxlen:
+                self.dropped += 1
+            self.buffer.append(event)
+            self._condition.notify()
+    
+    def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Wait for the next event
+        
+        Args:
+            timeout: Seconds to wait before giving up
+        
+        Returns:
+            The next event, or None on timeout or after close
+        """
+        with self._condition:
+            if not self.buffer and not self.closed:
+                self._condition.wait(timeout)
+            if self.buffer:
+                return self.buffer.popleft()
+            return None
+    
+    def close(self):
+        """Stop receiving events and wake any waiting reader"""
+        self.bus.unsubscribe(self)
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+
+class EventBus:
+    def __init__(self):
+        """Initialize an empty bus"""
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+    
+    def subscribe(self, tenant: Optional[str] = None, max_buffer: int = 100) -> Subscription:
+        """
+        Register a new subscriber
+        
+        Args:
+            tenant: Only receive events for this tenant (business phone number);
+                None receives events for every tenant
+            max_buffer: Events kept for a slow reader before the oldest are dropped
+        
+        Returns:
+            Subscription to read events from
+        """
+        subscription = Subscription(self, tenant, max_buffer)
+        with self._lock:
+            # Copy-on-write so publishers can iterate without holding the lock
+            self._subscribers = self._subscribers + [subscription]
+        return subscription
+    
+    def unsubscribe(self, subscription: Subscription):
+        """Remove a subscriber"""
+        with self._lock:
+            self._subscribers = [s for s in self._subscribers if s is not subscription]
+    
+    def publish(self, event_type: str, data: Dict[str, Any], tenant: Optional[str] = None):
+        """
+        Send an event to every matching subscriber
+        
+        The payload is serialized once and shared by all subscribers; with no
+        subscribers connected publishing costs a single attribute read.
+        
+        Args:
+            event_type: Event name, e.g. 'call.incoming'
+            data: JSON-serializable event payload
+            tenant: Tenant the event belongs to
+        """
+        subscribers = self._subscribers
+        if not subscribers:
+            return
+        
+        event = {
+            'id': next(self._ids),
+            'type': event_type,
+            'payload': json.dumps({
+                'type': event_type,
+                'tenant': tenant,
+                'timestamp': datetime.utcnow().isoformat(),
+                'data': data
+            }, default=str)
+        }
+        
+        for subscription in subscribers:
+            if subscription.tenant is None or subscription.tenant == tenant:
+                subscription.deliver(event)
+    
+    def subscriber_count(self) -> int:
+        """Number of connected subscribers"""
+        return len(self._subscribers)
+    
+    def buffered_count(self) -> int:
+        """Events waiting in subscriber buffers"""
+        return sum(len(subscription.buffer) for subscription in self._subscribers)
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """Format a bus event as a server-sent event frame"""
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {event['payload']}\n\n"
+
+# Process-wide bus shared by the phone and voice blueprints
+call_events = EventBus()
@@ -0,0 +1,425 @@
+"""
+Load Test Harness for AI Voice Receptionist
+Replays scripted conversations at N concurrent calls against local stand-ins
+for the OpenAI REST and Realtime APIs, and reports throughput, turn latency
+percentiles and error rates as JSON
+
+Scenarios:
+    text_chat       POST /api/voice/text-chat, one request per caller turn
+    process_call    POST /api/voice/process-call with an audio upload per turn
+    media_stream    Twilio voice webhook, then a simulated Twilio media stream
+                    bridged to the Realtime API stand-in in 20 ms frames
+
+Usage:
+    python loadtest.py                                   # every scenario, 10 concurrent calls
+    python loadtest.py text_chat --concurrency 50        # one scenario
+    python loadtest.py --latency-scale 0 --output baseline.json
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import base64
+import asyncio
+import logging
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Add the src directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+# Seconds each stand-in waits before answering; scaled by --latency-scale
+LATENCIES = {
+    'chat': 0.25,           # Chat completion
+    'transcription': 0.3,   # Whisper transcription
+    'speech': 0.15,         # Time to the first byte of synthesized speech
+    'speech_chunk': 0.01,   # Between streamed speech chunks
+    'realtime': 0.3,        # End of caller speech to the first Realtime audio delta
+}
+
+SPEECH_CHUNKS = 8           # Chunks of synthesized speech per reply
+SPEECH_CHUNK_BYTES = 4096
+REALTIME_AUDIO_DELTAS = 10  # Audio deltas per Realtime reply
+FRAME_SECONDS = 0.02        # Twilio sends 20 ms mu-law frames
+SPEECH_FRAMES = 25          # Frames of caller speech per utterance
+REPLY_TIMEOUT = 10.0        # Seconds a simulated caller waits for a reply
+
+# Caller turns of each scripted conversation; call i replays SCRIPTS[i % len(SCRIPTS)]
+SCRIPTS = [
+    ["Hi there", "What are your business hours?", "Where are you located?", "Thanks, goodbye"],
+    ["Hello", "I'd like to book an appointment", "Tomorrow at 2pm would be great",
+     "My name is Jordan Smith", "Yes, that works", "Bye"],
+    ["Good morning", "What services do you offer?", "How much does a consultation cost?",
+     "Can I talk to someone about insurance coverage for a referral?", "Thank you"],
+    ["Hey", "I need to cancel my appointment", "It was for Friday", "Goodbye"],
+]
+
+INTENT_REPLY = "intent: unknown\nconfidence: 0.4"
+CHAT_REPLY = "Thanks for your question. A member of our team will follow up with the details shortly."
+
+def _percentile(values, percentile):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percentile / 100))]
+
+class _StandInHTTPServer(ThreadingHTTPServer):
+    request_queue_size = 1024  # Every simulated call may connect at once; the default backlog of 5 drops SYNs
+    daemon_threads = True
+
+class FakeOpenAIServer:
+    """Stand-in for the OpenAI REST API: chat completions, transcriptions and streamed speech"""
+    
+    def __init__(self, latencies):
+        self.latencies = latencies
+        self.requests = 0
+        server = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            
+            def do_POST(self):
+                server.requests += 1
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if self.path.endswith('/chat/completions'):
+                    server.chat(self, json.loads(body))
+                elif self.path.endswith('/audio/transcriptions'):
+                    server.transcription(self, body)
+                elif self.path.endswith('/audio/speech'):
+                    server.speech(self)
+                else:
+                    server.send_json(self, 404, {'error': {'message': f'Unknown path {self.path}'}})
+            
+            def log_message(self, *args):
+                pass
+        
+        self.httpd = _StandInHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.httpd.server_port}/v1'
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+    
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+    
+    @staticmethod
+    def send_json(handler, status, body):
+        payload = json.dumps(body).encode()
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(payload)))
+        handler.end_headers()
+        handler.wfile.write(payload)
+    
+    def chat(self, handler, request):
+        time.sleep(self.latencies['chat'])
+        prompt = request['messages'][-1]['content']
+        content = INTENT_REPLY if 'determine the intent' in prompt else CHAT_REPLY
+        self.send_json(handler, 200, {
+            'id': 'chatcmpl-loadtest', 'object': 'chat.completion', 'created': int(time.time()),
+            'model': request.get('model', 'gpt-3.5-turbo'),
+            'choices': [{'index': 0, 'finish_reason': 'stop',
+                         'message': {'role': 'assistant', 'content': content}}],
+            'usage': {'prompt_tokens': len(prompt) // 4, 'completion_tokens': len(content) // 4,
+                      'total_tokens': (len(prompt) + len(content)) // 4}
+        })
+    
+    def transcription(self, handler, body):
+        """Answer with the utterance the load generator embedded in the uploaded audio"""
+        time.sleep(self.latencies['transcription'])
+        match = re.search(rb'UTTERANCE:(.*?)\x00', body)
+        text = match.group(1).decode() if match else ''
+        self.send_json(handler, 200, {'text': text})
+    
+    def speech(self, handler):
+        time.sleep(self.latencies['speech'])
+        handler.send_response(200)
+        handler.send_header('Content-Type', 'audio/mpeg')
+        handler.send_header('Content-Length', str(SPEECH_CHUNKS * SPEECH_CHUNK_BYTES))
+        handler.end_headers()
+        for _ in range(SPEECH_CHUNKS):
+            handler.wfile.write(b'\x7f' * SPEECH_CHUNK_BYTES)
+            handler.wfile.flush()
+            time.sleep(self.latencies['speech_chunk'])
+
+class FakeRealtimeServer:
+    """
+    Stand-in for the OpenAI Realtime API
+    
+    Caller speech is any non-silent audio; the first silent frame after it
+    ends the utterance (like server-side voice activity detection) and is
+    answered with a transcript, audio deltas and the reply transcript.
+    """
+    
+    def __init__(self, latencies):
+        from websockets.asyncio.server import serve
+        
+        self.latencies = latencies
+        self.loop = asyncio.new_event_loop()
+        ready = threading.Event()
+        
+        async def start():
+            self.server = await serve(self.handle, '127.0.0.1', 0)
+            ready.set()
+        
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+        asyncio.run_coroutine_threadsafe(start(), self.loop)
+        ready.wait()
+        port = self.server.sockets[0].getsockname()[1]
+        self.url = f'ws://127.0.0.1:{port}/v1/realtime'
+    
+    def close(self):
+        self.loop.call_soon_threadsafe(self.server.close)
+    
+    async def handle(self, ws):
+        await ws.send(json.dumps({'type': 'session.created', 'session': {'id': 'sess_loadtest'}}))
+        speaking = False
+        turn = 0
+        async for raw in ws:
+            event = json.loads(raw)
+            if event.get('type') == 'session.update':
+                await ws.send(json.dumps({'type': 'session.updated'}))
+            elif event.get('type') == 'input_audio_buffer.append':
+                silent = base64.b64decode(event['audio']).strip(b'\xff') == b''
+                if not silent:
+                    speaking = True
+                elif speaking:
+                    speaking = False
+                    turn += 1
+                    asyncio.ensure_future(self.reply(ws, turn))
+    
+    async def reply(self, ws, turn):
+        await asyncio.sleep(self.latencies['realtime'])
+        try:
+            await ws.send(json.dumps({'type': 'conversation.item.input_audio_transcription.completed',
+                                      'transcript': f'Caller utterance {turn}'}))
+            delta = base64.b64encode(b'\x7f' * 160).decode('ascii')
+            for _ in range(REALTIME_AUDIO_DELTAS):
+                await ws.send(json.dumps({'type': 'response.audio.delta', 'delta': delta}))
+            await ws.send(json.dumps({'type': 'response.audio_transcript.done', 'transcript': CHAT_REPLY}))
+            await ws.send(json.dumps({'type': 'response.done'}))
+        except Exception:
+            pass  # The call hung up first
+
+class SimulatedTwilioStream:
+    """
+    Twilio's side of a media stream: paced caller frames in, the assistant's audio out
+    
+    Each utterance is SPEECH_FRAMES of speech followed by silence until the
+    first reply frame arrives; the turn latency is the time from the end of
+    the caller's speech to that frame.
+    """
+    
+    def __init__(self, call_sid, utterances):
+        self.call_sid = call_sid
+        self.stream_sid = f'MZ{call_sid[2:]}'
+        self.latencies = []
+        self._messages = self._script(len(utterances))
+        self._speech_ended_at = None
+        self._replied = None
+    
+    def _frame(self, payload):
+        return json.dumps({'event': 'media', 'streamSid': self.stream_sid,
+                           'media': {'payload': base64.b64encode(payload).decode('ascii')}})
+    
+    def _script(self, turns):
+        """Messages Twilio would send, paced in real time"""
+        speech, silence = self._frame(b'\x00' * 160), self._frame(b'\xff' * 160)
+        yield json.dumps({'event': 'connected', 'protocol': 'Call', 'version': '1.0.0'})
+        yield json.dumps({'event': 'start', 'streamSid': self.stream_sid,
+                          'start': {'streamSid': self.stream_sid, 'callSid': self.call_sid}})
+        for _ in range(turns):
+            for _ in range(SPEECH_FRAMES):
+                yield speech
+            
+            self._replied = asyncio.Event()
+            self._speech_ended_at = time.perf_counter()
+            while not self._replied.is_set():
+                if time.perf_counter() - self._speech_ended_at > REPLY_TIMEOUT:
+                    self._speech_ended_at = None
+                    break
+                yield silence
+        yield json.dumps({'event': 'stop', 'streamSid': self.stream_sid})
+    
+    async def receive(self):
+        await asyncio.sleep(FRAME_SECONDS)
+        return next(self._messages, None)
+    
+    def send(self, message):
+        """Audio from the app; the first frame after the caller stops speaking ends the turn"""
+        if self._speech_ended_at is not None and json.loads(message).get('event') == 'media':
+            self.latencies.append(time.perf_counter() - self._speech_ended_at)
+            self._speech_ended_at = None
+            self._replied.set()
+
+class LoadTest:
+    def __init__(self, concurrency=10, calls=None, latency_scale=1.0):
+        """
+        Start the stand-in servers and the app under test
+        
+        Args:
+            concurrency: Calls in progress at once
+            calls: Conversations replayed per scenario (default 2 x concurrency)
+            latency_scale: Multiplier of LATENCIES; 0 measures the app alone
+        """
+        import requests
+        from werkzeug.serving import make_server
+        
+        self.concurrency = concurrency
+        self.calls = calls or 2 * concurrency
+        self.latencies = {name: seconds * latency_scale for name, seconds in LATENCIES.items()}
+        
+        self.openai = FakeOpenAIServer(self.latencies)
+        self.realtime = FakeRealtimeServer(self.latencies)
+        os.environ['OPENAI_API_KEY'] = 'sk-loadtest'
+        os.environ['OPENAI_BASE_URL'] = self.openai.url
+        os.environ['OPENAI_REALTIME_URL'] = self.realtime.url
+        
+        from main import create_app
+        self.app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tempfile.mkdtemp()}/loadtest.db",
+            'TESTING': True
+        })
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+        self.server = make_server('127.0.0.1', 0, self.app, threaded=True)
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        
+        self._local = threading.local()
+        self._requests = requests
+    
+    def close(self):
+        self.server.shutdown()
+        self.openai.close()
+        self.realtime.close()
+    
+    @property
+    def http(self):
+        """Per-thread session, so each simulated caller keeps its connection"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = self._requests.Session()
+        return session
+    
+    def run(self, scenario):
+        """
+        Replay the scripted conversations of one scenario
+        
+        Returns:
+            Calls, turns, errors, error_rate, duration_seconds, turns_per_second
+            and turn latency percentiles in milliseconds
+        """
+        call = getattr(self, f'_call_{scenario}')
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            results = list(pool.map(lambda i: call(i, SCRIPTS[i % len(SCRIPTS)]), range(self.calls)))
+        duration = time.perf_counter() - start
+        
+        latencies = [seconds * 1000 for latencies, _ in results for seconds in latencies]
+        errors = sum(errors for _, errors in results)
+        turns = len(latencies) + errors
+        return {
+            'calls': self.calls,
+            'concurrency': self.concurrency,
+            'turns': turns,
+            'errors': errors,
+            'error_rate': round(errors / turns, 4) if turns else 0.0,
+            'duration_seconds': round(duration, 3),
+            'turns_per_second': round(len(latencies) / duration, 2),
+            'latency_ms': {f'p{p}': round(_percentile(latencies, p), 2) if latencies else None
+                           for p in (50, 95, 99)}
+        }
+    
+    def _turns(self, utterances, send):
+        """Time each turn of a conversation; send returns whether the turn succeeded"""
+        latencies, errors = [], 0
+        for text in utterances:
+            start = time.perf_counter()
+            try:
+                ok = send(text)
+            except Exception:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+        return latencies, errors
+    
+    def _call_text_chat(self, index, utterances):
+        session = {}
+        
+        def send(text):
+            response = self.http.post(f'{self.url}/api/voice/text-chat',
+                                      json={'message': text, **session})
+            if response.status_code != 200:
+                return False
+            session['session_id'] = response.json()['session_id']
+            return True
+        
+        return self._turns(utterances, send)
+    
+    def _call_process_call(self, index, utterances):
+        session = {}
+        
+        def send(text):
+            # A WAV header with the script line embedded for the transcription stand-in
+            audio = b'RIFF\x24\x00\x00\x00WAVEfmt ' + b'UTTERANCE:' + text.encode() + b'\x00' + b'\x00' * 3200
+            response = self.http.post(f'{self.url}/api/voice/process-call', data=session,
+                                      files={'audio': ('utterance.wav', audio, 'audio/wav')})
+            if response.status_code != 200:
+                return False
+            session['session_id'] = response.json()['session_id']
+            return True
+        
+        return self._turns(utterances, send)
+    
+    def _call_media_stream(self, index, utterances):
+        from src.routes.phone_api import run_media_stream
+        
+        call_sid = f'CA{index:032d}'
+        response = self.http.post(f'{self.url}/api/phone/webhook/voice', data={
+            'CallSid': call_sid, 'From': f'+1555{index:07d}', 'To': '+15551234567', 'CallStatus': 'ringing'
+        })
+        if response.status_code != 200:
+            return [], len(utterances)
+        
+        stream = SimulatedTwilioStream(call_sid, utterances)
+        with self.app.app_context():
+            asyncio.run(run_media_stream(call_sid, stream))
+        return stream.latencies, len(utterances) - len(stream.latencies)
+
+SCENARIOS = ['text_chat', 'process_call', 'media_stream']
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('scenarios', nargs='*', help=f'Scenarios to run: {", ".join(SCENARIOS)} (default: all)')
+    parser.add_argument('--concurrency', type=int, default=10, help='Calls in progress at once')
+    parser.add_argument('--calls', type=int, help='Conversations per scenario (default: 2 x concurrency)')
+    parser.add_argument('--latency-scale', type=float, default=1.0, help='Multiplier of the stand-in latencies')
+    parser.add_argument('--output', help='Also write the report to this JSON file')
+    args = parser.parse_args()
+    for scenario in args.scenarios:
+        if scenario not in SCENARIOS:
+            parser.error(f'unknown scenario {scenario!r}')
+    
+    load_test = LoadTest(args.concurrency, args.calls, args.latency_scale)
+    try:
+        report = {
+            'config': {'concurrency': load_test.concurrency, 'calls': load_test.calls,
+                       'latencies_seconds': load_test.latencies},
+            'scenarios': {scenario: load_test.run(scenario) for scenario in args.scenarios or SCENARIOS}
+        }
+    finally:
+        load_test.close()
+    
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,6 @@
 import os
 import sys
+import threading
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
@@ -9,70 +10,160 @@ load_dotenv()
 
 from flask import Flask, send_from_directory
 from flask_cors import CORS
+from werkzeug.exceptions import NotFound
 from src.models.user import db
-from src.models.call import Call, Appointment, BusinessConfig
+from src.models.call import Call, CallTurn, CallRecording, Appointment, BusinessConfig
+from src.models.rollup import CallRollup, IntentRollup
+from src.models.campaign import Campaign, CampaignContact
+from src.models.reminder import AppointmentReminder
+from src.models.migrations import apply_migrations
 from src.routes.user import user_bp
 from src.routes.voice_api import voice_bp
-from src.routes.phone_api import phone_bp
+from src.routes.phone_api import phone_bp, call_log_sync
+from src.routes.analytics_api import analytics_bp
+from src.routes.campaign_api import campaign_bp, campaign_dialer
+from src.routes.metrics_api import metrics_bp
+from src.services.reminder_scheduler import reminder_scheduler
+from src.services.static_assets import StaticAssets
+from src.services.metrics import metrics_store
 
-app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
-app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
+DEFAULT_CONFIGS = [
+    ('business_name', 'Your Business Name', 'Name of the business'),
+    ('business_hours', 'Monday-Friday 9AM-6PM, Saturday 9AM-3PM', 'Business operating hours'),
+    ('business_address', '123 Main Street, City, State 12345', 'Business address'),
+    ('business_phone', '(555) 123-4567', 'Business phone number'),
+    ('business_email', 'info@yourbusiness.com', 'Business email address'),
+    ('services', 'Consultation,Treatment,Follow-up', 'Available services (comma-separated)'),
+    ('default_voice', 'alloy', 'Default TTS voice'),
+    ('appointment_duration', '60', 'Default appointment duration in minutes'),
+    ('twilio_account_sid', '', 'Twilio Account SID'),
+    ('twilio_auth_token', '', 'Twilio Auth Token'),
+    ('twilio_phone_number', '', 'Twilio Phone Number'),
+    ('openai_api_key', '', 'OpenAI API Key for Realtime API')
+]
 
-# Enable CORS for all routes
-CORS(app)
-
-# Database configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
-
-# Register blueprints
-app.register_blueprint(user_bp, url_prefix='/api')
-app.register_blueprint(voice_bp, url_prefix='/api/voice')
-app.register_blueprint(phone_bp, url_prefix='/api/phone')
-
-with app.app_context():
+def init_database():
+    """Create tables, apply migrations and seed the default business configuration"""
     db.create_all()
+    apply_migrations()
     
-    # Initialize default business configuration
     if not BusinessConfig.query.filter_by(key='business_name').first():
-        default_configs = [
-            ('business_name', 'Your Business Name', 'Name of the business'),
-            ('business_hours', 'Monday-Friday 9AM-6PM, Saturday 9AM-3PM', 'Business operating hours'),
-            ('business_address', '123 Main Street, City, State 12345', 'Business address'),
-            ('business_phone', '(555) 123-4567', 'Business phone number'),
-            ('business_email', 'info@yourbusiness.com', 'Business email address'),
-            ('services', 'Consultation,Treatment,Follow-up', 'Available services (comma-separated)'),
-            ('default_voice', 'alloy', 'Default TTS voice'),
-            ('appointment_duration', '60', 'Default appointment duration in minutes'),
-            ('twilio_account_sid', '', 'Twilio Account SID'),
-            ('twilio_auth_token', '', 'Twilio Auth Token'),
-            ('twilio_phone_number', '', 'Twilio Phone Number'),
-            ('openai_api_key', '', 'OpenAI API Key for Realtime API')
-        ]
-        
-        for key, value, description in default_configs:
+        for key, value, description in DEFAULT_CONFIGS:
             config = BusinessConfig(key=key, value=value, description=description)
             db.session.add(config)
         
         db.session.commit()
 
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
-def serve(path):
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
-            return "Static folder not configured", 404
+def start_background_services(app):
+    """
+    Start this process's background workers
+    
+    Called on the first request of every process rather than at startup, so
+    with gunicorn --preload each forked worker runs its own threads instead of
+    the master holding threads that never reach the workers.
+    """
+    # Mirror Twilio call logs into the local database in the background
+    call_log_sync.start(app)
+    
+    # Dial scheduled outbound campaigns in the background
+    campaign_dialer.start(app)
+    
+    # Send appointment confirmations and reminders as they come due
+    reminder_scheduler.start(app)
+    
+    # Publish this worker's metrics for whichever worker serves /metrics
+    metrics_store.start(app)
 
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
-        else:
+def create_app(config=None):
+    """
+    Application factory
+    
+    Services (OpenAI, Twilio) are built lazily on first use; see
+    src.services.registry.
+    
+    Args:
+        config: Optional settings applied over the defaults, e.g. a test database URI
+            or STATIC_FOLDER for the dashboard build
+    
+    Returns:
+        Flask application with its database initialized
+    """
+    config = config or {}
+    static_folder = config.get('STATIC_FOLDER') or os.path.join(os.path.dirname(__file__), 'static')
+    app = Flask(__name__, static_folder=static_folder)
+    app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
+    
+    # Enable CORS for all routes
+    CORS(app)
+    
+    # Database configuration
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config.update(config)
+    db.init_app(app)
+    
+    # Register blueprints
+    app.register_blueprint(user_bp, url_prefix='/api')
+    app.register_blueprint(voice_bp, url_prefix='/api/voice')
+    app.register_blueprint(phone_bp, url_prefix='/api/phone')
+    app.register_blueprint(analytics_bp, url_prefix='/api/analytics')
+    app.register_blueprint(campaign_bp, url_prefix='/api/campaigns')
+    app.register_blueprint(metrics_bp)
+    
+    with app.app_context():
+        init_database()
+        
+        # Don't hand pooled connections to forked workers (an in-memory
+        # database only lives as long as its connection, so keep that one)
+        if db.engine.url.database not in (None, '', ':memory:'):
+            db.engine.dispose()
+    
+    started = set()  # Process ids whose background services are running
+    started_lock = threading.Lock()
+    
+    @app.before_request
+    def start_process_services():
+        if os.getpid() in started or app.testing:
+            return
+        with started_lock:
+            if os.getpid() not in started:
+                started.add(os.getpid())
+                start_background_services(app)
+    
+    # Dashboard files are read into memory once, with compressed variants
+    static_assets = StaticAssets(app.static_folder)
+    
+    @app.route('/', defaults={'path': ''})
+    @app.route('/<path:path>')
+    def serve(path):
+        static_folder_path = app.static_folder
+        if static_folder_path is None:
+            return "Static folder not configured", 404
+        
+        asset = static_assets.get(path) if path else None
+        if asset is None and path:
+            # Files written after startup (e.g. generated audio) or too large to cache
+            try:
+                return send_from_directory(static_folder_path, path)
+            except NotFound:
+                pass
+        
+        # Unknown paths are client-side routes of the dashboard
+        asset = asset or static_assets.get('index.html')
+        if asset is None:
             return "index.html not found", 404
+        return static_assets.respond(asset)
+    
+    return app
+
+def __getattr__(name):
+    """Build the default app on first access to main.app (gunicorn main:app, tests)"""
+    if name == 'app':
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    create_app().run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,490 @@
+"""
+Metrics
+Prometheus counters, gauges and histograms for the voice stack. Updates go
+to per-thread shards without taking a lock; with METRICS_DIR set, every
+worker process also writes its totals to a file there, so whichever gunicorn
+worker answers /metrics reports the whole server
+"""
+
+import os
+import glob
+import json
+import time
+import bisect
+import logging
+import threading
+import weakref
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import requests
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+FLUSH_SECONDS = 5.0  # How stale another worker's numbers may be on /metrics
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_metrics = []  # Every metric of this process, in exposition order
+
+class _ShardOwner:
+    """Thread-local handle of a shard; collected, and its shard retired, when the thread exits"""
+    __slots__ = ('shard', '__weakref__')
+    
+    def __init__(self, shard: Dict):
+        self.shard = shard
+
+class Metric:
+    """A named metric with a fixed set of label names"""
+    type = 'untyped'
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        """
+        Create and register a metric
+        
+        Args:
+            name: Metric name, including the _total suffix for counters
+            documentation: HELP text
+            labelnames: Names of the labels every sample must have
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards = {}  # id -> {label values: value} dict of each live thread that updated the metric
+        self._retired = {}  # Totals of exited threads' shards
+        self._shards_lock = threading.Lock()
+        self._functions = []
+        _metrics.append(self)
+    
+    def _shard(self) -> Dict:
+        """This thread's shard; only the owning thread ever writes to it"""
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            owner = self._local.owner = _ShardOwner(shard)
+            with self._shards_lock:
+                self._shards[id(shard)] = shard
+            # Thread-per-request servers start threads endlessly; fold each one's counts away as it exits
+            weakref.finalize(owner, self._retire, shard)
+        return shard
+    
+    def _retire(self, shard: Dict):
+        """Fold an exited thread's shard into the retired totals"""
+        with self._shards_lock:
+            if self._shards.pop(id(shard), None) is None:
+                return
+            for key, value in shard.items():
+                self._retired[key] = self._merge(self._retired.get(key), value)
+    
+    def _key(self, labels: Dict) -> Tuple[str, ...]:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+    
+    def add_function(self, function: Callable):
+        """
+        Add samples computed when the metric is collected
+        
+        Args:
+            function: Returns a number for a metric without labels, otherwise
+                a dict of label value tuples to numbers
+        """
+        self._functions.append(function)
+    
+    def collect(self) -> Dict[Tuple[str, ...], object]:
+        """Current values of this process, by label values"""
+        # Under the lock, so a shard being retired is counted exactly once
+        with self._shards_lock:
+            values = {key: self._merge(None, value) for key, value in self._retired.items()}
+            for shard in self._shards.values():
+                for key, value in shard.copy().items():
+                    values[key] = self._merge(values.get(key), value)
+        
+        for function in self._functions:
+            try:
+                samples = function()
+            except Exception as e:
+                logger.debug(f"Could not collect {self.name}: {e}")
+                continue
+            if not isinstance(samples, dict):
+                samples = {(): samples}
+            for key, value in samples.items():
+                values[key] = self._merge(values.get(key), value)
+        return values
+    
+    @staticmethod
+    def _merge(total, value):
+        return value if total is None else total + value
+    
+    def reset(self):
+        """Forget every recorded value"""
+        with self._shards_lock:
+            for shard in self._shards.values():
+                shard.clear()
+            self._retired.clear()
+
+class _Child:
+    """A counter with its label values bound, for hot paths"""
+    __slots__ = ('metric', 'key')
+    
+    def __init__(self, metric: 'Counter', key: Tuple[str, ...]):
+        self.metric = metric
+        self.key = key
+    
+    def inc(self, amount: float = 1):
+        shard = self.metric._shard()
+        shard[self.key] = shard.get(self.key, 0) + amount
+
+class Counter(Metric):
+    """Monotonically increasing count; summed across worker processes"""
+    type = 'counter'
+    
+    def inc(self, amount: float = 1, **labels):
+        shard = self._shard()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0) + amount
+    
+    def labels(self, **labels) -> _Child:
+        """Counter with these label values bound"""
+        return _Child(self, self._key(labels))
+
+class Gauge(Metric):
+    """Value that goes up and down"""
+    type = 'gauge'
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 multiprocess_mode: str = 'livesum'):
+        """
+        Args:
+            multiprocess_mode: 'livesum' adds up the values of live worker
+                processes (per-process state such as open calls), 'max' takes
+                the largest (state shared by every worker, such as database queues)
+        """
+        super().__init__(name, documentation, labelnames)
+        self.multiprocess_mode = multiprocess_mode
+        self._values = {}
+        self._lock = threading.Lock()
+    
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+    
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+    
+    def collect(self):
+        values = super().collect()
+        for key, value in self._values.copy().items():
+            values[key] = self._merge(values.get(key), value)
+        return values
+    
+    def reset(self):
+        super().reset()
+        self._values.clear()
+
+class Histogram(Metric):
+    """Distribution of observed values in fixed buckets; summed across worker processes"""
+    type = 'histogram'
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        """
+        Args:
+            buckets: Upper bounds of the buckets, ascending; +Inf is implied
+        """
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+    
+    def observe(self, value: float, **labels):
+        shard = self._shard()
+        key = self._key(labels)
+        counts = shard.get(key)
+        if counts is None:
+            # Per-bucket counts (the last one is +Inf), then the sum
+            counts = shard[key] = [0] * (len(self.buckets) + 2)
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+    
+    def time(self, **labels) -> 'Timer':
+        """Context manager observing the seconds spent in its block"""
+        return Timer(lambda seconds: self.observe(seconds, **labels))
+    
+    @staticmethod
+    def _merge(total, value):
+        if total is None:
+            return list(value)
+        return [a + b for a, b in zip(total, value)]
+
+class Timer:
+    """Times a block and hands the elapsed seconds to a callback"""
+    __slots__ = ('callback', 'started')
+    
+    def __init__(self, callback: Callable[[float], None]):
+        self.callback = callback
+        self.started = None
+    
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.callback(time.perf_counter() - self.started)
+
+# Global metrics
+active_calls = Gauge('voice_active_calls', 'Media stream calls in progress')
+dialogue_sessions = Gauge('voice_dialogue_sessions', 'Open dialogue sessions')
+turn_stage_seconds = Histogram(
+    'voice_turn_stage_seconds', 'Time spent in each stage of a conversational turn', ['stage'])
+turn_stage_errors = Counter(
+    'voice_turn_stage_errors_total', 'Turn stages that raised an exception', ['stage'])
+external_request_seconds = Histogram(
+    'voice_external_request_seconds',
+    'Latency of requests to OpenAI, Twilio, CRM and calendar APIs (until response headers)',
+    ['service', 'operation'])
+external_requests = Counter(
+    'voice_external_requests_total', 'Requests to external APIs by outcome',
+    ['service', 'operation', 'outcome'])
+cache_requests = Counter('voice_cache_requests_total', 'Cache lookups by result', ['cache', 'result'])
+media_frames = Counter('voice_media_frames_total', 'Media stream audio frames', ['direction'])
+queue_depth = Gauge('voice_queue_depth', 'Items buffered in in-process queues', ['queue'])
+backlog = Gauge('voice_backlog_items', 'Work waiting in database-backed queues', ['backlog'],
+                multiprocess_mode='max')
+
+class ExternalCall:
+    """
+    Context manager recording one request to an external API
+    
+    The request counts as an error if its block raises or status() is given
+    an HTTP error code.
+    """
+    __slots__ = ('service', 'operation', 'outcome', 'started')
+    
+    def __init__(self, service: str, operation: str):
+        self.service = service
+        self.operation = operation
+        self.outcome = 'ok'
+        self.started = None
+    
+    def status(self, status_code: int):
+        """Record the HTTP status of the response"""
+        if status_code >= 400:
+            self.outcome = 'error'
+    
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.outcome = 'error'
+        external_request_seconds.observe(time.perf_counter() - self.started,
+                                         service=self.service, operation=self.operation)
+        external_requests.inc(service=self.service, operation=self.operation, outcome=self.outcome)
+
+class TimedSession(requests.Session):
+    """requests session recording every request as an external request of one service"""
+    
+    def __init__(self, service: str):
+        super().__init__()
+        self.service = service
+    
+    def request(self, method, url, *args, **kwargs):
+        with ExternalCall(self.service, method.upper()) as call:
+            response = super().request(method, url, *args, **kwargs)
+            call.status(response.status_code)
+        return response
+
+class TimedTransport:
+    """httpx transport wrapper (sync or async) recording every request, by URL path, as an external request"""
+    
+    def __init__(self, service: str, transport):
+        self.service = service
+        self.transport = transport
+    
+    def handle_request(self, request):
+        with ExternalCall(self.service, request.url.path) as call:
+            response = self.transport.handle_request(request)
+            call.status(response.status_code)
+        return response
+    
+    async def handle_async_request(self, request):
+        with ExternalCall(self.service, request.url.path) as call:
+            response = await self.transport.handle_async_request(request)
+            call.status(response.status_code)
+        return response
+    
+    def close(self):
+        self.transport.close()
+    
+    async def aclose(self):
+        await self.transport.aclose()
+    
+    def __enter__(self):
+        self.transport.__enter__()
+        return self
+    
+    def __exit__(self, *args):
+        self.transport.__exit__(*args)
+    
+    async def __aenter__(self):
+        await self.transport.__aenter__()
+        return self
+    
+    async def __aexit__(self, *args):
+        await self.transport.__aexit__(*args)
+
+def observe_turn(trace):
+    """Record the stage durations of a finished turn (a tracer listener)"""
+    if trace.duration_ms is not None:
+        turn_stage_seconds.observe(trace.duration_ms / 1000, stage='turn')
+    for span in trace.spans:
+        if span.duration_ms is not None:
+            turn_stage_seconds.observe(span.duration_ms / 1000, stage=span.name)
+        if 'error' in span.attrs:
+            turn_stage_errors.inc(stage=span.name)
+
+class MetricsStore:
+    def __init__(self, directory: Optional[str] = None):
+        """
+        Initialize the store
+        
+        Args:
+            directory: Folder shared by the worker processes of one server;
+                None keeps metrics per process. It should be emptied before
+                the server starts, as counters of exited workers are kept.
+        """
+        self.directory = directory
+        self._thread = None
+    
+    def snapshot(self) -> Dict[str, List]:
+        """This process's samples: metric name -> [[label values, value], ...]"""
+        return {metric.name: [[list(key), value] for key, value in metric.collect().items()]
+                for metric in _metrics}
+    
+    def write(self):
+        """Publish this process's samples for the other workers"""
+        if not self.directory:
+            return
+        path = os.path.join(self.directory, f'metrics-{os.getpid()}.json')
+        temp_path = f'{path}.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump({'pid': os.getpid(), 'metrics': self.snapshot()}, f)
+        os.replace(temp_path, path)
+    
+    def gather(self) -> Dict[str, Dict[Tuple[str, ...], object]]:
+        """
+        Samples of every worker process, merged
+        
+        This process contributes its live values. Gauges of processes that
+        have exited are dropped; their counters and histograms are kept so
+        totals never go backwards.
+        """
+        snapshots = [(True, self.snapshot())]
+        if self.directory:
+            for path in glob.glob(os.path.join(self.directory, 'metrics-*.json')):
+                try:
+                    with open(path) as f:
+                        data = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                if data['pid'] != os.getpid():
+                    snapshots.append((_is_alive(data['pid']), data['metrics']))
+        
+        merged = {}
+        for metric in _metrics:
+            values = {}
+            for alive, snapshot in snapshots:
+                if metric.type == 'gauge' and not alive:
+                    continue
+                for key, value in snapshot.get(metric.name, ()):
+                    key = tuple(key)
+                    if key not in values:
+                        values[key] = list(value) if isinstance(value, list) else value
+                    elif metric.type == 'gauge' and metric.multiprocess_mode == 'max':
+                        values[key] = max(values[key], value)
+                    else:
+                        values[key] = metric._merge(values[key], value)
+            merged[metric.name] = values
+        return merged
+    
+    def render(self) -> str:
+        """Prometheus text exposition of the merged samples"""
+        merged = self.gather()
+        lines = []
+        for metric in _metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for key, value in sorted(merged[metric.name].items()):
+                labels = list(zip(metric.labelnames, key))
+                if metric.type != 'histogram':
+                    lines.append(f'{metric.name}{_format_labels(labels)} {_format_value(value)}')
+                    continue
+                
+                cumulative = 0
+                for bound, count in zip(metric.buckets + (float('inf'),), value):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(float(bound))
+                    lines.append(f'{metric.name}_bucket{_format_labels(labels + [("le", le)])} {cumulative}')
+                lines.append(f'{metric.name}_sum{_format_labels(labels)} {_format_value(value[-1])}')
+                lines.append(f'{metric.name}_count{_format_labels(labels)} {cumulative}')
+        return '\n'.join(lines) + '\n'
+    
+    def start(self, app=None):
+        """Start writing this process's samples every FLUSH_SECONDS (only with a directory)"""
+        if not self.directory or (self._thread and self._thread.is_alive()):
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, args=(app,), name='metrics-writer', daemon=True)
+        self._thread.start()
+    
+    def _run(self, app):
+        """Writer loop; gauge functions may query the database, so run in an app context"""
+        while True:
+            try:
+                if app is not None:
+                    with app.app_context():
+                        self.write()
+                else:
+                    self.write()
+            except Exception as e:
+                logger.error(f"Error writing metrics: {e}")
+            time.sleep(FLUSH_SECONDS)
+
+def _is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(labels) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+def _format_value(value) -> str:
+    if isinstance(value, float) and not value.is_integer():
+        return repr(value)
+    return str(int(value))
+
+def _reset_after_fork():
+    """Workers forked from a --preload master start from zero instead of inheriting its counts"""
+    for metric in _metrics:
+        # Another thread may have held a lock at the fork
+        metric._shards_lock = threading.Lock()
+        if isinstance(metric, Gauge):
+            metric._lock = threading.Lock()
+        metric.reset()
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+# Process-wide store used by the /metrics endpoint
+metrics_store = MetricsStore(os.getenv('METRICS_DIR'))
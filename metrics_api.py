@@ -0,0 +1,56 @@
+"""
+Metrics API Routes
+Prometheus scrape endpoint for the voice stack
+"""
+
+import sys
+import logging
+from flask import Blueprint, Response
+from src.services import metrics
+from src.services.metrics import metrics_store
+from src.services.registry import dialogue_service
+from src.services.tracing import tracer
+from src.services.event_bus import call_events
+from src.services.status_ingest import status_ingestor
+from src.services.reminder_scheduler import reminder_scheduler
+from src.routes.phone_api import active_calls
+
+logger = logging.getLogger(__name__)
+
+metrics_bp = Blueprint('metrics', __name__)
+
+# lru_cache-backed caches: cache label -> (module, function name)
+LRU_CACHES = {
+    'realtime_session_update': ('src.services.realtime_voice_service', '_session_update_message'),
+    'campaign_template': ('src.services.campaign_dialer', '_parse_template'),
+}
+
+def _lru_cache_requests():
+    """Hits and misses of the lru_cache caches in modules loaded so far"""
+    samples = {}
+    for cache, (module_name, function_name) in LRU_CACHES.items():
+        module = sys.modules.get(module_name)
+        if module is None:
+            continue
+        info = getattr(module, function_name).cache_info()
+        samples[(cache, 'hit')] = info.hits
+        samples[(cache, 'miss')] = info.misses
+    return samples
+
+metrics.active_calls.add_function(lambda: len(active_calls))
+metrics.dialogue_sessions.add_function(lambda: len(dialogue_service.active_sessions) if dialogue_service.loaded else 0)
+metrics.queue_depth.add_function(lambda: {('call_events',): call_events.buffered_count()})
+metrics.backlog.add_function(lambda: {('status_callbacks',): status_ingestor.pending_count()})
+metrics.backlog.add_function(lambda: {('reminders',): reminder_scheduler.pending_count()})
+metrics.cache_requests.add_function(_lru_cache_requests)
+tracer.add_listener(metrics.observe_turn)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Counters, gauges and histograms of every worker process in Prometheus text format"""
+    try:
+        return Response(metrics_store.render(), content_type=metrics.CONTENT_TYPE)
+    
+    except Exception as e:
+        logger.error(f"Error rendering metrics: {e}")
+        return Response(f"# Error rendering metrics: {e}\n", status=500, content_type=metrics.CONTENT_TYPE)
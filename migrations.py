@@ -0,0 +1,185 @@
+"""
+Schema Migrations
+Applies versioned schema changes to existing databases and registers the
+hot queries whose plans must stay index-backed
+"""
+
+from datetime import datetime, date
+from sqlalchemy import inspect, select, text
+from src.models.user import db
+from src.models.call import Call, CallTurn, CallRecording, Appointment, TenantConfig
+from src.models.reminder import AppointmentReminder
+
+def _has_table(connection, table: str) -> bool:
+    return inspect(connection).has_table(table)
+
+def _create_index(connection, name: str, table: str, columns: str):
+    """
+    Create an index unless it exists
+    
+    Tables that do not exist yet are skipped; db.create_all creates them
+    with their indexes.
+    """
+    if _has_table(connection, table):
+        connection.execute(text(f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})'))
+
+def _add_column(connection, table: str, column: str, ddl: str):
+    """
+    Add a column to an existing table
+    
+    Skipped when the table was created by db.create_all with the column
+    already in place, or does not exist yet.
+    """
+    if not _has_table(connection, table):
+        return
+    if column not in {existing['name'] for existing in inspect(connection).get_columns(table)}:
+        connection.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}'))
+
+def _hot_query_indexes(connection):
+    _create_index(connection, 'ix_calls_start_time', 'calls', 'start_time')
+    _create_index(connection, 'ix_calls_status_start_time', 'calls', 'call_status, start_time')
+    _create_index(connection, 'ix_calls_caller_phone', 'calls', 'caller_phone')
+    _create_index(connection, 'ix_calls_primary_intent', 'calls', 'primary_intent')
+    _create_index(connection, 'ix_appointments_date_status', 'appointments', 'appointment_date, status')
+    _create_index(connection, 'ix_appointments_customer_phone', 'appointments', 'customer_phone')
+
+def _call_routing_columns(connection):
+    _add_column(connection, 'calls', 'business_phone', 'VARCHAR(20)')
+    _add_column(connection, 'calls', 'direction', "VARCHAR(10) DEFAULT 'inbound'")  # Calls so far were all inbound
+    _add_column(connection, 'calls', 'stream_sid', 'VARCHAR(100)')
+
+def _twilio_sync_columns(connection):
+    _add_column(connection, 'calls', 'price', 'VARCHAR(20)')
+    _add_column(connection, 'calls', 'twilio_synced_at', 'DATETIME')
+
+def _turn_trace_column(connection):
+    _add_column(connection, 'call_turns', 'spans', 'TEXT')
+
+def _tenant_indexes(connection):
+    _create_index(connection, 'ix_calls_business_phone', 'calls', 'business_phone')
+
+def _campaign_dial_budget(connection):
+    _add_column(connection, 'campaigns', 'dial_tokens', 'FLOAT')
+    _add_column(connection, 'campaigns', 'dial_tokens_at', 'DATETIME')
+
+def _sync_state(connection):
+    """Move the call log sync watermarks out of business_config into sync_state"""
+    if not (_has_table(connection, 'business_config') and _has_table(connection, 'sync_state')):
+        return
+    keys = "('twilio_calls_watermark', 'twilio_recordings_watermark')"
+    connection.execute(text(
+        f"INSERT INTO sync_state (key, value, updated_at) SELECT key, value, updated_at FROM business_config "
+        f"WHERE key IN {keys} AND key NOT IN (SELECT key FROM sync_state)"
+    ))
+    connection.execute(text(f"DELETE FROM business_config WHERE key IN {keys}"))
+
+def _appointment_business(connection):
+    """Business number on appointments, taken from the call each was booked on"""
+    _add_column(connection, 'appointments', 'business_phone', 'VARCHAR(20)')
+    if _has_table(connection, 'appointments') and _has_table(connection, 'calls'):
+        connection.execute(text(
+            "UPDATE appointments SET business_phone = "
+            "(SELECT business_phone FROM calls WHERE calls.id = appointments.call_id) "
+            "WHERE business_phone IS NULL AND call_id IS NOT NULL"
+        ))
+
+# Ordered list of (version, description, apply function); tables new in a
+# version need no entry, as db.create_all creates them before migrations run
+MIGRATIONS = [
+    ('0001_hot_query_indexes', 'Indexes for call and appointment hot queries', _hot_query_indexes),
+    ('0002_call_routing_columns', 'Dialed number, direction and stream SID on calls', _call_routing_columns),
+    ('0003_twilio_sync_columns', 'Price and last sync time on calls', _twilio_sync_columns),
+    ('0004_turn_trace_column', 'Persisted stage spans on call turns', _turn_trace_column),
+    ('0005_tenant_indexes', 'Calls by dialed number, for per-tenant availability', _tenant_indexes),
+    ('0006_campaign_dial_budget', 'Campaign rate budget shared by every worker', _campaign_dial_budget),
+    ('0007_sync_state', 'Call log sync watermarks moved out of business configuration', _sync_state),
+    ('0008_appointment_business', 'Business number on appointments, for per-tenant availability', _appointment_business),
+]
+
+def apply_migrations(engine=None):
+    """
+    Apply pending migrations, recording each one in schema_migrations
+    
+    Args:
+        engine: SQLAlchemy engine; defaults to the app's db.engine
+    
+    Returns:
+        List of versions applied by this call
+    """
+    engine = engine or db.engine
+    applied = []
+    
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version VARCHAR(100) PRIMARY KEY, applied_at DATETIME NOT NULL)"
+        ))
+        done = {row[0] for row in connection.execute(text("SELECT version FROM schema_migrations"))}
+        
+        for version, description, apply in MIGRATIONS:
+            if version in done:
+                continue
+            apply(connection)
+            connection.execute(
+                text("INSERT INTO schema_migrations (version, applied_at) VALUES (:version, :applied_at)"),
+                {'version': version, 'applied_at': datetime.utcnow()}
+            )
+            applied.append(version)
+    
+    return applied
+
+# Queries on request paths that must never fall back to a full table scan
+HOT_QUERIES = {
+    'calls_recent': lambda: select(Call).order_by(Call.start_time.desc()).limit(50),
+    'calls_by_status': lambda: select(Call).where(Call.call_status == 'completed')
+        .order_by(Call.start_time.desc()).limit(50),
+    'calls_after_cursor': lambda: select(Call.id, Call.session_id, Call.start_time).where(
+        (Call.start_time < datetime(2025, 1, 1)) |
+        ((Call.start_time == datetime(2025, 1, 1)) & (Call.id < 500000))
+    ).order_by(Call.start_time.desc(), Call.id.desc()).limit(51),
+    'calls_by_caller': lambda: select(Call).where(Call.caller_phone == '+15551234567'),
+    'calls_by_business_phone': lambda: select(Call.id).where(Call.business_phone == '+15557654321'),
+    'calls_by_intent': lambda: select(Call).where(Call.primary_intent == 'appointment_booking'),
+    'call_by_session': lambda: select(Call).where(Call.session_id == 'CA00000000000000000000000000000000'),
+    'call_turns': lambda: select(CallTurn).where(CallTurn.call_id == 1).order_by(CallTurn.seq),
+    'call_recordings': lambda: select(CallRecording).where(
+        CallRecording.call_sid == 'CA00000000000000000000000000000000'
+    ),
+    'appointments_for_slot': lambda: select(Appointment).where(
+        Appointment.appointment_date == date(2025, 8, 1),
+        Appointment.status.in_(['scheduled', 'confirmed'])
+    ),
+    'appointments_by_phone': lambda: select(Appointment).where(Appointment.customer_phone == '+15551234567'),
+    'tenant_config': lambda: select(TenantConfig).where(TenantConfig.tenant == '+15557654321'),
+    'pending_reminders': lambda: select(AppointmentReminder).where(AppointmentReminder.status == 'pending'),
+}
+
+def explain_query_plan(connection, statement):
+    """
+    Return the SQLite query plan details for a statement
+    
+    Args:
+        connection: SQLAlchemy connection to a SQLite database
+        statement: SQLAlchemy selectable
+    
+    Returns:
+        List of plan detail strings
+    """
+    compiled = statement.compile(connection, compile_kwargs={'literal_binds': True})
+    rows = connection.execute(text(f"EXPLAIN QUERY PLAN {compiled}"))
+    return [row[-1] for row in rows]
+
+def find_full_scans(connection):
+    """
+    Check every registered hot query for full table scans
+    
+    Returns:
+        Dictionary of query name to the offending plan lines
+    """
+    offenders = {}
+    for name, build in HOT_QUERIES.items():
+        scans = [detail for detail in explain_query_plan(connection, build())
+                 if detail.startswith('SCAN') and 'USING' not in detail]
+        if scans:
+            offenders[name] = scans
+    return offenders
@@ -5,14 +5,147 @@ Handles intent recognition, entity extraction, and conversation understanding
 
 import re
 import json
-from typing import Dict, List, Optional, Tuple
-from openai import OpenAI
+import logging
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 from datetime import datetime, timedelta
+from src.services.registry import openai_client, async_openai_client, OPENAI_TIMEOUT_SECONDS
+from src.services.tracing import tracer
+from src.services.entity_extractor import Entity, entities_by_type, entity_extractor
+from src.services.tenants import Tenant, tenant_registry
+
+logger = logging.getLogger(__name__)
+
+# Tenant config keys holding JSON that tailors the NLU (see NLUService.compile_language)
+LANGUAGE_CONFIG_KEYS = ('custom_intents', 'intent_synonyms', 'service_synonyms', 'response_templates')
+
+# Replies per intent; {name}, {hours}, {address}, {phone}, {email} and {services}
+# are filled in from the business configuration
+RESPONSE_TEMPLATES = {
+    'greeting': "Hello! Thank you for calling {name}. How can I help you today?",
+    'appointment_booking': "I'd be happy to help you schedule an appointment. What type of service are you looking for, and when would you prefer to come in?",
+    'appointment_cancel': "I can help you with that. Can you please provide your name and the date of your current appointment?",
+    'business_hours': "Our business hours are {hours}. Is there anything else I can help you with?",
+    'location': "We're located at {address}. Would you like me to provide directions or any other information?",
+    'services': "We offer the following services: {services}. Would you like more information about any specific service or would you like to schedule an appointment?",
+    'pricing': "Our pricing varies depending on the specific service you're interested in. Could you tell me which service you'd like to know about, and I'll provide you with detailed pricing information?",
+    'contact': "You can reach us at {phone} or email us at {email}. Is there anything specific you'd like to know or discuss?",
+    'goodbye': "Thank you for calling {name}! Have a wonderful day, and we look forward to serving you soon.",
+    'unknown': "I'm sorry, I didn't quite understand that. Could you please rephrase your question or let me know how I can help you?"
+}
+
+# Services recognized for any business, besides its own services and their synonyms
+SERVICE_KEYWORDS = ['consultation', 'checkup', 'cleaning', 'treatment', 'therapy', 'massage', 'haircut']
+
+_WORD_PATTERN = re.compile(r"[a-z0-9']+")
+
+@lru_cache(maxsize=1024)
+def _words(text: str) -> Tuple[str, ...]:
+    """
+    Words of a lowercase text, the unit phrases are matched in; memoized
+    so the intent and service lookups of a turn share one split
+    """
+    return tuple(_WORD_PATTERN.findall(text))
+
+class PhraseIndex:
+    """
+    Literal phrases in a trie of words, so finding them in an utterance costs
+    a few lookups per word however many phrases there are
+    """
+    
+    _LABELS = ''  # Key of the labels of phrases ending at a node; never a word
+    
+    def __init__(self, phrases: Iterable[Tuple[str, Any]]):
+        """
+        Build the index
+        
+        Args:
+            phrases: (phrase, label) pairs; the label is what a match reports
+        
+        Raises:
+            ValueError: A phrase has no words
+        """
+        self._root = {}
+        for phrase, label in phrases:
+            words = _words(phrase.lower())
+            if not words:
+                raise ValueError(f"Phrase {phrase!r} has no words")
+            node = self._root
+            for word in words:
+                node = node.setdefault(word, {})
+            node.setdefault(self._LABELS, []).append(label)
+    
+    def __bool__(self):
+        return bool(self._root)
+    
+    def find(self, words: Tuple[str, ...]) -> List[Any]:
+        """Labels of the phrases among the words, in order of appearance"""
+        if self._root.keys().isdisjoint(words):
+            return []  # Most utterances: no phrase starts with any of their words
+        labels = []
+        for start, word in enumerate(words):
+            node = self._root.get(word)
+            position = start + 1
+            while node is not None:
+                labels.extend(node.get(self._LABELS, ()))
+                if position == len(words):
+                    break
+                node = node.get(words[position])
+                position += 1
+        return labels
+
+class TenantLanguage:
+    """
+    A business's intents, services and replies, compiled from its configuration
+    
+    Built once per configuration version and never modified, so replacing a
+    tenant's language swaps all of it at once.
+    """
+    
+    def __init__(self, intents: List[Tuple[str, Optional[re.Pattern]]], phrases: PhraseIndex,
+                 services: PhraseIndex, templates: Dict[str, str]):
+        """
+        Initialize the language
+        
+        Args:
+            intents: (intent, regex or None) in priority order
+            phrases: Phrases labelled with the intent they signal
+            services: Phrases labelled with the service they name
+            templates: Intent -> reply, placeholders filled in
+        """
+        self.intents = intents
+        self.names = [intent for intent, _ in intents]
+        self.phrases = phrases or None  # None skips splitting the text into words
+        self.services = services
+        self.templates = templates
+        self._priority = {intent: index for index, (intent, _) in enumerate(intents)}
+        self._patterns = [(index, intent, pattern) for index, (intent, pattern) in enumerate(intents) if pattern is not None]
+    
+    def match(self, text: str) -> Optional[str]:
+        """
+        First intent, in priority order, whose patterns or phrases the text contains
+        
+        Args:
+            text: Lowercase user input text
+        """
+        best = len(self.intents)
+        hits = self.phrases.find(_words(text)) if self.phrases else None
+        if hits:
+            best = min(self._priority[intent] for intent in hits)
+        
+        # Only intents ranked above the best phrase hit need their patterns tried
+        for index, intent, pattern in self._patterns:
+            if index >= best:
+                break
+            if pattern.search(text):
+                return intent
+        return self.intents[best][0] if best < len(self.intents) else None
 
 class NLUService:
     def __init__(self):
-        """Initialize the NLU Service with OpenAI client"""
-        self.client = OpenAI()
+        """Initialize the NLU Service with the process's shared OpenAI clients"""
+        self.client = openai_client
+        self.async_client = async_openai_client  # The running event loop's
         
         # Define common intents and their patterns
         self.intent_patterns = {
@@ -63,57 +196,212 @@ class NLUService:
                 r'\bi have to go\b'
             ]
         }
+        self.intent_matcher = self.compile_intents(self.intent_patterns)
+    
+    @staticmethod
+    def compile_intents(intent_patterns: Dict[str, List[str]]) -> List[Tuple[str, re.Pattern]]:
+        """
+        Compile each intent's patterns into one regex, matched against lowercase text
         
-        # Common entities patterns
-        self.entity_patterns = {
-            'time': [
-                r'\b(\d{1,2}):(\d{2})\s*(am|pm)?\b',
-                r'\b(\d{1,2})\s*(am|pm)\b',
-                r'\b(morning|afternoon|evening|noon)\b'
-            ],
-            'date': [
-                r'\b(today|tomorrow|yesterday)\b',
-                r'\b(monday|tuesday|wednesday|thursday|friday|saturday|sunday)\b',
-                r'\b(\d{1,2})/(\d{1,2})/(\d{4})\b',
-                r'\b(january|february|march|april|may|june|july|august|september|october|november|december)\s+(\d{1,2})\b'
-            ],
-            'name': [
-                r'\bmy name is\s+([A-Za-z\s]+)\b',
-                r'\bi\'m\s+([A-Za-z\s]+)\b',
-                r'\bthis is\s+([A-Za-z\s]+)\b'
-            ],
-            'phone': [
-                r'\b(\d{3}[-.\s]?\d{3}[-.\s]?\d{4})\b',
-                r'\b(\(\d{3}\)\s*\d{3}[-.\s]?\d{4})\b'
-            ],
-            'email': [
-                r'\b([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})\b'
-            ]
-        }
+        The patterns are lowercase, so they are compiled case-sensitively:
+        IGNORECASE would keep the regex engine from skipping ahead to their
+        literal words, making matching about 60% slower.
+        
+        Returns:
+            (intent, regex) pairs in priority order: the first intent that
+            matches wins, as with the pattern lists
+        """
+        return [
+            (intent, re.compile('|'.join(f'(?:{pattern})' for pattern in patterns)))
+            for intent, patterns in intent_patterns.items()
+        ]
+    
+    def compile_language(self, tenant: Tenant) -> TenantLanguage:
+        """
+        Compile a tenant's intents, services and replies from its configuration
+        
+        JSON config keys tailor the built-ins:
+            custom_intents: {"parking": {"phrases": ["park", "parking lot"],
+                "patterns": ["where .* park"], "response": "There is free parking behind the building."}}
+                Custom intents rank above the built-in ones. Phrases cost the
+                same however many there are; each pattern is a regex tried on
+                every utterance, so prefer phrases.
+            intent_synonyms: {"appointment_booking": ["pencil me in"]}
+            service_synonyms: {"Teeth Cleaning": ["cleaning", "hygiene visit"]}
+            response_templates: {"business_hours": "We're open {hours}, call {phone} after hours."}
+        
+        Args:
+            tenant: Tenant whose configuration to compile
+        
+        Returns:
+            The tenant's language
+        
+        Raises:
+            ValueError: The configuration is malformed
+        """
+        config = {key: self._json_config(tenant.config, key) for key in LANGUAGE_CONFIG_KEYS}
+        
+        intents = []
+        phrases = []
+        templates = dict(RESPONSE_TEMPLATES)
+        for intent, definition in config['custom_intents'].items():
+            if not re.fullmatch(r'\w+', intent) or intent in self.intent_patterns or intent == 'unknown':
+                raise ValueError(f"Custom intent name {intent!r} must be a new word (extend built-in intents with intent_synonyms)")
+            if not isinstance(definition, dict):
+                raise ValueError(f"Custom intent {intent!r} must be an object")
+            patterns = self._string_list(definition.get('patterns', []), f"Patterns of {intent!r}")
+            try:
+                pattern = re.compile('|'.join(f'(?:{pattern})' for pattern in patterns), re.IGNORECASE) if patterns else None
+            except re.error as e:
+                raise ValueError(f"Invalid pattern for {intent!r}: {e}")
+            intents.append((intent, pattern))
+            phrases.extend((phrase, intent) for phrase in self._string_list(definition.get('phrases', []), f"Phrases of {intent!r}"))
+            if not patterns and not definition.get('phrases'):
+                raise ValueError(f"Custom intent {intent!r} needs phrases or patterns")
+            if definition.get('response'):
+                templates[intent] = definition['response']
+        intents.extend(self.intent_matcher)
+        
+        known = {intent for intent, _ in intents}
+        for intent, synonyms in config['intent_synonyms'].items():
+            if intent not in known:
+                raise ValueError(f"Synonyms given for unknown intent {intent!r}")
+            phrases.extend((phrase, intent) for phrase in self._string_list(synonyms, f"Synonyms of {intent!r}"))
+        
+        services = self._service_phrases(tenant)
+        for service, synonyms in config['service_synonyms'].items():
+            services.extend((phrase, service) for phrase in self._string_list(synonyms, f"Synonyms of {service!r}"))
+        
+        templates.update(config['response_templates'])
+        fields = self._template_fields(tenant)
+        for intent, template in templates.items():
+            try:
+                templates[intent] = str(template).format(**fields)
+            except (KeyError, IndexError, ValueError) as e:
+                raise ValueError(f"Response template for {intent!r} has an invalid placeholder: {e}")
+        
+        return TenantLanguage(intents, PhraseIndex(phrases), PhraseIndex(services), templates)
     
-    def analyze_intent(self, text: str) -> Dict[str, any]:
+    def builtin_language(self, tenant: Tenant) -> TenantLanguage:
+        """
+        The built-in intents and replies with a tenant's business details,
+        ignoring its NLU configuration; cannot fail
+        
+        Args:
+            tenant: Tenant whose business details fill in the replies
+        """
+        fields = self._template_fields(tenant)
+        templates = {intent: template.format(**fields) for intent, template in RESPONSE_TEMPLATES.items()}
+        return TenantLanguage(list(self.intent_matcher), PhraseIndex([]), PhraseIndex(self._service_phrases(tenant)), templates)
+    
+    def tenant_language(self, tenant: Tenant) -> TenantLanguage:
+        """
+        Compiled language of a tenant, built once per configuration version
+        
+        A malformed configuration is logged and the built-in language used
+        instead, so the business keeps answering calls.
+        """
+        def build(tenant):
+            try:
+                return self.compile_language(tenant)
+            except ValueError as e:
+                logger.error(f"Ignoring NLU configuration of {tenant!r}: {e}")
+                return self.builtin_language(tenant)
+        
+        return tenant.derived('language', build)
+    
+    @staticmethod
+    def _service_phrases(tenant: Tenant) -> List[Tuple[str, str]]:
+        """(name, service) pairs of a tenant's services; names without words (e.g. '!!!') can never be said"""
+        return [(service, service) for service in tenant.business_config['services'] if _words(service.lower())]
+    
+    @staticmethod
+    def _template_fields(tenant: Tenant) -> Dict[str, str]:
+        """Placeholders of the reply templates"""
+        return dict(tenant.business_config, services=', '.join(tenant.business_config['services']))
+    
+    @staticmethod
+    def _json_config(config: Dict[str, str], key: str) -> Dict[str, Any]:
+        """A JSON object config value, empty when unset"""
+        if not config.get(key):
+            return {}
+        try:
+            value = json.loads(config[key])
+        except ValueError:
+            raise ValueError(f"{key} is not valid JSON")
+        if not isinstance(value, dict):
+            raise ValueError(f"{key} must be a JSON object")
+        return value
+    
+    @staticmethod
+    def _string_list(value, what: str) -> List[str]:
+        if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+            raise ValueError(f"{what} must be a list of strings")
+        return value
+    
+    def analyze_intent(self, text: str, tenant: Optional[Tenant] = None) -> Dict[str, any]:
         """
         Analyze the intent of the user's message using pattern matching and AI
         
         Args:
             text: User's input text
+            tenant: Tenant whose intents to match; None for the global business
         
         Returns:
             Dictionary containing intent, confidence, and extracted entities
         """
-        text_lower = text.lower()
+        with tracer.span('nlu') as span:
+            language, pattern_intent, entities = self._local_analysis(text, tenant)
+            
+            # Use AI for more complex intent analysis if pattern matching is uncertain
+            path = 'patterns'
+            if pattern_intent['confidence'] < 0.7:
+                with tracer.span('nlu.ai'):
+                    ai_intent = self._ai_based_intent(text, language.names)
+                if ai_intent['confidence'] > pattern_intent['confidence']:
+                    pattern_intent = ai_intent
+                    path = 'ai'
+            
+            if span is not None:
+                span.attrs['path'] = path
         
-        # First try pattern matching for quick common intents
-        pattern_intent = self._pattern_based_intent(text_lower)
+        return {
+            'intent': pattern_intent['intent'],
+            'confidence': pattern_intent['confidence'],
+            'entities': entities,
+            'original_text': text
+        }
+    
+    async def analyze_intent_async(self, text: str, tenant: Optional[Tenant] = None,
+                                   timeout: Optional[float] = None) -> Dict[str, any]:
+        """
+        Analyze the intent of the user's message without blocking the event loop
         
-        # Extract entities
-        entities = self._extract_entities(text)
+        Pattern matching and entity extraction take microseconds and run
+        inline; only the AI fallback is awaited, and cancelling the awaiting
+        task aborts it.
         
-        # Use AI for more complex intent analysis if pattern matching is uncertain
-        if pattern_intent['confidence'] < 0.7:
-            ai_intent = self._ai_based_intent(text)
-            if ai_intent['confidence'] > pattern_intent['confidence']:
-                pattern_intent = ai_intent
+        Args:
+            text: User's input text
+            tenant: Tenant whose intents to match; None for the global business
+            timeout: Seconds to wait for the AI fallback (default OPENAI_TIMEOUT_SECONDS)
+        
+        Returns:
+            Dictionary containing intent, confidence, and extracted entities
+        """
+        with tracer.span('nlu') as span:
+            language, pattern_intent, entities = self._local_analysis(text, tenant)
+            
+            path = 'patterns'
+            if pattern_intent['confidence'] < 0.7:
+                with tracer.span('nlu.ai'):
+                    ai_intent = await self._ai_based_intent_async(text, language.names, timeout)
+                if ai_intent['confidence'] > pattern_intent['confidence']:
+                    pattern_intent = ai_intent
+                    path = 'ai'
+            
+            if span is not None:
+                span.attrs['path'] = path
         
         return {
             'intent': pattern_intent['intent'],
@@ -122,143 +410,167 @@ class NLUService:
             'original_text': text
         }
     
-    def _pattern_based_intent(self, text: str) -> Dict[str, any]:
+    def _local_analysis(self, text: str, tenant: Optional[Tenant]) -> Tuple[TenantLanguage, Dict[str, any], Dict[str, List]]:
+        """The tenant's language, the pattern-matched intent and the entities of a message"""
+        language = self.tenant_language(tenant or tenant_registry.get())
+        
+        # First try pattern matching for quick common intents
+        with tracer.span('nlu.patterns'):
+            pattern_intent = self._pattern_based_intent(text.lower(), language)
+            
+            # Extract entities
+            entities = self._extract_entities(text)
+        
+        return language, pattern_intent, entities
+    
+    def _pattern_based_intent(self, text: str, language: TenantLanguage) -> Dict[str, any]:
         """
         Use pattern matching to determine intent
         
         Args:
             text: Lowercase user input text
+            language: Compiled intents to match (see compile_language)
         
         Returns:
             Dictionary with intent and confidence score
         """
-        best_intent = 'unknown'
-        best_confidence = 0.0
-        
-        for intent, patterns in self.intent_patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, text, re.IGNORECASE):
-                    confidence = 0.8  # High confidence for pattern matches
-                    if confidence > best_confidence:
-                        best_intent = intent
-                        best_confidence = confidence
+        intent = language.match(text)
+        if intent is not None:
+            return {
+                'intent': intent,
+                'confidence': 0.8  # High confidence for pattern matches
+            }
         
         return {
-            'intent': best_intent,
-            'confidence': best_confidence
+            'intent': 'unknown',
+            'confidence': 0.0
         }
     
-    def _ai_based_intent(self, text: str) -> Dict[str, any]:
+    def _ai_based_intent(self, text: str, intents: Optional[List[str]] = None) -> Dict[str, any]:
         """
         Use OpenAI to analyze intent for complex cases
         
         Args:
             text: User input text
+            intents: Intents to choose from; the built-in ones by default
         
         Returns:
             Dictionary with intent and confidence score
         """
         try:
-            prompt = f"""
-            Analyze the following customer message and determine the intent. 
-            Choose from these intents: greeting, appointment_booking, appointment_cancel, 
-            business_hours, location, services, pricing, contact, goodbye, unknown.
-            
-            Customer message: "{text}"
-            
-            Respond with only the intent name and confidence (0.0-1.0) in this format:
-            intent: <intent_name>
-            confidence: <confidence_score>
-            """
-            
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=50,
-                temperature=0.1
-            )
-            
-            result = response.choices[0].message.content.strip()
-            
-            # Parse the response
-            intent_match = re.search(r'intent:\s*(\w+)', result)
-            confidence_match = re.search(r'confidence:\s*([\d.]+)', result)
-            
-            intent = intent_match.group(1) if intent_match else 'unknown'
-            confidence = float(confidence_match.group(1)) if confidence_match else 0.5
+            with tracer.span('openai.chat', service='openai', purpose='intent'):
+                response = self.client.chat.completions.create(
+                    model="gpt-3.5-turbo",
+                    messages=[{"role": "user", "content": self._intent_prompt(text, intents)}],
+                    max_tokens=50,
+                    temperature=0.1
+                )
             
+            return self._parse_intent(response.choices[0].message.content)
+        
+        except Exception as e:
+            logger.error(f"Error in AI-based intent analysis: {e}")
             return {
-                'intent': intent,
-                'confidence': confidence
+                'intent': 'unknown',
+                'confidence': 0.0
             }
+    
+    async def _ai_based_intent_async(self, text: str, intents: Optional[List[str]] = None,
+                                     timeout: Optional[float] = None) -> Dict[str, any]:
+        """Async _ai_based_intent; timeout is in seconds (default OPENAI_TIMEOUT_SECONDS)"""
+        try:
+            with tracer.span('openai.chat', service='openai', purpose='intent'):
+                response = await self.async_client.chat.completions.create(
+                    model="gpt-3.5-turbo",
+                    messages=[{"role": "user", "content": self._intent_prompt(text, intents)}],
+                    max_tokens=50,
+                    temperature=0.1,
+                    timeout=timeout or OPENAI_TIMEOUT_SECONDS
+                )
+            
+            return self._parse_intent(response.choices[0].message.content)
         
         except Exception as e:
-            print(f"Error in AI-based intent analysis: {str(e)}")
+            logger.error(f"Error in AI-based intent analysis: {e}")
             return {
                 'intent': 'unknown',
                 'confidence': 0.0
             }
     
-    def _extract_entities(self, text: str) -> Dict[str, List[str]]:
+    def _intent_prompt(self, text: str, intents: Optional[List[str]]) -> str:
+        return f"""
+            Analyze the following customer message and determine the intent. 
+            Choose from these intents: {', '.join(intents or self.intent_patterns)}, unknown.
+            
+            Customer message: "{text}"
+            
+            Respond with only the intent name and confidence (0.0-1.0) in this format:
+            intent: <intent_name>
+            confidence: <confidence_score>
+            """
+    
+    @staticmethod
+    def _parse_intent(result: str) -> Dict[str, any]:
+        """Intent and confidence from the model's 'intent: ...' / 'confidence: ...' reply"""
+        result = result.strip()
+        intent_match = re.search(r'intent:\s*(\w+)', result)
+        confidence_match = re.search(r'confidence:\s*([\d.]+)', result)
+        
+        intent = intent_match.group(1) if intent_match else 'unknown'
+        confidence = float(confidence_match.group(1)) if confidence_match else 0.5
+        
+        return {
+            'intent': intent,
+            'confidence': confidence
+        }
+    
+    def extract_entities(self, text: str) -> Tuple[Entity, ...]:
         """
-        Extract entities from the text using pattern matching
+        Extract entities with their normalized values and character spans
         
         Args:
             text: User input text
         
         Returns:
-            Dictionary of entity types and their values
+            Entities in order of appearance
         """
-        entities = {}
-        
-        for entity_type, patterns in self.entity_patterns.items():
-            matches = []
-            for pattern in patterns:
-                found = re.findall(pattern, text, re.IGNORECASE)
-                if found:
-                    if entity_type == 'name':
-                        # For names, extract the captured group
-                        matches.extend([match for match in found if isinstance(match, str)])
-                    else:
-                        matches.extend(found)
-            
-            if matches:
-                entities[entity_type] = matches
+        return entity_extractor.extract(text)
+    
+    def _extract_entities(self, text: str) -> Dict[str, List]:
+        """
+        Extract entities from the text in a single pass
+        
+        Args:
+            text: User input text
         
-        return entities
+        Returns:
+            Dictionary of entity types and their normalized values: dates and
+            times as date/time objects, phones in E.164, emails lowercased
+        """
+        return entities_by_type(entity_extractor.extract(text))
     
-    def get_response_template(self, intent: str, entities: Dict = None) -> str:
+    def get_response_template(self, intent: str, entities: Dict = None, tenant: Optional[Tenant] = None) -> str:
         """
         Get appropriate response template based on intent
         
         Args:
             intent: Detected intent
             entities: Extracted entities
+            tenant: Tenant whose replies to use; None for the global business
         
         Returns:
-            Response template string
+            Response template string with the business details filled in
         """
-        templates = {
-            'greeting': "Hello! Thank you for calling. How can I help you today?",
-            'appointment_booking': "I'd be happy to help you schedule an appointment. What type of service are you looking for, and when would you prefer to come in?",
-            'appointment_cancel': "I can help you with that. Can you please provide your name and the date of your current appointment?",
-            'business_hours': "Our business hours are Monday through Friday, 9 AM to 6 PM, and Saturday 9 AM to 3 PM. We're closed on Sundays.",
-            'location': "We're located at [BUSINESS_ADDRESS]. Would you like me to provide directions or send you our location details?",
-            'services': "We offer a variety of services including [LIST_SERVICES]. Would you like more information about any specific service?",
-            'pricing': "Our pricing varies depending on the service. Could you tell me which specific service you're interested in so I can provide accurate pricing information?",
-            'contact': "You can reach us at [PHONE_NUMBER] or email us at [EMAIL_ADDRESS]. Is there anything specific you'd like to know?",
-            'goodbye': "Thank you for calling! Have a wonderful day, and we look forward to serving you soon.",
-            'unknown': "I'm sorry, I didn't quite understand that. Could you please rephrase your question or let me know how I can help you?"
-        }
-        
+        templates = self.tenant_language(tenant or tenant_registry.get()).templates
         return templates.get(intent, templates['unknown'])
     
-    def extract_appointment_details(self, text: str) -> Dict[str, any]:
+    def extract_appointment_details(self, text: str, tenant: Optional[Tenant] = None) -> Dict[str, any]:
         """
         Extract specific appointment-related details from text
         
         Args:
             text: User input text
+            tenant: Tenant whose services to recognize; None for the global business
         
         Returns:
             Dictionary with appointment details
@@ -271,19 +583,25 @@ class NLUService:
             'special_requests': None
         }
         
-        # Extract service type
-        service_keywords = ['consultation', 'checkup', 'cleaning', 'treatment', 'therapy', 'massage', 'haircut']
-        for service in service_keywords:
-            if service in text.lower():
-                details['service_type'] = service
-                break
+        # Extract service type: the business's own services and their synonyms first
+        language = self.tenant_language(tenant or tenant_registry.get())
+        text_lower = text.lower()
+        services = language.services.find(_words(text_lower))
+        if services:
+            details['service_type'] = services[0]
+        else:
+            for service in SERVICE_KEYWORDS:
+                if service in text_lower:
+                    details['service_type'] = service
+                    break
         
-        # Extract date and time from entities
+        # Extract date and time from entities (memoized, so this reuses the scan of analyze_intent)
         entities = self._extract_entities(text)
         if 'date' in entities:
             details['preferred_date'] = entities['date'][0]
         if 'time' in entities:
             details['preferred_time'] = entities['time'][0]
+        elif 'part_of_day' in entities:
+            details['preferred_time'] = entities['part_of_day'][0]
         
         return details
-
@@ -1,24 +1,40 @@
-from flask import Blueprint, request, jsonify, Response
+from flask import Blueprint, request, jsonify, Response, stream_with_context, current_app, has_app_context
 from flask_cors import cross_origin
 import asyncio
 import json
+import time
+import inspect
 import base64
 import logging
 from datetime import datetime
-from ..services.twilio_service import TwilioService
-from ..services.realtime_voice_service import RealtimeVoiceService
-from ..services.speech_service import SpeechService
-from ..services.dialogue_service import DialogueService
-from ..models.call import Call, db
+from ..services.registry import twilio_service, speech_service, dialogue_service, nlu_service, async_openai_client
+from ..services.event_bus import call_events, format_sse
+from ..services.tracing import tracer
+from ..services.metrics import cache_requests, media_frames
+from ..services.status_ingest import status_ingestor
+from ..services.tenants import Tenant, tenant_registry, normalize_number
+from ..services.call_sync import CallLogSync
+from ..models.call import Call, CallTurn, CallRecording, TenantConfig, db
+from ..models.rollup import TERMINAL_CALL_STATUSES
 
 logger = logging.getLogger(__name__)
 
 phone_bp = Blueprint('phone', __name__)
 
 # Global services
-twilio_service = TwilioService()
+call_log_sync = CallLogSync(twilio_service)
 active_calls = {}  # Store active call sessions
 
+# Call listing limits
+MAX_PAGE_SIZE = 1000
+STREAM_PAGE_SIZE = 200  # Pages larger than this are streamed
+TOTAL_CACHE_SECONDS = 60
+_total_cache = {}  # status -> (expires_at, count)
+
+# Live event feed
+SSE_HEARTBEAT_SECONDS = 15
+SSE_BUFFER_SIZE = 100
+
 @phone_bp.route('/webhook/voice', methods=['POST'])
 @cross_origin()
 def handle_incoming_call():
@@ -37,55 +53,73 @@ def handle_incoming_call():
             session_id=call_sid,
             caller_phone=from_number,
             business_phone=to_number,
-            status='active',
+            call_status='active',
             start_time=datetime.utcnow()
         )
         db.session.add(call)
         db.session.commit()
         
+        call_events.publish('call.incoming', {
+            'call_sid': call_sid,
+            'from': from_number,
+            'to': to_number
+        }, tenant=to_number)
+        
         # Generate stream URL for WebSocket connection
         stream_url = f"wss://{request.host}/phone/stream/{call_sid}"
         
         # Return TwiML response to connect to media stream
-        twiml_response = twilio_service.handle_incoming_call(stream_url)
+        twiml_response = twilio_service.handle_incoming_call(stream_url, tenant=to_number)
         
         return Response(twiml_response, mimetype='text/xml')
-        
+    
     except Exception as e:
         logger.error(f"Error handling incoming call: {e}")
         # Return error TwiML
         error_response = twilio_service.create_voice_response(
-            message="I'm sorry, but I'm experiencing technical difficulties. Please try calling back later."
+            message="I'm sorry, but I'm experiencing technical difficulties. Please try calling back later.",
+            tenant=request.form.get('To')
         )
         return Response(error_response, mimetype='text/xml')
 
 @phone_bp.route('/webhook/status', methods=['POST'])
 @cross_origin()
 def handle_call_status():
-    """Handle call status updates from Twilio"""
+    """
+    Handle call status updates from Twilio
+    
+    The callback is queued and acknowledged immediately; the background
+    status ingestor applies queued callbacks to calls in batches.
+    """
     try:
         call_sid = request.form.get('CallSid')
-        call_status = request.form.get('CallStatus')
-        call_duration = request.form.get('CallDuration')
-        
-        logger.info(f"Call status update: {call_sid} - {call_status}")
-        
-        # Update call record
-        call = Call.query.filter_by(session_id=call_sid).first()
-        if call:
-            call.status = call_status.lower()
-            if call_status in ['completed', 'busy', 'failed', 'no-answer']:
-                call.end_time = datetime.utcnow()
-                if call_duration:
-                    call.duration = int(call_duration)
-            db.session.commit()
-        
-        # Clean up active call session
-        if call_sid in active_calls and call_status in ['completed', 'busy', 'failed', 'no-answer']:
-            del active_calls[call_sid]
-        
-        return jsonify({'status': 'success'})
+        call_status = (request.form.get('CallStatus') or '').lower()
+        call_duration = request.form.get('CallDuration', type=int)
+        sequence_number = request.form.get('SequenceNumber', 0, type=int)
+        
+        if not call_sid or not call_status:
+            return jsonify({'error': 'CallSid and CallStatus are required'}), 400
+        
+        is_new = status_ingestor.enqueue(call_sid, call_status, sequence_number, call_duration)
+        
+        # Started on first use so each server worker process runs its own
+        # applier; tests drain the queue explicitly instead
+        if not current_app.testing:
+            status_ingestor.start(current_app._get_current_object())
+        
+        if is_new and call_status in TERMINAL_CALL_STATUSES:
+            logger.info(f"Call ended: {call_sid} - {call_status}")
+            call_events.publish('call.ended', {
+                'call_sid': call_sid,
+                'status': call_status,
+                'duration': call_duration
+            }, tenant=request.form.get('To'))
+            
+            # Clean up active call session
+            active_calls.pop(call_sid, None)
         
+        return jsonify({'status': 'success', 'duplicate': not is_new})
+    
     except Exception as e:
         logger.error(f"Error handling call status: {e}")
         return jsonify({'error': str(e)}), 500
@@ -96,54 +130,94 @@ async def handle_media_stream(call_sid):
     from flask import request
     
     if request.environ.get('wsgi.websocket'):
-        ws = request.environ['wsgi.websocket']
+        await run_media_stream(call_sid, request.environ['wsgi.websocket'])
+    
+    return jsonify({'error': 'WebSocket connection required'}), 400
+
+async def run_media_stream(call_sid, ws):
+    """
+    Bridge a Twilio media stream to the Realtime API until the stream ends
+    
+    Args:
+        call_sid: Call the stream belongs to
+        ws: Twilio websocket; receive() may block (gevent) or be a coroutine
+            (asyncio servers, the load-test simulator)
+    """
+    # Flask runs each async view on a loop of its own; the loop's OpenAI client is closed with the stream
+    async with async_openai_client.scope():
+        await _bridge_media_stream(call_sid, ws)
+
+async def _bridge_media_stream(call_sid, ws):
+    """Relay a media stream's messages until it ends; see run_media_stream"""
+    try:
+        realtime_service = open_call_session(call_sid, ws)['realtime_service']
         
-        try:
-            # Initialize services for this call
-            realtime_service = RealtimeVoiceService()
-            speech_service = SpeechService()
-            dialogue_service = DialogueService()
-            
-            # Store call session
-            active_calls[call_sid] = {
-                'realtime_service': realtime_service,
-                'speech_service': speech_service,
-                'dialogue_service': dialogue_service,
-                'ws': ws
-            }
-            
-            # Connect to OpenAI Realtime API
-            await realtime_service.connect_to_openai()
-            
-            # Set up event handlers
-            realtime_service.set_audio_response_handler(
-                lambda audio: send_audio_to_twilio(ws, audio)
-            )
-            
-            # Handle incoming messages from Twilio
-            while True:
-                message = ws.receive()
-                if message is None:
-                    break
-                
-                try:
-                    data = json.loads(message)
-                    await handle_twilio_message(call_sid, data)
-                except json.JSONDecodeError:
-                    logger.warning(f"Invalid JSON from Twilio: {message}")
-                except Exception as e:
-                    logger.error(f"Error processing Twilio message: {e}")
-        
-        except Exception as e:
-            logger.error(f"Error in media stream for {call_sid}: {e}")
+        # Connect to OpenAI Realtime API
+        await realtime_service.connect_to_openai()
         
-        finally:
-            # Clean up
-            if call_sid in active_calls:
-                await active_calls[call_sid]['realtime_service'].disconnect()
-                del active_calls[call_sid]
+        # Set up event handlers
+        realtime_service.set_audio_response_handler(
+            lambda audio: send_audio_to_twilio(ws, audio)
+        )
+        realtime_service.set_transcript_handler(
+            lambda role, text: record_transcript(call_sid, role, text)
+        )
+        
+        # Handle incoming messages from Twilio
+        while True:
+            message = ws.receive()
+            if inspect.isawaitable(message):
+                message = await message
+            if message is None:
+                break
+            
+            try:
+                data = json.loads(message)
+                await handle_twilio_message(call_sid, data)
+            except json.JSONDecodeError:
+                logger.warning(f"Invalid JSON from Twilio: {message}")
+            except Exception as e:
+                logger.error(f"Error processing Twilio message: {e}")
     
-    return jsonify({'error': 'WebSocket connection required'}), 400
+    except Exception as e:
+        logger.error(f"Error in media stream for {call_sid}: {e}")
+    
+    finally:
+        await close_call_session(call_sid)
+
+def open_call_session(call_sid, ws):
+    """
+    Register the media stream session of a call
+    
+    Only the Realtime API connection is per call. Speech synthesis, dialogue
+    and NLU are the process-wide services from the registry, sharing one
+    OpenAI client; the call's dialogue state is keyed by its CallSid.
+    """
+    from ..services.realtime_voice_service import RealtimeVoiceService, tenant_instructions
+    
+    # Instructions and voice are the business's, so they go out with the first session.update
+    business = tenant_registry.get(_dialed_number(call_sid))
+    realtime_service = RealtimeVoiceService()
+    realtime_service.set_system_message(business.derived('realtime_instructions', tenant_instructions))
+    realtime_service.set_voice(business.voice)
+    
+    session = {'realtime_service': realtime_service, 'ws': ws}
+    active_calls[call_sid] = session
+    return session
+
+def _dialed_number(call_sid):
+    """Business number of a call, if its record can be read here"""
+    if not has_app_context():
+        return None
+    return db.session.query(Call.business_phone).filter_by(session_id=call_sid).scalar()
+
+async def close_call_session(call_sid):
+    """Disconnect a call's Realtime session and drop its per-call state"""
+    session = active_calls.pop(call_sid, None)
+    if session:
+        await session['realtime_service'].disconnect()
+    if dialogue_service.loaded:
+        dialogue_service.end_session(call_sid)
 
 async def handle_twilio_message(call_sid, data):
     """Process messages from Twilio media stream"""
@@ -161,12 +235,28 @@ async def handle_twilio_message(call_sid, data):
         if call:
             call.stream_sid = stream_sid
             db.session.commit()
+        
+        if call_sid in active_calls:
+            active_calls[call_sid]['stream_sid'] = stream_sid
+            active_calls[call_sid]['tenant'] = call.business_phone if call else None
+            call_events.publish('call.stream_started', {
+                'call_sid': call_sid,
+                'stream_sid': stream_sid
+            }, tenant=active_calls[call_sid]['tenant'])
+            
+            # Fall back to streamed TTS if the Realtime API is unavailable
+            if not active_calls[call_sid]['realtime_service'].is_connected:
+                await speak_to_caller(
+                    call_sid,
+                    "I'm sorry, but I'm experiencing technical difficulties. Please try calling back later."
+                )
     
     elif event == 'media':
         # Process incoming audio
         if call_sid in active_calls:
             payload = data.get('media', {}).get('payload')
             if payload:
+                media_frames.inc(direction='inbound')
                 # Send audio to OpenAI Realtime API
                 realtime_service = active_calls[call_sid]['realtime_service']
                 await realtime_service.send_audio(payload)
@@ -176,6 +266,27 @@ async def handle_twilio_message(call_sid, data):
         if call_sid in active_calls:
             await active_calls[call_sid]['realtime_service'].disconnect()
 
+async def record_transcript(call_sid, role, text):
+    """Buffer the caller's words and log them with the reply as one turn"""
+    session = active_calls.get(call_sid)
+    if not session:
+        return
+    
+    call_events.publish('call.turn', {
+        'call_sid': call_sid,
+        'role': role,
+        'text': text
+    }, tenant=session.get('tenant'))
+    
+    if role == 'user':
+        session['pending_user_text'] = text
+        return
+    
+    call = Call.query.filter_by(session_id=call_sid).first()
+    if call:
+        call.record_turn(session.pop('pending_user_text', ''), text)
+        db.session.commit()
+
 async def send_audio_to_twilio(ws, audio_data):
     """Send audio response back to Twilio"""
     try:
@@ -187,60 +298,284 @@ async def send_audio_to_twilio(ws, audio_data):
             }
         }
         ws.send(json.dumps(media_message))
+        media_frames.inc(direction='outbound')
     except Exception as e:
         logger.error(f"Error sending audio to Twilio: {e}")
 
+async def speak_to_caller(call_sid, text, voice=None):
+    """
+    Stream synthesized speech to the caller as mu-law frames, in the business's voice by default
+    
+    Speech is read from the async OpenAI client, so the media stream's event
+    loop keeps relaying other frames while it is synthesized.
+    """
+    session = active_calls.get(call_sid)
+    if not session:
+        return
+    voice = voice or tenant_registry.get(session.get('tenant')).voice
+    
+    try:
+        with tracer.turn(call_sid), tracer.span('tts', streamed=True):
+            async for chunk in speech_service.stream_text_to_speech_async(text, voice=voice, response_format='ulaw'):
+                media_message = {
+                    'event': 'media',
+                    'streamSid': session.get('stream_sid'),
+                    'media': {
+                        'payload': base64.b64encode(chunk).decode('ascii')
+                    }
+                }
+                session['ws'].send(json.dumps(media_message))
+                media_frames.inc(direction='outbound')
+    except Exception as e:
+        logger.error(f"Error streaming speech to Twilio: {e}")
+
+@phone_bp.route('/events', methods=['GET'])
+@cross_origin()
+def stream_call_events():
+    """
+    Server-sent event feed of call lifecycle events for live monitoring
+    
+    call.intent is published for turns the dialogue manager answers (text
+    chat, recorded calls); media streams are answered by the Realtime API,
+    which classifies no intent, so they publish call.turn only.
+    
+    Query parameters:
+        tenant: Only send events for this business phone number
+    """
+    # Publishers use E.164; an unescaped '+' arrives as a space
+    subscription = call_events.subscribe(
+        tenant=normalize_number(request.args.get('tenant')),
+        max_buffer=SSE_BUFFER_SIZE
+    )
+    
+    def generate():
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                event = subscription.get(timeout=SSE_HEARTBEAT_SECONDS)
+                if event is None:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ': heartbeat\n\n'
+                else:
+                    yield format_sse(event)
+        finally:
+            subscription.close()
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 @phone_bp.route('/calls', methods=['GET'])
 @cross_origin()
 def get_calls():
-    """Get call history"""
+    """
+    Get call history, newest first, using keyset pagination
+    
+    Query parameters:
+        limit: Page size (per_page is accepted as an alias)
+        cursor: next_cursor value from the previous page
+        status: Filter by call_status
+        fields: Comma-separated columns to return (defaults to all list fields)
+        include_history: 'true' to attach conversation turns
+        total: 'approx' for a cached count or 'exact' for a live count
+    """
     try:
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 50, type=int)
+        limit = request.args.get('limit', request.args.get('per_page', 50, type=int), type=int)
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
         status = request.args.get('status')
-        
-        query = Call.query
+        include_history = request.args.get('include_history', 'false').lower() == 'true'
+        total_mode = request.args.get('total')
+        
+        fields = Call.LIST_FIELDS
+        if request.args.get('fields'):
+            fields = tuple(field.strip() for field in request.args['fields'].split(',') if field.strip())
+            unknown = [field for field in fields if field not in Call.LIST_FIELDS]
+            if unknown:
+                return jsonify({'error': f"Unknown fields: {', '.join(unknown)}"}), 400
+        
+        # id and start_time are always selected to build the cursor
+        columns = {'id', 'start_time', *fields}
+        if include_history:
+            columns.add('conversation_history')
+        query = db.session.query(*[getattr(Call, column) for column in columns])
         
         if status:
-            query = query.filter(Call.status == status)
-        
-        calls = query.order_by(Call.start_time.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
+            query = query.filter(Call.call_status == status)
+        
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                cursor_time, cursor_id = _decode_cursor(cursor)
+            except ValueError:
+                return jsonify({'error': 'Invalid cursor'}), 400
+            query = query.filter(db.or_(
+                Call.start_time < cursor_time,
+                db.and_(Call.start_time == cursor_time, Call.id < cursor_id)
+            ))
+        
+        # Fetch one extra row to learn whether another page exists
+        query = query.order_by(Call.start_time.desc(), Call.id.desc()).limit(limit + 1)
+        
+        total = None
+        if total_mode == 'exact':
+            total = _count_calls(status)
+        elif total_mode == 'approx':
+            total = _approximate_call_count(status)
+        
+        if limit > STREAM_PAGE_SIZE and not include_history:
+            return Response(
+                stream_with_context(_stream_calls(query.yield_per(STREAM_PAGE_SIZE), limit, fields, total)),
+                mimetype='application/json'
+            )
         
-        return jsonify({
-            'calls': [call.to_dict() for call in calls.items],
-            'total': calls.total,
-            'pages': calls.pages,
-            'current_page': page
-        })
+        rows = query.all()
+        page = rows[:limit]
+        calls = [Call.columns_to_dict(row, fields) for row in page]
+        if include_history:
+            _attach_history(page, calls)
         
+        data = {
+            'calls': calls,
+            'next_cursor': _encode_cursor(page[-1]) if len(rows) > limit else None
+        }
+        if total is not None:
+            data['total'] = total
+        return jsonify(data)
+    
     except Exception as e:
         logger.error(f"Error fetching calls: {e}")
         return jsonify({'error': str(e)}), 500
 
+def _encode_cursor(row):
+    """Encode the (start_time, id) position of a row as an opaque cursor"""
+    raw = json.dumps([row.start_time.isoformat(), row.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode('ascii')
+
+def _decode_cursor(cursor):
+    """Decode a cursor back to (start_time, id), raising ValueError if malformed"""
+    try:
+        start_time, call_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return datetime.fromisoformat(start_time), int(call_id)
+    except (TypeError, ValueError, UnicodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+def _count_calls(status=None):
+    """Count calls, optionally filtered by status"""
+    query = db.session.query(db.func.count(Call.id))
+    if status:
+        query = query.filter(Call.call_status == status)
+    return query.scalar()
+
+def _approximate_call_count(status=None):
+    """Return a call count that may be up to TOTAL_CACHE_SECONDS old"""
+    now = time.monotonic()
+    cached = _total_cache.get(status)
+    if cached and cached[0] > now:
+        cache_requests.inc(cache='call_count', result='hit')
+        return cached[1]
+    
+    cache_requests.inc(cache='call_count', result='miss')
+    count = _count_calls(status)
+    _total_cache[status] = (now + TOTAL_CACHE_SECONDS, count)
+    return count
+
+def _attach_history(rows, calls):
+    """Load the turns for a page of calls with a single query"""
+    call_ids = [row.id for row in rows]
+    turns_by_call = {}
+    for turn in CallTurn.query.filter(CallTurn.call_id.in_(call_ids)).order_by(CallTurn.call_id, CallTurn.seq):
+        turns_by_call.setdefault(turn.call_id, []).append(turn.to_dict())
+    
+    for row, call in zip(rows, calls):
+        history = turns_by_call.get(row.id)
+        if history is None:
+            history = json.loads(row.conversation_history) if row.conversation_history else []
+        call['conversation_history'] = history
+
+def _stream_calls(rows, limit, fields, total):
+    """Yield a calls page as JSON text, one row at a time"""
+    yield '{"calls": ['
+    last = None
+    has_more = False
+    for count, row in enumerate(rows):
+        if count == limit:
+            has_more = True
+            break
+        if last is not None:
+            yield ','
+        yield json.dumps(Call.columns_to_dict(row, fields))
+        last = row
+    
+    tail = {'next_cursor': _encode_cursor(last) if has_more else None}
+    if total is not None:
+        tail['total'] = total
+    yield '], ' + json.dumps(tail)[1:]
+
 @phone_bp.route('/calls/<call_sid>', methods=['GET'])
 @cross_origin()
 def get_call_details(call_sid):
-    """Get details of a specific call"""
+    """
+    Get details of a specific call from the local database
+    
+    Query Parameters:
+        refresh: 'true' to re-fetch the call and its recordings from Twilio first
+    """
     try:
+        if request.args.get('refresh', 'false').lower() == 'true' and twilio_service.client:
+            call_log_sync.refresh_call(call_sid)
+        
         call = Call.query.filter_by(session_id=call_sid).first()
         if not call:
             return jsonify({'error': 'Call not found'}), 404
         
-        # Get additional details from Twilio
-        twilio_details = twilio_service.get_call_details(call_sid)
-        
         call_data = call.to_dict()
-        if twilio_details:
-            call_data.update(twilio_details)
+        call_data['recordings'] = [
+            recording.to_dict()
+            for recording in CallRecording.query.filter_by(call_sid=call_sid).order_by(CallRecording.date_created)
+        ]
         
         return jsonify(call_data)
-        
+    
     except Exception as e:
         logger.error(f"Error fetching call details: {e}")
         return jsonify({'error': str(e)}), 500
 
+@phone_bp.route('/calls/sync', methods=['POST'])
+@cross_origin()
+def sync_call_logs():
+    """Pull call logs and recordings from Twilio since the last sync"""
+    try:
+        if not twilio_service.client:
+            return jsonify({'error': 'Twilio is not configured'}), 400
+        
+        return jsonify({'success': True, 'synced': call_log_sync.sync()})
+    
+    except Exception as e:
+        logger.error(f"Error syncing call logs: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@phone_bp.route('/calls/<call_sid>/turns', methods=['GET'])
+@cross_origin()
+def get_call_turns(call_sid):
+    """Get the conversation turns of a call, optionally after a given sequence number"""
+    try:
+        call = Call.query.filter_by(session_id=call_sid).first()
+        if not call:
+            return jsonify({'error': 'Call not found'}), 404
+        
+        after = request.args.get('after', 0, type=int)
+        turns = call.turns.filter(CallTurn.seq > after).all()
+        
+        return jsonify({
+            'call_sid': call_sid,
+            'turns': [turn.to_dict() for turn in turns]
+        })
+    
+    except Exception as e:
+        logger.error(f"Error fetching call turns: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @phone_bp.route('/calls/outbound', methods=['POST'])
 @cross_origin()
 def make_outbound_call():
@@ -265,7 +600,7 @@ def make_outbound_call():
                 session_id=result['call_sid'],
                 caller_phone=twilio_service.phone_number,
                 business_phone=to_number,
-                status='initiated',
+                call_status='initiated',
                 start_time=datetime.utcnow(),
                 direction='outbound'
             )
@@ -273,7 +608,7 @@ def make_outbound_call():
             db.session.commit()
         
         return jsonify(result)
-        
+    
     except Exception as e:
         logger.error(f"Error making outbound call: {e}")
         return jsonify({'error': str(e)}), 500
@@ -285,7 +620,7 @@ def get_phone_numbers():
     try:
         numbers = twilio_service.list_phone_numbers()
         return jsonify({'numbers': numbers})
-        
+    
     except Exception as e:
         logger.error(f"Error fetching phone numbers: {e}")
         return jsonify({'error': str(e)}), 500
@@ -305,7 +640,7 @@ def purchase_phone_number():
         )
         
         return jsonify(result)
-        
+    
     except Exception as e:
         logger.error(f"Error purchasing phone number: {e}")
         return jsonify({'error': str(e)}), 500
@@ -328,11 +663,61 @@ def configure_phone_number(number_sid):
         )
         
         return jsonify(result)
-        
+    
     except Exception as e:
         logger.error(f"Error configuring phone number: {e}")
         return jsonify({'error': str(e)}), 500
 
+@phone_bp.route('/tenants/<number>/config', methods=['GET'])
+@cross_origin()
+def get_tenant_config(number):
+    """Get the configuration overrides of the business reached at a number"""
+    try:
+        tenant = normalize_number(number)
+        return jsonify({'tenant': tenant, 'config': TenantConfig.get_configs(tenant)})
+    
+    except Exception as e:
+        logger.error(f"Error fetching tenant config: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@phone_bp.route('/tenants/<number>/config', methods=['PUT'])
+@cross_origin()
+def update_tenant_config(number):
+    """
+    Set configuration overrides of the business reached at a number
+    
+    Accepts a JSON object of config keys (business_name, business_hours,
+    services, default_voice, greeting_message, system_prompt, ...) to values.
+    Keys not set fall back to the global business configuration. The NLU
+    keys (custom_intents, intent_synonyms, service_synonyms,
+    response_templates) take JSON objects, see NLUService.compile_language.
+    """
+    try:
+        data = request.get_json()
+        if not isinstance(data, dict) or not data:
+            return jsonify({'error': 'A JSON object of config values is required'}), 400
+        
+        tenant = normalize_number(number)
+        if not tenant:
+            return jsonify({'error': 'Invalid phone number'}), 400
+        
+        values = {key: value if isinstance(value, str) else json.dumps(value) for key, value in data.items()}
+        
+        # Reject NLU configuration that calls would have to ignore
+        try:
+            nlu_service.compile_language(Tenant(tenant, {**tenant_registry.get(tenant).config, **values}, ()))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        for key, value in values.items():
+            TenantConfig.set_config(tenant, key, value)
+        
+        return jsonify({'tenant': tenant, 'config': TenantConfig.get_configs(tenant)})
+    
+    except Exception as e:
+        logger.error(f"Error updating tenant config: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @phone_bp.route('/test/voice', methods=['POST'])
 @cross_origin()
 def test_voice_response():
@@ -342,7 +727,6 @@ def test_voice_response():
         text = data.get('text', 'Hello, this is a test of the AI voice system.')
         
         # Use speech service to generate audio
-        speech_service = SpeechService()
         audio_result = speech_service.text_to_speech(text)
         
         if audio_result['success']:
@@ -356,7 +740,7 @@ def test_voice_response():
                 'success': False,
                 'error': audio_result['error']
             }), 500
-            
+    
     except Exception as e:
         logger.error(f"Error testing voice response: {e}")
         return jsonify({'error': str(e)}), 500
@@ -0,0 +1,118 @@
+"""
+Prompt Builder
+Chat prompts for the dialogue's LLM replies: the business's system message,
+built once per configuration version so every request of a tenant starts
+with an identical prefix the provider can cache, followed by as much of the
+conversation as fits a token budget
+"""
+
+import os
+from typing import Dict, List
+from src.services.tenants import Tenant
+
+HISTORY_TOKEN_BUDGET = int(os.getenv('PROMPT_HISTORY_TOKENS', '800'))  # Conversation sent with each reply request
+CHARS_PER_TOKEN = 4  # OpenAI's rule of thumb for English text
+MESSAGE_OVERHEAD_TOKENS = 4  # Role and separators added per chat message
+
+REPLY_INSTRUCTIONS = (
+    "You are an AI receptionist. Provide a helpful, professional response "
+    "as a receptionist would, in a few sentences suited to a phone call."
+)
+
+def estimate_tokens(text: str) -> int:
+    """
+    Tokens a chat message takes, estimated from its length
+    
+    Rounds up, so trimming to a budget errs on the side of sending less.
+    """
+    return -(-len(text) // CHARS_PER_TOKEN) + MESSAGE_OVERHEAD_TOKENS
+
+def system_message(tenant: Tenant) -> Dict[str, str]:
+    """
+    System message of a business's reply requests: its own system_prompt, or
+    the default instructions, followed by its details
+    
+    Build it through tenant.derived('reply_system_message', system_message),
+    so it is assembled once per configuration version.
+    """
+    business = tenant.business_config
+    instructions = tenant.config.get('system_prompt') or REPLY_INSTRUCTIONS
+    return {
+        'role': 'system',
+        'content': (
+            f"{instructions}\n\n"
+            f"Business: {business['name']}\n"
+            f"Business hours: {business['hours']}\n"
+            f"Location: {business['address']}\n"
+            f"Phone: {business['phone']}\n"
+            f"Email: {business['email']}\n"
+            f"Services: {', '.join(business['services'])}"
+        )
+    }
+
+class PromptHistory:
+    """A conversation as chat messages, appended turn by turn with their token estimates"""
+    
+    def __init__(self):
+        self.messages = []  # user and assistant message per turn, oldest first
+        self._turn_tokens = []
+    
+    def add_turn(self, user_input: str, bot_response: str):
+        """Append a completed turn; earlier messages are kept as they are"""
+        self.messages.append({'role': 'user', 'content': user_input})
+        self.messages.append({'role': 'assistant', 'content': bot_response})
+        self._turn_tokens.append(estimate_tokens(user_input) + estimate_tokens(bot_response))
+    
+    def recent(self, budget: int) -> List[Dict[str, str]]:
+        """
+        Messages of the most recent whole turns that fit in a token budget
+        
+        Args:
+            budget: Most tokens the messages may take
+        
+        Returns:
+            Messages, oldest first; the message dicts are shared, not copied
+        """
+        used = 0
+        turns = 0
+        for tokens in reversed(self._turn_tokens):
+            if used + tokens > budget:
+                break
+            used += tokens
+            turns += 1
+        return self.messages[len(self.messages) - 2 * turns:]
+    
+    def __len__(self):
+        return len(self._turn_tokens)
+
+class PromptBuilder:
+    def __init__(self, history_budget: int = HISTORY_TOKEN_BUDGET):
+        """
+        Initialize the builder
+        
+        Args:
+            history_budget: Most tokens of conversation sent with a request
+        """
+        self.history_budget = history_budget
+    
+    def build(self, tenant: Tenant, history: PromptHistory, user_input: str) -> List[Dict[str, str]]:
+        """
+        Messages of a reply request
+        
+        Args:
+            tenant: Business the conversation is with
+            history: Conversation so far
+            user_input: Caller's message to reply to
+        
+        Returns:
+            The tenant's cached system message, the recent conversation
+            within the history budget, and the caller's message
+        """
+        return [
+            tenant.derived('reply_system_message', system_message),
+            *history.recent(self.history_budget),
+            {'role': 'user', 'content': user_input}
+        ]
+
+# Process-wide builder shared by the dialogue service
+prompt_builder = PromptBuilder()
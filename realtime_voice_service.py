@@ -4,10 +4,73 @@ import base64
 import asyncio
 import websockets
 import logging
-from typing import Dict, Any, Optional, Callable
+from functools import lru_cache
+from typing import Dict, Any, Optional, Callable, Union
+from src.services.metrics import ExternalCall
 
 logger = logging.getLogger(__name__)
 
+REALTIME_URL = "wss://api.openai.com/v1/realtime?model=gpt-4o-realtime-preview-2024-10-01"
+
+# Event types worth logging
+LOG_EVENT_TYPES = frozenset([
+    'response.content.done',
+    'rate_limits.updated',
+    'response.done',
+    'input_audio_buffer.committed',
+    'input_audio_buffer.speech_stopped',
+    'input_audio_buffer.speech_started',
+    'session.created',
+    'session.updated',
+    'error'
+])
+
+SYSTEM_MESSAGE = (
+    "You are a helpful AI voice receptionist for a business. "
+    "You can help customers with appointments, business hours, services, "
+    "and general inquiries. Be professional, friendly, and concise. "
+    "If you need to book an appointment, ask for the customer's name, "
+    "preferred date and time, and contact information."
+)
+
+def tenant_instructions(tenant) -> str:
+    """Session instructions for a business: its own system_prompt, or the default with its details"""
+    if tenant.config.get('system_prompt'):
+        return tenant.config['system_prompt']
+    business = tenant.business_config
+    return (
+        f"{SYSTEM_MESSAGE} You answer calls for {business['name']}. "
+        f"Business hours: {business['hours']}. Location: {business['address']}. "
+        f"Services: {', '.join(business['services'])}."
+    )
+
+@lru_cache(maxsize=32)
+def _session_update_message(instructions: str, voice: str) -> str:
+    """Serialized session.update event, shared by every call with the same settings"""
+    return json.dumps({
+        "type": "session.update",
+        "session": {
+            "modalities": ["text", "audio"],
+            "instructions": instructions,
+            "voice": voice,
+            "input_audio_format": "g711_ulaw",
+            "output_audio_format": "g711_ulaw",
+            "input_audio_transcription": {
+                "model": "whisper-1"
+            },
+            "turn_detection": {
+                "type": "server_vad",
+                "threshold": 0.5,
+                "prefix_padding_ms": 300,
+                "silence_duration_ms": 200
+            },
+            "tools": [],
+            "tool_choice": "auto",
+            "temperature": 0.8,
+            "max_response_output_tokens": 4096
+        }
+    })
+
 class RealtimeVoiceService:
     def __init__(self, openai_api_key: str = None):
         self.openai_api_key = openai_api_key or os.getenv('OPENAI_API_KEY')
@@ -20,43 +83,26 @@ class RealtimeVoiceService:
         
         # Configuration
         self.voice = 'alloy'  # Options: alloy, echo, shimmer
-        self.system_message = (
-            "You are a helpful AI voice receptionist for a business. "
-            "You can help customers with appointments, business hours, services, "
-            "and general inquiries. Be professional, friendly, and concise. "
-            "If you need to book an appointment, ask for the customer's name, "
-            "preferred date and time, and contact information."
-        )
+        self.system_message = SYSTEM_MESSAGE
         
         # Event handlers
         self.on_audio_response: Optional[Callable] = None
         self.on_text_response: Optional[Callable] = None
+        self.on_transcript: Optional[Callable] = None
         self.on_session_update: Optional[Callable] = None
         self.on_error: Optional[Callable] = None
-        
-        # Log specific event types
-        self.log_event_types = [
-            'response.content.done',
-            'rate_limits.updated', 
-            'response.done',
-            'input_audio_buffer.committed',
-            'input_audio_buffer.speech_stopped',
-            'input_audio_buffer.speech_started',
-            'session.created',
-            'session.updated',
-            'error'
-        ]
     
     async def connect_to_openai(self):
         """Connect to OpenAI Realtime API"""
         try:
-            url = "wss://api.openai.com/v1/realtime?model=gpt-4o-realtime-preview-2024-10-01"
+            url = os.getenv('OPENAI_REALTIME_URL', REALTIME_URL)
             headers = {
                 "Authorization": f"Bearer {self.openai_api_key}",
                 "OpenAI-Beta": "realtime=v1"
             }
             
-            self.openai_ws = await websockets.connect(url, extra_headers=headers)
+            with ExternalCall('openai', 'realtime.connect'):
+                self.openai_ws = await websockets.connect(url, additional_headers=headers)
             self.is_connected = True
             logger.info("Connected to OpenAI Realtime API")
             
@@ -65,7 +111,7 @@ class RealtimeVoiceService:
             
             # Start listening for messages
             asyncio.create_task(self.listen_to_openai())
-            
+        
         except Exception as e:
             logger.error(f"Failed to connect to OpenAI: {e}")
             self.is_connected = False
@@ -74,38 +120,14 @@ class RealtimeVoiceService:
     
     async def configure_session(self):
         """Configure the OpenAI session with system message and voice settings"""
-        session_update = {
-            "type": "session.update",
-            "session": {
-                "modalities": ["text", "audio"],
-                "instructions": self.system_message,
-                "voice": self.voice,
-                "input_audio_format": "g711_ulaw",
-                "output_audio_format": "g711_ulaw",
-                "input_audio_transcription": {
-                    "model": "whisper-1"
-                },
-                "turn_detection": {
-                    "type": "server_vad",
-                    "threshold": 0.5,
-                    "prefix_padding_ms": 300,
-                    "silence_duration_ms": 200
-                },
-                "tools": [],
-                "tool_choice": "auto",
-                "temperature": 0.8,
-                "max_response_output_tokens": 4096
-            }
-        }
-        
-        await self.send_to_openai(session_update)
+        await self.send_to_openai(_session_update_message(self.system_message, self.voice))
         logger.info("Session configured with OpenAI")
     
-    async def send_to_openai(self, message: Dict[str, Any]):
-        """Send message to OpenAI Realtime API"""
+    async def send_to_openai(self, message: Union[Dict[str, Any], str]):
+        """Send an event, or an already serialized one, to OpenAI Realtime API"""
         if self.openai_ws and self.is_connected:
             try:
-                await self.openai_ws.send(json.dumps(message))
+                await self.openai_ws.send(message if isinstance(message, str) else json.dumps(message))
             except Exception as e:
                 logger.error(f"Error sending to OpenAI: {e}")
                 if self.on_error:
@@ -130,7 +152,7 @@ class RealtimeVoiceService:
         event_type = message.get('type')
         
         # Log specific events
-        if event_type in self.log_event_types:
+        if event_type in LOG_EVENT_TYPES:
             logger.info(f"OpenAI Event: {event_type}")
         
         # Handle different event types
@@ -157,6 +179,18 @@ class RealtimeVoiceService:
             if text_data and self.on_text_response:
                 await self.on_text_response(text_data)
         
+        elif event_type == 'conversation.item.input_audio_transcription.completed':
+            # Caller's speech transcribed by Whisper
+            transcript = message.get('transcript')
+            if transcript and self.on_transcript:
+                await self.on_transcript('user', transcript.strip())
+        
+        elif event_type == 'response.audio_transcript.done':
+            # Full text of the spoken reply
+            transcript = message.get('transcript')
+            if transcript and self.on_transcript:
+                await self.on_transcript('assistant', transcript.strip())
+        
         elif event_type == 'response.done':
             logger.info("Response completed")
         
@@ -306,6 +340,10 @@ class RealtimeVoiceService:
         """Set handler for text responses"""
         self.on_text_response = handler
     
+    def set_transcript_handler(self, handler: Callable):
+        """Set handler for completed transcripts (role, text)"""
+        self.on_transcript = handler
+    
     def set_session_update_handler(self, handler: Callable):
         """Set handler for session updates"""
         self.on_session_update = handler
@@ -0,0 +1,152 @@
+"""
+Service Registry
+Process-wide service objects that are built on first use, so importing the
+app neither imports nor constructs the OpenAI and Twilio clients
+"""
+
+import os
+import asyncio
+import threading
+import weakref
+from contextlib import asynccontextmanager
+from importlib import import_module
+
+OPENAI_TIMEOUT_SECONDS = float(os.getenv('OPENAI_TIMEOUT_SECONDS', '30'))  # Default per request; calls may pass their own
+OPENAI_MAX_CONNECTIONS = int(os.getenv('OPENAI_MAX_CONNECTIONS', '100'))  # Per async client, i.e. per event loop
+
+class LazyService:
+    """Proxy for a process-wide service instance, created on first attribute access"""
+    
+    def __init__(self, path: str):
+        """
+        Args:
+            path: 'module:Class' of the service, or of a function building it;
+                the module is imported on first use
+        """
+        self.path = path
+        self._instance = None
+        self._pid = None
+        self._lock = threading.Lock()
+    
+    def get(self):
+        """
+        Get this process's service instance, building it if needed
+        
+        An instance inherited from a parent process (e.g. a gunicorn --preload
+        master) is replaced rather than shared, since its HTTP connection
+        pools belong to the parent.
+        """
+        instance = self._instance
+        if instance is not None and self._pid == os.getpid():
+            return instance
+        
+        with self._lock:
+            if self._instance is None or self._pid != os.getpid():
+                module_name, class_name = self.path.split(':')
+                self._instance = getattr(import_module(module_name), class_name)()
+                self._pid = os.getpid()
+            return self._instance
+    
+    @property
+    def loaded(self) -> bool:
+        """Whether this process has built its instance yet"""
+        return self._instance is not None and self._pid == os.getpid()
+    
+    def reset(self):
+        """Drop the instance; the next use builds a new one"""
+        with self._lock:
+            self._instance = None
+            self._pid = None
+    
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+    
+    def __repr__(self):
+        return f'<LazyService {self.path} ({"loaded" if self.loaded else "not loaded"})>'
+
+class LoopLocalService:
+    """
+    Proxy for a service instance per asyncio event loop, created on first use
+    in each loop
+    
+    asyncio connections belong to the loop that opened them, so an async
+    client's pool can be shared by everything running on one loop (an async
+    server's worker, a media stream) but not across loops. Open connections
+    also keep their loop alive, so work on a short-lived loop (a Flask async
+    view, asyncio.run) runs inside scope() to have the instance closed.
+    """
+    
+    def __init__(self, path: str):
+        """
+        Args:
+            path: 'module:function' building the instance; the module is
+                imported on first use
+        """
+        self.path = path
+        self._instances = weakref.WeakKeyDictionary()  # Dropped with their loop, or by scope()
+        self._scopes = weakref.WeakKeyDictionary()  # Loop -> scopes open on it
+    
+    def get(self):
+        """
+        Get the running event loop's instance, building it if needed
+        
+        Raises:
+            RuntimeError: Called outside of a running event loop
+        """
+        loop = asyncio.get_running_loop()
+        instance = self._instances.get(loop)
+        if instance is None:
+            module_name, function_name = self.path.split(':')
+            instance = self._instances[loop] = getattr(import_module(module_name), function_name)()
+        return instance
+    
+    @asynccontextmanager
+    async def scope(self):
+        """
+        Use the running event loop's instance for a block, closing it when the
+        last block open on the loop ends
+        
+        Blocks on one loop (e.g. concurrent media streams of an async server)
+        share the instance; the next use after the last one builds a new one.
+        """
+        loop = asyncio.get_running_loop()
+        self._scopes[loop] = self._scopes.get(loop, 0) + 1
+        try:
+            yield self.get()
+        finally:
+            self._scopes[loop] -= 1
+            if not self._scopes[loop]:
+                del self._scopes[loop]
+                instance = self._instances.pop(loop, None)
+                if instance is not None and hasattr(instance, 'close'):
+                    await instance.close()
+    
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+    
+    def __repr__(self):
+        return f'<LoopLocalService {self.path} ({len(self._instances)} loops)>'
+
+def build_openai_client():
+    """OpenAI client whose HTTP requests are recorded in the external request metrics"""
+    import httpx
+    from openai import OpenAI, DefaultHttpxClient
+    from src.services.metrics import TimedTransport
+    return OpenAI(http_client=DefaultHttpxClient(transport=TimedTransport('openai', httpx.HTTPTransport())))
+
+def build_async_openai_client():
+    """AsyncOpenAI client for the running event loop, recorded in the external request metrics like the sync one"""
+    import httpx
+    from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+    from src.services.metrics import TimedTransport
+    limits = httpx.Limits(max_connections=OPENAI_MAX_CONNECTIONS, max_keepalive_connections=OPENAI_MAX_CONNECTIONS)
+    transport = TimedTransport('openai', httpx.AsyncHTTPTransport(limits=limits))
+    return AsyncOpenAI(http_client=DefaultAsyncHttpxClient(transport=transport), timeout=OPENAI_TIMEOUT_SECONDS)
+
+# Global services
+openai_client = LazyService('src.services.registry:build_openai_client')  # One connection pool shared by every service
+async_openai_client = LoopLocalService('src.services.registry:build_async_openai_client')  # One pool per event loop
+nlu_service = LazyService('src.services.nlu_service:NLUService')
+speech_service = LazyService('src.services.speech_service:SpeechService')
+dialogue_service = LazyService('src.services.dialogue_service:DialogueService')
+twilio_service = LazyService('src.services.twilio_service:TwilioService')
@@ -0,0 +1,49 @@
+"""
+Reminder Model
+Confirmation and reminder messages owed for each appointment, with their
+delivery progress
+"""
+
+from src.models.user import db
+from datetime import datetime
+
+class AppointmentReminder(db.Model):
+    """Model for one scheduled confirmation or reminder message of an appointment"""
+    __tablename__ = 'appointment_reminders'
+    __table_args__ = (
+        db.UniqueConstraint('appointment_id', 'kind', name='uq_appointment_reminders_kind'),
+        db.Index('ix_appointment_reminders_due', 'status', 'fire_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    appointment_id = db.Column(db.Integer, db.ForeignKey('appointments.id'), nullable=False)
+    kind = db.Column(db.String(20), nullable=False)  # confirmation, reminder
+    
+    # Delivery
+    fire_at = db.Column(db.DateTime, nullable=False)  # Business local time, like appointment times
+    status = db.Column(db.String(20), default='pending')  # pending, sending, sent, failed, cancelled, expired
+    attempts = db.Column(db.Integer, default=0)
+    message_sid = db.Column(db.String(100), nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    sent_at = db.Column(db.DateTime, nullable=True)
+    
+    # Metadata
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<AppointmentReminder {self.appointment_id}:{self.kind} ({self.status})>'
+    
+    def to_dict(self):
+        """Convert reminder object to dictionary"""
+        return {
+            'id': self.id,
+            'appointment_id': self.appointment_id,
+            'kind': self.kind,
+            'fire_at': self.fire_at.isoformat() if self.fire_at else None,
+            'status': self.status,
+            'attempts': self.attempts,
+            'message_sid': self.message_sid,
+            'last_error': self.last_error,
+            'sent_at': self.sent_at.isoformat() if self.sent_at else None
+        }
@@ -0,0 +1,366 @@
+"""
+Reminder Scheduler Service
+Sends appointment confirmations and day-before reminders by SMS from a
+time-ordered heap kept in step with the appointments table
+"""
+
+import heapq
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from src.models.user import db
+from src.models.call import Appointment
+from src.models.reminder import AppointmentReminder
+from src.services.registry import twilio_service
+from src.services.entity_extractor import business_now
+from src.services.tenants import tenant_registry
+
+logger = logging.getLogger(__name__)
+
+# Messages owed for every appointment: kind -> lead time before the appointment
+# (None sends as soon as the appointment is booked)
+REMINDER_LEAD_TIMES = {
+    'confirmation': None,
+    'reminder': timedelta(hours=24),
+}
+
+BATCH_SIZE = 100
+MAX_WAIT_SECONDS = 60.0  # Longest sleep, so other processes' bookings are noticed
+RELOAD_SECONDS = 300  # How often the heap is rebuilt from the database
+SENDING_TIMEOUT = timedelta(minutes=10)  # Claimed reminders never confirmed as sent
+
+# Appointment statuses that no longer need messages
+INACTIVE_STATUSES = ('cancelled', 'completed')
+
+MESSAGES = {
+    'confirmation': "Hi {name}, your {service} appointment with {business} is booked for {date} at {time}. "
+                    "Reply or call us if you need to make changes.",
+    'reminder': "Hi {name}, this is a reminder of your {service} appointment with {business} "
+                "tomorrow, {date} at {time}.",
+}
+
+def appointment_start(appointment: Appointment) -> datetime:
+    """Start of an appointment in business local time"""
+    return datetime.combine(appointment.appointment_date, appointment.appointment_time)
+
+def reminder_fire_times(appointment: Appointment, now: datetime) -> Dict[str, datetime]:
+    """
+    When each message of an appointment is due
+    
+    Reminders whose time has already passed at booking are skipped, since
+    the confirmation covers them.
+    """
+    start = appointment_start(appointment)
+    fire_times = {}
+    for kind, lead_time in REMINDER_LEAD_TIMES.items():
+        fire_at = now if lead_time is None else start - lead_time
+        if lead_time is None or fire_at > now:
+            fire_times[kind] = fire_at
+    return fire_times
+
+class ReminderScheduler:
+    def __init__(self, twilio_service, batch_size: int = BATCH_SIZE):
+        """
+        Initialize the scheduler
+        
+        Args:
+            twilio_service: TwilioService used to send messages
+            batch_size: Reminders claimed and sent per round
+        """
+        self.twilio = twilio_service
+        self.batch_size = batch_size
+        self._heap = []  # (fire_at, appointment_id, kind)
+        self._scheduled = {}  # (appointment_id, kind) -> fire_at of the live heap entry
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+    
+    def schedule(self, appointment_id: int, kind: str, fire_at: datetime):
+        """
+        Add or move a reminder in O(log n)
+        
+        The previous heap entry, if any, is left in place and skipped when
+        popped because it no longer matches the live fire time.
+        """
+        with self._lock:
+            key = (appointment_id, kind)
+            self._scheduled[key] = fire_at
+            heapq.heappush(self._heap, (fire_at, appointment_id, kind))
+            earliest = self._heap[0][0] == fire_at
+            self._compact()
+        if earliest:
+            self._wakeup.set()
+    
+    def cancel(self, appointment_id: int, kind: Optional[str] = None):
+        """Drop one or all reminders of an appointment from the heap"""
+        with self._lock:
+            kinds = [kind] if kind else list(REMINDER_LEAD_TIMES)
+            for name in kinds:
+                self._scheduled.pop((appointment_id, name), None)
+    
+    def load(self) -> int:
+        """
+        Rebuild the heap from pending reminders in the database
+        
+        Returns:
+            Number of pending reminders
+        """
+        rows = db.session.query(
+            AppointmentReminder.fire_at, AppointmentReminder.appointment_id, AppointmentReminder.kind
+        ).filter(AppointmentReminder.status == 'pending').all()
+        
+        with self._lock:
+            self._heap = [tuple(row) for row in rows]
+            heapq.heapify(self._heap)
+            self._scheduled = {(appointment_id, kind): fire_at for fire_at, appointment_id, kind in self._heap}
+        self._wakeup.set()
+        return len(rows)
+    
+    def pending_count(self) -> int:
+        """Number of live reminders waiting to fire"""
+        return len(self._scheduled)
+    
+    def next_fire_time(self) -> Optional[datetime]:
+        """Fire time of the earliest live reminder"""
+        with self._lock:
+            self._discard_stale()
+            return self._heap[0][0] if self._heap else None
+    
+    def pop_due(self, now: datetime, limit: int) -> List[Tuple[int, str]]:
+        """Remove and return up to limit reminders due at or before now"""
+        due = []
+        with self._lock:
+            while self._heap and len(due) < limit:
+                self._discard_stale()
+                if not self._heap or self._heap[0][0] > now:
+                    break
+                _, appointment_id, kind = heapq.heappop(self._heap)
+                del self._scheduled[(appointment_id, kind)]
+                due.append((appointment_id, kind))
+        return due
+    
+    def fire_due(self, now: Optional[datetime] = None) -> int:
+        """
+        Send every reminder due by now, one batch at a time
+        
+        Each batch is claimed in the database before any message goes out,
+        so a restart part-way through never sends a message twice.
+        
+        Returns:
+            Number of messages sent
+        """
+        now = now or business_now()
+        sent = 0
+        while True:
+            due = self.pop_due(now, self.batch_size)
+            if not due:
+                return sent
+            sent += self._send_batch(due, now)
+    
+    def _send_batch(self, due: List[Tuple[int, str]], now: datetime) -> int:
+        """Claim, send and record one batch of due reminders"""
+        wanted = set(due)
+        candidates = db.session.query(AppointmentReminder, Appointment).join(
+            Appointment, Appointment.id == AppointmentReminder.appointment_id
+        ).filter(
+            AppointmentReminder.appointment_id.in_({appointment_id for appointment_id, _ in due}),
+            AppointmentReminder.status == 'pending',
+            AppointmentReminder.fire_at <= now
+        ).all()
+        batch = [(reminder, appointment) for reminder, appointment in candidates
+                 if (reminder.appointment_id, reminder.kind) in wanted]
+        if not batch:
+            return 0
+        
+        # Guarded claim: only rows still pending are ours, even with several processes
+        claimed = []
+        for reminder, appointment in batch:
+            result = db.session.execute(
+                db.update(AppointmentReminder)
+                .where(AppointmentReminder.id == reminder.id, AppointmentReminder.status == 'pending')
+                .values(status='sending', attempts=AppointmentReminder.attempts + 1, updated_at=datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount:
+                claimed.append((reminder, appointment))
+        db.session.commit()
+        
+        sent = 0
+        for reminder, appointment in claimed:
+            if appointment.status in INACTIVE_STATUSES or appointment_start(appointment) <= now:
+                reminder.status = 'expired'
+                continue
+            
+            # Signed by, and sent from the number of, the business the appointment is with
+            business = tenant_registry.get(appointment.business_phone)
+            start = appointment_start(appointment)
+            body = MESSAGES[reminder.kind].format(
+                name=appointment.customer_name,
+                service=appointment.service_type,
+                business=business.business_config['name'],
+                date=start.strftime('%A, %B %d'),
+                time=start.strftime('%I:%M %p').lstrip('0')
+            )
+            result = self.twilio.send_sms(appointment.customer_phone, body, from_number=business.number)
+            
+            if result['success']:
+                reminder.status = 'sent'
+                reminder.message_sid = result['message_sid']
+                reminder.sent_at = datetime.utcnow()
+                sent += 1
+            else:
+                reminder.status = 'failed'
+                reminder.last_error = result.get('error')
+        
+        db.session.commit()
+        return sent
+    
+    def recover(self, now: Optional[datetime] = None) -> int:
+        """
+        Mark reminders left claimed by a crashed run as failed
+        
+        Whether their message went out is unknown, so they are not resent.
+        
+        Returns:
+            Number of reminders recovered
+        """
+        now = now or datetime.utcnow()
+        result = db.session.execute(
+            db.update(AppointmentReminder)
+            .where(AppointmentReminder.status == 'sending',
+                   AppointmentReminder.updated_at < now - SENDING_TIMEOUT)
+            .values(status='failed', last_error='Interrupted while sending')
+        )
+        db.session.commit()
+        return result.rowcount
+    
+    def start(self, app):
+        """Load pending reminders and start sending them in the background"""
+        if self.twilio.client is None:
+            logger.info("Twilio not configured; appointment reminders disabled")
+            return
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, args=(app,), name='reminder-scheduler', daemon=True)
+        self._thread.start()
+    
+    def _run(self, app):
+        """Worker loop: sleep until the earliest reminder is due, then send a batch"""
+        with app.app_context():
+            last_load = None
+            while True:
+                try:
+                    if last_load is None or datetime.utcnow() - last_load > timedelta(seconds=RELOAD_SECONDS):
+                        self.recover()
+                        self.load()
+                        last_load = datetime.utcnow()
+                    self.fire_due()
+                except Exception as e:
+                    logger.error(f"Error sending appointment reminders: {e}")
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+                
+                next_fire = self.next_fire_time()
+                wait = MAX_WAIT_SECONDS
+                if next_fire is not None:
+                    wait = max(0.0, min(wait, (next_fire - business_now()).total_seconds()))
+                self._wakeup.wait(wait)
+                self._wakeup.clear()
+    
+    def _discard_stale(self):
+        """Pop heap entries that were moved or cancelled (caller holds the lock)"""
+        while self._heap:
+            fire_at, appointment_id, kind = self._heap[0]
+            if self._scheduled.get((appointment_id, kind)) == fire_at:
+                return
+            heapq.heappop(self._heap)
+    
+    def _compact(self):
+        """Rebuild the heap once stale entries outnumber live ones (caller holds the lock)"""
+        if len(self._heap) > 2 * len(self._scheduled) + 64:
+            self._heap = [(fire_at, appointment_id, kind)
+                          for (appointment_id, kind), fire_at in self._scheduled.items()]
+            heapq.heapify(self._heap)
+
+# Process-wide scheduler kept in step with appointment changes by the events below
+reminder_scheduler = ReminderScheduler(twilio_service)
+
+def _queue_heap_update(target, operation):
+    """Apply a heap change once the session that made it commits"""
+    session = inspect(target).session
+    if session is not None:
+        session.info.setdefault('reminder_updates', []).append(operation)
+
+@event.listens_for(Appointment, 'after_insert')
+def _appointment_inserted(mapper, connection, appointment):
+    """Persist and schedule the messages owed for a new appointment"""
+    if appointment.status in INACTIVE_STATUSES:
+        return
+    
+    fire_times = reminder_fire_times(appointment, business_now())
+    connection.execute(AppointmentReminder.__table__.insert(), [
+        {'appointment_id': appointment.id, 'kind': kind, 'fire_at': fire_at, 'status': 'pending',
+         'attempts': 0, 'created_at': datetime.utcnow(), 'updated_at': datetime.utcnow()}
+        for kind, fire_at in fire_times.items()
+    ])
+    for kind, fire_at in fire_times.items():
+        _queue_heap_update(appointment, ('schedule', appointment.id, kind, fire_at))
+
+@event.listens_for(Appointment, 'after_update')
+def _appointment_updated(mapper, connection, appointment):
+    """Cancel reminders of cancelled appointments and move those of rescheduled ones"""
+    state = inspect(appointment)
+    table = AppointmentReminder.__table__
+    pending = (table.c.appointment_id == appointment.id) & (table.c.status == 'pending')
+    
+    if state.attrs.status.history.has_changes() and appointment.status in INACTIVE_STATUSES:
+        connection.execute(table.update().where(pending).values(status='cancelled', updated_at=datetime.utcnow()))
+        _queue_heap_update(appointment, ('cancel', appointment.id, None, None))
+        return
+    
+    if state.attrs.appointment_date.history.has_changes() or state.attrs.appointment_time.history.has_changes():
+        now = business_now()
+        fire_at = appointment_start(appointment) - REMINDER_LEAD_TIMES['reminder']
+        # A reminder already sent for the old time is owed again for the new one,
+        # unless the new time is too close for it
+        status = 'pending' if fire_at > now else 'cancelled'
+        result = connection.execute(
+            table.update()
+            .where((table.c.appointment_id == appointment.id) & (table.c.kind == 'reminder'))
+            .values(fire_at=fire_at, status=status, updated_at=datetime.utcnow())
+        )
+        if result.rowcount == 0 and status == 'pending':
+            connection.execute(table.insert().values(
+                appointment_id=appointment.id, kind='reminder', fire_at=fire_at, status='pending',
+                attempts=0, created_at=datetime.utcnow(), updated_at=datetime.utcnow()
+            ))
+        
+        if status == 'pending':
+            _queue_heap_update(appointment, ('schedule', appointment.id, 'reminder', fire_at))
+        else:
+            _queue_heap_update(appointment, ('cancel', appointment.id, 'reminder', None))
+
+@event.listens_for(Appointment, 'after_delete')
+def _appointment_deleted(mapper, connection, appointment):
+    """Remove the reminders of a deleted appointment"""
+    table = AppointmentReminder.__table__
+    connection.execute(table.delete().where(table.c.appointment_id == appointment.id))
+    _queue_heap_update(appointment, ('cancel', appointment.id, None, None))
+
+@event.listens_for(Session, 'after_commit')
+def _apply_heap_updates(session):
+    """Mirror committed reminder changes into the scheduler's heap"""
+    for operation, appointment_id, kind, fire_at in session.info.pop('reminder_updates', []):
+        if operation == 'schedule':
+            reminder_scheduler.schedule(appointment_id, kind, fire_at)
+        else:
+            reminder_scheduler.cancel(appointment_id, kind)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_heap_updates(session):
+    """Forget heap changes from a transaction that was rolled back"""
+    session.info.pop('reminder_updates', None)
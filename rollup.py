@@ -0,0 +1,179 @@
+"""
+Analytics Rollup Models
+Hourly and daily call/appointment counters maintained incrementally as
+calls end and appointments are created
+"""
+
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from src.models.user import db
+from src.models.call import Call, Appointment
+
+GRANULARITIES = ('hour', 'day')
+
+# Call statuses after which a call no longer changes
+TERMINAL_CALL_STATUSES = ('completed', 'failed', 'busy', 'no-answer', 'canceled')
+
+class CallRollup(db.Model):
+    """Model for pre-aggregated call and appointment counters per time bucket"""
+    __tablename__ = 'call_rollups'
+    __table_args__ = (
+        db.UniqueConstraint('granularity', 'bucket_start', name='uq_call_rollups_bucket'),
+    )
+    
+    # Counters incremented by record_* functions
+    COUNTERS = ('calls', 'completed_calls', 'appointments_booked', 'leads_qualified',
+                'duration_sum', 'duration_count')
+    
+    id = db.Column(db.Integer, primary_key=True)
+    granularity = db.Column(db.String(10), nullable=False)  # hour, day
+    bucket_start = db.Column(db.DateTime, nullable=False)
+    
+    calls = db.Column(db.Integer, default=0, nullable=False)
+    completed_calls = db.Column(db.Integer, default=0, nullable=False)
+    appointments_booked = db.Column(db.Integer, default=0, nullable=False)
+    leads_qualified = db.Column(db.Integer, default=0, nullable=False)
+    duration_sum = db.Column(db.Integer, default=0, nullable=False)
+    duration_count = db.Column(db.Integer, default=0, nullable=False)
+    
+    def __repr__(self):
+        return f'<CallRollup {self.granularity} {self.bucket_start}>'
+    
+    def to_dict(self):
+        """Convert rollup object to dictionary"""
+        return {
+            'bucket_start': self.bucket_start.isoformat(),
+            'calls': self.calls,
+            'completed_calls': self.completed_calls,
+            'appointments_booked': self.appointments_booked,
+            'leads_qualified': self.leads_qualified,
+            'average_duration_seconds': round(self.duration_sum / self.duration_count) if self.duration_count else 0
+        }
+
+class IntentRollup(db.Model):
+    """Model for per-bucket histogram of primary call intents"""
+    __tablename__ = 'intent_rollups'
+    __table_args__ = (
+        db.UniqueConstraint('granularity', 'bucket_start', 'intent', name='uq_intent_rollups_bucket'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    granularity = db.Column(db.String(10), nullable=False)
+    bucket_start = db.Column(db.DateTime, nullable=False)
+    intent = db.Column(db.String(50), nullable=False)
+    count = db.Column(db.Integer, default=0, nullable=False)
+    
+    def __repr__(self):
+        return f'<IntentRollup {self.granularity} {self.bucket_start} {self.intent}>'
+
+def bucket_start(moment, granularity):
+    """Truncate a datetime to the start of its hour or day bucket"""
+    if granularity == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def bucket_range(start, end, granularity):
+    """List bucket starts from start to end inclusive"""
+    step = timedelta(hours=1) if granularity == 'hour' else timedelta(days=1)
+    current = bucket_start(start, granularity)
+    buckets = []
+    while current <= end:
+        buckets.append(current)
+        current += step
+    return buckets
+
+def _upsert_increment(connection, table, keys, increments):
+    """Add increments to the row identified by keys, creating it if needed"""
+    if connection.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    
+    statement = insert(table).values(**keys, **increments)
+    statement = statement.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={column: table.c[column] + statement.excluded[column] for column in increments}
+    )
+    connection.execute(statement)
+
+def record_call_end(connection, call):
+    """
+    Add a finished call to every rollup bucket it belongs to
+    
+    Args:
+        connection: Connection taking part in the current flush
+        call: Call that just reached a terminal status
+    """
+    increments = {
+        'calls': 1,
+        'completed_calls': 1 if (call.call_status or '').lower() == 'completed' else 0,
+        'leads_qualified': 1 if call.lead_qualified else 0,
+        'duration_sum': call.duration_seconds or 0,
+        'duration_count': 1 if call.duration_seconds is not None else 0
+    }
+    started = call.start_time or datetime.utcnow()
+    
+    for granularity in GRANULARITIES:
+        keys = {'granularity': granularity, 'bucket_start': bucket_start(started, granularity)}
+        _upsert_increment(connection, CallRollup.__table__, keys, increments)
+        if call.primary_intent:
+            _upsert_increment(connection, IntentRollup.__table__,
+                              {**keys, 'intent': call.primary_intent}, {'count': 1})
+
+def record_appointment(connection, appointment):
+    """
+    Count a newly booked appointment in the bucket it was booked in
+    
+    Args:
+        connection: Connection taking part in the current flush
+        appointment: Appointment that was just inserted
+    """
+    booked = appointment.created_at or datetime.utcnow()
+    for granularity in GRANULARITIES:
+        keys = {'granularity': granularity, 'bucket_start': bucket_start(booked, granularity)}
+        _upsert_increment(connection, CallRollup.__table__, keys, {'appointments_booked': 1})
+
+def _is_terminal(status):
+    """Whether a call status means the call is over"""
+    return isinstance(status, str) and status.lower() in TERMINAL_CALL_STATUSES
+
+@event.listens_for(Call.call_status, 'set', active_history=True)
+def _call_status_set(call, value, previous, initiator):
+    """Flag calls moving into a terminal status so the next flush counts them once"""
+    if _is_terminal(value) and not _is_terminal(previous):
+        call._rollup_pending = True
+
+@event.listens_for(Call, 'after_insert')
+def _call_inserted(mapper, connection, call):
+    """Count calls that are stored already finished (e.g. synced from Twilio)"""
+    call._rollup_pending = False
+    if _is_terminal(call.call_status):
+        record_call_end(connection, call)
+
+@event.listens_for(Call, 'after_update')
+def _call_updated(mapper, connection, call):
+    """Count calls the moment they move into a terminal status"""
+    if getattr(call, '_rollup_pending', False):
+        call._rollup_pending = False
+        record_call_end(connection, call)
+
+@event.listens_for(Appointment, 'after_insert')
+def _appointment_inserted(mapper, connection, appointment):
+    """Count every newly inserted appointment"""
+    record_appointment(connection, appointment)
+
+def rebuild_rollups():
+    """
+    Recompute all rollups from the calls and appointments tables
+    
+    Used once to backfill history recorded before rollups existed; regular
+    updates happen incrementally through the mapper events above.
+    """
+    db.session.execute(CallRollup.__table__.delete())
+    db.session.execute(IntentRollup.__table__.delete())
+    
+    for call in Call.query.filter(db.func.lower(Call.call_status).in_(TERMINAL_CALL_STATUSES)).yield_per(1000):
+        record_call_end(db.session.connection(), call)
+    for appointment in Appointment.query.yield_per(1000):
+        record_appointment(db.session.connection(), appointment)
+    db.session.commit()
@@ -5,14 +5,20 @@ Handles Speech-to-Text and Text-to-Speech functionality using OpenAI APIs
 
 import os
 import io
+import logging
 import tempfile
-from openai import OpenAI
-from typing import Optional, Union
+from typing import AsyncIterator, Iterable, Iterator, Optional, Union
+from src.services.audio_codec import UlawEncoder, TTS_SAMPLE_RATE
+from src.services.registry import openai_client, async_openai_client, OPENAI_TIMEOUT_SECONDS
+from src.services.tracing import tracer
+
+logger = logging.getLogger(__name__)
 
 class SpeechService:
     def __init__(self):
-        """Initialize the Speech Service with OpenAI client"""
-        self.client = OpenAI()
+        """Initialize the Speech Service with the process's shared OpenAI clients"""
+        self.client = openai_client
+        self.async_client = async_openai_client  # The running event loop's
     
     def speech_to_text(self, audio_file: Union[str, io.BytesIO], language: Optional[str] = None) -> str:
         """
@@ -29,7 +35,7 @@ class SpeechService:
             # Handle different input types
             if isinstance(audio_file, str):
                 # File path provided
-                with open(audio_file, 'rb') as f:
+                with open(audio_file, 'rb') as f, tracer.span('openai.transcription', service='openai'):
                     transcript = self.client.audio.transcriptions.create(
                         model="whisper-1",
                         file=f,
@@ -38,18 +44,58 @@ class SpeechService:
             elif isinstance(audio_file, io.BytesIO):
                 # BytesIO object provided
                 audio_file.seek(0)  # Reset to beginning
-                transcript = self.client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file,
-                    language=language
-                )
+                with tracer.span('openai.transcription', service='openai'):
+                    transcript = self.client.audio.transcriptions.create(
+                        model="whisper-1",
+                        file=audio_file,
+                        language=language
+                    )
             else:
                 raise ValueError("audio_file must be a file path string or BytesIO object")
             
             return transcript.text
         
         except Exception as e:
-            print(f"Error in speech-to-text conversion: {str(e)}")
+            logger.error(f"Error in speech-to-text conversion: {e}")
+            raise
+    
+    async def speech_to_text_async(self, audio_file: Union[str, io.BytesIO], language: Optional[str] = None,
+                                   timeout: Optional[float] = None) -> str:
+        """
+        Convert speech audio to text without blocking the event loop
+        
+        Like speech_to_text; cancelling the awaiting task aborts the request.
+        
+        Args:
+            audio_file: Path to audio file or BytesIO object containing audio data
+            language: Optional language code (e.g., 'en', 'es', 'fr')
+            timeout: Seconds to wait for the transcription (default OPENAI_TIMEOUT_SECONDS)
+        
+        Returns:
+            Transcribed text from the audio
+        """
+        try:
+            if isinstance(audio_file, str):
+                with open(audio_file, 'rb') as f:
+                    audio = io.BytesIO(f.read())
+                audio.name = os.path.basename(audio_file)
+            elif isinstance(audio_file, io.BytesIO):
+                audio = audio_file
+                audio.seek(0)
+            else:
+                raise ValueError("audio_file must be a file path string or BytesIO object")
+            
+            with tracer.span('openai.transcription', service='openai'):
+                transcript = await self.async_client.audio.transcriptions.create(
+                    model="whisper-1",
+                    file=audio,
+                    language=language,
+                    timeout=timeout or OPENAI_TIMEOUT_SECONDS
+                )
+            return transcript.text
+        
+        except Exception as e:
+            logger.error(f"Error in speech-to-text conversion: {e}")
             raise
     
     def text_to_speech(self, text: str, voice: str = "alloy", output_path: Optional[str] = None) -> Union[str, bytes]:
@@ -65,31 +111,142 @@ class SpeechService:
             If output_path is provided, returns the path to the saved file
             Otherwise, returns the audio data as bytes
         """
+        audio_stream = self.stream_text_to_speech(text, voice=voice)
+        
+        if output_path:
+            # Write chunks to disk as they arrive
+            with open(output_path, 'wb') as f:
+                for chunk in audio_stream:
+                    f.write(chunk)
+            return output_path
+        else:
+            # Return audio data as bytes
+            return b''.join(audio_stream)
+    
+    def stream_text_to_speech(self, text: str, voice: str = "alloy", response_format: str = "mp3",
+                              chunk_size: int = 4096) -> Iterator[bytes]:
+        """
+        Stream synthesized speech as it is generated by the OpenAI TTS API
+        
+        Args:
+            text: Text to convert to speech
+            voice: Voice to use (alloy, echo, fable, onyx, nova, shimmer)
+            response_format: mp3, opus, aac, flac, wav, pcm, or 'ulaw' for
+                8 kHz G.711 mu-law ready to send to Twilio
+            chunk_size: Number of bytes to read from the API per chunk
+        
+        Yields:
+            Audio data chunks in the requested format
+        """
+        # Available voices: alloy, echo, fable, onyx, nova, shimmer
+        if voice not in self.get_available_voices():
+            voice = "alloy"  # Default fallback
+        
+        api_format = 'pcm' if response_format == 'ulaw' else response_format
+        
         try:
-            # Available voices: alloy, echo, fable, onyx, nova, shimmer
-            valid_voices = ["alloy", "echo", "fable", "onyx", "nova", "shimmer"]
-            if voice not in valid_voices:
-                voice = "alloy"  # Default fallback
-            
-            response = self.client.audio.speech.create(
-                model="tts-1",
-                voice=voice,
-                input=text
-            )
-            
-            if output_path:
-                # Save to file
-                with open(output_path, 'wb') as f:
-                    f.write(response.content)
-                return output_path
-            else:
-                # Return audio data as bytes
-                return response.content
+            with tracer.span('openai.speech', service='openai') as span, \
+                    self.client.audio.speech.with_streaming_response.create(
+                        model="tts-1",
+                        voice=voice,
+                        input=text,
+                        response_format=api_format
+                    ) as response:
+                chunks = response.iter_bytes(chunk_size)
+                if response_format == 'ulaw':
+                    chunks = self.pcm_to_ulaw(chunks)
+                for chunk in chunks:
+                    if span is not None and 'first_chunk_ms' not in span.attrs:
+                        span.mark('first_chunk_ms')
+                    yield chunk
         
         except Exception as e:
-            print(f"Error in text-to-speech conversion: {str(e)}")
+            logger.error(f"Error in text-to-speech conversion: {e}")
             raise
     
+    async def text_to_speech_async(self, text: str, voice: str = "alloy", timeout: Optional[float] = None) -> bytes:
+        """
+        Convert text to speech without blocking the event loop
+        
+        Args:
+            text: Text to convert to speech
+            voice: Voice to use (alloy, echo, fable, onyx, nova, shimmer)
+            timeout: Seconds to wait for each read from the API (default OPENAI_TIMEOUT_SECONDS)
+        
+        Returns:
+            The audio data as MP3 bytes
+        """
+        return b''.join([chunk async for chunk in self.stream_text_to_speech_async(text, voice=voice, timeout=timeout)])
+    
+    async def stream_text_to_speech_async(self, text: str, voice: str = "alloy", response_format: str = "mp3",
+                                          chunk_size: int = 4096, timeout: Optional[float] = None) -> AsyncIterator[bytes]:
+        """
+        Stream synthesized speech without blocking the event loop
+        
+        Like stream_text_to_speech; closing the generator or cancelling the
+        consuming task (e.g. the caller barged in) closes the request.
+        
+        Args:
+            text: Text to convert to speech
+            voice: Voice to use (alloy, echo, fable, onyx, nova, shimmer)
+            response_format: mp3, opus, aac, flac, wav, pcm, or 'ulaw' for
+                8 kHz G.711 mu-law ready to send to Twilio
+            chunk_size: Number of bytes to read from the API per chunk
+            timeout: Seconds to wait for each read from the API (default OPENAI_TIMEOUT_SECONDS)
+        
+        Yields:
+            Audio data chunks in the requested format
+        """
+        if voice not in self.get_available_voices():
+            voice = "alloy"  # Default fallback
+        
+        api_format = 'pcm' if response_format == 'ulaw' else response_format
+        encoder = UlawEncoder(TTS_SAMPLE_RATE) if response_format == 'ulaw' else None
+        
+        try:
+            with tracer.span('openai.speech', service='openai') as span:
+                async with self.async_client.audio.speech.with_streaming_response.create(
+                    model="tts-1",
+                    voice=voice,
+                    input=text,
+                    response_format=api_format,
+                    timeout=timeout or OPENAI_TIMEOUT_SECONDS
+                ) as response:
+                    async for chunk in response.iter_bytes(chunk_size):
+                        if encoder is not None:
+                            chunk = encoder.encode(chunk)
+                            if not chunk:
+                                continue
+                        if span is not None and 'first_chunk_ms' not in span.attrs:
+                            span.mark('first_chunk_ms')
+                        yield chunk
+        
+        except Exception as e:
+            logger.error(f"Error in text-to-speech conversion: {e}")
+            raise
+    
+    @staticmethod
+    def pcm_to_ulaw(chunks: Iterable[bytes], input_rate: int = TTS_SAMPLE_RATE) -> Iterator[bytes]:
+        """
+        Convert a stream of 16-bit PCM chunks to 8 kHz G.711 mu-law
+        
+        Resampler state and any odd trailing byte are carried between chunks,
+        so chunk boundaries from the network do not have to be sample aligned.
+        
+        Args:
+            chunks: Iterable of 16-bit signed little-endian mono PCM chunks
+            input_rate: Sample rate of the incoming PCM (OpenAI 'pcm' is 24 kHz)
+        
+        Yields:
+            mu-law encoded chunks at 8 kHz
+        """
+        encoder = UlawEncoder(input_rate)
+        
+        for chunk in chunks:
+            data = encoder.encode(chunk)
+            if data:
+                yield data
+    
     def get_available_voices(self) -> list:
         """
         Get list of available TTS voices
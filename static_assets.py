@@ -0,0 +1,150 @@
+"""
+Static Assets
+In-memory manifest of the dashboard's static files, served with
+precompressed variants, ETags and long-lived caching of content-hashed files
+"""
+
+import os
+import re
+import gzip
+import hashlib
+import logging
+import mimetypes
+from typing import Dict, Optional
+from flask import Response, request
+from src.services.metrics import cache_requests
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; prebuilt .br files are still served
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+MAX_CACHED_BYTES = 5 * 1024 * 1024  # Larger files are left to send_from_directory
+MIN_COMPRESS_BYTES = 1024
+
+# Bundler output like index-4f9a2b1c.js or main.3f2a1b9c.css never changes: a hex
+# content hash of digits and letters, so names like icon-512.png or report-20250101.pdf
+# still revalidate
+_HASHED_NAME = re.compile(r'[.-](?=[0-9a-f]*\d)(?=[0-9a-f]*[a-f])[0-9a-f]{8,}\.\w+$')
+_COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json',
+                       'application/xml', 'image/svg+xml', 'application/wasm')
+
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE = 'no-cache'
+
+_HITS = cache_requests.labels(cache='static', result='hit')
+_MISSES = cache_requests.labels(cache='static', result='miss')
+
+class StaticAsset:
+    """One static file with its encoded variants"""
+    __slots__ = ('path', 'mimetype', 'etag', 'cache_control', 'variants')
+    
+    def __init__(self, path: str, mimetype: str, body: bytes):
+        self.path = path
+        self.mimetype = mimetype
+        self.etag = hashlib.sha256(body).hexdigest()[:20]
+        self.cache_control = IMMUTABLE_CACHE if _HASHED_NAME.search(path) else REVALIDATE_CACHE
+        self.variants = {'identity': body}  # Content-Encoding -> body, smallest first
+    
+    @property
+    def compressible(self) -> bool:
+        return self.mimetype.startswith(_COMPRESSIBLE_TYPES)
+    
+    def add_variant(self, encoding: str, body: bytes):
+        """Keep an encoded variant if it is actually smaller"""
+        if len(body) < len(self.variants['identity']):
+            self.variants[encoding] = body
+            self.variants = dict(sorted(self.variants.items(), key=lambda item: len(item[1])))
+
+class StaticAssets:
+    def __init__(self, folder: Optional[str] = None):
+        """
+        Initialize the manifest
+        
+        Args:
+            folder: Static folder to load now; see load()
+        """
+        self.assets: Dict[str, StaticAsset] = {}
+        if folder:
+            self.load(folder)
+    
+    def load(self, folder: str) -> int:
+        """
+        Read every servable file under folder into memory, replacing the manifest
+        
+        Prebuilt name.br / name.gz siblings are used as the encoded variants
+        of name; otherwise compressible files are gzipped here (and
+        brotli-compressed when the brotli package is installed).
+        
+        Returns:
+            Number of files loaded
+        """
+        assets = {}
+        for root, _, files in os.walk(folder):
+            names = set(files)
+            for name in files:
+                if name.endswith(('.br', '.gz')) and name[:-3] in names:
+                    continue
+                full_path = os.path.join(root, name)
+                if os.path.getsize(full_path) > MAX_CACHED_BYTES:
+                    continue
+                
+                path = os.path.relpath(full_path, folder).replace(os.sep, '/')
+                mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+                with open(full_path, 'rb') as f:
+                    asset = StaticAsset(path, mimetype, f.read())
+                
+                self._add_variants(asset, full_path, names, name)
+                assets[path] = asset
+        
+        self.assets = assets
+        logger.info(f"Loaded {len(assets)} static assets from {folder}")
+        return len(assets)
+    
+    @staticmethod
+    def _add_variants(asset: StaticAsset, full_path: str, names, name: str):
+        """Attach gzip and brotli variants, prebuilt or compressed now"""
+        body = asset.variants['identity']
+        if name + '.gz' in names:
+            with open(full_path + '.gz', 'rb') as f:
+                asset.add_variant('gzip', f.read())
+        elif asset.compressible and len(body) >= MIN_COMPRESS_BYTES:
+            asset.add_variant('gzip', gzip.compress(body, compresslevel=9, mtime=0))
+        
+        if name + '.br' in names:
+            with open(full_path + '.br', 'rb') as f:
+                asset.add_variant('br', f.read())
+        elif brotli and asset.compressible and len(body) >= MIN_COMPRESS_BYTES:
+            asset.add_variant('br', brotli.compress(body))
+    
+    def get(self, path: str) -> Optional[StaticAsset]:
+        """Look up a file by its path relative to the static folder"""
+        asset = self.assets.get(path)
+        (_HITS if asset is not None else _MISSES).inc()
+        return asset
+    
+    def respond(self, asset: StaticAsset) -> Response:
+        """
+        Build the response for the current request
+        
+        Picks the smallest encoding the client accepts and answers
+        If-None-Match revalidations with 304 Not Modified.
+        """
+        encoding = 'identity'
+        for candidate in asset.variants:
+            if candidate == 'identity' or request.accept_encodings[candidate] > 0:
+                encoding = candidate
+                break
+        
+        response = Response(asset.variants[encoding], mimetype=asset.mimetype)
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+        if len(asset.variants) > 1:
+            response.vary.add('Accept-Encoding')
+        response.headers['Cache-Control'] = asset.cache_control
+        
+        # Each encoding is a different representation, so it gets its own tag
+        response.set_etag(asset.etag if encoding == 'identity' else f'{asset.etag}-{encoding}')
+        return response.make_conditional(request)
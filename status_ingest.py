@@ -0,0 +1,216 @@
+"""
+Status Ingest Service
+Durable, idempotent ingestion of Twilio call status callbacks: webhooks are
+acknowledged after a single queue insert and applied to calls in batches
+"""
+
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+from src.models.user import db
+from src.models.call import Call, CallStatusEvent
+from src.models.rollup import TERMINAL_CALL_STATUSES
+
+logger = logging.getLogger(__name__)
+
+# Lifecycle order of call statuses; a call never moves back to a lower rank,
+# so late or replayed callbacks cannot undo a newer status
+STATUS_RANK = {
+    'queued': 0,
+    'initiated': 1,
+    'ringing': 2,
+    'active': 3,
+    'in-progress': 3,
+    **{status: 4 for status in TERMINAL_CALL_STATUSES}
+}
+
+BATCH_SIZE = 500
+POLL_SECONDS = 1.0
+RETENTION = timedelta(days=2)  # How long applied events are kept for deduplication
+ORPHAN_TIMEOUT = timedelta(minutes=15)  # How long events wait for their call to be recorded
+PRUNE_INTERVAL_SECONDS = 3600
+
+def _insert_ignore(table, values):
+    """Insert a row unless it violates a unique constraint; returns whether it was inserted"""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    
+    result = db.session.execute(insert(table).values(**values).on_conflict_do_nothing())
+    return result.rowcount == 1
+
+class StatusIngestor:
+    def __init__(self, batch_size: int = BATCH_SIZE, poll_seconds: float = POLL_SECONDS):
+        """
+        Initialize the ingestor
+        
+        Args:
+            batch_size: Maximum queued events applied per transaction
+            poll_seconds: How often the background worker checks the queue
+                when it has not been woken by a new event
+        """
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._last_prune = 0.0
+    
+    def enqueue(self, call_sid: str, call_status: str, sequence_number: int = 0,
+                duration_seconds: Optional[int] = None) -> bool:
+        """
+        Durably queue a status callback
+        
+        Callbacks already queued with the same (CallSid, CallStatus,
+        SequenceNumber) are ignored, so Twilio retries are harmless.
+        
+        Args:
+            call_sid: Twilio CallSid
+            call_status: Twilio CallStatus
+            sequence_number: Twilio SequenceNumber of the callback
+            duration_seconds: CallDuration, sent with terminal statuses
+        
+        Returns:
+            True if the callback is new, False if it was a duplicate
+        """
+        inserted = _insert_ignore(CallStatusEvent.__table__, {
+            'call_sid': call_sid,
+            'call_status': call_status.lower(),
+            'sequence_number': sequence_number,
+            'duration_seconds': duration_seconds,
+            'received_at': datetime.utcnow()
+        })
+        db.session.commit()
+        
+        if inserted:
+            self._wakeup.set()
+        return inserted
+    
+    def process_batch(self, now: Optional[datetime] = None) -> int:
+        """
+        Apply the oldest pending events to their calls in one transaction
+        
+        Events are claimed with a guarded update before they are applied, so
+        when several processes poll the queue each event is applied by one.
+        Events of a call not recorded yet (e.g. an outbound call's callback
+        arriving before its Call insert) stay queued until the call is, and
+        are dropped after ORPHAN_TIMEOUT.
+        
+        Args:
+            now: Current time
+        
+        Returns:
+            Number of queued events consumed
+        """
+        now = now or datetime.utcnow()
+        call_recorded = db.exists().where(Call.session_id == CallStatusEvent.call_sid)
+        ids = [row.id for row in db.session.query(CallStatusEvent.id).filter(
+            CallStatusEvent.processed_at.is_(None),
+            call_recorded | (CallStatusEvent.received_at < now - ORPHAN_TIMEOUT)
+        ).order_by(CallStatusEvent.id).limit(self.batch_size)]
+        if not ids:
+            return 0
+        
+        # Guarded claim: only rows still pending are ours, even with several processes
+        claimed = db.session.execute(
+            db.update(CallStatusEvent)
+            .where(CallStatusEvent.id.in_(ids), CallStatusEvent.processed_at.is_(None))
+            .values(processed_at=now)
+            .returning(CallStatusEvent.id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+        events = CallStatusEvent.query.filter(CallStatusEvent.id.in_(claimed)).all()
+        
+        # Only the most advanced event per call matters
+        latest = {}
+        for event in events:
+            current = latest.get(event.call_sid)
+            if current is None or self._event_key(event) >= self._event_key(current):
+                latest[event.call_sid] = event
+        
+        for call in Call.query.filter(Call.session_id.in_(list(latest))).all():
+            self._apply(call, latest.pop(call.session_id))
+        if latest:
+            logger.warning(f"Dropped status events of unknown calls: {', '.join(latest)}")
+        
+        db.session.commit()
+        return len(claimed)
+    
+    def drain(self) -> int:
+        """
+        Apply every pending event
+        
+        Returns:
+            Number of queued events consumed
+        """
+        total = 0
+        while True:
+            processed = self.process_batch()
+            if not processed:
+                return total
+            total += processed
+    
+    def prune(self, now: Optional[datetime] = None) -> int:
+        """
+        Delete applied events older than the deduplication window
+        
+        Returns:
+            Number of events deleted
+        """
+        cutoff = (now or datetime.utcnow()) - RETENTION
+        result = db.session.execute(
+            db.delete(CallStatusEvent).where(CallStatusEvent.processed_at < cutoff)
+        )
+        db.session.commit()
+        return result.rowcount
+    
+    def pending_count(self) -> int:
+        """Number of events waiting to be applied"""
+        return CallStatusEvent.query.filter(CallStatusEvent.processed_at.is_(None)).count()
+    
+    def start(self, app):
+        """Start the background worker for the given Flask app"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, args=(app,), name='status-ingestor', daemon=True)
+        self._thread.start()
+    
+    def _run(self, app):
+        """Worker loop: drain the queue whenever woken or every poll interval"""
+        with app.app_context():
+            while True:
+                self._wakeup.wait(self.poll_seconds)
+                self._wakeup.clear()
+                try:
+                    self.drain()
+                    if time.monotonic() - self._last_prune > PRUNE_INTERVAL_SECONDS:
+                        self._last_prune = time.monotonic()
+                        self.prune()
+                except Exception as e:
+                    logger.error(f"Error applying call status events: {e}")
+                    db.session.rollback()
+    
+    @staticmethod
+    def _event_key(event):
+        """Ordering key of an event: lifecycle rank, then Twilio sequence number"""
+        return (STATUS_RANK.get(event.call_status, 0), event.sequence_number)
+    
+    @staticmethod
+    def _apply(call: Call, event: CallStatusEvent):
+        """Move a call to the status of an event unless the call is already further along"""
+        current_rank = STATUS_RANK.get((call.call_status or '').lower(), 0)
+        if STATUS_RANK.get(event.call_status, 0) < current_rank:
+            return
+        
+        call.call_status = event.call_status
+        if event.call_status in TERMINAL_CALL_STATUSES:
+            call.end_time = call.end_time or event.received_at
+            if event.duration_seconds is not None:
+                call.duration_seconds = event.duration_seconds
+            else:
+                call.calculate_duration()
+
+# Process-wide ingestor used by the status webhook
+status_ingestor = StatusIngestor()
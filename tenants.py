@@ -0,0 +1,280 @@
+"""
+Tenants
+Per-business configuration keyed on the number callers dial, with each
+business's derived objects (date resolver, compiled patterns, availability,
+synthesized phrases) cached alongside it. Tenants are loaded on first use
+and the least recently used are evicted, so a worker can serve thousands of
+businesses without holding all of them.
+"""
+
+import os
+import re
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+from flask import has_app_context
+from sqlalchemy import event
+from src.models.user import db
+from src.models.call import BusinessConfig, TenantConfig
+from src.services.metrics import cache_requests
+
+TENANT_CACHE_SIZE = int(os.getenv('TENANT_CACHE_SIZE', '1000'))  # Tenants kept per process
+TTS_CACHE_BYTES = int(os.getenv('TTS_CACHE_BYTES', str(64 * 1024 * 1024)))  # Synthesized audio kept per process, all tenants together
+TTS_CACHE_MAX_CHARS = 300  # Longer replies are one-offs, not worth keeping
+CONFIG_CHECK_SECONDS = 5.0  # How stale another process's config change may be
+
+# Used when neither the tenant nor the global business configuration sets a key
+DEFAULT_CONFIG = {
+    'business_name': 'Your Business Name',
+    'business_hours': 'Monday-Friday 9AM-6PM, Saturday 9AM-3PM',
+    'business_address': '123 Main Street, City, State 12345',
+    'business_phone': '(555) 123-4567',
+    'business_email': 'info@yourbusiness.com',
+    'services': 'Consultation,Treatment,Follow-up',
+    'default_voice': 'alloy',
+    'appointment_duration': '60',
+}
+
+_TENANT_HITS = cache_requests.labels(cache='tenant', result='hit')
+_TENANT_MISSES = cache_requests.labels(cache='tenant', result='miss')
+_TTS_HITS = cache_requests.labels(cache='tenant_tts', result='hit')
+_TTS_MISSES = cache_requests.labels(cache='tenant_tts', result='miss')
+
+def normalize_number(number: Optional[str]) -> Optional[str]:
+    """Dialed number in E.164 (Twilio's format), so '+1 (555) 123-4567' and '+15551234567' are one tenant"""
+    if not number:
+        return None
+    if number[0] == '+' and number[1:].isdigit():
+        return number  # Already E.164, as every lookup after the first is
+    digits = re.sub(r'\D', '', number)
+    if len(digits) == 10:
+        digits = '1' + digits
+    return '+' + digits if digits else None
+
+class LRUCache:
+    """Thread-safe mapping that drops its least recently used entries beyond maxsize"""
+    
+    def __init__(self, maxsize: int, weigh: Optional[Callable[[Any], int]] = None):
+        """
+        Initialize an empty cache
+        
+        Args:
+            maxsize: Total weight kept; the least recently used entries are evicted beyond it
+            weigh: Weight of a value (e.g. len for byte strings); every entry weighs 1 if omitted
+        """
+        self.maxsize = maxsize
+        self.weight = 0
+        self._weigh = weigh or (lambda value: 1)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: Hashable, default=None):
+        with self._lock:
+            try:
+                self._entries.move_to_end(key)
+            except KeyError:
+                return default
+            return self._entries[key][0]
+    
+    def put(self, key: Hashable, value):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.weight -= old[1]
+            weight = self._weigh(value)
+            if weight > self.maxsize:
+                return  # Would evict everything else and still not fit
+            self._entries[key] = (value, weight)
+            self.weight += weight
+            while self.weight > self.maxsize:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.weight -= evicted
+    
+    def pop(self, key: Hashable, default=None):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return default
+            self.weight -= entry[1]
+            return entry[0]
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.weight = 0
+    
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+    
+    def __len__(self):
+        return len(self._entries)
+
+# Synthesized phrases of every tenant, (number, text, voice) -> audio bytes
+speech_cache = LRUCache(TTS_CACHE_BYTES, weigh=len)
+
+class Tenant:
+    """One business: its merged configuration and the objects derived from it"""
+    
+    def __init__(self, number: Optional[str], config: Dict[str, str], version: tuple):
+        self.number = number  # None for the deployment's own business
+        self.config = config
+        self.version = version
+        self.checked_at = time.monotonic()
+        self._derived = {}
+        self._lock = threading.Lock()
+        
+        # The dialogue manager's view of the configuration
+        self.business_config = {
+            'name': config['business_name'],
+            'hours': config['business_hours'],
+            'address': config['business_address'],
+            'phone': config['business_phone'],
+            'email': config['business_email'],
+            'services': [service.strip() for service in config['services'].split(',') if service.strip()],
+        }
+        self.voice = config['default_voice']
+    
+    def derived(self, name: str, build: Callable[['Tenant'], Any], max_age: Optional[float] = None) -> Any:
+        """
+        Get an object built from this tenant's configuration, building it once
+        
+        A configuration change replaces the Tenant, so derived objects never
+        outlive the configuration they were built from.
+        
+        Args:
+            name: Cache key, e.g. 'date_resolver'
+            build: Function of the tenant building the object
+            max_age: Seconds after which the object is rebuilt, for objects
+                that also depend on other data (e.g. open calendar slots)
+        """
+        entry = self._derived.get(name)
+        if entry is None or (max_age is not None and time.monotonic() - entry[1] >= max_age):
+            with self._lock:
+                entry = self._derived.get(name)
+                if entry is None or (max_age is not None and time.monotonic() - entry[1] >= max_age):
+                    entry = (build(self), time.monotonic())
+                    self._derived[name] = entry
+        return entry[0]
+    
+    def cached_speech(self, text: str, voice: str, synthesize: Callable[[], bytes]) -> bytes:
+        """
+        Synthesized audio for a reply, reused when the tenant says the same thing again
+        
+        Template replies (greetings, business hours, goodbyes) repeat verbatim
+        for every caller of a business, so they are synthesized once. The
+        audio of all tenants shares one cache bounded by TTS_CACHE_BYTES.
+        """
+        if len(text) > TTS_CACHE_MAX_CHARS:
+            return synthesize()
+        key = (self.number, text, voice)
+        audio = speech_cache.get(key)
+        if audio is None:
+            _TTS_MISSES.inc()
+            audio = synthesize()
+            speech_cache.put(key, audio)
+        else:
+            _TTS_HITS.inc()
+        return audio
+    
+    def __repr__(self):
+        return f'<Tenant {self.number or "default"}>'
+
+class TenantRegistry:
+    def __init__(self, maxsize: int = TENANT_CACHE_SIZE):
+        """
+        Initialize an empty registry
+        
+        Args:
+            maxsize: Tenants kept in memory; the least recently used are evicted
+        """
+        self._tenants = LRUCache(maxsize)
+    
+    def get(self, number: Optional[str] = None) -> Tenant:
+        """
+        Get the tenant a dialed number belongs to, loading it on first use
+        
+        Args:
+            number: Dialed (To) number; None or an unknown number gets the
+                global business configuration
+        """
+        key = normalize_number(number)
+        tenant = self._tenants.get(key)
+        if tenant is not None and time.monotonic() - tenant.checked_at < CONFIG_CHECK_SECONDS:
+            _TENANT_HITS.inc()
+            return tenant
+        
+        if not has_app_context():
+            # No database at hand (e.g. a bare asyncio task): serve what is loaded,
+            # or the defaults until the tenant can be loaded
+            if tenant is None:
+                _TENANT_MISSES.inc()
+                tenant = Tenant(key, dict(DEFAULT_CONFIG), ())
+                tenant.checked_at = float('-inf')
+                self._tenants.put(key, tenant)
+            else:
+                _TENANT_HITS.inc()
+            return tenant
+        
+        version = self._version(key)
+        if tenant is not None and tenant.version == version:
+            _TENANT_HITS.inc()
+            tenant.checked_at = time.monotonic()
+            return tenant
+        
+        _TENANT_MISSES.inc()
+        tenant = Tenant(key, self._load_config(key), version)
+        self._tenants.put(key, tenant)
+        return tenant
+    
+    def invalidate(self, number: Optional[str] = None):
+        """Drop loaded tenants, one or all, so they are reloaded on next use"""
+        if number is None:
+            self._tenants.clear()
+        else:
+            self._tenants.pop(normalize_number(number))
+    
+    def __contains__(self, number: Optional[str]) -> bool:
+        """Whether the tenant is loaded"""
+        return normalize_number(number) in self._tenants
+    
+    def __len__(self):
+        return len(self._tenants)
+    
+    @staticmethod
+    def _version(number: Optional[str]) -> tuple:
+        """Row count and last update of the global and the tenant's configuration"""
+        version = tuple(db.session.query(
+            db.func.count(BusinessConfig.id), db.func.max(BusinessConfig.updated_at)
+        ).one())
+        if number is not None:
+            version += tuple(db.session.query(
+                db.func.count(TenantConfig.id), db.func.max(TenantConfig.updated_at)
+            ).filter(TenantConfig.tenant == number).one())
+        return version
+    
+    @staticmethod
+    def _load_config(number: Optional[str]) -> Dict[str, str]:
+        """Defaults, overridden by the global configuration, overridden by the tenant's"""
+        config = dict(DEFAULT_CONFIG)
+        config.update({row.key: row.value for row in BusinessConfig.query.all() if row.value})
+        if number is not None:
+            config.update(TenantConfig.get_configs(number))
+        return config
+
+# Process-wide registry
+tenant_registry = TenantRegistry()
+
+@event.listens_for(BusinessConfig, 'after_insert')
+@event.listens_for(BusinessConfig, 'after_update')
+@event.listens_for(BusinessConfig, 'after_delete')
+def _business_config_changed(mapper, connection, config):
+    """The global configuration is every tenant's fallback"""
+    tenant_registry.invalidate()
+
+@event.listens_for(TenantConfig, 'after_insert')
+@event.listens_for(TenantConfig, 'after_update')
+@event.listens_for(TenantConfig, 'after_delete')
+def _tenant_config_changed(mapper, connection, config):
+    """Pick up this process's own configuration changes without waiting"""
+    tenant_registry.invalidate(config.tenant)
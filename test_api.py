@@ -7,6 +7,7 @@ import unittest
 import json
 import tempfile
 import os
+from datetime import date, datetime, time
 from unittest.mock import patch, MagicMock
 import sys
 
@@ -15,7 +16,7 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
 from main import app
 from models.user import db
-from models.call import Call, Appointment, BusinessConfig
+from models.call import Call, CallTurn, Appointment, BusinessConfig, TenantConfig
 
 class AIVoiceReceptionistTestCase(unittest.TestCase):
     """Base test case for AI Voice Receptionist"""
@@ -125,13 +126,14 @@ class PhoneAPITestCase(AIVoiceReceptionistTestCase):
     
     def test_get_calls_empty(self):
         """Test getting calls when none exist"""
-        response = self.client.get('/api/phone/calls')
+        response = self.client.get('/api/phone/calls?total=exact')
         
         self.assertEqual(response.status_code, 200)
         data = json.loads(response.data)
         
         self.assertEqual(data['calls'], [])
         self.assertEqual(data['total'], 0)
+        self.assertIsNone(data['next_cursor'])
     
     def test_get_calls_with_data(self):
         """Test getting calls with existing data"""
@@ -229,6 +231,91 @@ class PhoneAPITestCase(AIVoiceReceptionistTestCase):
         
         self.assertEqual(len(data['numbers']), 1)
         self.assertEqual(data['numbers'][0]['phone_number'], '+15551234567')
+    
+    def test_get_calls_omits_history(self):
+        """Test that call listings leave out transcripts unless requested"""
+        with self.app.app_context():
+            call = Call(session_id='test_list_history')
+            db.session.add(call)
+            call.record_turn('Hello', 'Hi there!', 'greeting')
+            db.session.commit()
+        
+        data = json.loads(self.client.get('/api/phone/calls').data)
+        self.assertNotIn('conversation_history', data['calls'][0])
+        
+        data = json.loads(self.client.get('/api/phone/calls?include_history=true').data)
+        self.assertEqual(len(data['calls'][0]['conversation_history']), 2)
+    
+    def _create_calls(self, count):
+        """Create calls one minute apart, newest last"""
+        from datetime import datetime, timedelta
+        
+        with self.app.app_context():
+            for i in range(count):
+                db.session.add(Call(
+                    session_id=f'test_page_{i}',
+                    start_time=datetime(2025, 8, 1) + timedelta(minutes=i),
+                    call_status='completed' if i % 2 else 'failed'
+                ))
+            db.session.commit()
+    
+    def test_get_calls_keyset_pagination(self):
+        """Test walking call history with cursors"""
+        self._create_calls(5)
+        
+        seen = []
+        url = '/api/phone/calls?limit=2'
+        while url:
+            data = json.loads(self.client.get(url).data)
+            seen.extend(call['session_id'] for call in data['calls'])
+            url = f"/api/phone/calls?limit=2&cursor={data['next_cursor']}" if data['next_cursor'] else None
+        
+        self.assertEqual(seen, [f'test_page_{i}' for i in range(4, -1, -1)])
+    
+    def test_get_calls_sparse_fields(self):
+        """Test selecting only some call columns"""
+        self._create_calls(3)
+        
+        response = self.client.get('/api/phone/calls?fields=session_id,call_status&status=completed')
+        
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual(data['calls'], [{'session_id': 'test_page_1', 'call_status': 'completed'}])
+    
+    def test_get_calls_unknown_field(self):
+        """Test rejecting fields that cannot be listed"""
+        response = self.client.get('/api/phone/calls?fields=session_id,password')
+        
+        self.assertEqual(response.status_code, 400)
+    
+    def test_get_calls_streamed_page(self):
+        """Test that large pages are streamed as valid JSON"""
+        self._create_calls(250)
+        
+        response = self.client.get('/api/phone/calls?limit=240&fields=id&total=approx')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_streamed)
+        data = json.loads(response.data)
+        self.assertEqual(len(data['calls']), 240)
+        self.assertEqual(data['total'], 250)
+        self.assertIsNotNone(data['next_cursor'])
+    
+    def test_get_call_turns_after(self):
+        """Test incremental loading of call turns"""
+        with self.app.app_context():
+            call = Call(session_id='test_turns_789')
+            db.session.add(call)
+            call.record_turn('Hello', 'Hi there!', 'greeting')
+            call.record_turn('What are your hours?', 'We are open 9 to 5.', 'business_hours')
+            db.session.commit()
+        
+        response = self.client.get('/api/phone/calls/test_turns_789/turns?after=2')
+        
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual([turn['seq'] for turn in data['turns']], [3, 4])
+        self.assertEqual(data['turns'][0]['role'], 'user')
 
 class BusinessLogicTestCase(AIVoiceReceptionistTestCase):
     """Test cases for business logic and integrations"""
@@ -254,6 +341,64 @@ class BusinessLogicTestCase(AIVoiceReceptionistTestCase):
             self.assertEqual(saved_appointment.customer_phone, '+15551234567')
             self.assertEqual(saved_appointment.status, 'scheduled')
     
+    def test_call_turns_append_only(self):
+        """Test that turns are appended in sequence and exposed as history"""
+        with self.app.app_context():
+            call = Call(session_id='test_turn_log')
+            db.session.add(call)
+            call.record_turn('Hi', 'Hello!', 'greeting', {'stt_ms': 120, 'total_ms': 900})
+            db.session.commit()
+            call.record_turn('Bye', 'Goodbye!', 'goodbye')
+            db.session.commit()
+            
+            history = call.get_conversation_history()
+            self.assertEqual([turn['seq'] for turn in history], [1, 2, 3, 4])
+            self.assertEqual(history[0]['stt_ms'], 120)
+            self.assertEqual(history[1]['total_ms'], 900)
+            self.assertEqual(call.primary_intent, 'greeting')
+            self.assertEqual(CallTurn.query.filter_by(call_id=call.id).count(), 4)
+    
+    def test_concurrent_turns_get_own_seq(self):
+        """Test that a turn written by another writer while appending does not collide on seq"""
+        from sqlalchemy import event
+        
+        with self.app.app_context():
+            call = Call(session_id='test_turn_race')
+            db.session.add(call)
+            call.record_turn('Hi', 'Hello!')
+            db.session.commit()
+            
+            def other_writer(conn, cursor, statement, parameters, context, executemany):
+                # Another transcript lands between this writer's reads and its insert
+                if statement.startswith('INSERT INTO call_turns') and not inserted:
+                    inserted.append(True)
+                    cursor.connection.execute(
+                        "INSERT INTO call_turns (call_id, seq, role, text, created_at) "
+                        "VALUES (?, 3, 'assistant', 'One moment.', '2026-01-05 10:00:00')", (call.id,)
+                    )
+            
+            inserted = []
+            event.listen(db.engine, 'before_cursor_execute', other_writer)
+            try:
+                call.record_turn('Bye', 'Goodbye!')
+                db.session.commit()
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', other_writer)
+            
+            history = call.get_conversation_history()
+            self.assertEqual([(turn['seq'], turn['text']) for turn in history],
+                             [(1, 'Hi'), (2, 'Hello!'), (3, 'One moment.'), (4, 'Bye'), (5, 'Goodbye!')])
+    
+    def test_legacy_conversation_history(self):
+        """Test that calls without turns still read the JSON column"""
+        with self.app.app_context():
+            call = Call(session_id='test_legacy_history')
+            call.set_conversation_history([{'user_input': 'Hi', 'bot_response': 'Hello!'}])
+            db.session.add(call)
+            db.session.commit()
+            
+            self.assertEqual(call.to_dict()['conversation_history'][0]['user_input'], 'Hi')
+    
     def test_business_config_retrieval(self):
         """Test business configuration retrieval"""
         with self.app.app_context():
@@ -311,6 +456,1867 @@ class IntegrationTestCase(AIVoiceReceptionistTestCase):
         self.assertEqual(data['intent'], 'business_hours')
         self.assertIn('Monday-Friday 9AM-5PM', data['response'])
 
+class AnalyticsAPITestCase(AIVoiceReceptionistTestCase):
+    """Test cases for rollup-backed analytics endpoints"""
+    
+    def test_summary_counts_finished_calls_once(self):
+        """Test that a call is counted when it ends and not again on later updates"""
+        from datetime import date, time
+        
+        with self.app.app_context():
+            call = Call(session_id='test_rollup_1', primary_intent='appointment_booking', lead_qualified=True)
+            db.session.add(call)
+            db.session.commit()
+            
+            call.end_call()
+            db.session.commit()
+            call.call_status = 'completed'
+            db.session.commit()
+            
+            db.session.add(Call(session_id='test_rollup_2', call_status='failed', duration_seconds=40))
+            db.session.add(Appointment(
+                customer_name='Jane Doe',
+                customer_phone='+15551234567',
+                service_type='Consultation',
+                appointment_date=date(2025, 8, 1),
+                appointment_time=time(14, 0)
+            ))
+            db.session.commit()
+        
+        response = self.client.get('/api/analytics/summary?days=7')
+        
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual(data['total_calls'], 2)
+        self.assertEqual(data['completed_calls'], 1)
+        self.assertEqual(data['appointments_booked'], 1)
+        self.assertEqual(data['leads_qualified'], 1)
+        self.assertEqual(data['intents'], {'appointment_booking': 1})
+    
+    def test_timeseries_fills_empty_buckets(self):
+        """Test that every requested bucket is returned"""
+        response = self.client.get('/api/analytics/timeseries?granularity=hour&periods=24')
+        
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual(len(data['series']), 24)
+        self.assertTrue(all(bucket['calls'] == 0 for bucket in data['series']))
+    
+    def test_timeseries_invalid_granularity(self):
+        """Test rejecting unsupported granularities"""
+        response = self.client.get('/api/analytics/timeseries?granularity=week')
+        
+        self.assertEqual(response.status_code, 400)
+
+class CallEventsTestCase(AIVoiceReceptionistTestCase):
+    """Test cases for the live call event feed"""
+    
+    def test_tenant_filtering(self):
+        """Test that subscribers only see their tenant's events"""
+        from src.services.event_bus import EventBus
+        
+        bus = EventBus()
+        everything = bus.subscribe()
+        tenant_a = bus.subscribe(tenant='+15550000001')
+        
+        bus.publish('call.incoming', {'call_sid': 'CA1'}, tenant='+15550000001')
+        bus.publish('call.incoming', {'call_sid': 'CA2'}, tenant='+15550000002')
+        
+        self.assertEqual(len(everything.buffer), 2)
+        self.assertEqual(len(tenant_a.buffer), 1)
+        self.assertIn('CA1', tenant_a.get(timeout=0)['payload'])
+    
+    def test_slow_subscriber_drops_oldest(self):
+        """Test that a full buffer drops the oldest events instead of blocking"""
+        from src.services.event_bus import EventBus
+        
+        bus = EventBus()
+        subscription = bus.subscribe(max_buffer=3)
+        for i in range(5):
+            bus.publish('call.turn', {'seq': i})
+        
+        self.assertEqual(subscription.dropped, 2)
+        self.assertIn('"seq": 2', subscription.get(timeout=0)['payload'])
+        
+        subscription.close()
+        self.assertEqual(bus.subscriber_count(), 0)
+    
+    def test_event_stream_endpoint(self):
+        """Test that published events reach an SSE client"""
+        from src.services.event_bus import call_events
+        
+        response = self.client.get('/api/phone/events', query_string={'tenant': '+15551234567'},
+                                   buffered=False)
+        chunks = response.response
+        
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        self.assertIn(b'retry', next(chunks))
+        
+        call_events.publish('call.incoming', {'call_sid': 'CA_other'}, tenant='+15559999999')
+        call_events.publish('call.incoming', {'call_sid': 'CA_test'}, tenant='+15551234567')
+        
+        frame = next(chunks).decode()
+        self.assertIn('event: call.incoming', frame)
+        self.assertIn('CA_test', frame)
+        
+        response.close()
+        self.assertEqual(call_events.subscriber_count(), 0)
+    
+    def test_event_stream_tenant_normalized(self):
+        """Test that the tenant filter matches however the number is written"""
+        from src.services.event_bus import call_events
+        
+        for tenant in ('+15551234567', '(555) 123-4567'):
+            response = self.client.get(f'/api/phone/events?tenant={tenant}', buffered=False)
+            chunks = response.response
+            next(chunks)
+            
+            call_events.publish('call.incoming', {'call_sid': 'CA_test'}, tenant='+15551234567')
+            self.assertIn('CA_test', next(chunks).decode())
+            response.close()
+    
+    def test_turn_events_carry_tenant(self):
+        """Test that text chat turns and intents reach their tenant's subscribers only"""
+        from src.services.event_bus import call_events
+        
+        tenant = call_events.subscribe(tenant='+15557654321')
+        other = call_events.subscribe(tenant='+15550000001')
+        try:
+            response = self.client.post('/api/voice/text-chat', json={'message': 'Hello there', 'tenant': '(555) 765-4321'})
+            self.assertEqual(response.status_code, 200)
+            
+            self.assertEqual([event['type'] for event in tenant.buffer], ['call.turn', 'call.intent'])
+            self.assertEqual(len(other.buffer), 0)
+        finally:
+            tenant.close()
+            other.close()
+
+class StatusIngestTestCase(AIVoiceReceptionistTestCase):
+    """Test cases for queued Twilio status callback ingestion"""
+    
+    def _post_status(self, call_status, sequence_number, duration=None):
+        data = {'CallSid': 'CA_status', 'CallStatus': call_status,
+                'SequenceNumber': str(sequence_number), 'To': '+15551234567'}
+        if duration is not None:
+            data['CallDuration'] = str(duration)
+        return self.client.post('/api/phone/webhook/status', data=data)
+    
+    def _create_call(self):
+        from datetime import datetime
+        
+        with self.app.app_context():
+            db.session.add(Call(session_id='CA_status', call_status='initiated',
+                                start_time=datetime(2025, 1, 6, 10, 0)))
+            db.session.commit()
+    
+    def test_retries_are_deduplicated(self):
+        """Test that a retried callback is acknowledged but queued once"""
+        from src.models.call import CallStatusEvent
+        
+        first = self._post_status('ringing', 1)
+        retry = self._post_status('ringing', 1)
+        
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(retry.status_code, 200)
+        self.assertFalse(json.loads(first.data)['duplicate'])
+        self.assertTrue(json.loads(retry.data)['duplicate'])
+        with self.app.app_context():
+            self.assertEqual(CallStatusEvent.query.count(), 1)
+    
+    def test_batched_application(self):
+        """Test that queued callbacks are applied to the call in the background batch"""
+        from src.services.status_ingest import status_ingestor
+        
+        self._create_call()
+        self._post_status('ringing', 1)
+        self._post_status('in-progress', 2)
+        self._post_status('completed', 3, duration=42)
+        
+        with self.app.app_context():
+            self.assertEqual(Call.query.first().call_status, 'initiated')
+            self.assertEqual(status_ingestor.drain(), 3)
+            self.assertEqual(status_ingestor.pending_count(), 0)
+            
+            call = Call.query.first()
+            self.assertEqual(call.call_status, 'completed')
+            self.assertEqual(call.duration_seconds, 42)
+            self.assertIsNotNone(call.end_time)
+    
+    def test_late_callbacks_do_not_regress_status(self):
+        """Test that an out-of-order callback cannot undo a terminal status"""
+        from src.services.status_ingest import status_ingestor
+        from src.models.rollup import CallRollup
+        
+        self._create_call()
+        self._post_status('completed', 3, duration=42)
+        with self.app.app_context():
+            status_ingestor.drain()
+        
+        self._post_status('ringing', 1)
+        self._post_status('completed', 3, duration=42)
+        with self.app.app_context():
+            status_ingestor.drain()
+            self.assertEqual(Call.query.first().call_status, 'completed')
+            daily = CallRollup.query.filter_by(granularity='day').one()
+            self.assertEqual(daily.completed_calls, 1)
+    
+    def test_prune_keeps_pending_events(self):
+        """Test that pruning only removes applied events past the retention window"""
+        from datetime import datetime, timedelta
+        from src.services.status_ingest import status_ingestor
+        from src.models.call import CallStatusEvent
+        
+        self._create_call()
+        self._post_status('ringing', 1)
+        with self.app.app_context():
+            status_ingestor.drain()
+        self._post_status('completed', 2)
+        
+        with self.app.app_context():
+            self.assertEqual(status_ingestor.prune(now=datetime.utcnow() + timedelta(days=3)), 1)
+            self.assertEqual(CallStatusEvent.query.count(), 1)
+            self.assertEqual(status_ingestor.pending_count(), 1)
+    
+    def test_events_wait_for_their_call(self):
+        """Test that events of a call not recorded yet stay queued, and expire after the orphan timeout"""
+        from datetime import datetime, timedelta
+        from src.services.status_ingest import status_ingestor, ORPHAN_TIMEOUT
+        
+        self._post_status('ringing', 1)
+        with self.app.app_context():
+            self.assertEqual(status_ingestor.drain(), 0)
+            self.assertEqual(status_ingestor.pending_count(), 1)
+        
+        self._create_call()
+        self._post_status('in-progress', 2)
+        with self.app.app_context():
+            self.assertEqual(status_ingestor.drain(), 2)
+            self.assertEqual(Call.query.first().call_status, 'in-progress')
+        
+        data = {'CallSid': 'CA_unknown', 'CallStatus': 'completed', 'SequenceNumber': '1'}
+        self.client.post('/api/phone/webhook/status', data=data)
+        with self.app.app_context():
+            later = datetime.utcnow() + ORPHAN_TIMEOUT + timedelta(minutes=1)
+            self.assertEqual(status_ingestor.process_batch(now=later), 1)
+            self.assertEqual(status_ingestor.pending_count(), 0)
+    
+    def test_claimed_events_applied_once(self):
+        """Test that events another process already claimed are not applied again"""
+        from src.services.status_ingest import status_ingestor
+        from src.models.call import CallStatusEvent
+        from src.models.rollup import CallRollup
+        
+        self._create_call()
+        self._post_status('completed', 3, duration=42)
+        
+        with self.app.app_context():
+            # Another worker claims the event between this worker's read and its claim
+            original_update = db.update
+            
+            def claim_first(table):
+                db.session.execute(original_update(CallStatusEvent).values(processed_at=datetime.utcnow()))
+                return original_update(table)
+            
+            with patch.object(db, 'update', side_effect=claim_first):
+                self.assertEqual(status_ingestor.process_batch(), 0)
+            self.assertEqual(Call.query.first().call_status, 'initiated')
+            self.assertIsNone(CallRollup.query.filter_by(granularity='day').first())
+
+class FakeTwilioServer:
+    """Stand-in for the Twilio REST API serving paged call and recording lists"""
+    
+    def __init__(self, account_sid='AC_test'):
+        from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+        import threading
+        
+        self.account_sid = account_sid
+        self.calls = []
+        self.recordings = []
+        self.requests = []
+        server = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests.append(self.path)
+                status, body = server.handle(self.path)
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+            
+            def log_message(self, *args):
+                pass
+        
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.httpd.server_port}'
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+    
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+    
+    def add_call(self, sid, start, status='completed', duration=60):
+        from email.utils import format_datetime
+        from datetime import timezone
+        
+        started = start.replace(tzinfo=timezone.utc)
+        self.calls.append({
+            'sid': sid, 'from': '+15550001111', 'to': '+15551234567', 'status': status,
+            'direction': 'inbound', 'duration': str(duration), 'price': '-0.0085',
+            'start_time': format_datetime(started), 'date_created': format_datetime(started),
+            'end_time': None if status == 'in-progress' else format_datetime(started)
+        })
+    
+    def add_recording(self, sid, call_sid, created):
+        from email.utils import format_datetime
+        from datetime import timezone
+        
+        self.recordings.append({
+            'sid': sid, 'call_sid': call_sid, 'status': 'completed', 'duration': '30',
+            'date_created': format_datetime(created.replace(tzinfo=timezone.utc)),
+            'uri': f'/2010-04-01/Accounts/{self.account_sid}/Recordings/{sid}.json'
+        })
+    
+    def handle(self, path):
+        from urllib.parse import urlsplit, parse_qs
+        from email.utils import parsedate_to_datetime
+        from datetime import datetime, timezone
+        
+        url = urlsplit(path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        base = f'/2010-04-01/Accounts/{self.account_sid}'
+        
+        for call in self.calls:
+            if url.path == f'{base}/Calls/{call["sid"]}.json':
+                return 200, call
+        
+        if url.path == f'{base}/Calls.json':
+            key, items, filter_key, field = 'calls', self.calls, 'StartTime>', 'start_time'
+        elif url.path == f'{base}/Recordings.json':
+            key, items, filter_key, field = 'recordings', self.recordings, 'DateCreated>', 'date_created'
+            if 'CallSid' in query:
+                items = [item for item in items if item['call_sid'] == query['CallSid']]
+        else:
+            return 404, {'code': 20404, 'message': 'Not found', 'status': 404}
+        
+        if filter_key in query:
+            since = datetime.strptime(query[filter_key], '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc)
+            items = [item for item in items if parsedate_to_datetime(item[field]) >= since]
+        items = sorted(items, key=lambda item: parsedate_to_datetime(item[field]), reverse=True)
+        
+        page = int(query.get('Page', 0))
+        page_size = int(query.get('PageSize', 50))
+        chunk = items[page * page_size:(page + 1) * page_size]
+        next_page_uri = None
+        if (page + 1) * page_size < len(items):
+            next_query = '&'.join(f'{k}={v}' for k, v in {**query, 'Page': page + 1}.items())
+            next_page_uri = f'{url.path}?{next_query}'
+        
+        return 200, {key: chunk, 'page': page, 'page_size': page_size,
+                     'next_page_uri': next_page_uri, 'uri': path}
+
+class TwilioSyncTestCase(AIVoiceReceptionistTestCase):
+    """Test cases for incremental Twilio call log synchronization"""
+    
+    def setUp(self):
+        super().setUp()
+        self.twilio = FakeTwilioServer()
+        env = {'TWILIO_ACCOUNT_SID': self.twilio.account_sid, 'TWILIO_AUTH_TOKEN': 'token',
+               'TWILIO_API_BASE_URL': self.twilio.url}
+        with patch.dict(os.environ, env):
+            from src.services.twilio_service import TwilioService
+            from src.services.call_sync import CallLogSync
+            self.sync = CallLogSync(TwilioService(), page_size=2)
+    
+    def tearDown(self):
+        self.twilio.close()
+        super().tearDown()
+    
+    def test_incremental_sync(self):
+        """Test paging through Twilio and resuming from the watermark"""
+        from datetime import datetime, timedelta
+        
+        start = datetime.utcnow() - timedelta(days=3)
+        for i in range(5):
+            self.twilio.add_call(f'CA{i}', start + timedelta(hours=2 * i))
+        self.twilio.add_recording('RE0', 'CA0', start)
+        
+        with self.app.app_context():
+            self.assertEqual(self.sync.sync(), {'calls': 5, 'recordings': 1})
+            self.assertEqual(Call.query.count(), 5)
+            call = Call.query.filter_by(session_id='CA4').one()
+            self.assertEqual(call.call_status, 'completed')
+            self.assertEqual(call.duration_seconds, 60)
+            self.assertEqual(call.price, '-0.0085')
+        
+        # Three pages of two calls, then one recordings page
+        self.assertEqual(sum('/Calls.json' in path for path in self.twilio.requests), 3)
+        
+        self.twilio.requests.clear()
+        self.twilio.add_call('CA5', start + timedelta(days=1))
+        with self.app.app_context():
+            # The newest synced call is re-read because of the overlap window
+            self.assertEqual(self.sync.sync()['calls'], 2)
+            self.assertEqual(Call.query.count(), 6)
+        self.assertIn('StartTime%3E=', self.twilio.requests[0])
+    
+    def test_open_calls_hold_back_watermark(self):
+        """Test that calls still in progress are fetched again on the next sync"""
+        from datetime import datetime, timedelta
+        
+        now = datetime.utcnow()
+        self.twilio.add_call('CA_open', now - timedelta(hours=3), status='in-progress')
+        self.twilio.add_call('CA_done', now - timedelta(minutes=5))
+        
+        with self.app.app_context():
+            self.sync.sync(now)
+            self.twilio.calls[0].update(status='completed', duration='120')
+            self.assertEqual(self.sync.sync(now)['calls'], 2)
+            self.assertEqual(Call.query.filter_by(session_id='CA_open').one().duration_seconds, 120)
+    
+    def test_watermark_is_not_configuration(self):
+        """Test that sync progress neither reloads tenants nor shows up in their configuration"""
+        from datetime import datetime
+        from src.services.tenants import tenant_registry
+        
+        self.twilio.add_call('CA_mark', datetime(2025, 1, 6, 10, 0))
+        with self.app.app_context():
+            tenant = tenant_registry.get('+15557654321')
+            self.sync.sync()
+            
+            self.assertIs(tenant_registry.get('+15557654321'), tenant)
+            self.assertNotIn('twilio_calls_watermark', tenant.config)
+            self.assertIsNone(BusinessConfig.get_config('twilio_calls_watermark'))
+    
+    def test_watermarks_migrated_out_of_config(self):
+        """Test that watermarks stored as business configuration move to sync state"""
+        from sqlalchemy import create_engine, text
+        from src.models.migrations import apply_migrations
+        
+        engine = create_engine('sqlite://')
+        db.metadata.create_all(engine)
+        with engine.begin() as connection:
+            connection.execute(text(
+                "INSERT INTO business_config (key, value, updated_at) "
+                "VALUES ('twilio_calls_watermark', '2025-01-06T10:00:00', '2025-01-06 10:05:00')"
+            ))
+        
+        apply_migrations(engine)
+        
+        with engine.connect() as connection:
+            self.assertEqual(connection.execute(text("SELECT key, value FROM sync_state")).all(),
+                             [('twilio_calls_watermark', '2025-01-06T10:00:00')])
+            self.assertEqual(connection.execute(text("SELECT count(*) FROM business_config")).scalar(), 0)
+        engine.dispose()
+    
+    def test_details_refresh(self):
+        """Test that the detail endpoint reads locally unless a refresh is requested"""
+        from datetime import datetime
+        
+        self.twilio.add_call('CA_detail', datetime(2025, 1, 6, 10, 0))
+        self.twilio.add_recording('RE_detail', 'CA_detail', datetime(2025, 1, 6, 10, 1))
+        with self.app.app_context():
+            db.session.add(Call(session_id='CA_detail', call_status='active'))
+            db.session.commit()
+        
+        with patch('src.routes.phone_api.call_log_sync', self.sync), \
+             patch('src.routes.phone_api.twilio_service', self.sync.twilio):
+            local = json.loads(self.client.get('/api/phone/calls/CA_detail').data)
+            self.assertEqual(local['call_status'], 'active')
+            self.assertEqual(self.twilio.requests, [])
+            
+            refreshed = json.loads(self.client.get('/api/phone/calls/CA_detail?refresh=true').data)
+        
+        self.assertEqual(refreshed['call_status'], 'completed')
+        self.assertEqual([r['sid'] for r in refreshed['recordings']], ['RE_detail'])
+
+class CampaignTestCase(AIVoiceReceptionistTestCase):
+    """Test cases for outbound call campaigns"""
+    
+    def _dialer(self, sids=None):
+        """Dialer backed by a mock Twilio client that numbers its calls"""
+        from src.services.twilio_service import TwilioService
+        from src.services.campaign_dialer import CampaignDialer
+        
+        twilio = TwilioService()
+        twilio.client = MagicMock()
+        sids = sids or iter(f'CA_campaign_{i}' for i in range(1000))
+        twilio.client.calls.create.side_effect = lambda **kwargs: MagicMock(sid=next(sids), status='queued')
+        return CampaignDialer(twilio, dial_workers=2), twilio.client
+    
+    def _create_campaign(self, phones, **settings):
+        payload = {'name': 'Reminders', 'message': 'Hi {name}, see you at {time}.',
+                   'contacts': [{'phone': phone, 'name': f'Caller {phone[-1]}', 'time': '10am'}
+                                for phone in phones]}
+        payload.update(settings)
+        response = self.client.post('/api/campaigns', data=json.dumps(payload),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        campaign_id = json.loads(response.data)['id']
+        self.client.post(f'/api/campaigns/{campaign_id}/schedule')
+        return campaign_id
+    
+    def _finish_calls(self, outcomes):
+        """Report a final status for every call in flight through the status webhook"""
+        from src.models.campaign import CampaignContact
+        from src.services.status_ingest import status_ingestor
+        
+        with self.app.app_context():
+            in_flight = CampaignContact.query.filter_by(status='in_progress').all()
+            sids = [(contact.phone, contact.call_sid) for contact in in_flight]
+        for phone, call_sid in sids:
+            self.client.post('/api/phone/webhook/status', data={
+                'CallSid': call_sid, 'CallStatus': outcomes.get(phone, 'completed'), 'SequenceNumber': '3'
+            })
+        with self.app.app_context():
+            status_ingestor.drain()
+    
+    def test_create_from_csv_upload(self):
+        """Test uploading a CSV contact list, dropping duplicate numbers"""
+        import io
+        
+        csv_data = b'phone,name,time\n+15550000001,Ann,9am\n+15550000002,Bob,10am\n+15550000001,Ann,9am\n'
+        response = self.client.post('/api/campaigns', data={
+            'name': 'Reminders', 'message': 'Hi {name}',
+            'file': (io.BytesIO(csv_data), 'contacts.csv')
+        }, content_type='multipart/form-data')
+        
+        self.assertEqual(response.status_code, 201)
+        data = json.loads(response.data)
+        self.assertEqual(data['status'], 'draft')
+        self.assertEqual(data['contact_counts'], {'pending': 2})
+    
+    def test_twiml_template_escapes_variables(self):
+        """Test that contact variables are XML-escaped into the cached TwiML"""
+        from src.services.campaign_dialer import render_campaign_twiml
+        
+        twiml = render_campaign_twiml('Hi {name}, see you {time}.', {'name': 'Ann & <Bob>'})
+        
+        self.assertIn('<Say voice="Polly.Amy">Hi Ann &amp; &lt;Bob&gt;, see you .</Say>', twiml)
+        self.assertTrue(twiml.startswith('<?xml'))
+    
+    def test_rate_limit(self):
+        """Test that dialing never exceeds the campaign's calls per second"""
+        from datetime import datetime, timedelta
+        
+        dialer, client = self._dialer()
+        self._create_campaign([f'+1555000000{i}' for i in range(5)], max_concurrency=10, calls_per_second=1)
+        now = datetime.utcnow()
+        
+        with self.app.app_context():
+            self.assertEqual(dialer.tick(now)['dialed'], 1)
+            self.assertEqual(dialer.tick(now + timedelta(seconds=0.5))['dialed'], 0)
+            self.assertEqual(dialer.tick(now + timedelta(seconds=1))['dialed'], 1)
+        self.assertEqual(client.calls.create.call_count, 2)
+    
+    def test_limits_shared_across_processes(self):
+        """Test that dialers of several worker processes share the limits and never dial a contact twice"""
+        from datetime import datetime, timedelta
+        
+        sids = iter(f'CA_campaign_{i}' for i in range(1000))
+        first, first_client = self._dialer(sids)
+        second, second_client = self._dialer(sids)
+        self._create_campaign([f'+1555000000{i}' for i in range(5)], max_concurrency=2, calls_per_second=1)
+        now = datetime.utcnow()
+        
+        with self.app.app_context():
+            self.assertEqual(first.tick(now)['dialed'], 1)
+            self.assertEqual(second.tick(now)['dialed'], 0)  # The rate budget is spent
+            
+            # The first process dials between the second one's read of the budget and its claim
+            read_budget = second._budget
+            
+            def interleaved(campaign):
+                budget = read_budget(campaign)
+                first.tick(now + timedelta(seconds=1))
+                return budget
+            
+            with patch.object(second, '_budget', side_effect=interleaved):
+                self.assertEqual(second.tick(now + timedelta(seconds=1))['dialed'], 0)
+            self.assertEqual(second.tick(now + timedelta(seconds=5))['dialed'], 0)  # Both lines busy
+        
+        dialed = [call.kwargs['to'] for call in
+                  first_client.calls.create.call_args_list + second_client.calls.create.call_args_list]
+        self.assertEqual(sorted(dialed), ['+15550000000', '+15550000001'])
+    
+    def test_campaign_end_to_end(self):
+        """Test concurrency limit, busy retry with backoff and campaign completion"""
+        from datetime import datetime, timedelta
+        from src.models.campaign import Campaign, CampaignContact
+        
+        dialer, client = self._dialer()
+        campaign_id = self._create_campaign([f'+1555000000{i}' for i in range(5)], max_concurrency=2,
+                                            calls_per_second=50, max_attempts=2, retry_delay_seconds=60)
+        now = datetime.utcnow()
+        
+        with self.app.app_context():
+            self.assertEqual(dialer.tick(now)['dialed'], 2)
+            self.assertEqual(dialer.tick(now)['dialed'], 0)  # Both lines busy
+        
+        # The first number is busy on its first attempt
+        self._finish_calls({'+15550000000': 'busy'})
+        with self.app.app_context():
+            self.assertEqual(dialer.tick(now), {'resolved': 2, 'dialed': 2})
+            retry = CampaignContact.query.filter_by(phone='+15550000000').one()
+            self.assertEqual(retry.status, 'pending')
+            self.assertEqual(retry.next_attempt_at, now + timedelta(seconds=60))
+        
+        for _ in range(4):
+            self._finish_calls({})
+            now += timedelta(seconds=61)
+            with self.app.app_context():
+                dialer.tick(now)
+        
+        with self.app.app_context():
+            self.assertEqual(Campaign.query.get(campaign_id).status, 'completed')
+            self.assertEqual(CampaignContact.query.filter_by(status='completed').count(), 5)
+            self.assertEqual(CampaignContact.query.filter_by(phone='+15550000000').one().attempts, 2)
+            self.assertEqual(Call.query.filter_by(direction='outbound').count(), 6)
+        
+        kwargs = client.calls.create.call_args.kwargs
+        self.assertIn('Caller', kwargs['twiml'])
+        self.assertTrue(kwargs['status_callback'].endswith('/api/phone/webhook/status'))
+        self.assertEqual(client.calls.create.call_count, 6)
+    
+    def test_schedule_time_stored_in_utc(self):
+        """Test that a schedule time with an offset is stored as UTC, and one without as given"""
+        campaign_id = self._create_campaign(['+15550000001'])
+        
+        for scheduled_at, stored in (('2026-10-20T09:00:00-05:00', '2026-10-20T14:00:00'),
+                                     ('2026-10-20T09:00:00Z', '2026-10-20T09:00:00'),
+                                     ('2026-10-20T09:00:00', '2026-10-20T09:00:00')):
+            response = self.client.post(f'/api/campaigns/{campaign_id}/schedule', json={'scheduled_at': scheduled_at})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(json.loads(response.data)['scheduled_at'], stored)
+        
+        response = self.client.post(f'/api/campaigns/{campaign_id}/schedule', json={'scheduled_at': 'tomorrow'})
+        self.assertEqual(response.status_code, 400)
+
+class ReminderSchedulerTestCase(AIVoiceReceptionistTestCase):
+    """Test cases for appointment confirmation and reminder messages"""
+    
+    def setUp(self):
+        super().setUp()
+        from src.services.reminder_scheduler import reminder_scheduler
+        
+        self.scheduler = reminder_scheduler
+        self.twilio = MagicMock()
+        self.twilio.send_sms.side_effect = lambda to, body, from_number=None: {'success': True, 'message_sid': f'SM{len(self.sent)}'}
+        self.sent = self.twilio.send_sms.call_args_list
+        self.scheduler.twilio = self.twilio
+        with self.app.app_context():
+            self.scheduler.load()
+    
+    def tearDown(self):
+        from src.services.registry import twilio_service
+        
+        self.scheduler.twilio = twilio_service
+        super().tearDown()
+    
+    def _book(self, start, **fields):
+        with self.app.app_context():
+            appointment = Appointment(customer_name='Jane Doe', customer_phone='+15559876543',
+                                      service_type='Consultation', appointment_date=start.date(),
+                                      appointment_time=start.time(), **fields)
+            db.session.add(appointment)
+            db.session.commit()
+            return appointment.id
+    
+    def test_confirmation_and_reminder(self):
+        """Test that each message is sent once, at its time, even across a restart"""
+        from datetime import timedelta
+        from src.models.reminder import AppointmentReminder
+        from src.services.entity_extractor import business_now
+        
+        start = business_now().replace(second=0, microsecond=0) + timedelta(days=3)
+        self._book(start)
+        
+        with self.app.app_context():
+            self.assertEqual(self.scheduler.next_fire_time().date(), business_now().date())
+            self.assertEqual(self.scheduler.fire_due(business_now() + timedelta(seconds=1)), 1)
+            self.assertIn('is booked for', self.sent[0].args[1])
+            
+            # A restarted process rebuilds its heap from the database
+            self.assertEqual(self.scheduler.load(), 1)
+            self.assertEqual(self.scheduler.fire_due(start - timedelta(hours=25)), 0)
+            self.assertEqual(self.scheduler.fire_due(start - timedelta(hours=23)), 1)
+            self.assertIn('reminder', self.sent[1].args[1])
+            
+            self.scheduler.load()
+            self.assertEqual(self.scheduler.fire_due(start - timedelta(hours=1)), 0)
+            self.assertEqual(AppointmentReminder.query.filter_by(status='sent').count(), 2)
+    
+    def test_messages_from_booked_business(self):
+        """Test that messages are signed by and sent from the business the appointment was booked with"""
+        from datetime import timedelta
+        from src.services.entity_extractor import business_now
+        
+        with self.app.app_context():
+            TenantConfig.set_config('+15557654321', 'business_name', 'Acme Dental')
+            call = Call(session_id='CA_booking', business_phone='+15557654321')
+            db.session.add(call)
+            db.session.commit()
+            call_id = call.id
+        
+        start = business_now().replace(second=0, microsecond=0) + timedelta(days=3)
+        self._book(start, call_id=call_id)
+        self._book(start + timedelta(hours=2))
+        
+        with self.app.app_context():
+            self.assertEqual(self.scheduler.fire_due(business_now() + timedelta(seconds=1)), 2)
+        
+        sent = {call.kwargs['from_number']: call.args[1] for call in self.sent}
+        self.assertIn('Acme Dental', sent['+15557654321'])
+        self.assertIn('Test Business', sent[None])
+    
+    def test_reschedule_moves_reminder(self):
+        """Test that moving an appointment moves its pending reminder"""
+        from datetime import timedelta
+        from src.models.reminder import AppointmentReminder
+        from src.services.entity_extractor import business_now
+        
+        start = business_now().replace(second=0, microsecond=0) + timedelta(days=3)
+        appointment_id = self._book(start)
+        new_start = start + timedelta(days=2)
+        
+        with self.app.app_context():
+            appointment = Appointment.query.get(appointment_id)
+            appointment.appointment_date = new_start.date()
+            db.session.commit()
+            
+            self.scheduler.fire_due(business_now() + timedelta(seconds=1))  # Confirmation
+            self.assertEqual(self.scheduler.fire_due(start - timedelta(hours=23)), 0)
+            self.assertEqual(self.scheduler.fire_due(new_start - timedelta(hours=23)), 1)
+            reminder = AppointmentReminder.query.filter_by(kind='reminder').one()
+            self.assertEqual(reminder.fire_at, new_start - timedelta(hours=24))
+    
+    def test_cancel_drops_reminders(self):
+        """Test that cancelled appointments get no further messages"""
+        from datetime import timedelta
+        from src.models.reminder import AppointmentReminder
+        from src.services.entity_extractor import business_now
+        
+        start = business_now().replace(second=0, microsecond=0) + timedelta(days=3)
+        appointment_id = self._book(start)
+        
+        with self.app.app_context():
+            Appointment.query.get(appointment_id).status = 'cancelled'
+            db.session.commit()
+            
+            self.assertIsNone(self.scheduler.next_fire_time())
+            self.assertEqual(self.scheduler.fire_due(start), 0)
+            self.assertEqual(AppointmentReminder.query.filter_by(status='cancelled').count(), 2)
+        self.assertEqual(self.sent, [])
+    
+    def test_reminders_follow_business_clock(self):
+        """Test that reminder times are judged in the business timezone, not the server's"""
+        from datetime import timedelta
+        from zoneinfo import ZoneInfo
+        from src.models.reminder import AppointmentReminder
+        from src.services.entity_extractor import business_now
+        
+        # UTC-11: the reminder 24 hours before an appointment 30 business hours away
+        # is still ahead, though a UTC clock would already be past it
+        with patch('src.services.entity_extractor._BUSINESS_ZONE', ZoneInfo('Pacific/Pago_Pago')):
+            start = business_now().replace(second=0, microsecond=0) + timedelta(hours=30)
+            self._book(start)
+            
+            with self.app.app_context():
+                self.assertEqual(self.scheduler.fire_due(), 1)  # Confirmation only
+                reminder = AppointmentReminder.query.filter_by(kind='reminder').one()
+                self.assertEqual(reminder.status, 'pending')
+                self.assertEqual(reminder.fire_at, start - timedelta(hours=24))
+
+class TwimlTemplateTestCase(AIVoiceReceptionistTestCase):
+    """Test cases for precompiled TwiML responses"""
+    
+    def test_values_are_escaped(self):
+        """Test that messages and stream URLs cannot break out of the document"""
+        from xml.etree import ElementTree
+        from src.services.twiml_templates import twiml_cache
+        
+        twiml = twiml_cache.render('say_stream', message='Tom & "Jerry" <3',
+                                   stream_url='wss://host/stream?a=1&b="2"')
+        root = ElementTree.fromstring(twiml)
+        
+        self.assertEqual(root.find('Say').text, 'Tom & "Jerry" <3')
+        self.assertEqual(root.find('Connect/Stream').get('url'), 'wss://host/stream?a=1&b="2"')
+    
+    def test_static_response_reused(self):
+        """Test that documents without parameters are served as the same bytes"""
+        from src.services.twiml_templates import twiml_cache
+        
+        first = twiml_cache.render('empty')
+        self.assertIs(twiml_cache.render('empty'), first)
+        self.assertIn(b'<Response', first)
+    
+    def test_greeting_change_rebuilds_templates(self):
+        """Test that a new greeting is spoken once the configuration changes"""
+        from src.services.twiml_templates import twiml_cache
+        
+        with self.app.app_context():
+            twiml_cache.render('incoming_stream', '+15551234567', stream_url='wss://host/stream')
+            BusinessConfig.set_config('greeting_message', 'Thanks for calling Test Business!')
+            twiml = twiml_cache.render('incoming_stream', '+15551234567', stream_url='wss://host/stream')
+        
+        self.assertIn(b'Thanks for calling Test Business!', twiml)
+    
+    def test_incoming_call_webhook(self):
+        """Test that the voice webhook connects the call's media stream"""
+        response = self.client.post('/api/phone/webhook/voice', data={
+            'CallSid': 'CA123', 'From': '+15559876543', 'To': '+15551234567'
+        })
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'text/xml')
+        self.assertIn(b'<Stream url="wss://localhost/phone/stream/CA123"', response.data)
+
+class TurnTracingTestCase(AIVoiceReceptionistTestCase):
+    """Test cases for per-turn latency tracing"""
+    
+    def setUp(self):
+        super().setUp()
+        from src.services.tracing import tracer
+        
+        self.tracer = tracer
+        tracer.clear()
+    
+    def test_text_chat_turn_spans(self):
+        """Test that a chat turn records its dialogue and NLU stages"""
+        response = self.client.post('/api/voice/text-chat', json={'message': 'Hello there',
+                                                                   'session_id': 'chat-1'})
+        self.assertEqual(response.status_code, 200)
+        
+        trace = self.tracer.recent('chat-1')[0]
+        spans = {span.name: span for span in trace.spans}
+        self.assertLessEqual({'dialogue', 'nlu', 'nlu.patterns', 'dialogue.response'}, set(spans))
+        self.assertEqual(spans['nlu'].attrs['path'], 'patterns')
+        self.assertEqual(spans['nlu'].depth, 1)
+        
+        response = self.client.get('/api/analytics/latency?window=60')
+        stages = json.loads(response.data)['stages']
+        self.assertEqual(stages['turn']['count'], 1)
+        self.assertIn('p99_ms', stages['dialogue'])
+        
+        response = self.client.get('/api/analytics/traces?session_id=chat-1')
+        self.assertEqual(len(json.loads(response.data)['traces']), 1)
+    
+    @patch('src.services.speech_service.SpeechService.text_to_speech')
+    @patch('src.services.speech_service.SpeechService.speech_to_text')
+    def test_voice_turn_persisted(self, mock_stt, mock_tts):
+        """Test that stage timings, and optionally the spans, are stored with the turn"""
+        import io
+        
+        mock_stt.return_value = 'Hello'
+        mock_tts.return_value = b'audio'
+        
+        with patch.dict(os.environ, {'PERSIST_TURN_TRACES': 'true'}):
+            response = self.client.post('/api/voice/process-call', data={
+                'audio': (io.BytesIO(b'fake audio'), 'turn.wav'), 'session_id': 'voice-1'
+            })
+        self.assertEqual(response.status_code, 200)
+        
+        with self.app.app_context():
+            call = Call.query.filter_by(session_id='voice-1').one()
+            turn = CallTurn.query.filter_by(call_id=call.id, role='assistant').one().to_dict()
+        
+        self.assertIsNotNone(turn['tts_ms'])
+        self.assertGreaterEqual(turn['total_ms'], turn['dialogue_ms'])
+        self.assertEqual([span['name'] for span in turn['spans'] if span['depth'] == 0],
+                         ['stt', 'dialogue', 'tts'])
+    
+    def test_span_records_errors(self):
+        """Test that a failing stage is marked and spans are no-ops outside a turn"""
+        with self.tracer.span('idle') as idle:
+            self.assertIsNone(idle)
+        
+        with self.assertRaises(TimeoutError):
+            with self.tracer.turn('CA1'), self.tracer.span('openai.chat', service='openai'):
+                raise TimeoutError()
+        
+        span = self.tracer.recent('CA1')[0].spans[0]
+        self.assertEqual(span.attrs, {'service': 'openai', 'error': 'TimeoutError'})
+
+class CallSessionTestCase(AIVoiceReceptionistTestCase):
+    """Test cases for per-call media stream sessions"""
+    
+    def test_sessions_share_services(self):
+        """Test that only the Realtime connection is allocated per call"""
+        import asyncio
+        from src.routes.phone_api import open_call_session, close_call_session, active_calls
+        from src.services.registry import dialogue_service, openai_client, nlu_service
+        
+        first = open_call_session('CA1', ws=None)
+        second = open_call_session('CA2', ws=None)
+        self.assertIsNot(first['realtime_service'], second['realtime_service'])
+        self.assertEqual(set(first), {'realtime_service', 'ws'})
+        
+        dialogue_service.process_message('hello', 'CA1')
+        self.assertIs(dialogue_service.client, openai_client)
+        self.assertIs(dialogue_service.nlu_service, nlu_service)
+        
+        asyncio.run(close_call_session('CA1'))
+        self.assertNotIn('CA1', active_calls)
+        self.assertIsNone(dialogue_service.get_session_info('CA1'))
+        asyncio.run(close_call_session('CA2'))
+    
+    def test_booking_slots_regenerated_daily(self):
+        """Test that the shared dialogue service doesn't keep stale slots"""
+        from datetime import date, timedelta
+        from src.services.dialogue_service import DialogueService
+        
+        service = DialogueService()
+        slots = service.booking_slots
+        self.assertIs(service.booking_slots, slots)
+        
+        service._slots_date = date.today() - timedelta(days=1)
+        self.assertIsNot(service.booking_slots, slots)
+        self.assertGreater(min(service.booking_slots), str(date.today()))
+
+class SpeechStreamingTestCase(AIVoiceReceptionistTestCase):
+    """Test cases for streamed text-to-speech"""
+    
+    def test_pcm_to_ulaw_unaligned_chunks(self):
+        """Test mu-law conversion when chunks split samples"""
+        from src.services.speech_service import SpeechService
+        
+        pcm = b'\x00\x10' * 2400  # 100 ms of 24 kHz audio
+        chunks = [pcm[:1001], pcm[1001:3333], pcm[3333:]]
+        ulaw = b''.join(SpeechService.pcm_to_ulaw(chunks))
+        
+        # 100 ms at 8 kHz, one byte per sample
+        self.assertAlmostEqual(len(ulaw), 800, delta=2)
+    
+    @patch('src.services.speech_service.SpeechService.stream_text_to_speech')
+    def test_tts_stream_endpoint(self, mock_stream):
+        """Test streamed TTS endpoint"""
+        mock_stream.return_value = iter([b'abc', b'def'])
+        
+        response = self.client.post('/api/voice/tts',
+                                  json={'text': 'Hello', 'format': 'ulaw'})
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'audio/basic')
+        self.assertEqual(response.data, b'abcdef')
+        self.assertEqual(mock_stream.call_args.kwargs['response_format'], 'ulaw')
+    
+    def test_tts_stream_unsupported_format(self):
+        """Test streamed TTS endpoint with unknown format"""
+        response = self.client.post('/api/voice/tts',
+                                  json={'text': 'Hello', 'format': 'ogg-vorbis'})
+        
+        self.assertEqual(response.status_code, 400)
+
+class AppFactoryTestCase(unittest.TestCase):
+    """Test cases for the application factory and lazily built services"""
+    
+    def test_create_app_initializes_database(self):
+        """Test that a new app gets its schema and default configuration"""
+        from main import create_app
+        
+        app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:', 'TESTING': True})
+        with app.app_context():
+            self.assertEqual(BusinessConfig.get_config('business_name'), 'Your Business Name')
+        
+        response = app.test_client().get('/api/phone/calls')
+        self.assertEqual(response.status_code, 200)
+    
+    def test_lazy_service_per_process(self):
+        """Test that services are built on first use, once per process"""
+        from src.services.registry import LazyService
+        
+        service = LazyService('collections:OrderedDict')
+        self.assertFalse(service.loaded)
+        
+        service.update(a=1)
+        self.assertTrue(service.loaded)
+        self.assertIs(service.get(), service.get())
+        self.assertEqual(service.get(), {'a': 1})
+        
+        # A forked worker builds its own instance
+        with patch('os.getpid', return_value=-1):
+            self.assertEqual(service.get(), {})
+
+class StaticAssetsTestCase(unittest.TestCase):
+    """Test cases for serving the dashboard build from memory"""
+    
+    def setUp(self):
+        from main import create_app
+        
+        self.folder = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.folder, 'assets'))
+        self.bundle = b'console.log("dashboard");\n' * 200
+        with open(os.path.join(self.folder, 'index.html'), 'wb') as f:
+            f.write(b'<!doctype html><div id="root"></div>')
+        with open(os.path.join(self.folder, 'assets', 'index-4f9a2b1c.js'), 'wb') as f:
+            f.write(self.bundle)
+        
+        app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:', 'TESTING': True,
+                          'STATIC_FOLDER': self.folder})
+        self.client = app.test_client()
+    
+    def test_hashed_bundle_is_compressed_and_immutable(self):
+        """Test gzip negotiation and long-lived caching of content-hashed files"""
+        import gzip
+        
+        response = self.client.get('/assets/index-4f9a2b1c.js', headers={'Accept-Encoding': 'gzip, deflate'})
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('immutable', response.headers['Cache-Control'])
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertEqual(gzip.decompress(response.data), self.bundle)
+        
+        plain = self.client.get('/assets/index-4f9a2b1c.js')
+        self.assertNotIn('Content-Encoding', plain.headers)
+        self.assertEqual(plain.data, self.bundle)
+        self.assertNotEqual(plain.headers['ETag'], response.headers['ETag'])
+    
+    def test_only_content_hashed_names_are_immutable(self):
+        """Test that plain asset names with digits are not cached as immutable"""
+        from src.services.static_assets import StaticAsset, IMMUTABLE_CACHE
+        
+        for name in ('index-4f9a2b1c.js', 'assets/main.3f2a1b9c0d.css'):
+            self.assertEqual(StaticAsset(name, 'text/plain', b'x').cache_control, IMMUTABLE_CACHE, name)
+        for name in ('android-chrome512.png', 'icon-maskable512.png', 'report-20250101.pdf', 'index.html'):
+            self.assertNotEqual(StaticAsset(name, 'text/plain', b'x').cache_control, IMMUTABLE_CACHE, name)
+    
+    def test_index_revalidates_with_etag(self):
+        """Test that client-side routes get index.html and a 304 once cached"""
+        response = self.client.get('/calls/monitor')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'id="root"', response.data)
+        self.assertEqual(response.headers['Cache-Control'], 'no-cache')
+        
+        revalidated = self.client.get('/', headers={'If-None-Match': response.headers['ETag']})
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated.data, b'')
+    
+    def test_files_added_after_startup(self):
+        """Test that files written after startup, like generated audio, are still served"""
+        with open(os.path.join(self.folder, 'reply.mp3'), 'wb') as f:
+            f.write(b'ID3audio')
+        
+        response = self.client.get('/reply.mp3')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, b'ID3audio')
+        response.close()
+
+class MetricsTestCase(unittest.TestCase):
+    """Test cases for the Prometheus metrics endpoint"""
+    
+    def setUp(self):
+        from main import create_app
+        from src.services import metrics
+        
+        for metric in metrics._metrics:
+            metric.reset()
+        self.metrics = metrics
+        app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:', 'TESTING': True})
+        self.client = app.test_client()
+    
+    def test_metrics_endpoint(self):
+        """Test that turn stages, external requests and gauges are exposed"""
+        from src.services.tracing import tracer
+        from src.services.metrics import ExternalCall
+        
+        with tracer.turn('session-1'):
+            with tracer.span('nlu'):
+                pass
+        with self.assertRaises(ConnectionError):
+            with ExternalCall('crm', 'POST'):
+                raise ConnectionError('refused')
+        
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain; version=0.0.4'))
+        
+        text = response.get_data(as_text=True)
+        self.assertIn('# TYPE voice_turn_stage_seconds histogram', text)
+        self.assertIn('voice_turn_stage_seconds_bucket{stage="nlu",le="+Inf"} 1', text)
+        self.assertIn('voice_turn_stage_seconds_count{stage="turn"} 1', text)
+        self.assertIn('voice_external_requests_total{service="crm",operation="POST",outcome="error"} 1', text)
+        self.assertIn('voice_active_calls 0', text)
+        
+        from src.services.registry import dialogue_service
+        sessions = len(dialogue_service.active_sessions)
+        text = self.client.get('/metrics').get_data(as_text=True)
+        self.assertIn(f'voice_dialogue_sessions {sessions}', text)
+    
+    def test_counters_summed_across_threads(self):
+        """Test that per-thread shards add up without losing increments"""
+        import threading
+        
+        frames = self.metrics.media_frames.labels(direction='inbound')
+        threads = [threading.Thread(target=lambda: [frames.inc() for _ in range(1000)]) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(self.metrics.media_frames.collect()[('inbound',)], 4000)
+    
+    def test_exited_threads_shards_retired(self):
+        """Test that short-lived threads' counts are kept while their shards are dropped"""
+        import gc
+        import threading
+        
+        for _ in range(500):
+            thread = threading.Thread(target=lambda: (self.metrics.media_frames.inc(direction='inbound'),
+                                                      self.metrics.turn_stage_seconds.observe(0.01, stage='nlu')))
+            thread.start()
+            thread.join()
+        gc.collect()
+        
+        self.assertLess(len(self.metrics.media_frames._shards), 10)
+        self.assertEqual(self.metrics.media_frames.collect()[('inbound',)], 500)
+        self.assertEqual(sum(self.metrics.turn_stage_seconds.collect()[('nlu',)][:-1]), 500)
+    
+    def test_workers_aggregated_through_directory(self):
+        """Test that other workers' files are merged, dropping gauges of exited workers"""
+        from src.services.metrics import MetricsStore
+        
+        directory = tempfile.mkdtemp()
+        store = MetricsStore(directory)
+        self.metrics.media_frames.inc(5, direction='outbound')
+        self.metrics.active_calls.set(2)
+        store.write()
+        
+        # Another worker that has since exited
+        with open(os.path.join(directory, 'metrics-999999999.json'), 'w') as f:
+            json.dump({'pid': 999999999, 'metrics': {
+                'voice_media_frames_total': [[['outbound'], 7]],
+                'voice_active_calls': [[[], 3]],
+            }}, f)
+        
+        merged = store.gather()
+        self.assertEqual(merged['voice_media_frames_total'][('outbound',)], 12)
+        self.assertEqual(merged['voice_active_calls'][()], 2)
+
+class QueryPlanTestCase(unittest.TestCase):
+    """Query-plan regression tests for registered hot queries"""
+    
+    SYNTHETIC_CALLS = int(os.environ.get('QUERY_PLAN_CALLS', 1000000))
+    
+    @classmethod
+    def setUpClass(cls):
+        """Build a schema without indexes, migrate it and seed synthetic data"""
+        from datetime import datetime, timedelta
+        from sqlalchemy import create_engine
+        from sqlalchemy.pool import StaticPool
+        from src.models.migrations import apply_migrations
+        
+        cls.engine = create_engine('sqlite://', poolclass=StaticPool)
+        
+        # Start from tables as an older deployment would have them, calls and
+        # appointments without the indexes the migrations add
+        for table in db.metadata.sorted_tables:
+            table.create(cls.engine)
+            if table.name in ('calls', 'appointments'):
+                for index in table.indexes:
+                    index.drop(cls.engine)
+        cls.applied = apply_migrations(cls.engine)
+        
+        statuses = ['completed', 'completed', 'completed', 'failed', 'active', 'busy']
+        intents = ['greeting', 'appointment_booking', 'business_hours', 'pricing', 'location', None]
+        base = datetime(2024, 1, 1)
+        now = datetime.utcnow()
+        
+        def calls():
+            for i in range(cls.SYNTHETIC_CALLS):
+                yield (f'CA{i:032d}', f'+1555{i % 100000:07d}', base + timedelta(seconds=i * 30),
+                       statuses[i % len(statuses)], intents[i % len(intents)], now, now)
+        
+        def appointments():
+            for i in range(cls.SYNTHETIC_CALLS // 20):
+                day = (base + timedelta(days=i % 730)).date().isoformat()
+                yield (f'Customer {i}', f'+1555{i % 100000:07d}', 'Consultation', day,
+                       f'{9 + i % 8:02d}:00:00.000000', 'scheduled' if i % 5 else 'cancelled')
+        
+        raw = cls.engine.raw_connection()
+        raw.executemany(
+            "INSERT INTO calls (session_id, caller_phone, start_time, call_status, primary_intent, "
+            "created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)", calls()
+        )
+        raw.executemany(
+            "INSERT INTO appointments (customer_name, customer_phone, service_type, appointment_date, "
+            "appointment_time, status) VALUES (?, ?, ?, ?, ?, ?)", appointments()
+        )
+        raw.execute("ANALYZE")
+        raw.commit()
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.engine.dispose()
+    
+    def test_migrations_applied_once(self):
+        """Test that migrations are recorded and not re-applied"""
+        from src.models.migrations import apply_migrations
+        
+        self.assertIn('0001_hot_query_indexes', self.applied)
+        self.assertEqual(apply_migrations(self.engine), [])
+    
+    def test_missing_columns_added(self):
+        """Test that columns added to models are added to older tables"""
+        from sqlalchemy import create_engine, inspect, text
+        from src.models.migrations import apply_migrations
+        
+        engine = create_engine('sqlite://')
+        with engine.begin() as connection:
+            connection.execute(text(
+                "CREATE TABLE calls (id INTEGER PRIMARY KEY, session_id VARCHAR(100) NOT NULL, "
+                "caller_phone VARCHAR(20), start_time DATETIME NOT NULL, call_status VARCHAR(20), "
+                "primary_intent VARCHAR(50))"
+            ))
+        
+        apply_migrations(engine)
+        
+        columns = {column['name'] for column in inspect(engine).get_columns('calls')}
+        self.assertTrue({'business_phone', 'direction', 'stream_sid', 'price', 'twilio_synced_at'} <= columns)
+        indexes = {index['name'] for index in inspect(engine).get_indexes('calls')}
+        self.assertTrue({'ix_calls_start_time', 'ix_calls_business_phone'} <= indexes)
+        engine.dispose()
+    
+    def test_appointment_business_backfilled(self):
+        """Test that existing appointments get the business number of the call they were booked on"""
+        from sqlalchemy import create_engine, text
+        from src.models.migrations import apply_migrations
+        
+        engine = create_engine('sqlite://')
+        with engine.begin() as connection:
+            connection.execute(text(
+                "CREATE TABLE calls (id INTEGER PRIMARY KEY, session_id VARCHAR(100) NOT NULL, "
+                "caller_phone VARCHAR(20), start_time DATETIME NOT NULL, call_status VARCHAR(20), "
+                "primary_intent VARCHAR(50), business_phone VARCHAR(20))"
+            ))
+            connection.execute(text(
+                "CREATE TABLE appointments (id INTEGER PRIMARY KEY, call_id INTEGER, "
+                "appointment_date DATE, appointment_time TIME, status VARCHAR(20), customer_phone VARCHAR(20))"
+            ))
+            connection.execute(text(
+                "INSERT INTO calls (id, session_id, start_time, business_phone) "
+                "VALUES (1, 'CA1', '2026-01-05 10:00:00', '+15550000001')"
+            ))
+            connection.execute(text("INSERT INTO appointments (id, call_id) VALUES (1, 1), (2, NULL)"))
+        
+        apply_migrations(engine)
+        
+        with engine.connect() as connection:
+            rows = connection.execute(text("SELECT id, business_phone FROM appointments ORDER BY id")).all()
+        self.assertEqual([tuple(row) for row in rows], [(1, '+15550000001'), (2, None)])
+        engine.dispose()
+    
+    def test_hot_queries_use_indexes(self):
+        """Test that no registered hot query falls back to a full table scan"""
+        from src.models.migrations import find_full_scans
+        
+        with self.engine.connect() as connection:
+            self.assertEqual(find_full_scans(connection), {})
+    
+    def test_recent_calls_avoid_sort(self):
+        """Test that the call listing reads start_time order straight from the index"""
+        from src.models.migrations import HOT_QUERIES, explain_query_plan
+        
+        with self.engine.connect() as connection:
+            plan = explain_query_plan(connection, HOT_QUERIES['calls_by_status']())
+        
+        self.assertFalse(any('TEMP B-TREE' in detail for detail in plan), plan)
+
+class AudioCodecTestCase(unittest.TestCase):
+    """Test cases for in-process audio transcoding"""
+    
+    def test_g711_silence(self):
+        """Test G.711 encoding of digital silence"""
+        from src.services.audio_codec import ulaw_encode, alaw_encode
+        
+        silence = b'\x00\x00' * 160
+        self.assertEqual(ulaw_encode(silence), b'\xff' * 160)
+        self.assertEqual(alaw_encode(silence), b'\xd5' * 160)
+    
+    def test_ulaw_round_trip(self):
+        """Test that every mu-law code survives decode and re-encode"""
+        from src.services.audio_codec import ulaw_decode, ulaw_encode
+        
+        codes = bytes(range(256))
+        decoded = ulaw_decode(codes)
+        self.assertTrue((ulaw_decode(ulaw_encode(decoded)) == decoded).all())
+    
+    def test_streaming_resample_matches_buffer(self):
+        """Test that frame-by-frame resampling matches whole-buffer resampling"""
+        import numpy as np
+        from src.services.audio_codec import Resampler, resample
+        
+        samples = (8000 * np.sin(np.arange(8000) / 10.0)).astype(np.int16)
+        resampler = Resampler(8000, 24000)
+        streamed = np.concatenate([resampler.process(samples[i:i + 160])
+                                   for i in range(0, len(samples), 160)])
+        
+        self.assertEqual(len(streamed), 24000)
+        self.assertLessEqual(np.abs(streamed.astype(int) - resample(samples, 8000, 24000)).max(), 1)
+    
+    def test_framer_fixed_frames(self):
+        """Test splitting a stream into 20 ms frames"""
+        from src.services.audio_codec import Framer
+        
+        framer = Framer()
+        frames = list(framer.push(b'a' * 100)) + list(framer.push(b'b' * 300))
+        frames += list(framer.flush())
+        
+        self.assertEqual([len(frame) for frame in frames], [160, 160, 160])
+        self.assertEqual(bytes(frames[0]), b'a' * 100 + b'b' * 60)
+
+class EntityExtractorTestCase(unittest.TestCase):
+    """Test cases for single-pass entity extraction"""
+    
+    def setUp(self):
+        from src.services.entity_extractor import EntityExtractor
+        
+        self.extractor = EntityExtractor()
+        self.today = date(2026, 10, 19)  # A Monday
+    
+    def test_typed_values_with_spans(self):
+        """Test that entities are normalized and located in the utterance"""
+        text = "My name is jane doe and I'd like tomorrow at 3:30 pm, call 555-123-4567 or Jane@Example.com"
+        entities = self.extractor.extract(text, self.today)
+        
+        self.assertEqual([(entity.type, entity.value) for entity in entities], [
+            ('name', 'Jane Doe'),
+            ('date', date(2026, 10, 20)),
+            ('time', time(15, 30)),
+            ('phone', '+15551234567'),
+            ('email', 'jane@example.com'),
+        ])
+        for entity in entities:
+            self.assertEqual(text[entity.start:entity.end], entity.text)
+    
+    def test_relative_dates(self):
+        """Test weekdays and month names resolved against today"""
+        from src.services.entity_extractor import entities_by_type
+        
+        entities = entities_by_type(self.extractor.extract('next Monday or Friday, else March 3rd', self.today))
+        
+        self.assertEqual(entities['date'], [date(2026, 10, 26), date(2026, 10, 23), date(2027, 3, 3)])
+    
+    def test_introductions(self):
+        """Test that only capitalized introductions are taken as names"""
+        self.assertEqual(self.extractor.extract("I'm calling about my booking", self.today), ())
+        self.assertEqual(self.extractor.extract("I'm Fine thanks", self.today), ())
+        self.assertEqual(self.extractor.extract('my name is not important', self.today), ())
+        
+        entities = self.extractor.extract('Hi, this is Alex Chen from accounting', self.today)
+        self.assertEqual([entity.value for entity in entities], ['Alex Chen'])
+    
+    def test_memoized(self):
+        """Test that repeated extraction of an utterance reuses the first scan"""
+        first = self.extractor.extract('tomorrow at noon', self.today)
+        
+        self.assertIs(self.extractor.extract('tomorrow at noon', self.today), first)
+        self.assertIsNot(self.extractor.extract('tomorrow at noon', date(2026, 10, 20)), first)
+    
+    def test_dialogue_entities_json(self):
+        """Test that chat responses carry entities as JSON-safe values"""
+        from src.services.registry import dialogue_service
+        
+        result = dialogue_service.process_message('Can I book a cleaning at 2pm?', 'entity-test')
+        
+        self.assertEqual(result['entities']['time'], ['14:00:00'])
+        json.dumps(result)
+
+class DateResolverTestCase(unittest.TestCase):
+    """Test cases for resolving requested dates and times to open slots"""
+    
+    def setUp(self):
+        from src.services.date_resolver import AvailabilityIndex, DateResolver
+        
+        self.resolver = DateResolver('Monday-Friday 9AM-6PM, Saturday 9AM-3PM')
+        self.now = datetime(2026, 10, 19, 10, 15)  # A Monday
+        self.availability = AvailabilityIndex(datetime(2026, 10, 19 + day, hour)
+                                              for day in range(7) for hour in (9, 10, 11, 14, 15, 16))
+    
+    def test_default_now_is_business_time(self):
+        """Test that candidates start from the current time in the business timezone"""
+        from zoneinfo import ZoneInfo
+        from src.services.date_resolver import DateResolver
+        
+        zone = ZoneInfo('Pacific/Kiritimati')  # UTC+14
+        with patch('src.services.entity_extractor._BUSINESS_ZONE', zone):
+            start = DateResolver('Monday-Sunday 12AM-11:59PM').candidates()[0][0]
+        
+        self.assertLess(abs((start - datetime.now(zone).replace(tzinfo=None)).total_seconds()), 60)
+    
+    def test_business_hours(self):
+        """Test parsing business hours per weekday"""
+        self.assertEqual(self.resolver.hours[0], (time(9, 0), time(18, 0)))
+        self.assertEqual(self.resolver.hours[5], (time(9, 0), time(15, 0)))
+        self.assertNotIn(6, self.resolver.hours)
+    
+    def test_nearest_to_requested_time(self):
+        """Test that a taken time is answered with the closest open slots that day"""
+        proposals = self.resolver.propose(self.availability, date(2026, 10, 20), time(13, 0), self.now)
+        
+        self.assertEqual(proposals, [datetime(2026, 10, 20, 14), datetime(2026, 10, 20, 11),
+                                     datetime(2026, 10, 20, 15)])
+    
+    def test_part_of_day(self):
+        """Test that a part of day is clipped to business hours and to now"""
+        self.assertEqual(self.resolver.candidates(date(2026, 10, 24), 'afternoon', self.now),
+                         [(datetime(2026, 10, 24, 12), datetime(2026, 10, 24, 15))])
+        
+        proposals = self.resolver.propose(self.availability, None, 'morning', self.now)
+        self.assertEqual(proposals, [datetime(2026, 10, 19, 11), datetime(2026, 10, 20, 9),
+                                     datetime(2026, 10, 20, 10)])
+    
+    def test_closed_day_falls_forward(self):
+        """Test offering the next openings when the requested day is closed"""
+        proposals = self.resolver.propose(self.availability, date(2026, 10, 24), 'evening', self.now)
+        
+        self.assertEqual(proposals, [datetime(2026, 10, 24, 9), datetime(2026, 10, 24, 10),
+                                     datetime(2026, 10, 24, 11)])
+    
+    def test_dialogue_offers_open_slots(self):
+        """Test that booking an unavailable time offers the nearest open ones"""
+        from src.services.date_resolver import AvailabilityIndex
+        from src.services.dialogue_service import DialogueService, DialogueState
+        
+        service = DialogueService()
+        session = DialogueState('resolver-test')
+        session.user_info.update({'name': 'Jane Doe', 'phone': '+15551234567'})
+        session.appointment_details.update({'service_type': 'cleaning', 'preferred_date': date(2030, 1, 7)})
+        service.active_sessions['resolver-test'] = session
+        
+        availability = AvailabilityIndex(datetime(2030, 1, 7, hour) for hour in (9, 14, 15))
+        with patch.object(service, '_availability', return_value=availability):
+            offered = service.process_message('Can I book at 1pm?', 'resolver-test')
+            confirmed = service.process_message('Book the 2pm appointment please', 'resolver-test')
+        
+        self.assertEqual(offered['state'], 'offering_slots')
+        self.assertIn('Monday, January 7 at 2:00 PM', offered['response'])
+        self.assertEqual(confirmed['action_type'], 'appointment_confirm')
+        self.assertEqual(confirmed['action_data']['time'], '14:00:00')
+
+class TenantTestCase(AIVoiceReceptionistTestCase):
+    """Test cases for per-business configuration keyed on the dialed number"""
+    
+    def _configure_tenant(self):
+        return self.client.put('/api/phone/tenants/+1 (555) 765-4321/config', json={
+            'business_name': 'Acme Dental',
+            'business_hours': 'Monday-Friday 8AM-4PM',
+            'greeting_message': 'Thanks for calling Acme Dental!'
+        })
+    
+    def test_tenant_config_overrides(self):
+        """Test that a tenant's keys override the global configuration and others fall back"""
+        response = self._configure_tenant()
+        
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual(data['tenant'], '+15557654321')
+        
+        with self.app.app_context():
+            from src.services.tenants import tenant_registry
+            
+            tenant = tenant_registry.get('+15557654321')
+            self.assertEqual(tenant.business_config['name'], 'Acme Dental')
+            self.assertEqual(tenant.business_config['services'], ['Consultation', 'Treatment'])
+            self.assertEqual(tenant_registry.get(None).business_config['name'], 'Test Business')
+    
+    def test_text_chat_per_tenant(self):
+        """Test that a session keeps answering for the business it started with"""
+        self._configure_tenant()
+        
+        response = self.client.post('/api/voice/text-chat', json={'message': 'Hi there', 'tenant': '+15557654321'})
+        session_id = json.loads(response.data)['session_id']
+        response = self.client.post('/api/voice/text-chat', json={
+            'message': 'What are your business hours?', 'session_id': session_id
+        })
+        self.assertIn('Monday-Friday 8AM-4PM', json.loads(response.data)['response'])
+        
+        response = self.client.post('/api/voice/text-chat', json={'message': 'What are your business hours?'})
+        self.assertIn('Monday-Friday 9AM-5PM', json.loads(response.data)['response'])
+    
+    def test_config_change_rebuilds_derived(self):
+        """Test that derived objects are cached until the tenant's configuration changes"""
+        from src.services.tenants import tenant_registry
+        
+        self._configure_tenant()
+        with self.app.app_context():
+            tenant = tenant_registry.get('+15557654321')
+            resolver = tenant.derived('date_resolver', lambda tenant: object())
+            self.assertIs(tenant.derived('date_resolver', lambda tenant: object()), resolver)
+            
+            TenantConfig.set_config('+15557654321', 'business_hours', 'Monday-Friday 10AM-2PM')
+            changed = tenant_registry.get('+15557654321')
+            self.assertIsNot(changed, tenant)
+            self.assertIsNot(changed.derived('date_resolver', lambda tenant: object()), resolver)
+    
+    def test_least_recently_used_evicted(self):
+        """Test that the registry keeps only its most recently used tenants"""
+        from src.services.tenants import TenantRegistry
+        
+        registry = TenantRegistry(maxsize=2)
+        with self.app.app_context():
+            first = registry.get('+15550000001')
+            registry.get('+15550000002')
+            registry.get('+15550000001')
+            registry.get('+15550000003')
+            
+            self.assertEqual(len(registry), 2)
+            self.assertNotIn('+15550000002', registry)
+            self.assertIs(registry.get('+15550000001'), first)
+    
+    def test_speech_cached_per_tenant(self):
+        """Test that a tenant's repeated replies are synthesized once"""
+        from src.services.tenants import tenant_registry, speech_cache
+        
+        speech_cache.clear()
+        synthesize = MagicMock(return_value=b'audio')
+        with self.app.app_context():
+            tenant = tenant_registry.get('+15557654321')
+            for _ in range(3):
+                self.assertEqual(tenant.cached_speech('Goodbye!', 'alloy', synthesize), b'audio')
+            tenant_registry.get('+15550000001').cached_speech('Goodbye!', 'alloy', synthesize)
+        
+        self.assertEqual(synthesize.call_count, 2)
+    
+    def test_speech_cache_bounded_by_bytes(self):
+        """Test that synthesized audio of all tenants is evicted by total size"""
+        from src.services import tenants
+        
+        cache = tenants.LRUCache(1000, weigh=len)
+        with patch.object(tenants, 'speech_cache', cache), self.app.app_context():
+            for number in ('+15550000001', '+15550000002', '+15550000003'):
+                tenant = tenants.tenant_registry.get(number)
+                tenant.cached_speech('Goodbye!', 'alloy', lambda: b'x' * 400)
+            
+            self.assertEqual(len(cache), 2)
+            self.assertEqual(cache.weight, 800)
+            self.assertNotIn(('+15550000001', 'Goodbye!', 'alloy'), cache)
+            
+            # A clip larger than the whole budget is returned but not kept
+            audio = tenant.cached_speech('Hello!', 'alloy', lambda: b'x' * 2000)
+            self.assertEqual(len(audio), 2000)
+            self.assertNotIn(('+15550000003', 'Hello!', 'alloy'), cache)
+            self.assertEqual(cache.weight, 800)
+    
+    def test_availability_per_tenant(self):
+        """Test that a business's appointments, booked on a call or not, take only its own slots"""
+        from datetime import date, datetime, time
+        from src.services.calendar_service import CalendarService
+        
+        day = date(2030, 1, 7)
+        with self.app.app_context():
+            call = Call(session_id='CA_booked', business_phone='+15550000001')
+            db.session.add(call)
+            db.session.commit()
+            for hour, business_phone, call_id in ((9, None, call.id), (10, '+15550000002', None), (11, None, None)):
+                db.session.add(Appointment(customer_name='Jane Doe', customer_phone='+15559876543',
+                                           service_type='Consultation', appointment_date=day,
+                                           appointment_time=time(hour), business_phone=business_phone,
+                                           call_id=call_id))
+            db.session.commit()
+            self.assertEqual(Appointment.query.filter_by(call_id=call.id).one().business_phone, '+15550000001')
+            
+            calendar = CalendarService()
+            taken = {}
+            for tenant in ('+15550000001', '+15550000002', None):
+                slots = calendar.get_availability_index(day, day, tenant=tenant)
+                taken[tenant] = [hour for hour in (9, 10, 11) if datetime.combine(day, time(hour)) not in slots]
+        
+        self.assertEqual(taken, {'+15550000001': [9], '+15550000002': [10], None: [11]})
+    
+    def test_greeting_per_tenant(self):
+        """Test that incoming call TwiML greets with the dialed business's greeting"""
+        self._configure_tenant()
+        
+        with self.app.app_context():
+            from src.services.twiml_templates import twiml_cache
+            
+            tenant_twiml = twiml_cache.render('incoming_stream', '+15557654321', stream_url='wss://example/s').decode()
+            default_twiml = twiml_cache.render('incoming_stream', '+15550000001', stream_url='wss://example/s').decode()
+        
+        self.assertIn('Thanks for calling Acme Dental!', tenant_twiml)
+        self.assertNotIn('Acme Dental', default_twiml)
+
+class TenantLanguageTestCase(AIVoiceReceptionistTestCase):
+    """Test cases for per-business intents, synonyms, services and replies"""
+    
+    TENANT = '+15557654321'
+    
+    def _configure_language(self, **config):
+        return self.client.put(f'/api/phone/tenants/{self.TENANT}/config', json=dict({
+            'services': 'Teeth Cleaning,Whitening',
+            'custom_intents': {
+                'parking': {'phrases': ['park', 'parking'], 'response': 'Parking is free behind {name}.'}
+            },
+            'intent_synonyms': {'appointment_booking': ['pencil me in']},
+            'service_synonyms': {'Teeth Cleaning': ['hygiene visit', 'cleaning']}
+        }, **config))
+    
+    def test_custom_intent_answered(self):
+        """Test that a custom intent outranks built-in ones and replies with its template"""
+        self.assertEqual(self._configure_language(business_name='Acme Dental').status_code, 200)
+        
+        response = self.client.post('/api/voice/text-chat', json={'message': 'Where do I park?', 'tenant': self.TENANT})
+        data = json.loads(response.data)
+        self.assertEqual(data['intent'], 'parking')
+        self.assertEqual(data['response'], 'Parking is free behind Acme Dental.')
+        
+        response = self.client.post('/api/voice/text-chat', json={'message': 'Where do I park?'})
+        self.assertEqual(json.loads(response.data)['intent'], 'location')
+    
+    def test_synonyms_and_services(self):
+        """Test that intent and service synonyms map to their intent and service"""
+        self._configure_language()
+        
+        with self.app.app_context():
+            from src.services.registry import nlu_service
+            from src.services.tenants import tenant_registry
+            
+            tenant = tenant_registry.get(self.TENANT)
+            self.assertEqual(nlu_service.analyze_intent('Could you pencil me in?', tenant)['intent'], 'appointment_booking')
+            details = nlu_service.extract_appointment_details('I need a hygiene visit on Monday', tenant)
+            self.assertEqual(details['service_type'], 'Teeth Cleaning')
+            details = nlu_service.extract_appointment_details('I need a massage', tenant)
+            self.assertEqual(details['service_type'], 'massage')
+    
+    def test_response_templates(self):
+        """Test that reply templates are filled in with the business's details"""
+        self._configure_language(business_hours='Monday-Friday 8AM-4PM',
+                                 response_templates={'business_hours': 'Open {hours}. Call {phone}.'})
+        
+        with self.app.app_context():
+            from src.services.registry import nlu_service
+            from src.services.tenants import tenant_registry
+            
+            tenant = tenant_registry.get(self.TENANT)
+            self.assertEqual(nlu_service.get_response_template('business_hours', tenant=tenant),
+                             'Open Monday-Friday 8AM-4PM. Call +15551234567.')
+        
+        response = self.client.post('/api/voice/text-chat', json={'message': 'What are your hours?', 'tenant': self.TENANT})
+        self.assertEqual(json.loads(response.data)['response'], 'Open Monday-Friday 8AM-4PM. Call +15551234567.')
+    
+    def test_invalid_language_rejected(self):
+        """Test that malformed NLU configuration is rejected, or ignored if already stored"""
+        response = self._configure_language(response_templates={'greeting': 'Hi from {nickname}'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('greeting', json.loads(response.data)['error'])
+        response = self._configure_language(custom_intents={'location': {'phrases': ['where']}})
+        self.assertEqual(response.status_code, 400)
+        
+        with self.app.app_context():
+            from src.services.registry import nlu_service
+            from src.services.tenants import tenant_registry
+            
+            TenantConfig.set_config(self.TENANT, 'custom_intents', '{"parking": {"patterns": ["(park"]}}')
+            tenant = tenant_registry.get(self.TENANT)
+            self.assertEqual(nlu_service.analyze_intent('What are your hours?', tenant)['intent'], 'business_hours')
+    
+    def test_malformed_services_ignored(self):
+        """Test that service names without words neither break the NLU nor hide the other services"""
+        with self.app.app_context():
+            from src.services.registry import nlu_service
+            from src.services.tenants import tenant_registry
+            
+            BusinessConfig.set_config('services', 'Consultation,!!!,Treatment')
+            tenant = tenant_registry.get()
+            self.assertEqual(nlu_service.analyze_intent('What are your hours?', tenant)['intent'], 'business_hours')
+            details = nlu_service.extract_appointment_details('I need a treatment on Monday', tenant)
+            self.assertEqual(details['service_type'], 'Treatment')
+            
+            # Malformed NLU keys as well: the built-in language still answers
+            TenantConfig.set_config(self.TENANT, 'custom_intents', '{"parking": {"patterns": ["(park"]}}')
+            tenant = tenant_registry.get(self.TENANT)
+            self.assertEqual(nlu_service.analyze_intent('What are your hours?', tenant)['intent'], 'business_hours')
+        
+        for tenant in (None, self.TENANT):
+            response = self.client.post('/api/voice/text-chat', json={'message': 'Hello there', 'tenant': tenant})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(json.loads(response.data)['intent'], 'greeting')
+    
+    def test_language_swapped_on_config_change(self):
+        """Test that a tenant's language is compiled once and replaced when its configuration changes"""
+        self._configure_language()
+        
+        with self.app.app_context():
+            from src.services.registry import nlu_service
+            from src.services.tenants import tenant_registry
+            
+            language = nlu_service.tenant_language(tenant_registry.get(self.TENANT))
+            self.assertIs(nlu_service.tenant_language(tenant_registry.get(self.TENANT)), language)
+            
+            TenantConfig.set_config(self.TENANT, 'intent_synonyms', '{"goodbye": ["cheers"]}')
+            changed = nlu_service.tenant_language(tenant_registry.get(self.TENANT))
+            self.assertIsNot(changed, language)
+            self.assertEqual(changed.match('cheers then'), 'goodbye')
+            self.assertEqual(language.match('cheers then'), None)
+
+class PromptBuilderTestCase(AIVoiceReceptionistTestCase):
+    """Test cases for the token-budgeted reply prompts"""
+    
+    def test_history_trimmed_to_budget(self):
+        """Test that the most recent whole turns within the token budget are kept"""
+        from src.services.prompt_builder import PromptHistory, estimate_tokens
+        
+        history = PromptHistory()
+        for turn in range(10):
+            history.add_turn(f'Question {turn}', f'Answer {turn}')
+        turn_tokens = estimate_tokens('Question 0') + estimate_tokens('Answer 0')
+        
+        messages = history.recent(3 * turn_tokens + 1)
+        self.assertEqual([message['content'] for message in messages],
+                         ['Question 7', 'Answer 7', 'Question 8', 'Answer 8', 'Question 9', 'Answer 9'])
+        self.assertEqual(history.recent(turn_tokens - 1), [])
+        self.assertIs(messages[-1], history.messages[-1])
+    
+    def test_system_message_cached_per_config(self):
+        """Test that a tenant's system message is built once per configuration version"""
+        from src.services.prompt_builder import PromptHistory, prompt_builder
+        from src.services.tenants import tenant_registry
+        
+        with self.app.app_context():
+            tenant = tenant_registry.get('+15557654321')
+            first = prompt_builder.build(tenant, PromptHistory(), 'Do you take insurance?')
+            second = prompt_builder.build(tenant, PromptHistory(), 'Is there parking?')
+            self.assertIs(first[0], second[0])
+            self.assertIn('Test Business', first[0]['content'])
+            
+            TenantConfig.set_config('+15557654321', 'business_name', 'Acme Dental')
+            changed = prompt_builder.build(tenant_registry.get('+15557654321'), PromptHistory(), 'Hi')
+            self.assertIn('Acme Dental', changed[0]['content'])
+    
+    def test_complex_query_sends_conversation(self):
+        """Test that unknown intents are answered with system, history and caller messages"""
+        from types import SimpleNamespace
+        from src.services.dialogue_service import DialogueService
+        
+        dialogue = DialogueService()
+        dialogue.client = MagicMock()
+        dialogue.client.chat.completions.create.return_value = SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content='Yes, we do.'))])
+        unknown = {'intent': 'unknown', 'confidence': 0.0}
+        
+        with self.app.app_context(), patch.object(dialogue.nlu_service, '_ai_based_intent', return_value=unknown):
+            dialogue.process_message('Hello there', 'prompt-session')
+            response = dialogue.process_message('Do you accept my insurance plan?', 'prompt-session')
+        
+        self.assertEqual(response['response'], 'Yes, we do.')
+        messages = dialogue.client.chat.completions.create.call_args.kwargs['messages']
+        self.assertEqual([message['role'] for message in messages], ['system', 'user', 'assistant', 'user'])
+        self.assertEqual(messages[1]['content'], 'Hello there')
+        self.assertEqual(messages[-1]['content'], 'Do you accept my insurance plan?')
+
+class AsyncOpenAITestCase(AIVoiceReceptionistTestCase):
+    """Test cases for the async OpenAI path"""
+    
+    def test_client_per_event_loop(self):
+        """Test that each event loop gets its own instance, reused within the loop"""
+        import asyncio
+        from src.services.registry import LoopLocalService
+        
+        service = LoopLocalService('builtins:object')
+        
+        async def instances():
+            return service.get(), service.get()
+        
+        first, again = asyncio.run(instances())
+        second, _ = asyncio.run(instances())
+        self.assertIs(first, again)
+        self.assertIsNot(first, second)
+        with self.assertRaises(RuntimeError):
+            service.get()
+    
+    def test_clients_closed_with_their_loop(self):
+        """Test that per-request event loops do not leave OpenAI clients and loops behind"""
+        import asyncio
+        import gc
+        from src.services.registry import LoopLocalService
+        
+        service = LoopLocalService('src.services.registry:build_async_openai_client')
+        clients = []
+        
+        async def stream(delay):
+            async with service.scope() as client:
+                clients.append(client)
+                await asyncio.sleep(delay)
+                self.assertFalse(client.is_closed())  # Still used by the other stream on the loop
+        
+        async def call():
+            await asyncio.gather(stream(0), stream(0.01))
+        
+        with patch.dict(os.environ, {'OPENAI_API_KEY': 'sk-test'}):
+            for _ in range(5):
+                asyncio.run(call())
+        gc.collect()
+        
+        self.assertEqual(len(clients), 10)
+        self.assertEqual(len({id(client) for client in clients}), 5)
+        self.assertTrue(all(client.is_closed() for client in clients))
+        self.assertEqual(len(service._instances), 0)
+    
+    def test_process_message_async_awaits_reply(self):
+        """Test that unknown intents await the AI reply with a timeout, and template intents send nothing"""
+        import asyncio
+        from types import SimpleNamespace
+        from unittest.mock import AsyncMock
+        from src.services.dialogue_service import DialogueService
+        
+        dialogue = DialogueService()
+        dialogue.async_client = MagicMock()
+        dialogue.async_client.chat.completions.create = AsyncMock(return_value=SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content='Yes, we do.'))]))
+        unknown = {'intent': 'unknown', 'confidence': 0.0}
+        
+        async def conversation():
+            greeting = await dialogue.process_message_async('Hello there', 'async-session')
+            answer = await dialogue.process_message_async('Do you accept my insurance plan?', 'async-session',
+                                                          timeout=2.5)
+            return greeting, answer
+        
+        with self.app.app_context(), \
+                patch.object(dialogue.nlu_service, '_ai_based_intent_async', AsyncMock(return_value=unknown)):
+            greeting, answer = asyncio.run(conversation())
+        
+        self.assertEqual(greeting['intent'], 'greeting')
+        self.assertEqual(answer['response'], 'Yes, we do.')
+        dialogue.async_client.chat.completions.create.assert_awaited_once()
+        self.assertEqual(dialogue.async_client.chat.completions.create.call_args.kwargs['timeout'], 2.5)
+        self.assertEqual(len(dialogue.active_sessions['async-session'].conversation_history), 2)
+    
+    def test_cancellation_aborts_turn(self):
+        """Test that cancelling a turn awaiting OpenAI raises in the caller and records nothing"""
+        import asyncio
+        from unittest.mock import AsyncMock
+        from src.services.dialogue_service import DialogueService
+        
+        dialogue = DialogueService()
+        
+        async def hang(**kwargs):
+            await asyncio.Event().wait()
+        
+        create = AsyncMock(side_effect=hang)
+        dialogue.async_client = MagicMock()
+        dialogue.async_client.chat.completions.create = create
+        unknown = {'intent': 'unknown', 'confidence': 0.0}
+        
+        async def cancelled_turn():
+            task = asyncio.create_task(dialogue.process_message_async('Is there parking?', 'cancelled-session'))
+            # Cancel only once the turn is blocked inside the OpenAI request
+            while create.await_count < 1 and not task.done():
+                await asyncio.sleep(0)
+            self.assertEqual(create.await_count, 1)
+            task.cancel()
+            await task
+        
+        with self.app.app_context(), \
+                patch.object(dialogue.nlu_service, '_ai_based_intent_async', AsyncMock(return_value=unknown)):
+            with self.assertRaises(asyncio.CancelledError):
+                asyncio.run(cancelled_turn())
+        
+        self.assertEqual(dialogue.active_sessions['cancelled-session'].conversation_history, [])
+
 if __name__ == '__main__':
     # Create test suite
     test_suite = unittest.TestSuite()
@@ -320,6 +2326,27 @@ if __name__ == '__main__':
     test_suite.addTest(unittest.makeSuite(PhoneAPITestCase))
     test_suite.addTest(unittest.makeSuite(BusinessLogicTestCase))
     test_suite.addTest(unittest.makeSuite(IntegrationTestCase))
+    test_suite.addTest(unittest.makeSuite(AnalyticsAPITestCase))
+    test_suite.addTest(unittest.makeSuite(CallEventsTestCase))
+    test_suite.addTest(unittest.makeSuite(StatusIngestTestCase))
+    test_suite.addTest(unittest.makeSuite(TwilioSyncTestCase))
+    test_suite.addTest(unittest.makeSuite(CampaignTestCase))
+    test_suite.addTest(unittest.makeSuite(ReminderSchedulerTestCase))
+    test_suite.addTest(unittest.makeSuite(TwimlTemplateTestCase))
+    test_suite.addTest(unittest.makeSuite(TurnTracingTestCase))
+    test_suite.addTest(unittest.makeSuite(CallSessionTestCase))
+    test_suite.addTest(unittest.makeSuite(SpeechStreamingTestCase))
+    test_suite.addTest(unittest.makeSuite(AudioCodecTestCase))
+    test_suite.addTest(unittest.makeSuite(QueryPlanTestCase))
+    test_suite.addTest(unittest.makeSuite(AppFactoryTestCase))
+    test_suite.addTest(unittest.makeSuite(StaticAssetsTestCase))
+    test_suite.addTest(unittest.makeSuite(MetricsTestCase))
+    test_suite.addTest(unittest.makeSuite(EntityExtractorTestCase))
+    test_suite.addTest(unittest.makeSuite(DateResolverTestCase))
+    test_suite.addTest(unittest.makeSuite(TenantTestCase))
+    test_suite.addTest(unittest.makeSuite(TenantLanguageTestCase))
+    test_suite.addTest(unittest.makeSuite(PromptBuilderTestCase))
+    test_suite.addTest(unittest.makeSuite(AsyncOpenAITestCase))
     
     # Run tests
     runner = unittest.TextTestRunner(verbosity=2)
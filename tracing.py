@@ -0,0 +1,200 @@
+"""
+Turn Tracing
+Lightweight spans around each stage of a conversational turn (speech to
+text, NLU, dialogue, LLM calls, text to speech), kept in a ring buffer for
+per-stage latency breakdowns
+"""
+
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional
+
+RING_SIZE = 2048  # Most recent turns kept per process
+PERCENTILES = (50, 90, 99)
+
+class Span:
+    """One timed stage of a turn"""
+    __slots__ = ('name', 'start_ms', 'duration_ms', 'depth', 'attrs', '_started')
+    
+    def __init__(self, name: str, start_ms: float, depth: int, attrs: Dict):
+        self.name = name
+        self.start_ms = start_ms  # Offset from the start of the turn
+        self.duration_ms = None
+        self.depth = depth
+        self.attrs = attrs
+        self._started = time.perf_counter()
+    
+    def mark(self, key: str):
+        """Record the milliseconds since the span started, e.g. time to first byte"""
+        self.attrs[key] = round((time.perf_counter() - self._started) * 1000, 2)
+    
+    def to_dict(self):
+        """Convert span to dictionary"""
+        return {
+            'name': self.name,
+            'start_ms': round(self.start_ms, 2),
+            'duration_ms': round(self.duration_ms, 2) if self.duration_ms is not None else None,
+            'depth': self.depth,
+            **self.attrs
+        }
+
+class TurnTrace:
+    """Spans recorded for one turn of a call or chat session"""
+    
+    def __init__(self, session_id: Optional[str] = None):
+        self.session_id = session_id
+        self.started_at = time.time()
+        self.finished_at = None
+        self.duration_ms = None
+        self.spans: List[Span] = []
+        self._start = time.perf_counter()
+        self._open: List[Span] = []
+    
+    def start_span(self, name: str, attrs: Dict) -> Span:
+        span = Span(name, (time.perf_counter() - self._start) * 1000, len(self._open), attrs)
+        self.spans.append(span)
+        self._open.append(span)
+        return span
+    
+    def end_span(self, span: Span):
+        span.duration_ms = (time.perf_counter() - span._started) * 1000
+        self._open.remove(span)
+    
+    @property
+    def current_span(self) -> Optional[Span]:
+        """Innermost span still open"""
+        return self._open[-1] if self._open else None
+    
+    def finish(self):
+        self.duration_ms = (time.perf_counter() - self._start) * 1000
+        self.finished_at = time.time()
+    
+    def stage_ms(self, name: str) -> Optional[int]:
+        """Total milliseconds spent in spans with this name, None if there were none"""
+        durations = [span.duration_ms for span in self.spans if span.name == name and span.duration_ms is not None]
+        return int(sum(durations)) if durations else None
+    
+    def to_dict(self):
+        """Convert trace to dictionary"""
+        return {
+            'session_id': self.session_id,
+            'started_at': self.started_at,
+            'duration_ms': round(self.duration_ms, 2) if self.duration_ms is not None else None,
+            'spans': [span.to_dict() for span in self.spans]
+        }
+
+# Trace of the turn being handled by the current thread or asyncio task
+_current_trace: ContextVar[Optional[TurnTrace]] = ContextVar('turn_trace', default=None)
+
+class Tracer:
+    def __init__(self, size: int = RING_SIZE):
+        """
+        Initialize the tracer
+        
+        Args:
+            size: Finished turns kept in the ring buffer
+        """
+        self._traces = deque(maxlen=size)
+        self._listeners = []
+    
+    @contextmanager
+    def turn(self, session_id: Optional[str] = None):
+        """
+        Trace one turn; spans opened inside the block are attached to it
+        
+        Args:
+            session_id: Chat session ID or CallSid; may be set on the trace
+                later, once the dialogue manager has assigned one
+        """
+        trace = TurnTrace(session_id)
+        token = _current_trace.set(trace)
+        try:
+            yield trace
+        finally:
+            _current_trace.reset(token)
+            trace.finish()
+            self._traces.append(trace)
+            for listener in self._listeners:
+                listener(trace)
+    
+    @contextmanager
+    def span(self, name: str, **attrs):
+        """
+        Time a stage of the current turn; a no-op outside of a traced turn
+        
+        Exceptions propagate and are recorded on the span as its error.
+        """
+        trace = _current_trace.get()
+        if trace is None:
+            yield None
+            return
+        
+        span = trace.start_span(name, attrs)
+        try:
+            yield span
+        except Exception as e:
+            span.attrs['error'] = type(e).__name__
+            raise
+        finally:
+            trace.end_span(span)
+    
+    def add_listener(self, listener: Callable[[TurnTrace], None]):
+        """Call listener with every turn as it finishes, e.g. to feed metrics"""
+        self._listeners.append(listener)
+    
+    def annotate(self, **attrs):
+        """Attach attributes (e.g. path='ai', cache='hit') to the innermost open span"""
+        trace = _current_trace.get()
+        span = trace.current_span if trace is not None else None
+        if span is not None:
+            span.attrs.update(attrs)
+    
+    def current(self) -> Optional[TurnTrace]:
+        """Trace of the turn in progress, if any"""
+        return _current_trace.get()
+    
+    def recent(self, session_id: Optional[str] = None, limit: int = 50) -> List[TurnTrace]:
+        """Most recent finished turns, newest first"""
+        traces = []
+        for trace in reversed(list(self._traces)):
+            if session_id is None or trace.session_id == session_id:
+                traces.append(trace)
+                if len(traces) >= limit:
+                    break
+        return traces
+    
+    def stage_percentiles(self, window_seconds: float = 300) -> Dict[str, Dict]:
+        """
+        Latency percentiles per stage over the turns finished in the window
+        
+        Returns:
+            Stage name (span name, plus 'turn' for whole turns) -> count,
+            p50_ms, p90_ms, p99_ms and max_ms
+        """
+        cutoff = time.time() - window_seconds
+        durations = {}
+        for trace in list(self._traces):
+            if trace.finished_at < cutoff:
+                continue
+            durations.setdefault('turn', []).append(trace.duration_ms)
+            for span in trace.spans:
+                if span.duration_ms is not None:
+                    durations.setdefault(span.name, []).append(span.duration_ms)
+        
+        stats = {}
+        for name, values in durations.items():
+            values.sort()
+            stats[name] = {'count': len(values), 'max_ms': round(values[-1], 2)}
+            for percentile in PERCENTILES:
+                index = min(len(values) - 1, int(len(values) * percentile / 100))
+                stats[name][f'p{percentile}_ms'] = round(values[index], 2)
+        return stats
+    
+    def clear(self):
+        """Forget every recorded turn"""
+        self._traces.clear()
+
+# Process-wide tracer
+tracer = Tracer()
@@ -1,15 +1,22 @@
 import os
-import json
-import base64
-import asyncio
-import websockets
 from twilio.rest import Client
-from twilio.twiml.voice_response import VoiceResponse, Connect, Say, Stream
+from twilio.http.http_client import TwilioHttpClient
 from twilio.base.exceptions import TwilioException
 import logging
+from src.services.twiml_templates import twiml_cache
+from src.services.metrics import ExternalCall
 
 logger = logging.getLogger(__name__)
 
+class TimedHttpClient(TwilioHttpClient):
+    """Twilio HTTP client recording every REST request in the external request metrics"""
+    
+    def request(self, method, url, *args, **kwargs):
+        with ExternalCall('twilio', method.upper()) as call:
+            response = super().request(method, url, *args, **kwargs)
+            call.status(response.status_code)
+        return response
+
 class TwilioService:
     def __init__(self):
         self.account_sid = os.getenv('TWILIO_ACCOUNT_SID')
@@ -18,67 +25,69 @@ class TwilioService:
         
         # Allow initialization without credentials for testing
         if self.account_sid and self.auth_token:
-            self.client = Client(self.account_sid, self.auth_token)
+            self.client = Client(self.account_sid, self.auth_token, http_client=TimedHttpClient())
+            
+            # Point the REST client at another host, e.g. a local stand-in server
+            api_base_url = os.getenv('TWILIO_API_BASE_URL')
+            if api_base_url:
+                self.client.api.base_url = api_base_url.rstrip('/')
         else:
             logger.warning("Twilio credentials not found. Service will run in test mode.")
             self.client = None
     
-    def create_voice_response(self, message=None, connect_stream=False, stream_url=None):
-        """Create a TwiML voice response"""
-        response = VoiceResponse()
+    def create_voice_response(self, message=None, connect_stream=False, stream_url=None, tenant=None):
+        """
+        Create a TwiML voice response
         
+        Returns:
+            TwiML document as bytes, rendered from a cached template
+        """
+        stream = connect_stream and stream_url
+        if message and stream:
+            return twiml_cache.render('say_stream', tenant, message=message, stream_url=stream_url)
         if message:
-            response.say(message, voice='Polly.Amy')
-        
-        if connect_stream and stream_url:
-            connect = Connect()
-            stream = Stream(url=stream_url)
-            connect.append(stream)
-            response.append(connect)
-        
-        return str(response)
+            return twiml_cache.render('say', tenant, message=message)
+        if stream:
+            return twiml_cache.render('stream', tenant, stream_url=stream_url)
+        return twiml_cache.render('empty', tenant)
     
-    def handle_incoming_call(self, stream_url=None):
-        """Handle incoming phone call with AI voice assistant"""
-        response = VoiceResponse()
+    def handle_incoming_call(self, stream_url=None, tenant=None):
+        """
+        Handle incoming phone call with AI voice assistant
         
-        # Initial greeting
-        response.say("Hello! I'm your AI voice receptionist. How can I help you today?", voice='Polly.Amy')
+        Greets the caller and connects the media stream for real-time AI
+        processing, or apologizes when no stream URL is available.
         
-        # Connect to media stream for real-time AI processing
+        Returns:
+            TwiML document as bytes, rendered from a cached template
+        """
         if stream_url:
-            connect = Connect()
-            stream = Stream(url=stream_url)
-            connect.append(stream)
-            response.append(connect)
-        else:
-            # Fallback if no stream URL provided
-            response.say("I'm sorry, but I'm having technical difficulties. Please try calling back later.", voice='Polly.Amy')
-        
-        return str(response)
+            return twiml_cache.render('incoming_stream', tenant, stream_url=stream_url)
+        return twiml_cache.render('incoming_unavailable', tenant)
     
-    def make_outbound_call(self, to_number, from_number=None, twiml_url=None, message=None):
+    def make_outbound_call(self, to_number, from_number=None, twiml_url=None, message=None,
+                           twiml=None, status_callback=None):
         """Make an outbound call"""
         try:
             if not from_number:
                 from_number = self.phone_number
             
-            if message and not twiml_url:
+            kwargs = {'to': to_number, 'from_': from_number}
+            if status_callback:
+                # Report every lifecycle change to the status webhook
+                kwargs['status_callback'] = status_callback
+                kwargs['status_callback_event'] = ['initiated', 'ringing', 'answered', 'completed']
+            
+            if twiml:
+                call = self.client.calls.create(twiml=twiml, **kwargs)
+            elif message and not twiml_url:
                 # Create simple TwiML for message
-                twiml = f'<Response><Say voice="Polly.Amy">{message}</Say></Response>'
-                call = self.client.calls.create(
-                    twiml=twiml,
-                    to=to_number,
-                    from_=from_number
-                )
+                twiml = twiml_cache.render('say', message=message).decode()
+                call = self.client.calls.create(twiml=twiml, **kwargs)
             elif twiml_url:
-                call = self.client.calls.create(
-                    url=twiml_url,
-                    to=to_number,
-                    from_=from_number
-                )
+                call = self.client.calls.create(url=twiml_url, **kwargs)
             else:
-                raise ValueError("Either message or twiml_url must be provided")
+                raise ValueError("Either message, twiml or twiml_url must be provided")
             
             logger.info(f"Outbound call created: {call.sid}")
             return {
@@ -100,21 +109,68 @@ class TwilioService:
                 'error': str(e)
             }
     
+    def send_sms(self, to_number, body, from_number=None):
+        """Send an SMS message"""
+        try:
+            message = self.client.messages.create(
+                to=to_number,
+                from_=from_number or self.phone_number,
+                body=body
+            )
+            
+            logger.info(f"SMS sent: {message.sid}")
+            return {
+                'success': True,
+                'message_sid': message.sid,
+                'status': message.status
+            }
+        
+        except TwilioException as e:
+            logger.error(f"Twilio error sending SMS: {e}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+        except Exception as e:
+            logger.error(f"Error sending SMS: {e}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    @staticmethod
+    def _call_to_dict(call):
+        """Convert a Twilio call resource to a dictionary"""
+        return {
+            'sid': call.sid,
+            'from': call._from,  # The SDK stores the reserved word with a leading underscore
+            'to': call.to,
+            'status': call.status,
+            'start_time': call.start_time,
+            'end_time': call.end_time,
+            'date_created': call.date_created,
+            'duration': call.duration,
+            'price': call.price,
+            'direction': call.direction
+        }
+    
+    @staticmethod
+    def _recording_to_dict(recording):
+        """Convert a Twilio recording resource to a dictionary"""
+        return {
+            'sid': recording.sid,
+            'call_sid': recording.call_sid,
+            'status': recording.status,
+            'duration': recording.duration,
+            'date_created': recording.date_created,
+            'uri': recording.uri
+        }
+    
     def get_call_details(self, call_sid):
         """Get details of a specific call"""
         try:
             call = self.client.calls(call_sid).fetch()
-            return {
-                'sid': call.sid,
-                'from': call.from_,
-                'to': call.to,
-                'status': call.status,
-                'start_time': call.start_time,
-                'end_time': call.end_time,
-                'duration': call.duration,
-                'price': call.price,
-                'direction': call.direction
-            }
+            return self._call_to_dict(call)
         except TwilioException as e:
             logger.error(f"Error fetching call details: {e}")
             return None
@@ -123,15 +179,7 @@ class TwilioService:
         """Get recordings for a specific call"""
         try:
             recordings = self.client.recordings.list(call_sid=call_sid)
-            return [
-                {
-                    'sid': recording.sid,
-                    'duration': recording.duration,
-                    'date_created': recording.date_created,
-                    'uri': recording.uri
-                }
-                for recording in recordings
-            ]
+            return [self._recording_to_dict(recording) for recording in recordings]
         except TwilioException as e:
             logger.error(f"Error fetching call recordings: {e}")
             return []
@@ -232,22 +280,49 @@ class TwilioService:
             
             calls = self.client.calls.list(**kwargs)
             
-            return [
-                {
-                    'sid': call.sid,
-                    'from': call.from_,
-                    'to': call.to,
-                    'status': call.status,
-                    'start_time': call.start_time,
-                    'end_time': call.end_time,
-                    'duration': call.duration,
-                    'direction': call.direction,
-                    'price': call.price
-                }
-                for call in calls
-            ]
+            return [self._call_to_dict(call) for call in calls]
         
         except TwilioException as e:
             logger.error(f"Error fetching call logs: {e}")
             return []
+    
+    def iter_call_pages(self, start_time_after=None, page_size=1000):
+        """
+        Page through call logs, newest first
+        
+        Args:
+            start_time_after: Only calls started at or after this datetime
+            page_size: Calls per REST request
+        
+        Yields:
+            Lists of call dictionaries, one list per page
+        """
+        kwargs = {'page_size': page_size}
+        if start_time_after:
+            kwargs['start_time_after'] = start_time_after
+        
+        page = self.client.calls.page(**kwargs)
+        while page is not None:
+            yield [self._call_to_dict(call) for call in page]
+            page = page.next_page()
+    
+    def iter_recording_pages(self, date_created_after=None, page_size=1000):
+        """
+        Page through recording metadata, newest first
+        
+        Args:
+            date_created_after: Only recordings created at or after this datetime
+            page_size: Recordings per REST request
+        
+        Yields:
+            Lists of recording dictionaries, one list per page
+        """
+        kwargs = {'page_size': page_size}
+        if date_created_after:
+            kwargs['date_created_after'] = date_created_after
+        
+        page = self.client.recordings.page(**kwargs)
+        while page is not None:
+            yield [self._recording_to_dict(recording) for recording in page]
+            page = page.next_page()
 
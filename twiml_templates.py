@@ -0,0 +1,174 @@
+"""
+TwiML Templates
+Precompiled TwiML responses: documents are built with the Twilio helper
+library once per configuration version and then rendered as bytes by
+escaped substitution of their parameters
+"""
+
+import re
+import time
+import threading
+from typing import Callable, Dict, Optional
+from xml.sax.saxutils import escape
+from flask import has_app_context
+from sqlalchemy import event
+from twilio.twiml.voice_response import VoiceResponse, Connect, Stream
+from src.models.user import db
+from src.models.call import BusinessConfig, TenantConfig
+from src.services.metrics import cache_requests
+from src.services.tenants import LRUCache, tenant_registry
+
+VOICE = 'Polly.Amy'
+DEFAULT_GREETING = "Hello! I'm your AI voice receptionist. How can I help you today?"
+UNAVAILABLE_MESSAGE = "I'm sorry, but I'm having technical difficulties. Please try calling back later."
+
+CONFIG_CHECK_SECONDS = 5.0  # How stale another process's config change may be
+TEMPLATE_CACHE_SIZE = 4096  # Compiled (template, tenant) pairs kept per process
+
+_PARAM = re.compile('\x00(\\w+)\x00')
+_ATTRIBUTE_ESCAPES = {'"': '&quot;'}
+_HITS = cache_requests.labels(cache='twiml', result='hit')
+_MISSES = cache_requests.labels(cache='twiml', result='miss')
+
+def param(name: str) -> str:
+    """Placeholder for a template parameter, filled in at render time"""
+    return f'\x00{name}\x00'
+
+class TwimlTemplate:
+    """A serialized TwiML document split around its parameters"""
+    
+    def __init__(self, response: VoiceResponse):
+        pieces = _PARAM.split(str(response))
+        self.literals = [piece.encode() for piece in pieces[0::2]]
+        self.params = pieces[1::2]
+        # Documents without parameters are served as the same bytes every time
+        self.static = self.literals[0] if not self.params else None
+    
+    def render(self, **values) -> bytes:
+        """
+        Fill in the parameters
+        
+        Values are XML-escaped, including double quotes, so they are safe in
+        both element text and attribute values.
+        """
+        if self.static is not None:
+            return self.static
+        
+        parts = [self.literals[0]]
+        for name, literal in zip(self.params, self.literals[1:]):
+            parts.append(escape(str(values[name]), _ATTRIBUTE_ESCAPES).encode())
+            parts.append(literal)
+        return b''.join(parts)
+
+def _stream(response: VoiceResponse):
+    """Append a media stream connection to the stream_url parameter"""
+    connect = Connect()
+    connect.append(Stream(url=param('stream_url')))
+    response.append(connect)
+
+def _incoming_stream(config):
+    response = VoiceResponse()
+    response.say(config['greeting'], voice=VOICE)
+    _stream(response)
+    return response
+
+def _incoming_unavailable(config):
+    response = VoiceResponse()
+    response.say(config['greeting'], voice=VOICE)
+    response.say(UNAVAILABLE_MESSAGE, voice=VOICE)
+    return response
+
+def _say(config):
+    response = VoiceResponse()
+    response.say(param('message'), voice=VOICE)
+    return response
+
+def _say_stream(config):
+    response = _say(config)
+    _stream(response)
+    return response
+
+def _stream_only(config):
+    response = VoiceResponse()
+    _stream(response)
+    return response
+
+# Template name -> builder taking the tenant's configuration
+TEMPLATES: Dict[str, Callable[[Dict], VoiceResponse]] = {
+    'incoming_stream': _incoming_stream,
+    'incoming_unavailable': _incoming_unavailable,
+    'say': _say,
+    'say_stream': _say_stream,
+    'stream': _stream_only,
+    'empty': lambda config: VoiceResponse(),
+}
+
+class TwimlCache:
+    def __init__(self):
+        """Initialize an empty cache"""
+        self._templates = LRUCache(TEMPLATE_CACHE_SIZE)  # (name, tenant) -> TwimlTemplate for the current version
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+    
+    def get(self, name: str, tenant: Optional[str] = None) -> TwimlTemplate:
+        """
+        Get a compiled template, building it on first use for this configuration
+        
+        Args:
+            name: Key of TEMPLATES
+            tenant: Business number the call is for
+        """
+        self._check_version()
+        key = (name, tenant)
+        template = self._templates.get(key)
+        if template is None:
+            _MISSES.inc()
+            template = TwimlTemplate(TEMPLATES[name](self._load_config(tenant)))
+            self._templates.put(key, template)
+        else:
+            _HITS.inc()
+        return template
+    
+    def render(self, name: str, tenant: Optional[str] = None, **values) -> bytes:
+        """Render a template to TwiML bytes"""
+        return self.get(name, tenant).render(**values)
+    
+    def invalidate(self):
+        """Re-check the configuration version on next use"""
+        self._checked_at = 0.0
+    
+    def _check_version(self):
+        """Drop compiled templates once the global or any tenant's configuration has changed"""
+        now = time.monotonic()
+        if now - self._checked_at < CONFIG_CHECK_SECONDS or not has_app_context():
+            return
+        
+        with self._lock:
+            version = tuple(db.session.query(
+                db.func.count(BusinessConfig.id), db.func.max(BusinessConfig.updated_at)
+            ).one()) + tuple(db.session.query(
+                db.func.count(TenantConfig.id), db.func.max(TenantConfig.updated_at)
+            ).one())
+            if version != self._version:
+                self._templates.clear()
+                self._version = version
+            self._checked_at = now
+    
+    @staticmethod
+    def _load_config(tenant: Optional[str]) -> Dict[str, str]:
+        """Configuration values the templates depend on"""
+        return {'greeting': tenant_registry.get(tenant).config.get('greeting_message') or DEFAULT_GREETING}
+
+# Process-wide cache used by TwilioService
+twiml_cache = TwimlCache()
+
+@event.listens_for(BusinessConfig, 'after_insert')
+@event.listens_for(BusinessConfig, 'after_update')
+@event.listens_for(BusinessConfig, 'after_delete')
+@event.listens_for(TenantConfig, 'after_insert')
+@event.listens_for(TenantConfig, 'after_update')
+@event.listens_for(TenantConfig, 'after_delete')
+def _business_config_changed(mapper, connection, config):
+    """Pick up this process's own configuration changes without waiting"""
+    twiml_cache.invalidate()
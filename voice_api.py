@@ -5,26 +5,176 @@ Handles voice-related API endpoints for the AI receptionist
 
 import os
 import io
+import json
+import base64
 import tempfile
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, request, jsonify, send_file, Response, stream_with_context
 from werkzeug.utils import secure_filename
-from src.services.speech_service import SpeechService
-from src.services.dialogue_service import DialogueService
-from src.models.call import Call, Appointment, BusinessConfig, db
+from src.services.registry import speech_service, dialogue_service
+from src.services.event_bus import call_events
+from src.services.tracing import tracer
+from src.services.tenants import tenant_registry, normalize_number
+from src.models.call import Call, Appointment, db
 from datetime import datetime
 
 voice_bp = Blueprint('voice', __name__)
 
-# Initialize services
-speech_service = SpeechService()
-dialogue_service = DialogueService()
+# Content types for streamed TTS output
+STREAM_MIMETYPES = {
+    'mp3': 'audio/mpeg',
+    'opus': 'audio/ogg',
+    'aac': 'audio/aac',
+    'flac': 'audio/flac',
+    'wav': 'audio/wav',
+    'pcm': 'audio/L16;rate=24000',
+    'ulaw': 'audio/basic'
+}
 
 @voice_bp.route('/process-call', methods=['POST'])
 def process_call():
     """
     Process a voice call - handles audio input and returns audio response
+    
+    The optional tenant form field is the business number the call is for.
     """
     try:
         # Check if audio file is provided
         if 'audio' not in request.files:
-            return jsonify({'error': 'No audio file provided'}), 400
\ No newline at end of file
+            return jsonify({'error': 'No audio file provided'}), 400        
+        audio_file = request.files['audio']
+        session_id = request.form.get('session_id')
+        tenant = request.form.get('tenant')  # Business number the caller dialed
+        
+        if not audio_file.filename or not speech_service.validate_audio_format(audio_file.filename):
+            return jsonify({'error': 'Unsupported audio format'}), 400
+        
+        # Save the upload so the Whisper client gets a named file
+        suffix = os.path.splitext(secure_filename(audio_file.filename))[1]
+        with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as temp_file:
+            audio_file.save(temp_file)
+            temp_path = temp_file.name
+        
+        with tracer.turn(session_id) as trace:
+            try:
+                with tracer.span('stt'):
+                    transcription = speech_service.speech_to_text(temp_path)
+            finally:
+                os.unlink(temp_path)
+            
+            # Run the transcription through the dialogue manager
+            with tracer.span('dialogue'):
+                result = dialogue_service.process_message(transcription, session_id, tenant)
+            trace.session_id = result['session_id']
+            
+            # Synthesize the reply; the business's template replies are synthesized once
+            business = tenant_registry.get(result['tenant'])
+            with tracer.span('tts'):
+                audio_response = business.cached_speech(
+                    result['response'], business.voice,
+                    lambda: speech_service.text_to_speech(result['response'], voice=business.voice)
+                )
+        
+        _log_turn(result, transcription, trace)
+        
+        return jsonify({
+            'transcription': transcription,
+            'response': result['response'],
+            'intent': result['intent'],
+            'entities': result['entities'],
+            'session_id': result['session_id'],
+            'state': result['state'],
+            'audio': base64.b64encode(audio_response).decode('ascii')
+        })
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@voice_bp.route('/text-chat', methods=['POST'])
+def text_chat():
+    """
+    Process a text message through the dialogue manager (used by the chat tester)
+    
+    The optional tenant field is the business number to chat with.
+    """
+    try:
+        data = request.get_json() or {}
+        message = data.get('message')
+        
+        if not message:
+            return jsonify({'error': 'message is required'}), 400
+        
+        with tracer.turn(data.get('session_id')) as trace:
+            with tracer.span('dialogue'):
+                result = dialogue_service.process_message(message, data.get('session_id'), data.get('tenant'))
+            trace.session_id = result['session_id']
+        
+        _log_turn(result, message, trace)
+        return jsonify(result)
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@voice_bp.route('/tts', methods=['POST'])
+def stream_tts():
+    """
+    Stream synthesized speech back to the client as it is generated
+    
+    Accepts JSON with text, an optional voice and an optional format
+    (mp3, opus, aac, flac, wav, pcm or ulaw for 8 kHz G.711 mu-law).
+    """
+    try:
+        data = request.get_json() or {}
+        text = data.get('text')
+        
+        if not text:
+            return jsonify({'error': 'text is required'}), 400
+        
+        response_format = data.get('format', 'mp3')
+        if response_format not in STREAM_MIMETYPES:
+            return jsonify({'error': f'Unsupported format: {response_format}'}), 400
+        
+        voice = data.get('voice') or tenant_registry.get(data.get('tenant')).voice
+        audio_stream = speech_service.stream_text_to_speech(
+            text,
+            voice=voice,
+            response_format=response_format
+        )
+        
+        return Response(
+            stream_with_context(audio_stream),
+            mimetype=STREAM_MIMETYPES[response_format]
+        )
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def _persist_traces():
+    """Whether full turn traces are stored with each turn (PERSIST_TURN_TRACES)"""
+    return os.getenv('PERSIST_TURN_TRACES', '').lower() in ('1', 'true', 'yes')
+
+def _log_turn(result, user_text, trace):
+    """Append the exchange, with its stage timings, to the call's turn log"""
+    latency = {
+        'stt_ms': trace.stage_ms('stt'),
+        'dialogue_ms': trace.stage_ms('dialogue'),
+        'tts_ms': trace.stage_ms('tts'),
+        'total_ms': int(trace.duration_ms)
+    }
+    spans = json.dumps(trace.to_dict()['spans']) if _persist_traces() else None
+    
+    call = Call.get_or_create(result['session_id'])
+    call.record_turn(user_text, result['response'], result['intent'], dict(latency, spans=spans))
+    db.session.commit()
+    
+    tenant = normalize_number(result['tenant'])
+    call_events.publish('call.turn', {
+        'call_sid': result['session_id'],
+        'user_text': user_text,
+        'response': result['response'],
+        'latency': latency
+    }, tenant=tenant)
+    call_events.publish('call.intent', {
+        'call_sid': result['session_id'],
+        'intent': result['intent'],
+        'entities': result['entities']
+    }, tenant=tenant)